@@ -2,9 +2,13 @@
 # admin.py - Área de administração Flask (similar ao Django Admin)
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
-from models import db, Usuario, Escola, Dossie, Anexo, Perfil, Cidade, Movimentacao, Diretor, Permissao, PerfilPermissao, Solicitante
+from models import db, Usuario, Escola, Dossie, Anexo, Perfil, Cidade, Movimentacao, Diretor, Permissao, PerfilPermissao, Solicitante, EstatisticaEscola
 from controllers.auth_controller import login_required
+from utils.usuario_atual import get_usuario_atual
 from datetime import datetime
+from sqlalchemy import inspect as sa_inspect
+from utils.paginacao import paginar_keyset
+from utils.carregamento import com_carregamento
 import os
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
@@ -16,7 +20,7 @@ def admin_required(f):
             flash('Acesso negado. Faça login.', 'error')
             return redirect(url_for('auth.login'))
         
-        usuario = Usuario.query.get(session['user_id'])
+        usuario = get_usuario_atual()
         if not usuario or not usuario.is_admin_geral():
             flash('Acesso negado. Apenas administradores.', 'error')
             return redirect(url_for('dashboard'))
@@ -30,15 +34,16 @@ def admin_required(f):
 @admin_required
 def index():
     """Dashboard administrativo"""
-    # Estatísticas gerais
+    # Estatísticas gerais (tabelas grandes vêm dos contadores materializados)
+    resumo = EstatisticaEscola.obter_resumo()
     stats = {
-        'usuarios': Usuario.query.count(),
+        'usuarios': sum(resumo.get(EstatisticaEscola.USUARIO_SITUACAO, {}).values()),
         'escolas': Escola.query.count(),
-        'dossies': Dossie.query.count(),
+        'dossies': sum(resumo.get(EstatisticaEscola.DOSSIE_STATUS, {}).values()),
         'anexos': Anexo.query.count(),
         'perfis': Perfil.query.count(),
         'cidades': Cidade.query.count(),
-        'movimentacoes': Movimentacao.query.count(),
+        'movimentacoes': sum(resumo.get(EstatisticaEscola.MOVIMENTACAO_STATUS, {}).values()),
         'solicitantes': Solicitante.query.count()
     }
     
@@ -163,8 +168,8 @@ def model_list(model):
     
     Model = model_map[model]
     
-    # Paginação
-    page = request.args.get('page', 1, type=int)
+    # Paginação por cursor
+    cursor = request.args.get('cursor')
     per_page = 20
     
     # Busca
@@ -180,28 +185,13 @@ def model_list(model):
     else:
         objects = Model.query
     
-    # Ordenação
-    try:
-        if hasattr(Model, 'data_cadastro') and hasattr(Model.data_cadastro, 'desc'):
-            objects = objects.order_by(Model.data_cadastro.desc())
-        elif hasattr(Model, 'dt_cadastro') and hasattr(Model.dt_cadastro, 'desc'):
-            objects = objects.order_by(Model.dt_cadastro.desc())
-        elif hasattr(Model, 'id') and hasattr(Model.id, 'desc'):
-            objects = objects.order_by(Model.id.desc())
-        elif hasattr(Model, 'id_perfil') and hasattr(Model.id_perfil, 'desc'):
-            objects = objects.order_by(Model.id_perfil.desc())
-        elif hasattr(Model, 'id_cidade') and hasattr(Model.id_cidade, 'desc'):
-            objects = objects.order_by(Model.id_cidade.desc())
-        else:
-            # Ordenação padrão sem desc() para evitar erros
-            pass
-    except AttributeError:
-        # Se der erro, não ordena
-        pass
+    # Chave de ordenação: data de cadastro (se houver) + chave primária, mais recentes primeiro
+    mapper = sa_inspect(Model)
+    colunas = mapper.columns
+    chaves = [getattr(Model, nome) for nome in ('data_cadastro', 'dt_cadastro') if nome in colunas][:1]
+    chaves.append(getattr(Model, mapper.get_property_by_column(mapper.primary_key[0]).key))
     
-    pagination = objects.paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    pagination = paginar_keyset(com_carregamento(objects, f'admin.{model}'), chaves, cursor, per_page=per_page, contar=True)
     
     return render_template('admin/model_list.html', 
                          model=model,
@@ -300,14 +290,19 @@ def logs():
     """Visualizar logs do sistema"""
     from models import LogAuditoria, LogSistema
     from utils.logs import obter_logs_auditoria, obter_logs_sistema
+    from services.retencao_logs_service import ler_periodo, filtrar_periodo
+    from utils.paginacao import estimar_total
+
+    # Período consultado (no PostgreSQL só as partições do intervalo são lidas)
+    inicio, fim = ler_periodo(request.args)
 
     # Obter logs recentes
-    logs_auditoria = obter_logs_auditoria(limite=50)
-    logs_sistema = obter_logs_sistema(limite=50)
+    logs_auditoria = obter_logs_auditoria(limite=50, inicio=inicio, fim=fim)
+    logs_sistema = obter_logs_sistema(limite=50, inicio=inicio, fim=fim)
 
-    # Estatísticas
-    total_auditoria = LogAuditoria.query.count()
-    total_sistema = LogSistema.query.count()
+    # Estatísticas do período (estimadas pelo planejador no PostgreSQL)
+    total_auditoria, estimado_auditoria = estimar_total(filtrar_periodo(LogAuditoria.query, LogAuditoria, inicio, fim))
+    total_sistema, estimado_sistema = estimar_total(filtrar_periodo(LogSistema.query, LogSistema, inicio, fim))
 
     # Logs de hoje
     hoje = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
@@ -315,8 +310,8 @@ def logs():
     logs_hoje_sistema = LogSistema.query.filter(LogSistema.data_hora >= hoje).count()
 
     stats = {
-        'total_auditoria': total_auditoria,
-        'total_sistema': total_sistema,
+        'total_auditoria': f"~{total_auditoria}" if estimado_auditoria else total_auditoria,
+        'total_sistema': f"~{total_sistema}" if estimado_sistema else total_sistema,
         'logs_hoje_auditoria': logs_hoje_auditoria,
         'logs_hoje_sistema': logs_hoje_sistema
     }
@@ -324,7 +319,18 @@ def logs():
     return render_template('admin/logs.html',
                          logs_auditoria=logs_auditoria,
                          logs_sistema=logs_sistema,
-                         stats=stats)
+                         stats=stats,
+                         inicio=inicio,
+                         fim=fim)
+
+@admin_bp.route('/logs/metricas')
+@login_required
+@admin_required
+def logs_metricas():
+    """Métricas da fila de gravação de logs (backpressure)"""
+    from utils.gravador_logs import gravador_logs
+
+    return jsonify(gravador_logs.metricas())
 
 @admin_bp.route('/configuracoes')
 @login_required
@@ -8,14 +8,14 @@ from flask import Flask, render_template, redirect, url_for, session, flash
 from flask_migrate import Migrate
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from datetime import datetime, timedelta
+from datetime import datetime
 import secrets
 import os
-from sqlalchemy import func
 from werkzeug.security import generate_password_hash
 
 # Importar db dos modelos
 from models import db
+from utils.usuario_atual import get_usuario_atual
 
 # Configuração da aplicação
 def create_app():
@@ -44,6 +44,8 @@ def create_app():
         app.config['SQLALCHEMY_DATABASE_URI'] = database_url
 
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Registrar consultas SQL por requisição (cabeçalho X-SQL-Queries) para auditoria de desempenho
+    app.config['SQLALCHEMY_RECORD_QUERIES'] = os.environ.get('SQLALCHEMY_RECORD_QUERIES') == '1'
     app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
         'pool_pre_ping': True,
         'pool_recycle': 300,
@@ -53,6 +55,11 @@ def create_app():
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
     app.config['UPLOAD_FOLDER'] = 'static/uploads'
 
+    # Entrega de anexos e fotos pelo proxy: '' (a aplicação envia),
+    # 'x-accel-redirect' (nginx) ou 'x-sendfile' (Apache/lighttpd)
+    app.config['ARQUIVOS_OFFLOAD'] = os.environ.get('ARQUIVOS_OFFLOAD', '')
+    app.config['ARQUIVOS_ACCEL_PREFIXO'] = os.environ.get('ARQUIVOS_ACCEL_PREFIXO', '/_arquivos/')
+
     # Configurações de segurança de sessão
     app.config['SESSION_COOKIE_SECURE'] = False  # Permitir HTTP para desenvolvimento
     app.config['SESSION_COOKIE_HTTPONLY'] = True  # Não acessível via JavaScript
@@ -62,12 +69,56 @@ def create_app():
     # Inicializar banco de dados
     db.init_app(app)
 
+    # Escopo automático de escola nas consultas de usuários que não são Admin Geral
+    from utils.escopo_escola import escopo_escola
+    escopo_escola.init_app(app)
+
+    # Gravação assíncrona em lote dos logs de auditoria
+    from utils.gravador_logs import gravador_logs
+    gravador_logs.init_app(app)
+
+    # Pool de processamento das fotos enviadas (miniaturas e WebP)
+    from services.imagem_service import processador_imagens
+    processador_imagens.init_app(app)
+
+    # Detector de N+1 nos templates (ativo com debug ou DETECTAR_N_MAIS_1=1)
+    app.config['DETECTAR_N_MAIS_1'] = os.environ.get('DETECTAR_N_MAIS_1') == '1'
+    from utils.carregamento import detector_n_mais_1
+    detector_n_mais_1.init_app(app)
+
+    # Varredura periódica dos empréstimos em atraso (0 desliga; use o cron com manage.py)
+    app.config['EMPRESTIMOS_VARREDURA_SEGUNDOS'] = int(os.environ.get('EMPRESTIMOS_VARREDURA_SEGUNDOS', 300))
+    from services.emprestimo_service import controle_emprestimos
+    controle_emprestimos.init_app(app)
+
+    # Canal de notificações (SSE); com vários workers, publique pelo Redis
+    app.config['NOTIFICACOES_REDIS_URL'] = os.environ.get('NOTIFICACOES_REDIS_URL') or None
+    app.config['NOTIFICACOES_SSE_DURACAO'] = int(os.environ.get('NOTIFICACOES_SSE_DURACAO', 300))
+    app.config['NOTIFICACOES_SSE_PING'] = int(os.environ.get('NOTIFICACOES_SSE_PING', 25))
+    # Streams simultâneos por processo; manter abaixo de --threads do gunicorn
+    app.config['NOTIFICACOES_SSE_MAXIMO'] = int(os.environ.get('NOTIFICACOES_SSE_MAXIMO', 8))
+    from services.notificacao_service import canal_notificacoes
+    canal_notificacoes.init_app(app)
+
+    # Contadores de login e CAPTCHAs compartilhados entre workers (memory://, redis://... ou sql)
+    app.config['LIMITES_ARMAZENAMENTO'] = os.environ.get('LIMITES_ARMAZENAMENTO', 'memory://')
+    app.config['LIMITES_MEMORIA_MAXIMO'] = int(os.environ.get('LIMITES_MEMORIA_MAXIMO', 100000))
+    from utils.armazenamento_limites import armazenamento_limites
+    armazenamento_limites.init_app(app)
+
+    # Cache das configurações: local por worker + Redis opcional (sem ele, geração em versoes_cache)
+    app.config['CONFIG_REDIS_URL'] = os.environ.get('CONFIG_REDIS_URL') or None
+    app.config['CONFIG_CACHE_TIMEOUT'] = int(os.environ.get('CONFIG_CACHE_TIMEOUT', 1800))
+    from utils.cache_configuracoes import cache_configuracoes
+    cache_configuracoes.init_app(app)
+
     # Inicializar Rate Limiter
     limiter = Limiter(
         app=app,
         key_func=get_remote_address,
         default_limits=["200 per day", "50 per hour"],
-        storage_uri="memory://"
+        storage_uri=armazenamento_limites.storage_uri_flask_limiter(app),
+        in_memory_fallback_enabled=True  # Redis fora do ar não derruba as requisições
     )
 
     # Inicializar Flask-Migrate
@@ -82,6 +133,7 @@ def create_app():
         from controllers.configuracao_controller import config_bp
         from controllers.foto_controller import foto_bp
         from controllers.relatorio_controller import relatorio_bp
+        from controllers.notificacao_controller import notificacao_bp
         from admin import admin_bp
 
     app.register_blueprint(auth_bp)
@@ -98,7 +150,14 @@ def create_app():
     app.register_blueprint(config_bp)
     app.register_blueprint(foto_bp)
     app.register_blueprint(relatorio_bp)
+    app.register_blueprint(notificacao_bp)
     app.register_blueprint(admin_bp)
+
+    # Autocompletar do formulário de movimentação: cache curto no navegador e fora do
+    # limite global (cada termo digitado é uma requisição; as rotas exigem login)
+    app.config['AUTOCOMPLETAR_CACHE_SEGUNDOS'] = int(os.environ.get('AUTOCOMPLETAR_CACHE_SEGUNDOS', 30))
+    limiter.exempt(app.view_functions['movimentacao.api_dossies'])
+    limiter.exempt(app.view_functions['movimentacao.api_solicitantes'])
     
     # Rotas principais
     @app.route('/')
@@ -114,69 +173,24 @@ def create_app():
         if 'user_id' not in session:
             return redirect(url_for('auth.login'))
 
-        from models import Usuario, Escola, Dossie, Movimentacao
-        usuario = Usuario.query.get(session['user_id'])
+        from models import Escola
+        usuario = get_usuario_atual()
         if not usuario:
             session.clear()
             flash('Sessão inválida. Faça login novamente.', 'error')
             return redirect(url_for('auth.login'))
 
-        hoje = datetime.now()
-        inicio_mes = hoje.replace(day=1)
         escola_atual_id = session.get('escola_atual_id') or usuario.escola_id
         escola_atual = Escola.query.get(escola_atual_id)
         escola_nome = escola_atual.nome if escola_atual else 'Escola Atual'
 
-        # Indicadores principais
-        stats = {
-            'total_dossies': Dossie.query.filter_by(id_escola=escola_atual_id).count(),
-            'dossies_ativos': Dossie.query.filter_by(id_escola=escola_atual_id, status='ativo').count(),
-            'dossies_pendentes': Dossie.query.filter_by(id_escola=escola_atual_id, status='pendente').count(),
-            'movimentacoes_mes': Movimentacao.query.join(Dossie).filter(
-                Dossie.id_escola == escola_atual_id,
-                Movimentacao.data_movimentacao >= inicio_mes
-            ).count()
-        }
-
-        # Alertas
-        alertas = {
-            'dossies_pendentes': stats['dossies_pendentes'],
-            'movimentacoes_atrasadas': Movimentacao.query.join(Dossie).filter(
-                Dossie.id_escola == escola_atual_id,
-                Movimentacao.status == 'pendente',
-                Movimentacao.data_prevista_devolucao != None,
-                Movimentacao.data_prevista_devolucao < hoje
-            ).count()
-        }
-
-        # Gráficos
-        graficos = {'evolucao_mensal': [], 'tipos_movimentacao': [], 'status_dossies': []}
-        for i in range(5, -1, -1):
-            mes_inicio = (hoje.replace(day=1) - timedelta(days=i*30)).replace(day=1)
-            mes_fim = (mes_inicio + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-            count = Dossie.query.filter(
-                Dossie.id_escola == escola_atual_id,
-                Dossie.dt_cadastro >= mes_inicio,
-                Dossie.dt_cadastro <= mes_fim
-            ).count()
-            graficos['evolucao_mensal'].append({
-                'mes': mes_inicio.strftime('%b/%Y'),
-                'count': count
-            })
-        tipos_mov = db.session.query(
-            Movimentacao.tipo_movimentacao,
-            func.count(Movimentacao.id)
-        ).join(Dossie).filter(Dossie.id_escola == escola_atual_id).group_by(Movimentacao.tipo_movimentacao).all()
-        graficos['tipos_movimentacao'] = [
-            {'tipo': tipo or 'Outro', 'count': count} for tipo, count in tipos_mov
-        ]
-        status_counts = db.session.query(
-            Dossie.status,
-            func.count(Dossie.id_dossie)
-        ).filter(Dossie.id_escola == escola_atual_id).group_by(Dossie.status).all()
-        graficos['status_dossies'] = [
-            {'status': status.title(), 'count': count} for status, count in status_counts
-        ]
+        # Indicadores, alertas e gráficos em consultas agregadas únicas
+        from services.dashboard_service import dashboard_service
+        resultado = dashboard_service.obter_estatisticas(escola_atual_id)
+        stats = resultado['stats']
+        alertas = resultado['alertas']
+        graficos = resultado['graficos']
+        app.logger.debug(f"Dashboard escola {escola_atual_id}: {resultado['tempos']}")
 
         return render_template('dashboard.html',
             usuario=usuario,
@@ -193,139 +207,75 @@ def create_app():
         if 'user_id' not in session:
             return redirect(url_for('auth.login'))
 
-        from models import Usuario, Escola, Dossie, Movimentacao, Perfil
-
-        usuario = Usuario.query.get(session['user_id'])
+        usuario = get_usuario_atual()
         if not usuario:
             session.clear()
             flash('Sessão inválida. Faça login novamente.', 'error')
             return redirect(url_for('auth.login'))
         
-        # Estatísticas avançadas para o dashboard
-        from datetime import datetime, timedelta
-        from sqlalchemy import func, extract
+        # Estatísticas avançadas lidas da tabela materializada estatisticas_escola
+        from models import EstatisticaEscola
 
         hoje = datetime.now()
-        inicio_mes = hoje.replace(day=1)
-        inicio_ano = hoje.replace(month=1, day=1)
-
-        # Obter escola atual
-        escola_atual_id = usuario.get_escola_atual_id()
+        mes_atual = hoje.strftime('%Y-%m')
+        ano_atual = hoje.strftime('%Y-')
 
         if usuario.is_admin_geral():
-            # Admin geral vê estatísticas da escola atual selecionada
-            stats = {
-                # Totais básicos
-                'total_escolas': Escola.query.count(),
-                'total_usuarios': Usuario.query.count(),
-                'total_dossies': Dossie.query.count(),
-                'total_movimentacoes': Movimentacao.query.count(),
-
-                # Status específicos
-                'escolas_ativas': Escola.query.filter_by(situacao='ativa').count(),
-                'usuarios_ativos': Usuario.query.filter_by(situacao='ativo').count(),
-                'dossies_ativos': Dossie.query.filter_by(situacao='ativo').count(),
-                'movimentacoes_pendentes': Movimentacao.query.filter_by(status='pendente').count(),
-
-                # Dados para gráficos - Dossiês por mês (últimos 6 meses)
-                'dossies_por_mes': [],
-
-                # Movimentações por tipo
-                'movimentacoes_por_tipo': [],
-
-                # Usuários por perfil
-                'usuarios_por_perfil': [],
-
-                # Atividade recente (últimos 30 dias)
-                'dossies_mes_atual': Dossie.query.filter(Dossie.dt_cadastro >= inicio_mes).count(),
-                'movimentacoes_mes_atual': Movimentacao.query.filter(Movimentacao.data_movimentacao >= inicio_mes).count(),
-                'usuarios_mes_atual': Usuario.query.filter(Usuario.data_cadastro >= inicio_mes).count(),
-
-                # Crescimento anual
-                'dossies_ano_atual': Dossie.query.filter(Dossie.dt_cadastro >= inicio_ano).count(),
-                'movimentacoes_ano_atual': Movimentacao.query.filter(Movimentacao.data_movimentacao >= inicio_ano).count()
-            }
-
-            # Dados para gráfico de dossiês por mês (últimos 6 meses)
-            for i in range(6):
-                mes_inicio = (hoje.replace(day=1) - timedelta(days=i*30)).replace(day=1)
-                mes_fim = (mes_inicio + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-                count = Dossie.query.filter(
-                    Dossie.dt_cadastro >= mes_inicio,
-                    Dossie.dt_cadastro <= mes_fim
-                ).count()
-                stats['dossies_por_mes'].insert(0, {
-                    'mes': mes_inicio.strftime('%b/%Y'),
-                    'count': count
-                })
-
-            # Movimentações por tipo
-            tipos_mov = db.session.query(
-                Movimentacao.tipo_movimentacao,
-                func.count(Movimentacao.id).label('count')
-            ).group_by(Movimentacao.tipo_movimentacao).all()
-
-            stats['movimentacoes_por_tipo'] = [{'tipo': tipo, 'count': count} for tipo, count in tipos_mov]
-
-            # Usuários por perfil
-            usuarios_perfil = db.session.query(
-                Perfil.perfil,
-                func.count(Usuario.id).label('count')
-            ).join(Usuario).group_by(Perfil.perfil).all()
-
-            stats['usuarios_por_perfil'] = [{'perfil': perfil, 'count': count} for perfil, count in usuarios_perfil]
-
+            # Admin geral vê estatísticas consolidadas de todas as escolas
+            resumo = EstatisticaEscola.obter_resumo()
         else:
             # Usuários da escola veem apenas dados da sua escola
-            stats = {
+            resumo = EstatisticaEscola.obter_resumo(usuario.escola_id)
+
+        dossie_status = resumo.get(EstatisticaEscola.DOSSIE_STATUS, {})
+        dossie_mes = resumo.get(EstatisticaEscola.DOSSIE_MES, {})
+        mov_tipo = resumo.get(EstatisticaEscola.MOVIMENTACAO_TIPO, {})
+        mov_status = resumo.get(EstatisticaEscola.MOVIMENTACAO_STATUS, {})
+        mov_mes = resumo.get(EstatisticaEscola.MOVIMENTACAO_MES, {})
+        usuario_situacao = resumo.get(EstatisticaEscola.USUARIO_SITUACAO, {})
+        usuario_mes = resumo.get(EstatisticaEscola.USUARIO_MES, {})
+
+        stats = {
+            'total_usuarios': sum(usuario_situacao.values()),
+            'total_dossies': sum(dossie_status.values()),
+            'total_movimentacoes': sum(mov_status.values()),
+            'usuarios_ativos': usuario_situacao.get('ativo', 0),
+            'dossies_ativos': dossie_status.get('ativo', 0),
+            'movimentacoes_pendentes': mov_status.get('pendente', 0),
+            'dossies_mes_atual': dossie_mes.get(mes_atual, 0),
+            'movimentacoes_mes_atual': mov_mes.get(mes_atual, 0),
+            'movimentacoes_por_tipo': [{'tipo': tipo, 'count': count} for tipo, count in mov_tipo.items() if count],
+            'dossies_por_mes': []
+        }
+
+        # Dossiês por mês (últimos 6 meses)
+        for i in range(5, -1, -1):
+            indice = hoje.year * 12 + hoje.month - 1 - i
+            mes_inicio = datetime(indice // 12, indice % 12 + 1, 1)
+            stats['dossies_por_mes'].append({
+                'mes': mes_inicio.strftime('%b/%Y'),
+                'count': dossie_mes.get(mes_inicio.strftime('%Y-%m'), 0)
+            })
+
+        if usuario.is_admin_geral():
+            from utils.dados_referencia import dados_referencia
+            perfis = {str(p.id_perfil): p.perfil for p in dados_referencia.obter('perfis')}
+            stats.update({
+                'total_escolas': len(dados_referencia.obter('escolas')),
+                'escolas_ativas': len(dados_referencia.obter('escolas_ativas')),
+                'usuarios_mes_atual': usuario_mes.get(mes_atual, 0),
+                'dossies_ano_atual': sum(c for m, c in dossie_mes.items() if m.startswith(ano_atual)),
+                'movimentacoes_ano_atual': sum(c for m, c in mov_mes.items() if m.startswith(ano_atual)),
+                'usuarios_por_perfil': [
+                    {'perfil': perfis.get(perfil_id, perfil_id), 'count': count}
+                    for perfil_id, count in resumo.get(EstatisticaEscola.USUARIO_PERFIL, {}).items() if count
+                ]
+            })
+        else:
+            stats.update({
                 'total_escolas': 1,
-                'total_usuarios': Usuario.query.filter_by(escola_id=usuario.escola_id).count(),
-                'total_dossies': Dossie.query.filter_by(escola_id=usuario.escola_id).count(),
-                'total_movimentacoes': Movimentacao.query.join(Dossie).filter(Dossie.escola_id == usuario.escola_id).count(),
-                'escolas_ativas': 1 if usuario.escola.situacao == 'ativa' else 0,
-                'usuarios_ativos': Usuario.query.filter_by(escola_id=usuario.escola_id, situacao='ativo').count(),
-                'dossies_ativos': Dossie.query.filter_by(escola_id=usuario.escola_id, situacao='ativo').count(),
-                'movimentacoes_pendentes': Movimentacao.query.join(Dossie).filter(
-                    Dossie.escola_id == usuario.escola_id,
-                    Movimentacao.status == 'pendente'
-                ).count(),
-
-                # Dados específicos da escola
-                'dossies_por_mes': [],
-                'movimentacoes_por_tipo': [],
-                'dossies_mes_atual': Dossie.query.filter(
-                    Dossie.id_escola == usuario.escola_id,
-                    Dossie.dt_cadastro >= inicio_mes
-                ).count(),
-                'movimentacoes_mes_atual': Movimentacao.query.join(Dossie).filter(
-                    Dossie.id_escola == usuario.escola_id,
-                    Movimentacao.data_movimentacao >= inicio_mes
-                ).count()
-            }
-
-            # Dados para gráficos da escola específica
-            for i in range(6):
-                mes_inicio = (hoje.replace(day=1) - timedelta(days=i*30)).replace(day=1)
-                mes_fim = (mes_inicio + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-                count = Dossie.query.filter(
-                    Dossie.id_escola == usuario.escola_id,
-                    Dossie.dt_cadastro >= mes_inicio,
-                    Dossie.dt_cadastro <= mes_fim
-                ).count()
-                stats['dossies_por_mes'].insert(0, {
-                    'mes': mes_inicio.strftime('%b/%Y'),
-                    'count': count
-                })
-
-            # Movimentações por tipo da escola
-            tipos_mov = db.session.query(
-                Movimentacao.tipo_movimentacao,
-                func.count(Movimentacao.id).label('count')
-            ).join(Dossie).filter(
-                Dossie.id_escola == usuario.escola_id
-            ).group_by(Movimentacao.tipo_movimentacao).all()
-
-            stats['movimentacoes_por_tipo'] = [{'tipo': tipo, 'count': count} for tipo, count in tipos_mov]
+                'escolas_ativas': 1 if usuario.escola and usuario.escola.situacao == 'ativa' else 0
+            })
         
         return render_template('dashboard_novo.html', usuario=usuario, stats=stats, current_date=datetime.now())
     
@@ -390,6 +340,14 @@ def create_app():
     def forbidden(error):
         return render_template('errors/403.html'), 403
     
+    @app.after_request
+    def contar_consultas_sql(response):
+        """Expõe a quantidade de consultas SQL da requisição quando o registro está ativo"""
+        if app.config.get('SQLALCHEMY_RECORD_QUERIES'):
+            from flask_sqlalchemy.record_queries import get_recorded_queries
+            response.headers['X-SQL-Queries'] = str(len(get_recorded_queries()))
+        return response
+
     # Context processor para variáveis globais
     @app.context_processor
     def inject_globals():
@@ -404,11 +362,10 @@ def create_app():
     @app.context_processor
     def inject_permission_functions():
         from utils.permissions import has_permission, can_access_menu
-        from models import Usuario
 
         def get_current_user():
             if 'user_id' in session:
-                return Usuario.query.get(session['user_id'])
+                return get_usuario_atual()
             return None
 
         def can_view(usuario, modulo):
@@ -462,6 +419,14 @@ def init_database(app):
         
         db.create_all()
 
+        # Índice de busca textual de dossiês (FTS5 / tsvector + pg_trgm)
+        from services.busca_dossie_service import dossie_search
+        try:
+            dossie_search.criar_indice()
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ Índice de busca de dossiês não criado: {e}")
+
         # --- Etapa 1: Perfis ---
         if not Perfil.query.filter_by(perfil='Administrador Geral').first():
             print("👤 Criando perfis padrão...")
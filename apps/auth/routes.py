@@ -7,6 +7,7 @@ from datetime import datetime
 from .utils import (registrar_tentativa_login, verificar_bloqueio_ip, verificar_bloqueio_usuario,
                    gerar_token_recuperacao, validar_token_recuperacao, validar_forca_senha)
 from apps.core.utils import log_acao
+from utils.usuario_atual import get_usuario_atual, limpar_usuario_atual
 
 # Criar blueprint
 auth_bp = Blueprint('auth', __name__)
@@ -19,8 +20,7 @@ def verificar_login():
 
     # Verificar se usuário ainda existe e está ativo
     try:
-        from models import Usuario
-        usuario = Usuario.query.get(session['user_id'])
+        usuario = get_usuario_atual()
         return usuario and usuario.status == 'ativo'
     except:
         return False
@@ -140,6 +140,7 @@ def logout():
     
     # Limpar sessão
     session.clear()
+    limpar_usuario_atual()
     flash('Logout realizado com sucesso!', 'success')
     
     return redirect('/')
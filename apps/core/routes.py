@@ -78,19 +78,20 @@ def api_estatisticas():
     from apps.usuarios.models import Usuario
     usuario = Usuario.query.get(session['user_id'])
     
+    # Contadores materializados (todas as escolas para o Admin Geral)
+    from models import EstatisticaEscola
     if usuario.perfil_obj.nome == 'Administrador Geral':
-        stats = obter_estatisticas_gerais()
+        resumo = EstatisticaEscola.obter_resumo()
     else:
-        # Estatísticas da escola do usuário
-        from apps.dossies.models import Dossie
-        from apps.movimentacoes.models import Movimentacao
-        
-        stats = {
-            'total_usuarios': Usuario.query.filter_by(escola_id=usuario.escola_id, status='ativo').count(),
-            'total_dossies': Dossie.query.filter_by(escola_id=usuario.escola_id, status='ativo').count(),
-            'total_movimentacoes': Movimentacao.query.filter_by(escola_id=usuario.escola_id).count(),
-            'movimentacoes_pendentes': Movimentacao.query.filter_by(escola_id=usuario.escola_id, status='pendente').count()
-        }
+        resumo = EstatisticaEscola.obter_resumo(usuario.escola_id)
+
+    mov_status = resumo.get(EstatisticaEscola.MOVIMENTACAO_STATUS, {})
+    stats = {
+        'total_usuarios': resumo.get(EstatisticaEscola.USUARIO_SITUACAO, {}).get('ativo', 0),
+        'total_dossies': resumo.get(EstatisticaEscola.DOSSIE_STATUS, {}).get('ativo', 0),
+        'total_movimentacoes': sum(mov_status.values()),
+        'movimentacoes_pendentes': mov_status.get('pendente', 0)
+    }
     
     return jsonify(stats)
 
@@ -5,6 +5,7 @@ Aplicação LOGS - Rotas
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from .models import LogAuditoria, LogSistema
 from apps.auth.routes import verificar_login
+from services.retencao_logs_service import ler_periodo, filtrar_periodo
 
 # Criar blueprint
 logs_bp = Blueprint('logs', __name__)
@@ -23,9 +24,12 @@ def auditoria():
         flash('Acesso negado.', 'error')
         return redirect('/')
     
-    logs = LogAuditoria.query.order_by(LogAuditoria.data_hora.desc()).limit(100).all()
+    # Intervalo de datas: no PostgreSQL só as partições do período são lidas
+    inicio, fim = ler_periodo(request.args)
+    query = filtrar_periodo(LogAuditoria.query, LogAuditoria, inicio, fim)
+    logs = query.order_by(LogAuditoria.data_hora.desc()).limit(100).all()
     
-    return render_template('logs/auditoria.html', logs=logs)
+    return render_template('logs/auditoria.html', logs=logs, inicio=inicio, fim=fim)
 
 @logs_bp.route('/sistema')
 def sistema():
@@ -41,6 +45,8 @@ def sistema():
         flash('Acesso negado.', 'error')
         return redirect('/')
     
-    logs = LogSistema.query.order_by(LogSistema.data_hora.desc()).limit(100).all()
+    inicio, fim = ler_periodo(request.args)
+    query = filtrar_periodo(LogSistema.query, LogSistema, inicio, fim)
+    logs = query.order_by(LogSistema.data_hora.desc()).limit(100).all()
     
-    return render_template('logs/sistema.html', logs=logs)
+    return render_template('logs/sistema.html', logs=logs, inicio=inicio, fim=fim)
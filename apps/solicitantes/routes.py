@@ -2,10 +2,12 @@
 Aplicação SOLICITANTES - Rotas
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from .models import Solicitante
 from apps.auth.routes import verificar_login
 from apps.core.utils import log_acao
+from utils.usuario_atual import get_usuario_atual
+from utils.paginacao import paginar_keyset
 from datetime import datetime
 
 # Criar blueprint
@@ -21,11 +23,10 @@ def listar():
     search = request.args.get('search', '')
     parentesco = request.args.get('parentesco', '')
     status = request.args.get('status', '')
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
 
     # Obter usuário atual e aplicar filtro de escola
-    from models import Usuario
-    usuario_atual = Usuario.query.get(session['user_id'])
+    usuario_atual = get_usuario_atual()
 
     # Query base com filtro de escola
     query = Solicitante.query
@@ -50,12 +51,9 @@ def listar():
     if status:
         query = query.filter_by(status=status)
 
-    # Ordenar por nome
-    query = query.order_by(Solicitante.nome)
-
-    # Paginação
-    solicitantes = query.paginate(
-        page=page, per_page=15, error_out=False
+    # Paginação por nome (id desempata homônimos)
+    solicitantes = paginar_keyset(
+        query, [Solicitante.nome, Solicitante.id], cursor, descendente=False, contar=True
     )
 
     return render_template('solicitantes/listar.html',
@@ -70,8 +68,8 @@ def novo():
     if not verificar_login():
         return redirect(url_for('auth.login'))
 
-    from models import Usuario, Cidade
-    usuario = Usuario.query.get(session['user_id'])
+    from models import Cidade
+    usuario = get_usuario_atual()
     cidades = Cidade.query.order_by(Cidade.nome).all()
 
     if request.method == 'POST':
@@ -132,8 +130,7 @@ def ver(id):
         return redirect(url_for('auth.login'))
 
     # Verificar acesso à escola do solicitante
-    from models import Usuario
-    usuario_atual = Usuario.query.get(session['user_id'])
+    usuario_atual = get_usuario_atual()
 
     solicitante = Solicitante.query.get_or_404(id)
 
@@ -150,8 +147,8 @@ def editar(id):
     if not verificar_login():
         return redirect(url_for('auth.login'))
 
-    from models import Usuario, Cidade
-    usuario = Usuario.query.get(session['user_id'])
+    from models import Cidade
+    usuario = get_usuario_atual()
     cidades = Cidade.query.order_by(Cidade.nome).all()
 
     solicitante = Solicitante.query.get_or_404(id)
@@ -218,8 +215,7 @@ def excluir(id):
     if not verificar_login():
         return redirect(url_for('auth.login'))
 
-    from models import Usuario
-    usuario = Usuario.query.get(session['user_id'])
+    usuario = get_usuario_atual()
 
     # Apenas admins podem excluir
     if usuario.perfil_obj.nome not in ['Administrador Geral', 'Administrador da Escola']:
@@ -254,8 +250,7 @@ def ativar(id):
     if not verificar_login():
         return redirect(url_for('auth.login'))
 
-    from models import Usuario
-    usuario = Usuario.query.get(session['user_id'])
+    usuario = get_usuario_atual()
 
     # Apenas admins podem ativar/desativar
     if usuario.perfil_obj.nome not in ['Administrador Geral', 'Administrador da Escola']:
@@ -284,8 +279,7 @@ def desativar(id):
     if not verificar_login():
         return redirect(url_for('auth.login'))
 
-    from models import Usuario
-    usuario = Usuario.query.get(session['user_id'])
+    usuario = get_usuario_atual()
 
     # Apenas admins podem ativar/desativar
     if usuario.perfil_obj.nome not in ['Administrador Geral', 'Administrador da Escola']:
@@ -1,14 +1,15 @@
 # controllers/anexo_controller.py
 import os
-from werkzeug.utils import secure_filename
-from flask import Blueprint, request, redirect, url_for, flash, session, jsonify, send_file
-from models import db, Anexo, Dossie
+from flask import Blueprint, request, redirect, url_for, flash, session, jsonify, abort
+from models import db, Anexo, Dossie, SessaoUpload
+from services.armazenamento_service import armazenamento_anexos, ArquivoMuitoGrande
+from services.entrega_arquivos_service import entrega_arquivos
+from services.upload_fracionado_service import uploads_fracionados, ParteInvalida, UploadIncompleto
 from .auth_controller import login_required
 
 anexo_bp = Blueprint('anexo', __name__, url_prefix='/anexos')
 
 # Configurações de upload
-UPLOAD_FOLDER = 'uploads/anexos'
 ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx', 'xls', 'xlsx', 'zip', 'rar'}
 MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
 
@@ -17,10 +18,21 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def create_upload_folder():
-    """Cria a pasta de upload se não existir"""
-    if not os.path.exists(UPLOAD_FOLDER):
-        os.makedirs(UPLOAD_FOLDER)
+def _registrar_anexo(dossie_id, nome, nome_personalizado, sha256, tamanho):
+    """Cria o Anexo de um conteúdo já gravado no armazenamento"""
+    anexo = Anexo(
+        dossie_id=dossie_id,
+        nome=nome,  # Nome original
+        nome_personalizado=nome_personalizado if nome_personalizado else None,
+        caminho=armazenamento_anexos.caminho_relativo(sha256),
+        sha256=sha256,
+        tamanho=tamanho,
+        tipo_arquivo=nome.rsplit('.', 1)[1].lower() if '.' in nome else None,
+        usuario_upload_id=session['user_id']
+    )
+    db.session.add(anexo)
+    db.session.flush()
+    return anexo
 
 @anexo_bp.route('/upload/<int:dossie_id>', methods=['POST'])
 @login_required
@@ -36,7 +48,6 @@ def upload(dossie_id):
     if not files or all(f.filename == '' for f in files):
         return jsonify({'success': False, 'message': 'Nenhum arquivo selecionado'})
     
-    create_upload_folder()
     uploaded_files = []
     errors = []
     
@@ -46,49 +57,28 @@ def upload(dossie_id):
                 errors.append(f'Tipo de arquivo não permitido: {file.filename}')
                 continue
             
-            # Verificar tamanho do arquivo
-            file.seek(0, os.SEEK_END)
-            file_size = file.tell()
-            file.seek(0)
-            
-            if file_size > MAX_FILE_SIZE:
-                errors.append(f'Arquivo muito grande: {file.filename} ({file_size / (1024*1024):.1f}MB)')
-                continue
-            
-            # Gerar nome seguro
-            filename = secure_filename(file.filename)
-            
-            # Adicionar timestamp para evitar conflitos
-            from datetime import datetime
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-            filename = timestamp + filename
-            
-            # Caminho completo
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            
             try:
-                # Salvar arquivo
-                file.save(filepath)
-                
-                # Obter nome personalizado se fornecido
-                nome_personalizado = request.form.get(f'nome_personalizado_{file.filename}', '').strip()
-
-                # Salvar no banco
-                anexo = Anexo(
-                    dossie_id=dossie_id,
-                    nome=file.filename,  # Nome original
-                    nome_personalizado=nome_personalizado if nome_personalizado else None,
-                    caminho=filepath,
-                    tamanho=file_size,
-                    tipo_arquivo=filename.rsplit('.', 1)[1].lower() if '.' in filename else None,
-                    usuario_upload_id=session['user_id']
-                )
-                
-                db.session.add(anexo)
-                uploaded_files.append(file.filename)
-                
+                # Grava no armazenamento deduplicado (hash calculado durante a cópia)
+                sha256, file_size, _ = armazenamento_anexos.gravar(file, MAX_FILE_SIZE)
+            except ArquivoMuitoGrande:
+                errors.append(f'Arquivo muito grande: {file.filename} (máximo {MAX_FILE_SIZE // (1024*1024)}MB)')
+                continue
             except Exception as e:
                 errors.append(f'Erro ao salvar {file.filename}: {str(e)}')
+                continue
+            
+            # Mesmo conteúdo já anexado a este dossiê
+            existente = armazenamento_anexos.anexo_duplicado(dossie_id, sha256)
+            if existente:
+                errors.append(f'Arquivo já anexado a este dossiê: {file.filename} (igual a "{existente.nome}")')
+                continue
+            
+            # Obter nome personalizado se fornecido
+            nome_personalizado = request.form.get(f'nome_personalizado_{file.filename}', '').strip()
+
+            # Salvar no banco
+            _registrar_anexo(dossie_id, file.filename, nome_personalizado, sha256, file_size)
+            uploaded_files.append(file.filename)
     
     try:
         db.session.commit()
@@ -118,11 +108,17 @@ def upload(dossie_id):
 @anexo_bp.route('/download/<int:anexo_id>')
 @login_required
 def download(anexo_id):
-    """Download de um anexo"""
+    """Download de um anexo (ETag = SHA-256 do conteúdo; aceita Range)"""
     anexo = Anexo.query.get_or_404(anexo_id)
     
     try:
-        return send_file(anexo.caminho, as_attachment=True, download_name=anexo.nome)
+        return entrega_arquivos.enviar(
+            armazenamento_anexos.caminho_anexo(anexo),
+            etag=anexo.sha256,
+            download_name=anexo.nome,
+            as_attachment=request.args.get('inline') != '1',
+            privado=True
+        )
     except FileNotFoundError:
         flash('Arquivo não encontrado no servidor', 'error')
         return redirect(url_for('dossie.ver', id=anexo.dossie_id))
@@ -135,9 +131,13 @@ def excluir(anexo_id):
     dossie_id = anexo.dossie_id
     
     try:
-        # Remover arquivo físico
-        if os.path.exists(anexo.caminho):
-            os.remove(anexo.caminho)
+        # Anexos antigos (fora do armazenamento deduplicado): remover o arquivo.
+        # Blobs podem ser compartilhados; os sem referências são removidos
+        # por `python manage.py limpar-anexos`
+        if not anexo.sha256:
+            caminho = armazenamento_anexos.caminho_anexo(anexo)
+            if os.path.exists(caminho):
+                os.remove(caminho)
         
         # Remover do banco
         db.session.delete(anexo)
@@ -168,3 +168,103 @@ def listar_json(dossie_id):
             'usuario': anexo.usuario_upload.nome if anexo.usuario_upload else 'Desconhecido'
         } for anexo in anexos]
     })
+
+# Upload fracionado (arquivos grandes em partes, com retomada)
+
+def _obter_sessao(sessao_id):
+    """Sessão de upload do usuário logado (404 para sessões de outros usuários)"""
+    sessao = db.session.get(SessaoUpload, sessao_id)
+    if not sessao or sessao.usuario_id != session['user_id']:
+        abort(404)
+    return sessao
+
+@anexo_bp.route('/upload/<int:dossie_id>/sessoes', methods=['POST'])
+@login_required
+def iniciar_sessao(dossie_id):
+    """
+    Abre uma sessão de upload fracionado
+
+    JSON: {"nome": "...", "tamanho": bytes, "sha256": "..." (opcional),
+           "nome_personalizado": "..." (opcional)}
+    """
+    Dossie.query.get_or_404(dossie_id)
+    dados = request.get_json(silent=True) or {}
+    nome = (dados.get('nome') or '').strip()
+
+    if not nome or not allowed_file(nome):
+        return jsonify({'success': False, 'message': f'Tipo de arquivo não permitido: {nome}'}), 400
+
+    sha256 = (dados.get('sha256') or '').lower() or None
+    if sha256:
+        existente = armazenamento_anexos.anexo_duplicado(dossie_id, sha256)
+        if existente:
+            return jsonify({'success': False, 'message': f'Arquivo já anexado a este dossiê (igual a "{existente.nome}")'}), 409
+
+    try:
+        sessao = uploads_fracionados.iniciar(
+            dossie_id, session['user_id'], nome, int(dados.get('tamanho') or 0),
+            sha256=sha256, nome_personalizado=(dados.get('nome_personalizado') or '').strip()
+        )
+    except (TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    return jsonify({'success': True, 'sessao': uploads_fracionados.situacao(sessao)}), 201
+
+@anexo_bp.route('/sessoes/<sessao_id>', methods=['GET'])
+@login_required
+def situacao_sessao(sessao_id):
+    """Partes recebidas e faltantes (para retomar um upload interrompido)"""
+    sessao = _obter_sessao(sessao_id)
+    return jsonify({'success': True, 'sessao': uploads_fracionados.situacao(sessao)})
+
+@anexo_bp.route('/sessoes/<sessao_id>/partes/<int:indice>', methods=['PUT'])
+@login_required
+def enviar_parte(sessao_id, indice):
+    """Recebe uma parte no corpo da requisição (checksum em X-Checksum-SHA256)"""
+    sessao = _obter_sessao(sessao_id)
+    try:
+        sha256 = uploads_fracionados.receber_parte(
+            sessao, indice, request.stream, request.headers.get('X-Checksum-SHA256')
+        )
+    except ParteInvalida as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    return jsonify({'success': True, 'indice': indice, 'sha256': sha256})
+
+@anexo_bp.route('/sessoes/<sessao_id>/concluir', methods=['POST'])
+@login_required
+def concluir_sessao(sessao_id):
+    """Monta o arquivo a partir das partes e cria o anexo"""
+    sessao = _obter_sessao(sessao_id)
+    try:
+        sha256, tamanho = uploads_fracionados.concluir(sessao)
+    except UploadIncompleto as e:
+        return jsonify({'success': False, 'message': str(e),
+                        'sessao': uploads_fracionados.situacao(sessao)}), 409
+    except ParteInvalida as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    nome = sessao.nome
+    existente = armazenamento_anexos.anexo_duplicado(sessao.dossie_id, sha256)
+    if existente:
+        uploads_fracionados.encerrar(sessao)
+        return jsonify({'success': False, 'message': f'Arquivo já anexado a este dossiê: {nome} (igual a "{existente.nome}")'}), 409
+
+    try:
+        anexo = _registrar_anexo(sessao.dossie_id, nome, sessao.nome_personalizado, sha256, tamanho)
+        uploads_fracionados.encerrar(sessao)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Erro ao salvar anexo: {str(e)}'}), 500
+
+    return jsonify({'success': True, 'message': f'Arquivo enviado com sucesso: {nome}', 'anexo_id': anexo.id})
+
+@anexo_bp.route('/sessoes/<sessao_id>', methods=['DELETE'])
+@login_required
+def cancelar_sessao(sessao_id):
+    """Cancela um upload fracionado, descartando as partes recebidas"""
+    sessao = _obter_sessao(sessao_id)
+    uploads_fracionados.encerrar(sessao)
+    return jsonify({'success': True, 'message': 'Upload cancelado'})
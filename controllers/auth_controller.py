@@ -3,6 +3,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from datetime import datetime
 from models import db, Usuario
 from utils.constantes import AcoesAuditoria
+from utils.usuario_atual import get_usuario_atual, limpar_usuario_atual
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -80,7 +81,7 @@ def login():
             session['user_nome'] = usuario.nome  # Para compatibilidade
             session['user_email'] = usuario.email
             session['user_perfil'] = usuario.perfil_obj.nome
-            session['user_foto_url'] = usuario.get_foto_url()
+            session['user_foto_url'] = usuario.get_foto_url('thumb')
             session['escola_id'] = usuario.escola_id
 
             # Adicionar nome da escola na sessão
@@ -158,6 +159,7 @@ def logout():
         log_acao(AcoesAuditoria.LOGOUT, 'Usuario', f'Logout realizado: {session.get("user_name", "Usuário")}')
 
     session.clear()
+    limpar_usuario_atual()
     flash('Logout realizado com sucesso!', 'success')
     return redirect(url_for('auth.login'))
 
@@ -170,6 +172,12 @@ def login_required(f):
         if 'user_id' not in session:
             flash('Acesso negado. Faça login primeiro.', 'error')
             return redirect(url_for('auth.login'))
+
+        # Carrega o usuário uma vez; a view reutiliza o mesmo objeto via get_usuario_atual()
+        if not get_usuario_atual():
+            session.clear()
+            flash('Sessão inválida. Faça login novamente.', 'error')
+            return redirect(url_for('auth.login'))
         return f(*args, **kwargs)
     return decorated_function
 
@@ -183,7 +191,7 @@ def admin_required(f):
             flash('Acesso negado. Faça login primeiro.', 'error')
             return redirect(url_for('auth.login'))
         
-        usuario = Usuario.query.get(session['user_id'])
+        usuario = get_usuario_atual()
         if not usuario or not usuario.is_admin_geral():
             flash('Acesso negado. Apenas administradores podem acessar esta área.', 'error')
             return redirect(url_for('dashboard'))
@@ -2,6 +2,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from models import db, Cidade
 from .auth_controller import login_required, admin_required
+from utils.dados_referencia import dados_referencia
 
 cidade_bp = Blueprint('cidade', __name__, url_prefix='/cidades')
 
@@ -145,11 +146,9 @@ def excluir(id):
 @cidade_bp.route('/api/por-uf/<uf>')
 @login_required
 def api_por_uf(uf):
-    """API para buscar cidades por UF"""
-    from flask import jsonify
-    
-    cidades = Cidade.query.filter_by(uf=uf.upper()).order_by(Cidade.nome).all()
-    return jsonify([{
+    """API para buscar cidades por UF (ETag pela versão das cidades; 304 se não mudou)"""
+    uf = uf.upper()
+    return dados_referencia.resposta_json('cidades_por_uf', lambda por_uf: [{
         'id': cidade.id_cidade,
         'nome': cidade.nome
-    } for cidade in cidades])
+    } for cidade in por_uf.get(uf, ())], uf)
@@ -2,6 +2,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from models import db, Diretor
 from controllers.auth_controller import login_required
+from utils.usuario_atual import get_usuario_atual
+from utils.dados_referencia import dados_referencia
 # Removido: from utils.permissions import require_permission, Modulos, Acoes
 from datetime import datetime
 import re
@@ -10,9 +12,7 @@ diretor_bp = Blueprint('diretor', __name__, url_prefix='/diretores')
 
 def verificar_admin_geral():
     """Verificar se o usuário é Administrador Geral"""
-    from models import Usuario
-    from flask import session
-    usuario_atual = Usuario.query.get(session['user_id'])
+    usuario_atual = get_usuario_atual()
 
     if not usuario_atual.is_admin_geral():
         flash('Acesso negado. Apenas Administradores Gerais podem gerenciar diretores.', 'error')
@@ -32,8 +32,6 @@ def index():
     status_filter = request.args.get('status', '')
 
     # Admin Geral vê todos os diretores (pode filtrar por escola se quiser)
-    from models import Escola
-
     escola_filtro = request.args.get('escola', '')
 
     # Query base - Admin Geral vê todos os diretores
@@ -74,7 +72,7 @@ def index():
     }
 
     # Buscar todas as escolas para o filtro
-    escolas = Escola.query.filter_by(situacao='ativa').order_by(Escola.nome).all()
+    escolas = dados_referencia.obter('escolas_ativas')
 
     return render_template('diretores/index.html',
                          diretores=diretores,
@@ -119,8 +117,7 @@ def criar():
             escola_id = request.form.get('escola_id')
             if not escola_id:
                 flash('Escola é obrigatória', 'error')
-                from models import Escola
-                escolas = Escola.query.filter_by(situacao='ativa').order_by(Escola.nome).all()
+                escolas = dados_referencia.obter('escolas_ativas')
                 return render_template('diretores/form.html',
                                      diretor=None,
                                      tipos_mandato=Diretor.get_tipos_mandato(),
@@ -166,27 +163,11 @@ def criar():
             if 'foto' in request.files:
                 foto = request.files['foto']
                 if foto and foto.filename:
-                    from controllers.foto_controller import allowed_file, resize_image
-                    import os
-                    import uuid
-
-                    if allowed_file(foto.filename):
-                        # Gerar nome único para o arquivo
-                        file_extension = foto.filename.rsplit('.', 1)[1].lower()
-                        filename = f"diretor_{diretor.id_diretor}_{uuid.uuid4().hex[:8]}.{file_extension}"
-
-                        # Definir caminho para salvar
-                        upload_folder = os.path.join('static', 'uploads', 'diretores')
-                        os.makedirs(upload_folder, exist_ok=True)
-                        file_path = os.path.join(upload_folder, filename)
+                    from services.imagem_service import processador_imagens, extensao_permitida
 
-                        # Salvar arquivo
-                        foto.save(file_path)
-
-                        # Redimensionar imagem
-                        resize_image(file_path)
-
-                        # Atualizar diretor com o nome da foto
+                    if extensao_permitida(foto.filename):
+                        # Grava o original; as versões reduzidas são geradas em segundo plano
+                        filename = processador_imagens.salvar(foto, 'diretor', f"diretor_{diretor.id_diretor}", anterior=diretor.foto)
                         diretor.set_foto(filename)
 
             db.session.commit()
@@ -199,8 +180,7 @@ def criar():
             flash(f'Erro ao criar diretor: {e}', 'error')
     
     # Buscar escolas para seleção
-    from models import Escola
-    escolas = Escola.query.filter_by(situacao='ativa').order_by(Escola.nome).all()
+    escolas = dados_referencia.obter('escolas_ativas')
 
     return render_template('diretores/form.html',
                          diretor=None,
@@ -293,36 +273,11 @@ def editar(id_diretor):
             if 'foto' in request.files:
                 foto = request.files['foto']
                 if foto and foto.filename:
-                    from controllers.foto_controller import allowed_file, resize_image
-                    import os
-                    import uuid
-
-                    if allowed_file(foto.filename):
-                        # Remover foto anterior se existir
-                        if diretor.foto:
-                            old_photo_path = os.path.join('static', 'uploads', 'diretores', diretor.foto)
-                            if os.path.exists(old_photo_path):
-                                try:
-                                    os.remove(old_photo_path)
-                                except:
-                                    pass
-
-                        # Gerar nome único para o arquivo
-                        file_extension = foto.filename.rsplit('.', 1)[1].lower()
-                        filename = f"diretor_{diretor.id_diretor}_{uuid.uuid4().hex[:8]}.{file_extension}"
-
-                        # Definir caminho para salvar
-                        upload_folder = os.path.join('static', 'uploads', 'diretores')
-                        os.makedirs(upload_folder, exist_ok=True)
-                        file_path = os.path.join(upload_folder, filename)
-
-                        # Salvar arquivo
-                        foto.save(file_path)
-
-                        # Redimensionar imagem
-                        resize_image(file_path)
-
-                        # Atualizar diretor com o nome da foto
+                    from services.imagem_service import processador_imagens, extensao_permitida
+
+                    if extensao_permitida(foto.filename):
+                        # Grava o original; as versões reduzidas são geradas em segundo plano
+                        filename = processador_imagens.salvar(foto, 'diretor', f"diretor_{diretor.id_diretor}", anterior=diretor.foto)
                         diretor.set_foto(filename)
 
             db.session.commit()
@@ -335,8 +290,7 @@ def editar(id_diretor):
             flash(f'Erro ao atualizar diretor: {e}', 'error')
     
     # Buscar escolas para seleção
-    from models import Escola
-    escolas = Escola.query.filter_by(situacao='ativa').order_by(Escola.nome).all()
+    escolas = dados_referencia.obter('escolas_ativas')
 
     return render_template('diretores/form.html',
                          diretor=diretor,
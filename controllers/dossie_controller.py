@@ -1,50 +1,31 @@
 # controllers/dossie_controller.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, abort
 from datetime import datetime
-from models import db, Dossie, Escola, Usuario
+from models import db, Dossie, Escola
 from utils.logs import log_acao, AcoesAuditoria
 from .auth_controller import login_required
+from utils.usuario_atual import get_usuario_atual
+from utils.escola_utils import aplicar_filtro_escola
+from utils.dados_referencia import dados_referencia
+from services.busca_dossie_service import dossie_search
+from utils.paginacao import paginar_keyset, paginar_offset
+from utils.exportacao import resposta_exportacao, FORMATOS
+from utils.carregamento import com_carregamento
+from utils.importacao import ler_planilha, formato_do_arquivo, PlanilhaInvalida
+from services.importacao_dossie_service import importador_dossies
+from services.entrega_arquivos_service import entrega_arquivos
+from services.armazenamento_service import ArquivoMuitoGrande
 
 dossie_bp = Blueprint('dossie', __name__, url_prefix='/dossies')
 
-@dossie_bp.route('/')
-@login_required
-def listar():
-    """Lista dossiês"""
-    search = request.args.get('search', '')
-    escola_id = request.args.get('escola', '')
-    situacao = request.args.get('situacao', '')
-    ano = request.args.get('ano', '')
-    page = request.args.get('page', 1, type=int)
+def _filtrar_dossies(usuario, escola_id='', situacao='', ano=''):
+    """
+    Query de dossiês com o escopo de escola do usuário e os filtros da listagem
 
-    usuario = db.session.get(Usuario, session['user_id'])
-    query = Dossie.query
-
-    # Corrigido: lógica clara para filtro de escola usando id_escola
-    if usuario.is_admin_geral():
-        if escola_id:
-            try:
-                escola_id_int = int(escola_id)
-                query = query.filter(Dossie.id_escola == escola_id_int)
-            except ValueError:
-                pass  # Ignora filtro inválido
-        else:
-            escola_atual_id = session.get('escola_atual_id')
-            if escola_atual_id:
-                query = query.filter(Dossie.id_escola == escola_atual_id)
-    else:
-        query = query.filter(Dossie.id_escola == usuario.escola_id)
-
-    if search:
-        query = query.filter(
-            db.or_(
-                Dossie.n_dossie.contains(search),
-                Dossie.nome.contains(search),
-                Dossie.cpf.contains(search),
-                Dossie.n_mae.contains(search),
-                Dossie.n_pai.contains(search)
-            )
-        )
+    Usada pela listagem e pela exportação, para que ambas retornem os mesmos registros
+    """
+    # Demais perfis: escopo automático da própria escola (utils/escopo_escola.py)
+    query = aplicar_filtro_escola(Dossie.query, Dossie, usuario, escola_id)
 
     if situacao:
         query = query.filter(Dossie.status == situacao)
@@ -56,7 +37,26 @@ def listar():
         except ValueError:
             pass
 
-    dossies = query.paginate(page=page, per_page=15, error_out=False)
+    return query
+
+@dossie_bp.route('/')
+@login_required
+def listar():
+    """Lista dossiês"""
+    search = request.args.get('search', '')
+    escola_id = request.args.get('escola', '')
+    situacao = request.args.get('situacao', '')
+    ano = request.args.get('ano', '')
+    cursor = request.args.get('cursor')
+
+    usuario = get_usuario_atual()
+    query = com_carregamento(_filtrar_dossies(usuario, escola_id, situacao, ano), 'dossies.listar')
+
+    # Busca textual: resultados em ordem de relevância; sem busca, keyset por data de cadastro
+    if search:
+        dossies = paginar_offset(dossie_search.aplicar(query, search), cursor)
+    else:
+        dossies = paginar_keyset(query, [Dossie.dt_cadastro, Dossie.id_dossie], cursor, contar=True)
 
     escola_filtro = None
     if escola_id:
@@ -65,7 +65,7 @@ def listar():
         except Exception:
             escola_filtro = None
 
-    escolas = Escola.query.all() if usuario.is_admin_geral() else [usuario.escola]
+    escolas = dados_referencia.obter('escolas') if usuario.is_admin_geral() else [usuario.escola]
 
     return render_template('dossies/listar.html', 
                          dossies=dossies, 
@@ -76,11 +76,102 @@ def listar():
                          ano=ano,
                          usuario=usuario)
 
+@dossie_bp.route('/exportar')
+@login_required
+def exportar():
+    """Exporta os dossiês da listagem (mesmos filtros) em CSV ou XLSX"""
+    formato = request.args.get('formato', 'csv')
+    if formato not in FORMATOS:
+        flash('Formato de exportação inválido.', 'error')
+        return redirect(url_for('dossie.listar'))
+
+    search = request.args.get('search', '')
+    usuario = get_usuario_atual()
+    query = _filtrar_dossies(
+        usuario,
+        request.args.get('escola', ''),
+        request.args.get('situacao', ''),
+        request.args.get('ano', '')
+    )
+
+    if search:
+        query = dossie_search.aplicar(query, search)
+    else:
+        query = query.order_by(Dossie.id_escola, Dossie.n_dossie, Dossie.id_dossie)
+
+    query = query.outerjoin(Escola, Escola.id == Dossie.id_escola).with_entities(
+        Escola.nome, Dossie.n_dossie, Dossie.nome, Dossie.ano, Dossie.cpf,
+        Dossie.n_pai, Dossie.n_mae, Dossie.local, Dossie.pasta, Dossie.tipo_documento,
+        Dossie.status, Dossie.dt_cadastro, Dossie.dt_arquivo, Dossie.observacao
+    )
+    colunas = ['Escola', 'Nº Dossiê', 'Aluno', 'Ano', 'CPF', 'Pai', 'Mãe', 'Local', 'Pasta',
+               'Tipo de Documento', 'Status', 'Cadastro', 'Arquivamento', 'Observação']
+
+    log_acao(AcoesAuditoria.EXPORTACAO, 'Dossie', f'Exportação de dossiês ({formato})')
+    return resposta_exportacao(query, colunas, f"dossies_{datetime.now():%Y%m%d_%H%M}", formato, 'Dossiês')
+
+# Erros exibidos na página de resultado (o relatório completo vai para o CSV)
+ERROS_EXIBIDOS = 200
+
+@dossie_bp.route('/importar', methods=['GET', 'POST'])
+@login_required
+def importar():
+    """Importa dossiês em lote a partir de uma planilha CSV ou XLSX"""
+    if request.method == 'GET':
+        return render_template('dossies/importar.html')
+
+    usuario = get_usuario_atual()
+    arquivo = request.files.get('arquivo')
+    formato = formato_do_arquivo(arquivo.filename) if arquivo and arquivo.filename else None
+    if not formato:
+        flash('Selecione uma planilha CSV ou XLSX.', 'error')
+        return render_template('dossies/importar.html')
+
+    # Mesma regra de escola do cadastro individual
+    if usuario.is_admin_geral():
+        id_escola = session.get('escola_atual_id', usuario.escola_id)
+    else:
+        id_escola = usuario.escola_id
+    simular = request.form.get('simular') == '1'
+
+    try:
+        resultado = importador_dossies.importar(
+            ler_planilha(arquivo, formato), id_escola, usuario.id, simular=simular
+        )
+    except PlanilhaInvalida as e:
+        flash(str(e), 'error')
+        return render_template('dossies/importar.html')
+
+    relatorio = None
+    if resultado['erros']:
+        relatorio = importador_dossies.salvar_relatorio(resultado, usuario.id)
+
+    if not simular and resultado['importados']:
+        log_acao(AcoesAuditoria.IMPORTACAO, 'Dossie',
+                 f"Importação de dossiês ({arquivo.filename}): {resultado['importados']} importados, "
+                 f"{len(resultado['erros'])} linhas com erro")
+
+    return render_template('dossies/importar.html',
+                           resultado=resultado,
+                           erros=resultado['erros'][:ERROS_EXIBIDOS],
+                           relatorio=relatorio,
+                           arquivo_nome=arquivo.filename)
+
+@dossie_bp.route('/importar/relatorio/<token>')
+@login_required
+def relatorio_importacao(token):
+    """Download do relatório de erros de uma importação"""
+    caminho = importador_dossies.caminho_relatorio(token, session['user_id'])
+    if not caminho:
+        abort(404)
+    return entrega_arquivos.enviar(caminho, download_name='erros_importacao_dossies.csv',
+                                   as_attachment=True, privado=True)
+
 @dossie_bp.route('/novo', methods=['GET', 'POST'])
 @login_required
 def novo():
     """Cadastra novo dossiê"""
-    usuario = db.session.get(Usuario, session['user_id'])
+    usuario = get_usuario_atual()
     
     if request.method == 'POST':
         try:
@@ -92,8 +183,7 @@ def novo():
             # Validar campos obrigatórios
             if not n_dossie or not nome or not ano:
                 flash('Número do dossiê, nome do aluno e ano são obrigatórios!', 'error')
-                escolas = Escola.query.all() if usuario.is_admin_geral() else [usuario.escola]
-                return render_template('dossies/novo.html', escolas=escolas)
+                return _render_novo(usuario, request.form)
 
             # Definir escola automaticamente baseada no usuário
             if usuario.is_admin_geral():
@@ -111,8 +201,7 @@ def novo():
 
             if dossie_existente:
                 flash(f'Número de dossiê "{n_dossie}" já existe na escola {dossie_existente.escola.nome}!', 'error')
-                escolas = Escola.query.all() if usuario.is_admin_geral() else [usuario.escola]
-                return render_template('dossies/novo.html', escolas=escolas)
+                return _render_novo(usuario, request.form)
 
             # Criar novo dossiê
             dossie = Dossie(
@@ -139,27 +228,11 @@ def novo():
             if 'foto' in request.files:
                 foto = request.files['foto']
                 if foto and foto.filename:
-                    from controllers.foto_controller import allowed_file, resize_image
-                    import os
-                    import uuid
-
-                    if allowed_file(foto.filename):
-                        # Gerar nome único para o arquivo
-                        file_extension = foto.filename.rsplit('.', 1)[1].lower()
-                        filename = f"dossie_{dossie.id_dossie}_{uuid.uuid4().hex[:8]}.{file_extension}"
-
-                        # Definir caminho para salvar
-                        upload_folder = os.path.join('static', 'uploads', 'dossies')
-                        os.makedirs(upload_folder, exist_ok=True)
-                        file_path = os.path.join(upload_folder, filename)
-
-                        # Salvar arquivo
-                        foto.save(file_path)
+                    from services.imagem_service import processador_imagens, extensao_permitida
 
-                        # Redimensionar imagem
-                        resize_image(file_path)
-
-                        # Atualizar dossiê com o nome da foto
+                    if extensao_permitida(foto.filename):
+                        # Grava o original; as versões reduzidas são geradas em segundo plano
+                        filename = processador_imagens.salvar(foto, 'dossie', f"dossie_{dossie.id_dossie}", anterior=dossie.foto)
                         dossie.set_foto(filename)
 
             # Processar anexos
@@ -169,37 +242,32 @@ def novo():
 
             if files and len(files) > 0 and files[0].filename:
                 from models import Anexo
-                import os
-                from werkzeug.utils import secure_filename
-
-                # Criar pasta de upload se não existir
-                upload_folder = os.path.join('static', 'uploads', 'anexos')
-                os.makedirs(upload_folder, exist_ok=True)
+                from services.armazenamento_service import armazenamento_anexos
+                from controllers.anexo_controller import MAX_FILE_SIZE
 
                 for i, file in enumerate(files):
                     if file and file.filename:
                         nome_personalizado = nomes_personalizados[i] if i < len(nomes_personalizados) else ''
 
-                        # Gerar nome seguro
-                        filename = secure_filename(file.filename)
-                        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-                        filename = timestamp + filename
-
-                        # Salvar arquivo
-                        filepath = os.path.join(upload_folder, filename)
-                        file.save(filepath)
+                        # Grava no armazenamento deduplicado (mesmo conteúdo = mesmo arquivo)
+                        arquivo_atual = file.filename
+                        sha256, tamanho, _ = armazenamento_anexos.gravar(file, MAX_FILE_SIZE)
+                        if armazenamento_anexos.anexo_duplicado(dossie.id_dossie, sha256):
+                            continue
 
                         # Salvar no banco
                         anexo = Anexo(
                             dossie_id=dossie.id_dossie,
                             nome=file.filename,
                             nome_personalizado=nome_personalizado if nome_personalizado else None,
-                            caminho=filepath,
-                            tamanho=os.path.getsize(filepath),
-                            tipo_arquivo=filename.rsplit('.', 1)[1].lower() if '.' in filename else None,
+                            caminho=armazenamento_anexos.caminho_relativo(sha256),
+                            sha256=sha256,
+                            tamanho=tamanho,
+                            tipo_arquivo=file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else None,
                             usuario_upload_id=usuario.id
                         )
                         db.session.add(anexo)
+                        db.session.flush()
                         anexos_enviados += 1
 
             # Log detalhado da criação
@@ -234,22 +302,32 @@ def novo():
             # Redirecionar para a listagem
             return redirect(url_for('dossie.listar'))
 
+        except ArquivoMuitoGrande as e:
+            # Anexo acima do limite: nada é gravado, mas o formulário volta preenchido
+            db.session.rollback()
+            flash(f'O anexo "{arquivo_atual}" excede o tamanho máximo de {e} por arquivo. '
+                  'Os dados foram mantidos; selecione os anexos novamente.', 'error')
+            return _render_novo(usuario, request.form)
+
         except Exception as e:
             db.session.rollback()
             print(f"Erro ao cadastrar dossiê: {str(e)}")  # Log para debug
             flash(f'Erro ao cadastrar dossiê: {str(e)}', 'error')
-            escolas = Escola.query.all() if usuario.is_admin_geral() else [usuario.escola]
-            return render_template('dossies/novo.html', escolas=escolas)
+            return _render_novo(usuario, request.form)
 
     # GET - Mostrar formulário
-    escolas = Escola.query.all() if usuario.is_admin_geral() else [usuario.escola]
-    return render_template('dossies/novo.html', escolas=escolas)
+    return _render_novo(usuario)
+
+def _render_novo(usuario, dados=None):
+    """Formulário de cadastro; `dados` repreenche os campos após um erro"""
+    escolas = dados_referencia.obter('escolas') if usuario.is_admin_geral() else [usuario.escola]
+    return render_template('dossies/novo.html', escolas=escolas, dados=dados or {})
 
 @dossie_bp.route('/ver/<int:id>')
 @login_required
 def ver(id):
     """Visualiza detalhes do dossiê"""
-    usuario = db.session.get(Usuario, session['user_id'])
+    usuario = get_usuario_atual()
     dossie = Dossie.query.get_or_404(id)
     
     # Verificar se usuário pode acessar este dossiê
@@ -266,7 +344,7 @@ def ver(id):
 @login_required
 def editar(id):
     """Edita dossiê"""
-    usuario = db.session.get(Usuario, session['user_id'])
+    usuario = get_usuario_atual()
     dossie = Dossie.query.get_or_404(id)
     
     # Verificar se usuário pode editar este dossiê
@@ -296,7 +374,7 @@ def editar(id):
 
         if not dossie.n_dossie or not dossie.nome:
             flash('Número do dossiê e nome do aluno são obrigatórios!', 'error')
-            escolas = Escola.query.all() if usuario.is_admin_geral() else [usuario.escola]
+            escolas = dados_referencia.obter('escolas') if usuario.is_admin_geral() else [usuario.escola]
             return render_template('dossies/editar.html', dossie=dossie, escolas=escolas)
 
         try:
@@ -304,36 +382,11 @@ def editar(id):
             if 'foto' in request.files:
                 foto = request.files['foto']
                 if foto and foto.filename:
-                    from controllers.foto_controller import allowed_file, resize_image
-                    import os
-                    import uuid
-
-                    if allowed_file(foto.filename):
-                        # Remover foto anterior se existir
-                        if dossie.foto:
-                            old_photo_path = os.path.join('static', 'uploads', 'dossies', dossie.foto)
-                            if os.path.exists(old_photo_path):
-                                try:
-                                    os.remove(old_photo_path)
-                                except:
-                                    pass
-
-                        # Gerar nome único para o arquivo
-                        file_extension = foto.filename.rsplit('.', 1)[1].lower()
-                        filename = f"dossie_{dossie.id_dossie}_{uuid.uuid4().hex[:8]}.{file_extension}"
-
-                        # Definir caminho para salvar
-                        upload_folder = os.path.join('static', 'uploads', 'dossies')
-                        os.makedirs(upload_folder, exist_ok=True)
-                        file_path = os.path.join(upload_folder, filename)
-
-                        # Salvar arquivo
-                        foto.save(file_path)
-
-                        # Redimensionar imagem
-                        resize_image(file_path)
-
-                        # Atualizar dossiê com o nome da foto
+                    from services.imagem_service import processador_imagens, extensao_permitida
+
+                    if extensao_permitida(foto.filename):
+                        # Grava o original; as versões reduzidas são geradas em segundo plano
+                        filename = processador_imagens.salvar(foto, 'dossie', f"dossie_{dossie.id_dossie}", anterior=dossie.foto)
                         dossie.set_foto(filename)
 
             # Log detalhado da edição
@@ -351,9 +404,8 @@ def editar(id):
                 'user_agent': request.headers.get('User-Agent')
             }
 
-            log_acao(AcoesAuditoria.DOSSIE_EDITADO, 'Dossie',
-                    f'Dossiê editado: {dossie.numero_dossie} - {dossie.nome_aluno}',
-                    detalhes=json.dumps(detalhes_log))
+            detalhes_log['mensagem'] = f'Dossiê editado: {dossie.numero_dossie} - {dossie.nome_aluno}'
+            log_acao(AcoesAuditoria.DOSSIE_EDITADO, 'Dossie', detalhes=json.dumps(detalhes_log))
 
             db.session.commit()
             flash('Dossiê atualizado com sucesso!', 'success')
@@ -362,14 +414,14 @@ def editar(id):
             db.session.rollback()
             flash(f'Erro ao atualizar dossiê: {str(e)}', 'error')
 
-    escolas = Escola.query.all() if usuario.is_admin_geral() else [usuario.escola]
+    escolas = dados_referencia.obter('escolas') if usuario.is_admin_geral() else [usuario.escola]
     return render_template('dossies/editar.html', dossie=dossie, escolas=escolas)
 
 @dossie_bp.route('/excluir/<int:id>', methods=['POST'])
 @login_required
 def excluir(id):
     """Exclui dossiê"""
-    usuario = db.session.get(Usuario, session['user_id'])
+    usuario = get_usuario_atual()
     dossie = Dossie.query.get_or_404(id)
     
     # Verificar se usuário pode excluir este dossiê
@@ -393,9 +445,8 @@ def excluir(id):
             'user_agent': request.headers.get('User-Agent')
         }
 
-        log_acao(AcoesAuditoria.DOSSIE_EXCLUIDO, 'Dossie',
-                f'Dossiê excluído: {dossie.numero_dossie} - {dossie.nome_aluno}',
-                detalhes=json.dumps(detalhes_log))
+        detalhes_log['mensagem'] = f'Dossiê excluído: {dossie.numero_dossie} - {dossie.nome_aluno}'
+        log_acao(AcoesAuditoria.DOSSIE_EXCLUIDO, 'Dossie', detalhes=json.dumps(detalhes_log))
 
         db.session.delete(dossie)
         db.session.commit()
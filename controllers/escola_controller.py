@@ -1,9 +1,11 @@
 # controllers/escola_controller.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash
 from datetime import datetime
-from models import db, Escola, Cidade, Usuario
+from models import db, Escola, Usuario
 from utils.logs import log_acao, AcoesAuditoria
 from .auth_controller import login_required, admin_required
+from utils.usuario_atual import get_usuario_atual
+from utils.dados_referencia import dados_referencia
 
 escola_bp = Blueprint('escola', __name__, url_prefix='/escolas')
 
@@ -54,7 +56,7 @@ def nova():
         if not nome or not uf:
             flash('Nome e UF são obrigatórios!', 'error')
             return render_template('escolas/nova.html', 
-                                 cidades=Cidade.query.all(),
+                                 cidades=dados_referencia.obter('cidades'),
                                  usuarios=Usuario.query.filter_by(situacao='ativo').all())
 
         escola = Escola(
@@ -82,7 +84,7 @@ def nova():
             db.session.rollback()
             flash(f'Erro ao cadastrar escola: {str(e)}', 'error')
 
-    cidades = Cidade.query.all()
+    cidades = dados_referencia.obter('cidades')
     usuarios = Usuario.query.filter_by(situacao='ativo').all()
     return render_template('escolas/nova.html', cidades=cidades, usuarios=usuarios)
 
@@ -118,13 +120,13 @@ def editar(id):
             flash('Nome e UF são obrigatórios!', 'error')
             return render_template('escolas/editar.html', 
                                  escola=escola,
-                                 cidades=Cidade.query.all(),
+                                 cidades=dados_referencia.obter('cidades'),
                                  usuarios=Usuario.query.filter_by(situacao='ativo').all())
 
         try:
             # Log detalhado da edição
             import json
-            usuario_logado = Usuario.query.get(session['user_id'])
+            usuario_logado = get_usuario_atual()
             detalhes_log = {
                 'escola_editada': {
                     'id': escola.id,
@@ -146,7 +148,7 @@ def editar(id):
             db.session.rollback()
             flash(f'Erro ao atualizar escola: {str(e)}', 'error')
 
-    cidades = Cidade.query.all()
+    cidades = dados_referencia.obter('cidades')
     usuarios = Usuario.query.filter_by(situacao='ativo').all()
     return render_template('escolas/editar.html', 
                          escola=escola, 
@@ -162,7 +164,7 @@ def excluir(id):
     try:
         # Log detalhado da exclusão
         import json
-        usuario_logado = Usuario.query.get(session['user_id'])
+        usuario_logado = get_usuario_atual()
         detalhes_log = {
             'escola_excluida': {
                 'id': escola.id,
@@ -192,3 +194,19 @@ def configuracoes(id):
     """Configurações da escola"""
     escola = Escola.query.get_or_404(id)
     return render_template('escolas/configuracoes.html', escola=escola)
+
+@escola_bp.route('/api/ativas')
+@login_required
+def api_ativas():
+    """API das escolas para selects (ETag pela versão das escolas; 304 se não mudou)"""
+    usuario = get_usuario_atual()
+
+    def serializar(escolas):
+        return [{'id': escola.id, 'nome': escola.nome, 'uf': escola.uf} for escola in escolas]
+
+    if usuario.is_admin_geral():
+        return dados_referencia.resposta_json('escolas_ativas', serializar)
+    # Demais perfis: apenas a própria escola (como get_escolas_para_filtro)
+    return dados_referencia.resposta_json('escolas', lambda escolas: serializar(
+        escola for escola in escolas if escola.id == usuario.escola_id
+    ), usuario.escola_id)
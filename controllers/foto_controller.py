@@ -3,44 +3,21 @@
 Controller para gerenciamento de fotos de usuários
 """
 
-from flask import Blueprint, request, jsonify, session, current_app
-from werkzeug.utils import secure_filename
+import os
+
+from flask import Blueprint, request, jsonify, session, abort
+from werkzeug.security import safe_join
 from controllers.auth_controller import login_required
-from models import db, Usuario
+from models import db
 from utils.logs import log_acao, AcoesAuditoria
-import os
-import uuid
-from PIL import Image
+from utils.usuario_atual import get_usuario_atual
+from services.imagem_service import (
+    processador_imagens, extensao_permitida, nome_derivada, CATEGORIAS, FORMATOS, TAMANHOS
+)
+from services.entrega_arquivos_service import entrega_arquivos, nome_imutavel
 
 foto_bp = Blueprint('foto', __name__, url_prefix='/api/foto')
 
-# Extensões permitidas para fotos
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
-
-def allowed_file(filename):
-    """Verifica se a extensão do arquivo é permitida"""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-def resize_image(image_path, max_size=(300, 300)):
-    """Redimensiona a imagem para um tamanho máximo"""
-    try:
-        with Image.open(image_path) as img:
-            # Converter para RGB se necessário
-            if img.mode in ('RGBA', 'LA', 'P'):
-                img = img.convert('RGB')
-            
-            # Redimensionar mantendo proporção
-            img.thumbnail(max_size, Image.Resampling.LANCZOS)
-            
-            # Salvar com qualidade otimizada
-            img.save(image_path, 'JPEG', quality=85, optimize=True)
-            
-        return True
-    except Exception as e:
-        print(f"Erro ao redimensionar imagem: {e}")
-        return False
-
 @foto_bp.route('/upload', methods=['POST'])
 @login_required
 def upload_foto():
@@ -57,49 +34,27 @@ def upload_foto():
             return jsonify({'success': False, 'error': 'Nenhum arquivo selecionado'}), 400
         
         # Verificar extensão do arquivo
-        if not allowed_file(file.filename):
+        if not extensao_permitida(file.filename):
             return jsonify({
                 'success': False, 
                 'error': 'Tipo de arquivo não permitido. Use: PNG, JPG, JPEG, GIF ou WEBP'
             }), 400
         
         # Obter usuário atual
-        usuario = Usuario.query.get(session['user_id'])
+        usuario = get_usuario_atual()
         if not usuario:
             return jsonify({'success': False, 'error': 'Usuário não encontrado'}), 404
         
-        # Gerar nome único para o arquivo
-        file_extension = file.filename.rsplit('.', 1)[1].lower()
-        filename = f"user_{usuario.id}_{uuid.uuid4().hex[:8]}.{file_extension}"
-        
-        # Definir caminho para salvar
-        upload_folder = os.path.join(current_app.root_path, 'static', 'uploads', 'fotos')
-        os.makedirs(upload_folder, exist_ok=True)
-        file_path = os.path.join(upload_folder, filename)
-        
-        # Remover foto anterior se existir
-        if usuario.foto:
-            old_photo_path = os.path.join(upload_folder, usuario.foto)
-            if os.path.exists(old_photo_path):
-                try:
-                    os.remove(old_photo_path)
-                except:
-                    pass  # Não falhar se não conseguir remover
-        
-        # Salvar arquivo
-        file.save(file_path)
-        
-        # Redimensionar imagem
-        if not resize_image(file_path):
-            # Se falhar ao redimensionar, continuar com a imagem original
-            pass
+        # Grava o original (substituindo a foto anterior); as versões
+        # reduzidas são geradas em segundo plano
+        filename = processador_imagens.salvar(file, 'usuario', f"user_{usuario.id}", anterior=usuario.foto)
         
         # Atualizar banco de dados
         usuario.set_foto(filename)
         db.session.commit()
         
-        # Atualizar sessão
-        session['user_foto_url'] = usuario.get_foto_url()
+        # Atualizar sessão (a miniatura ainda está sendo gerada)
+        session['user_foto_url'] = usuario.get_foto_url('thumb', aguardar=True)
         
         # Registrar log
         log_acao(AcoesAuditoria.ALTERACAO, 'Usuario', f'Foto atualizada: {usuario.nome}', usuario.id)
@@ -122,7 +77,7 @@ def remove_foto():
     """Remove a foto do usuário"""
     try:
         # Obter usuário atual
-        usuario = Usuario.query.get(session['user_id'])
+        usuario = get_usuario_atual()
         if not usuario:
             return jsonify({'success': False, 'error': 'Usuário não encontrado'}), 404
         
@@ -131,7 +86,7 @@ def remove_foto():
         db.session.commit()
         
         # Atualizar sessão
-        session['user_foto_url'] = usuario.get_foto_url()
+        session['user_foto_url'] = usuario.get_foto_url('thumb')
         
         # Registrar log
         log_acao(AcoesAuditoria.ALTERACAO, 'Usuario', f'Foto removida: {usuario.nome}', usuario.id)
@@ -153,7 +108,7 @@ def remove_foto():
 def foto_info():
     """Retorna informações sobre a foto do usuário"""
     try:
-        usuario = Usuario.query.get(session['user_id'])
+        usuario = get_usuario_atual()
         if not usuario:
             return jsonify({'success': False, 'error': 'Usuário não encontrado'}), 404
         
@@ -169,3 +124,34 @@ def foto_info():
             'success': False,
             'error': f'Erro interno: {str(e)}'
         }), 500
+
+@foto_bp.route('/arquivo/<categoria>/<path:filename>')
+def arquivo(categoria, filename):
+    """
+    Entrega uma foto (original ou derivada) com validação de cache
+
+    Nomes com o hash do conteúdo são servidos como imutáveis (cache de um
+    ano no navegador); os demais são revalidados pelo ETag.
+    """
+    # Sem consulta ao banco: a imagem é pedida a cada <img> das listagens
+    if 'user_id' not in session:
+        abort(403)
+    if categoria not in CATEGORIAS:
+        abort(404)
+
+    pasta = processador_imagens.pasta(categoria)
+    caminho = safe_join(pasta, filename)
+    if caminho is None or not os.path.isfile(caminho):
+        abort(404)
+
+    # ?tamanho=: URL guardada logo após o upload (processador_imagens.url com aguardar)
+    tamanho = request.args.get('tamanho')
+    if tamanho in TAMANHOS:
+        extensao = request.args.get('extensao', 'jpg')
+        derivada = safe_join(pasta, nome_derivada(filename, tamanho, extensao)) if extensao in FORMATOS else None
+        if derivada is not None and os.path.isfile(derivada):
+            return entrega_arquivos.enviar(derivada, imutavel=True, privado=True)
+        # Derivada ainda em geração: o original, sem cache imutável (revalidado pelo ETag)
+        return entrega_arquivos.enviar(caminho, privado=True)
+
+    return entrega_arquivos.enviar(caminho, imutavel=nome_imutavel(filename), privado=True)
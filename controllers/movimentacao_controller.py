@@ -1,60 +1,69 @@
 # controllers/movimentacao_controller.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
 from datetime import datetime, timedelta
-from models import db, Movimentacao, Dossie, Escola, Usuario
+from models import db, Movimentacao, Dossie, Escola
 from utils.logs import log_acao, AcoesAuditoria
 from .auth_controller import login_required
+from utils.usuario_atual import get_usuario_atual
+from utils.escola_utils import aplicar_filtro_escola, get_escolas_para_filtro
+from utils.paginacao import paginar_keyset, paginar_offset
+from utils.exportacao import resposta_exportacao, FORMATOS
+from utils.carregamento import com_carregamento
+from services.emprestimo_service import controle_emprestimos
+from services.autocompletar_service import autocompletar
 
 
 movimentacao_bp = Blueprint('movimentacao', __name__, url_prefix='/movimentacoes')
 
-@movimentacao_bp.route('/')
-@login_required
-def listar():
-    """Lista movimentações"""
-    search = request.args.get('search', '')
-    escola_id = request.args.get('escola', '')
-    tipo = request.args.get('tipo', '')
-    status = request.args.get('status', '')
-    page = request.args.get('page', 1, type=int)
-
-    # Verificar permissões
-    usuario = Usuario.query.get(session['user_id'])
-    query = Movimentacao.query.join(Dossie)
+def _filtrar_movimentacoes(usuario, search='', escola_id='', tipo='', status=''):
+    """
+    Query de movimentações com o escopo de escola do usuário e os filtros da listagem
 
-    # Aplicar filtro de escola baseado no usuário atual
-    escola_atual_id = usuario.get_escola_atual_id()
-    if escola_atual_id:
-        query = query.filter(Dossie.escola_id == escola_atual_id)
+    Usada pela listagem e pela exportação, para que ambas retornem os mesmos registros
+    """
+    # Demais perfis: escopo automático da própria escola no join (utils/escopo_escola.py)
+    query = aplicar_filtro_escola(Movimentacao.query.join(Dossie), Dossie, usuario, escola_id)
     
     if search:
         query = query.filter(
             db.or_(
-                Dossie.numero_dossie.contains(search),
-                Dossie.nome_aluno.contains(search),
+                Dossie.n_dossie.contains(search),
+                Dossie.nome.contains(search),
                 Movimentacao.solicitante_nome.contains(search),
                 Movimentacao.solicitante_documento.contains(search)
             )
         )
     
-    if escola_id and usuario.is_admin_geral():
-        query = query.filter(Dossie.escola_id == escola_id)
-    
     if tipo:
         query = query.filter(Movimentacao.tipo_movimentacao == tipo)
     
     if status:
         query = query.filter(Movimentacao.status == status)
 
-    movimentacoes = query.order_by(Movimentacao.data_movimentacao.desc()).paginate(
-        page=page, per_page=15, error_out=False
+    return query
+
+@movimentacao_bp.route('/')
+@login_required
+def listar():
+    """Lista movimentações"""
+    search = request.args.get('search', '')
+    escola_id = request.args.get('escola', '')
+    tipo = request.args.get('tipo', '')
+    status = request.args.get('status', '')
+    cursor = request.args.get('cursor')
+
+    # Verificar permissões
+    usuario = get_usuario_atual()
+    query = _filtrar_movimentacoes(usuario, search, escola_id, tipo, status)
+
+    movimentacoes = paginar_keyset(
+        com_carregamento(query, 'movimentacoes.listar'), [Movimentacao.data_movimentacao, Movimentacao.id], cursor, contar=True
     )
 
     escola_filtro = None
     if escola_id:
         escola_filtro = Escola.query.get(escola_id)
 
-    from utils.escola_utils import get_escolas_para_filtro
     escolas = get_escolas_para_filtro(usuario)
 
     return render_template('movimentacoes/listar.html', 
@@ -65,11 +74,40 @@ def listar():
                          tipo=tipo,
                          status=status)
 
+@movimentacao_bp.route('/exportar')
+@login_required
+def exportar():
+    """Exporta as movimentações da listagem (mesmos filtros) em CSV ou XLSX"""
+    formato = request.args.get('formato', 'csv')
+    if formato not in FORMATOS:
+        flash('Formato de exportação inválido.', 'error')
+        return redirect(url_for('movimentacao.listar'))
+
+    usuario = get_usuario_atual()
+    query = _filtrar_movimentacoes(
+        usuario,
+        request.args.get('search', ''),
+        request.args.get('escola', ''),
+        request.args.get('tipo', ''),
+        request.args.get('status', '')
+    )
+    query = query.order_by(Movimentacao.data_movimentacao.desc(), Movimentacao.id.desc()).with_entities(
+        Movimentacao.data_movimentacao, Dossie.n_dossie, Dossie.nome, Movimentacao.tipo_movimentacao,
+        Movimentacao.status, Movimentacao.solicitante_nome, Movimentacao.solicitante_documento,
+        Movimentacao.solicitante_telefone, Movimentacao.motivo, Movimentacao.data_prevista_devolucao,
+        Movimentacao.data_devolucao, Movimentacao.observacoes
+    )
+    colunas = ['Data', 'Nº Dossiê', 'Aluno', 'Tipo', 'Status', 'Solicitante', 'Documento',
+               'Telefone', 'Motivo', 'Devolução Prevista', 'Devolução', 'Observações']
+
+    log_acao(AcoesAuditoria.EXPORTACAO, 'Movimentacao', f'Exportação de movimentações ({formato})')
+    return resposta_exportacao(query, colunas, f"movimentacoes_{datetime.now():%Y%m%d_%H%M}", formato, 'Movimentações')
+
 @movimentacao_bp.route('/nova', methods=['GET', 'POST'])
 @login_required
 def nova():
     """Cadastra nova movimentação"""
-    usuario = Usuario.query.get(session['user_id'])
+    usuario = get_usuario_atual()
     
     if request.method == 'POST':
         dossie_id = request.form.get('dossie_id')
@@ -77,8 +115,7 @@ def nova():
         
         if not dossie_id or not tipo_movimentacao:
             flash('Dossiê e tipo de movimentação são obrigatórios!', 'error')
-            dossies = Dossie.query.filter_by(escola_id=usuario.escola_id).all() if usuario.perfil_obj and usuario.perfil_obj.perfil != 'Administrador Geral' else Dossie.query.all()
-            return render_template('movimentacoes/nova.html', dossies=dossies)
+            return _render_nova(usuario)
 
         dossie = Dossie.query.get(dossie_id)
         if not dossie or (usuario.perfil_obj and usuario.perfil_obj.perfil != 'Administrador Geral' and dossie.escola_id != usuario.escola_id):
@@ -124,38 +161,65 @@ def nova():
             db.session.rollback()
             flash(f'Erro ao registrar movimentação: {str(e)}', 'error')
 
-    # Buscar dossiês disponíveis baseado na escola atual
-    escola_atual_id = usuario.get_escola_atual_id()
-    if escola_atual_id:
-        dossies = Dossie.query.filter_by(escola_id=escola_atual_id, status='ativo').all()
-    else:
-        dossies = []
-
-    from utils.escola_utils import get_escolas_para_filtro
-    escolas = get_escolas_para_filtro(usuario)
+    return _render_nova(usuario)
 
-    # Buscar solicitantes ativos
-    from models import Solicitante
-    solicitantes = Solicitante.query.filter_by(status='ativo').order_by(Solicitante.nome).all()
+def _render_nova(usuario):
+    """
+    Formulário de nova movimentação
 
-    # Verificar se há solicitante pré-selecionado na URL
-    solicitante_preselected = request.args.get('solicitante')
+    Dossiê e solicitante são escolhidos pelo autocompletar (api_dossies e
+    api_solicitantes); aqui só se carregam os já selecionados (valores
+    enviados ou ?solicitante= na URL), então o formulário não depende do
+    tamanho do arquivo.
+    """
+    dossie_id = request.form.get('dossie_id', type=int)
+    solicitante_id = request.form.get('solicitante_id', type=int) or request.args.get('solicitante', type=int)
 
     return render_template('movimentacoes/nova.html',
-                         dossies=dossies,
-                         escolas=escolas,
-                         solicitantes=solicitantes,
-                         solicitante_preselected=solicitante_preselected)
+                         escolas=get_escolas_para_filtro(usuario),
+                         dossie_inicial=autocompletar.dossie(dossie_id, usuario) if dossie_id else None,
+                         solicitante_inicial=autocompletar.solicitante(solicitante_id, usuario) if solicitante_id else None,
+                         minimo_caracteres=autocompletar.MINIMO_CARACTERES)
+
+def _resposta_autocompletar(resultados):
+    """JSON com cache curto no navegador (a sessão entra no Vary: Cookie)"""
+    resposta = jsonify(resultados)
+    resposta.cache_control.private = True
+    resposta.cache_control.max_age = current_app.config.get('AUTOCOMPLETAR_CACHE_SEGUNDOS', 30)
+    return resposta
+
+@movimentacao_bp.route('/api/dossies')
+@login_required
+def api_dossies():
+    """Autocompletar de dossiês ativos da escola (?q=termo&limite=N)"""
+    usuario = get_usuario_atual()
+    limite = autocompletar.limite(request.args.get('limite'))
+    return _resposta_autocompletar(autocompletar.dossies(request.args.get('q', ''), usuario, limite))
+
+@movimentacao_bp.route('/api/solicitantes')
+@login_required
+def api_solicitantes():
+    """Autocompletar de solicitantes ativos da escola (?q=termo&limite=N)"""
+    usuario = get_usuario_atual()
+    limite = autocompletar.limite(request.args.get('limite'))
+    return _resposta_autocompletar(autocompletar.solicitantes(request.args.get('q', ''), usuario, limite))
+
+def _da_escola_do_usuario(movimentacao, usuario):
+    """Dossiê da movimentação pertence à escola do usuário"""
+    # O escopo automático de escola não carrega o dossiê de outra escola: movimentacao.dossie é None
+    return movimentacao.dossie is not None and movimentacao.dossie.escola_id == usuario.escola_id
 
 @movimentacao_bp.route('/ver/<int:id>')
 @login_required
 def ver(id):
     """Visualiza detalhes da movimentação"""
-    usuario = Usuario.query.get(session['user_id'])
-    movimentacao = Movimentacao.query.get_or_404(id)
+    usuario = get_usuario_atual()
+    movimentacao = com_carregamento(Movimentacao.query, 'movimentacoes.detalhe').filter(
+        Movimentacao.id == id
+    ).first_or_404()
     
     # Verificar se usuário pode acessar esta movimentação
-    if usuario.perfil_obj and usuario.perfil_obj.perfil != 'Administrador Geral' and movimentacao.dossie.escola_id != usuario.escola_id:
+    if usuario.perfil_obj and usuario.perfil_obj.perfil != 'Administrador Geral' and not _da_escola_do_usuario(movimentacao, usuario):
         flash('Acesso negado a esta movimentação.', 'error')
         return redirect(url_for('movimentacao.listar'))
     
@@ -165,11 +229,11 @@ def ver(id):
 @login_required
 def concluir(id):
     """Marca movimentação como concluída"""
-    usuario = Usuario.query.get(session['user_id'])
+    usuario = get_usuario_atual()
     movimentacao = Movimentacao.query.get_or_404(id)
     
     # Verificar se usuário pode concluir esta movimentação
-    if usuario.perfil_obj and usuario.perfil_obj.perfil != 'Administrador Geral' and movimentacao.dossie.escola_id != usuario.escola_id:
+    if usuario.perfil_obj and usuario.perfil_obj.perfil != 'Administrador Geral' and not _da_escola_do_usuario(movimentacao, usuario):
         flash('Acesso negado a esta movimentação.', 'error')
         return redirect(url_for('movimentacao.listar'))
 
@@ -205,13 +269,13 @@ def concluir(id):
 @login_required
 def cancelar(id):
     """Cancela movimentação"""
-    usuario = Usuario.query.get(session['user_id'])
+    usuario = get_usuario_atual()
     movimentacao = Movimentacao.query.get_or_404(id)
     
     # Verificar se usuário pode cancelar esta movimentação
     pode_cancelar = (usuario.perfil_obj and
                     (usuario.perfil_obj.perfil == 'Administrador Geral' or
-                     (usuario.perfil_obj.perfil == 'Administrador da Escola' and movimentacao.dossie.escola_id == usuario.escola_id)))
+                     (usuario.perfil_obj.perfil == 'Administrador da Escola' and _da_escola_do_usuario(movimentacao, usuario))))
 
     if not pode_cancelar:
         flash('Acesso negado para cancelar esta movimentação.', 'error')
@@ -249,16 +313,13 @@ def cancelar(id):
 @login_required
 def relatorio():
     """Relatório de movimentações"""
-    usuario = Usuario.query.get(session['user_id'])
+    usuario = get_usuario_atual()
     
     # Estatísticas básicas
     if usuario.perfil_obj and usuario.perfil_obj.perfil == 'Administrador Geral':
         total_movimentacoes = Movimentacao.query.count()
         pendentes = Movimentacao.query.filter_by(status='pendente').count()
-        em_atraso = Movimentacao.query.filter(
-            Movimentacao.data_prevista_devolucao < datetime.now(),
-            Movimentacao.status == 'pendente'
-        ).count()
+        em_atraso = controle_emprestimos.contar_atrasados()
     else:
         total_movimentacoes = Movimentacao.query.join(Dossie).filter(
             Dossie.escola_id == usuario.escola_id
@@ -267,11 +328,7 @@ def relatorio():
             Dossie.escola_id == usuario.escola_id,
             Movimentacao.status == 'pendente'
         ).count()
-        em_atraso = Movimentacao.query.join(Dossie).filter(
-            Dossie.escola_id == usuario.escola_id,
-            Movimentacao.data_prevista_devolucao < datetime.now(),
-            Movimentacao.status == 'pendente'
-        ).count()
+        em_atraso = controle_emprestimos.contar_atrasados(usuario.escola_id)
     
     stats = {
         'total_movimentacoes': total_movimentacoes,
@@ -286,39 +343,33 @@ def relatorio():
 @login_required
 def pendentes():
     """Lista movimentações pendentes"""
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     search = request.args.get('search', '')
 
-    usuario = Usuario.query.get(session['user_id'])
+    usuario = get_usuario_atual()
 
     # Query base para movimentações pendentes
     query = Movimentacao.query.join(Dossie).filter(Movimentacao.status == 'pendente')
 
-    # Aplicar filtro de escola baseado no usuário atual
-    escola_atual_id = usuario.get_escola_atual_id()
-    if escola_atual_id:
-        query = query.filter(Dossie.escola_id == escola_atual_id)
+    # Admin Geral: escola atual da sessão; demais perfis: escopo automático
+    query = aplicar_filtro_escola(query, Dossie, usuario)
 
     # Aplicar filtro de busca
     if search:
         query = query.filter(
             db.or_(
-                Dossie.numero_dossie.contains(search),
-                Dossie.nome_aluno.contains(search),
+                Dossie.n_dossie.contains(search),
+                Dossie.nome.contains(search),
                 Movimentacao.solicitante_nome.contains(search)
             )
         )
 
-    # Ordenação por data de movimentação (mais recentes primeiro)
-    query = query.order_by(Movimentacao.data_movimentacao.desc())
-
-    # Paginação
-    movimentacoes = query.paginate(
-        page=page, per_page=10, error_out=False
+    # Paginação por data de movimentação (mais recentes primeiro)
+    movimentacoes = paginar_keyset(
+        com_carregamento(query, 'movimentacoes.listar'), [Movimentacao.data_movimentacao, Movimentacao.id], cursor, per_page=10, contar=True
     )
 
     # Buscar escolas para filtro
-    from utils.escola_utils import get_escolas_para_filtro
     escolas = get_escolas_para_filtro(usuario)
 
     return render_template('movimentacoes/listar.html',
@@ -334,10 +385,10 @@ def pendentes():
 @login_required
 def emprestados():
     """Lista dossiês emprestados (movimentações de empréstimo pendentes)"""
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     search = request.args.get('search', '')
 
-    usuario = Usuario.query.get(session['user_id'])
+    usuario = get_usuario_atual()
 
     # Query base para empréstimos pendentes
     query = Movimentacao.query.join(Dossie).filter(
@@ -345,17 +396,15 @@ def emprestados():
         Movimentacao.status == 'pendente'
     )
 
-    # Aplicar filtro de escola baseado no usuário atual
-    escola_atual_id = usuario.get_escola_atual_id()
-    if escola_atual_id:
-        query = query.filter(Dossie.escola_id == escola_atual_id)
+    # Admin Geral: escola atual da sessão; demais perfis: escopo automático
+    query = aplicar_filtro_escola(query, Dossie, usuario)
 
     # Aplicar filtro de busca
     if search:
         query = query.filter(
             db.or_(
-                Dossie.numero_dossie.contains(search),
-                Dossie.nome_aluno.contains(search),
+                Dossie.n_dossie.contains(search),
+                Dossie.nome.contains(search),
                 Movimentacao.solicitante_nome.contains(search)
             )
         )
@@ -366,13 +415,10 @@ def emprestados():
         Movimentacao.data_movimentacao.desc()
     )
 
-    # Paginação
-    movimentacoes = query.paginate(
-        page=page, per_page=10, error_out=False
-    )
+    # Paginação (ordem por prazo não é chave única: cursor por deslocamento)
+    movimentacoes = paginar_offset(com_carregamento(query, 'movimentacoes.listar'), cursor, per_page=10)
 
     # Buscar escolas para filtro
-    from utils.escola_utils import get_escolas_para_filtro
     escolas = get_escolas_para_filtro(usuario)
 
     return render_template('movimentacoes/listar.html',
@@ -0,0 +1,97 @@
+# controllers/notificacao_controller.py
+"""
+Controller das notificações da escola (sino da barra de navegação)
+
+/notificacoes/stream entrega as notificações por Server-Sent Events: o
+estado atual na conexão e, depois, só os deltas publicados pelo canal
+(services/notificacao_service.py). A conexão com o banco é devolvida ao
+pool antes de começar a esperar pelos eventos. Com o processo no limite de
+streams (NOTIFICACOES_SSE_MAXIMO) a resposta é 503 e o navegador volta a
+consultar /notificacoes/ periodicamente.
+"""
+
+import json
+import time
+
+from flask import Blueprint, Response, current_app, request, jsonify
+from controllers.auth_controller import login_required
+from models import db
+from utils.usuario_atual import get_usuario_atual
+from services.notificacao_service import canal_notificacoes, central_notificacoes, LimiteConexoes
+
+notificacao_bp = Blueprint('notificacao', __name__, url_prefix='/notificacoes')
+
+@notificacao_bp.route('/')
+@login_required
+def listar():
+    """Notificações não lidas da escola atual do usuário"""
+    usuario = get_usuario_atual()
+    return jsonify(central_notificacoes.listar(usuario.get_escola_atual_id(), bool(usuario.is_admin_escola())))
+
+def _evento_sse(nome, dados):
+    return f'event: {nome}\ndata: {json.dumps(dados)}\n\n'
+
+@notificacao_bp.route('/stream')
+@login_required
+def stream():
+    """Stream de notificações (text/event-stream) da escola atual do usuário"""
+    usuario = get_usuario_atual()
+    escola_id = usuario.get_escola_atual_id()
+    admin = bool(usuario.is_admin_escola())
+    duracao = current_app.config['NOTIFICACOES_SSE_DURACAO']
+    intervalo_ping = current_app.config['NOTIFICACOES_SSE_PING']
+
+    # Assina antes de ler o estado: nada publicado entre os dois se perde
+    try:
+        assinatura = canal_notificacoes.assinar(escola_id, admin)
+    except LimiteConexoes:
+        # Threads do worker reservadas às demais requisições
+        return Response('Limite de conexões de notificações atingido', status=503, headers={
+            'Retry-After': str(duracao)
+        })
+    try:
+        estado = central_notificacoes.listar(escola_id, admin)
+    except Exception:
+        canal_notificacoes.cancelar(assinatura)
+        raise
+    finally:
+        # Conexão aberta por minutos não deve segurar uma conexão do pool
+        db.session.close()
+
+    def gerar():
+        try:
+            yield 'retry: 5000\n'
+            yield _evento_sse('estado', estado)
+            fim = time.monotonic() + duracao
+            while not assinatura.perdeu_eventos:
+                restante = fim - time.monotonic()
+                if restante <= 0:
+                    break
+                evento = assinatura.proximo(min(intervalo_ping, restante))
+                if evento is None:
+                    yield ': ping\n\n'
+                else:
+                    yield _evento_sse(evento['evento'], evento)
+        finally:
+            canal_notificacoes.cancelar(assinatura)
+
+    return Response(gerar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # nginx não deve acumular o stream
+    })
+
+@notificacao_bp.route('/lidas', methods=['POST'])
+@login_required
+def marcar_lidas():
+    """Marca como lidas as notificações informadas (ou todas, sem 'ids')"""
+    usuario = get_usuario_atual()
+    dados = request.get_json(silent=True) or {}
+    ids = dados.get('ids')
+    if ids is not None:
+        try:
+            ids = [int(i) for i in ids]
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'IDs inválidos'}), 400
+
+    marcadas = central_notificacoes.marcar_lidas(usuario.get_escola_atual_id(), ids, bool(usuario.is_admin_escola()))
+    return jsonify({'success': True, 'marcadas': marcadas})
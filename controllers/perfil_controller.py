@@ -2,6 +2,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from models import db, Perfil
 from .auth_controller import login_required, admin_required
+from utils.dados_referencia import dados_referencia
 
 perfil_bp = Blueprint('perfil', __name__, url_prefix='/perfis')
 
@@ -143,3 +144,13 @@ def usuarios(id):
     usuarios = Usuario.query.filter_by(perfil_id=perfil.id_perfil).order_by(Usuario.nome).all()
     
     return render_template('perfis/usuarios.html', perfil=perfil, usuarios=usuarios)
+
+@perfil_bp.route('/api')
+@admin_required
+def api_listar():
+    """API dos perfis para selects (ETag pela versão dos perfis; 304 se não mudou)"""
+    return dados_referencia.resposta_json('perfis', lambda perfis: [{
+        'id': perfil.id_perfil,
+        'perfil': perfil.perfil,
+        'descricao': perfil.descricao or ''
+    } for perfil in perfis])
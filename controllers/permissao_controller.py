@@ -1,7 +1,11 @@
 # controllers/permissao_controller.py
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
-from models import db, Perfil, Permissao, PerfilPermissao
+from models import db, Perfil, Permissao, PerfilPermissao, VersaoCache
 from controllers.auth_controller import login_required
+from utils.permissions import has_permission
+from utils.permission_cache import invalidate_perfil_cache
+from utils.usuario_atual import get_usuario_atual
+from utils.dados_referencia import dados_referencia
 
 permissao_bp = Blueprint('permissao', __name__, url_prefix='/permissoes')
 
@@ -24,7 +28,7 @@ def index():
 @login_required
 def perfis():
     """Gerenciar permissões por perfil"""
-    perfis = Perfil.query.all()
+    perfis = dados_referencia.obter('perfis')
     permissoes = Permissao.query.order_by(Permissao.modulo, Permissao.acao).all()
     
     # Agrupar permissões por módulo
@@ -54,8 +58,9 @@ def atualizar_perfil(perfil_id):
     try:
         perfil = Perfil.query.get_or_404(perfil_id)
         
-        # Remover permissões existentes
+        # Remover permissões existentes (delete em massa não dispara os listeners)
         PerfilPermissao.query.filter_by(perfil_id=perfil_id).delete()
+        VersaoCache.incrementar(VersaoCache.PERMISSOES)
         
         # Adicionar novas permissões
         permissoes_ids = request.form.getlist('permissoes')
@@ -64,6 +69,7 @@ def atualizar_perfil(perfil_id):
             db.session.add(pp)
         
         db.session.commit()
+        invalidate_perfil_cache(perfil_id)
         flash(f'Permissões do perfil "{perfil.perfil}" atualizadas com sucesso!', 'success')
         
     except Exception as e:
@@ -76,10 +82,7 @@ def atualizar_perfil(perfil_id):
 @login_required
 def verificar_permissao(modulo, acao):
     """API para verificar se usuário tem permissão"""
-    from flask import session
-    from models import Usuario
-    
-    usuario = Usuario.query.get(session.get('user_id'))
+    usuario = get_usuario_atual()
     if not usuario:
         return jsonify({'tem_permissao': False})
     
@@ -87,8 +90,8 @@ def verificar_permissao(modulo, acao):
     if usuario.perfil_obj and usuario.perfil_obj.perfil == 'Administrador Geral':
         return jsonify({'tem_permissao': True})
     
-    # Verificar permissão específica
-    tem_permissao = usuario.perfil_obj.has_permission(modulo, acao) if usuario.perfil_obj else False
+    # Verificar permissão específica no snapshot do perfil
+    tem_permissao = has_permission(usuario, modulo, acao)
     
     return jsonify({'tem_permissao': tem_permissao})
 
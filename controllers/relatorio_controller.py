@@ -3,7 +3,11 @@ Controller para Relatórios - Integração com app.py
 """
 
 from flask import Blueprint, render_template, request, session, redirect, url_for, flash
-from models import Usuario, Dossie, Movimentacao, db
+from models import Usuario, Dossie, Movimentacao, EstatisticaEscola
+from utils.usuario_atual import get_usuario_atual
+from utils.exportacao import resposta_exportacao, FORMATOS
+from utils.carregamento import com_carregamento
+from services.emprestimo_service import controle_emprestimos
 from datetime import datetime, timedelta
 
 # Criar blueprint
@@ -15,20 +19,20 @@ def dashboard():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
 
-    usuario = db.session.get(Usuario, session['user_id'])
+    usuario = get_usuario_atual()
     if not usuario:
         session.clear()
         flash('Sessão inválida. Faça login novamente.', 'error')
         return redirect(url_for('auth.login'))
 
-    # Estatísticas para o dashboard
+    # Estatísticas para o dashboard (contadores materializados)
+    resumo = EstatisticaEscola.obter_resumo()
+    mov_status = resumo.get(EstatisticaEscola.MOVIMENTACAO_STATUS, {})
     stats = {
-        'total_dossies': Dossie.query.count(),
-        'total_movimentacoes': Movimentacao.query.count(),
-        'movimentacoes_pendentes': Movimentacao.query.filter_by(status='pendente').count(),
-        'dossies_mes_atual': Dossie.query.filter(
-            Dossie.dt_cadastro >= datetime.now().replace(day=1)
-        ).count()
+        'total_dossies': sum(resumo.get(EstatisticaEscola.DOSSIE_STATUS, {}).values()),
+        'total_movimentacoes': sum(mov_status.values()),
+        'movimentacoes_pendentes': mov_status.get('pendente', 0),
+        'dossies_mes_atual': resumo.get(EstatisticaEscola.DOSSIE_MES, {}).get(datetime.now().strftime('%Y-%m'), 0)
     }
 
     return render_template('relatorios/dashboard.html', stats=stats)
@@ -39,7 +43,7 @@ def solicitante():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
 
-    usuario = db.session.get(Usuario, session['user_id'])
+    usuario = get_usuario_atual()
     if not usuario:
         session.clear()
         flash('Sessão inválida. Faça login novamente.', 'error')
@@ -55,12 +59,26 @@ def nao_devolvidos():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
 
-    usuario = db.session.get(Usuario, session['user_id'])
+    usuario = get_usuario_atual()
     if not usuario:
         session.clear()
         flash('Sessão inválida. Faça login novamente.', 'error')
         return redirect(url_for('auth.login'))
 
+    # Empréstimos em aberto (conjunto mantido em emprestimos_abertos, mais atrasados primeiro)
+    query = controle_emprestimos.em_aberto(usuario.get_escola_atual_id())
+
+    # Exportação: streaming direto do cursor, sem carregar o resultado em memória
+    formato = request.args.get('formato')
+    if formato in FORMATOS:
+        query = query.with_entities(
+            Dossie.n_dossie, Dossie.nome, Movimentacao.solicitante_nome, Movimentacao.solicitante_documento,
+            Movimentacao.solicitante_telefone, Movimentacao.data_movimentacao, Movimentacao.data_prevista_devolucao
+        )
+        colunas = ['Nº Dossiê', 'Aluno', 'Solicitante', 'Documento', 'Telefone',
+                   'Empréstimo', 'Devolução Prevista']
+        return resposta_exportacao(query, colunas, f"nao_devolvidos_{datetime.now():%Y%m%d}", formato, 'Não Devolvidos')
+
     # Dados para o relatório
-    movimentacoes = Movimentacao.query.filter_by(status='emprestado').all()
-    return render_template('relatorios/nao_devolvidos.html', movimentacoes=movimentacoes) 
\ No newline at end of file
+    movimentacoes = com_carregamento(query, 'relatorios.nao_devolvidos').all()
+    return render_template('relatorios/nao_devolvidos.html', movimentacoes=movimentacoes, agora=datetime.now()) 
\ No newline at end of file
@@ -1,23 +1,23 @@
 # controllers/usuario_controller.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from datetime import datetime
 from models import db, Usuario, Escola, Perfil
 from .auth_controller import login_required, admin_required
 from utils.logs import log_acao, AcoesAuditoria
+from utils.usuario_atual import get_usuario_atual
+from utils.dados_referencia import dados_referencia
 import json
 
 usuario_bp = Blueprint('usuario', __name__, url_prefix='/usuarios')
 
 def get_perfis_permitidos(usuario_logado):
     """Retorna perfis que o usuário logado pode cadastrar"""
-    from models import Perfil
-
     if usuario_logado.is_admin_geral():
         # Admin Geral pode cadastrar qualquer perfil
-        return Perfil.query.all()
+        return dados_referencia.obter('perfis')
     elif usuario_logado.is_admin_escola():
         # Admin Escola pode cadastrar perfis de nível igual ou inferior (exceto Admin Geral)
-        return Perfil.query.filter(Perfil.perfil != 'Administrador Geral').all()
+        return [perfil for perfil in dados_referencia.obter('perfis') if perfil.perfil != 'Administrador Geral']
     else:
         # Outros perfis não podem cadastrar usuários
         return []
@@ -78,7 +78,7 @@ def listar():
     page = request.args.get('page', 1, type=int)
 
     # Obter usuário atual
-    usuario_atual = Usuario.query.get(session['user_id'])
+    usuario_atual = get_usuario_atual()
 
     # Aplicar filtro de escola baseado no usuário
     from utils.escola_utils import get_escolas_para_filtro
@@ -121,7 +121,7 @@ def listar():
 
     # Escolas disponíveis baseadas no perfil
     escolas = get_escolas_para_filtro(usuario_atual)
-    perfis = Perfil.query.all()
+    perfis = dados_referencia.obter('perfis')
 
     return render_template('usuarios/listar.html',
                          usuarios=usuarios,
@@ -136,7 +136,7 @@ def listar():
 @login_required
 def novo():
     """Cadastra novo usuário"""
-    usuario_logado = Usuario.query.get(session['user_id'])
+    usuario_logado = get_usuario_atual()
     if not usuario_logado.is_admin_escola():
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard'))
@@ -172,7 +172,7 @@ def novo():
         except ValidationError as e:
             flash(str(e), 'error')
             return render_template('usuarios/cadastrar.html',
-                                 escolas=Escola.query.all(),
+                                 escolas=dados_referencia.obter('escolas'),
                                  perfis=get_perfis_permitidos(usuario_logado))
 
         # Validar hierarquia de perfis
@@ -180,7 +180,7 @@ def novo():
         if not validar_hierarquia_perfil(usuario_logado, perfil_id):
             flash('Você não tem permissão para cadastrar usuário com este perfil!', 'error')
             return render_template('usuarios/cadastrar.html',
-                                 escolas=Escola.query.all(),
+                                 escolas=dados_referencia.obter('escolas'),
                                  perfis=get_perfis_permitidos(usuario_logado))
 
         # Validar outros campos obrigatórios
@@ -214,28 +214,11 @@ def novo():
             if 'foto' in request.files:
                 foto = request.files['foto']
                 if foto and foto.filename:
-                    from controllers.foto_controller import allowed_file, resize_image
-                    from werkzeug.utils import secure_filename
-                    import os
-                    import uuid
-
-                    if allowed_file(foto.filename):
-                        # Gerar nome único para o arquivo
-                        file_extension = foto.filename.rsplit('.', 1)[1].lower()
-                        filename = f"user_{usuario.id}_{uuid.uuid4().hex[:8]}.{file_extension}"
-
-                        # Definir caminho para salvar
-                        upload_folder = os.path.join(current_app.root_path, 'static', 'uploads', 'fotos')
-                        os.makedirs(upload_folder, exist_ok=True)
-                        file_path = os.path.join(upload_folder, filename)
+                    from services.imagem_service import processador_imagens, extensao_permitida
 
-                        # Salvar arquivo
-                        foto.save(file_path)
-
-                        # Redimensionar imagem
-                        resize_image(file_path)
-
-                        # Atualizar usuário com o nome da foto
+                    if extensao_permitida(foto.filename):
+                        # Grava o original; as versões reduzidas são geradas em segundo plano
+                        filename = processador_imagens.salvar(foto, 'usuario', f"user_{usuario.id}", anterior=usuario.foto)
                         usuario.set_foto(filename)
 
             # Log detalhado da operação
@@ -263,7 +246,7 @@ def novo():
             db.session.rollback()
             flash(f'Erro ao criar usuário: {str(e)}', 'error')
 
-    escolas = Escola.query.all()
+    escolas = dados_referencia.obter('escolas')
     perfis = get_perfis_permitidos(usuario_logado)
     return render_template('usuarios/cadastrar.html', escolas=escolas, perfis=perfis)
 
@@ -278,7 +261,7 @@ def ver(id):
 @login_required
 def editar(id):
     """Edita usuário"""
-    usuario_logado = Usuario.query.get(session['user_id'])
+    usuario_logado = get_usuario_atual()
     if not usuario_logado.is_admin_escola():
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard'))
@@ -292,7 +275,7 @@ def editar(id):
             flash('Você não tem permissão para alterar para este perfil!', 'error')
             return render_template('usuarios/editar.html',
                                  usuario=usuario,
-                                 escolas=Escola.query.all(),
+                                 escolas=dados_referencia.obter('escolas'),
                                  perfis=get_perfis_permitidos(usuario_logado))
 
         usuario.nome = request.form.get('nome', '').strip()
@@ -314,7 +297,7 @@ def editar(id):
             flash('Nome e email são obrigatórios!', 'error')
             return render_template('usuarios/editar.html',
                                  usuario=usuario,
-                                 escolas=Escola.query.all(),
+                                 escolas=dados_referencia.obter('escolas'),
                                  perfis=get_perfis_permitidos(usuario_logado))
 
         try:
@@ -323,41 +306,16 @@ def editar(id):
                 foto = request.files['foto']
 
                 if foto and foto.filename:
-                    from controllers.foto_controller import allowed_file, resize_image
-                    import os
-                    import uuid
-
-                    if allowed_file(foto.filename):
-                        # Remover foto anterior se existir
-                        if usuario.foto:
-                            old_photo_path = os.path.join(current_app.root_path, 'static', 'uploads', 'fotos', usuario.foto)
-                            if os.path.exists(old_photo_path):
-                                try:
-                                    os.remove(old_photo_path)
-                                except:
-                                    pass  # Não falhar se não conseguir remover
-
-                        # Gerar nome único para o arquivo
-                        file_extension = foto.filename.rsplit('.', 1)[1].lower()
-                        filename = f"user_{usuario.id}_{uuid.uuid4().hex[:8]}.{file_extension}"
-
-                        # Definir caminho para salvar
-                        upload_folder = os.path.join(current_app.root_path, 'static', 'uploads', 'fotos')
-                        os.makedirs(upload_folder, exist_ok=True)
-                        file_path = os.path.join(upload_folder, filename)
-
-                        # Salvar arquivo
-                        foto.save(file_path)
-
-                        # Redimensionar imagem
-                        resize_image(file_path)
-
-                        # Atualizar usuário com o nome da foto
+                    from services.imagem_service import processador_imagens, extensao_permitida
+
+                    if extensao_permitida(foto.filename):
+                        # Grava o original; as versões reduzidas são geradas em segundo plano
+                        filename = processador_imagens.salvar(foto, 'usuario', f"user_{usuario.id}", anterior=usuario.foto)
                         usuario.set_foto(filename)
 
                         # Atualizar sessão se for o próprio usuário
                         if session.get('user_id') == usuario.id:
-                            session['user_foto_url'] = usuario.get_foto_url()
+                            session['user_foto_url'] = usuario.get_foto_url('thumb', aguardar=True)
                     else:
                         flash('Tipo de arquivo não permitido para foto!', 'error')
 
@@ -386,7 +344,7 @@ def editar(id):
             db.session.rollback()
             flash(f'Erro ao atualizar usuário: {str(e)}', 'error')
 
-    escolas = Escola.query.all()
+    escolas = dados_referencia.obter('escolas')
     perfis = get_perfis_permitidos(usuario_logado)
     return render_template('usuarios/editar.html',
                          usuario=usuario,
@@ -397,7 +355,7 @@ def editar(id):
 @admin_required
 def excluir(id):
     """Exclui usuário"""
-    usuario_logado = Usuario.query.get(session['user_id'])
+    usuario_logado = get_usuario_atual()
     usuario = Usuario.query.get_or_404(id)
     
     if usuario.id == usuario_logado.id:
@@ -438,7 +396,7 @@ def resetar_senha(id):
     """Reseta a senha do usuário"""
     from flask import jsonify
 
-    usuario_logado = Usuario.query.get(session['user_id'])
+    usuario_logado = get_usuario_atual()
     if not usuario_logado.is_admin_escola():
         return jsonify({'success': False, 'message': 'Acesso negado'}), 403
 
@@ -458,7 +416,7 @@ def bloquear(id):
     """Bloqueia usuário"""
     from flask import jsonify
 
-    usuario_logado = Usuario.query.get(session['user_id'])
+    usuario_logado = get_usuario_atual()
     if not usuario_logado.is_admin_escola():
         return jsonify({'success': False, 'message': 'Acesso negado'}), 403
 
@@ -481,7 +439,7 @@ def desbloquear(id):
     """Desbloqueia usuário"""
     from flask import jsonify
 
-    usuario_logado = Usuario.query.get(session['user_id'])
+    usuario_logado = get_usuario_atual()
     if not usuario_logado.is_admin_escola():
         return jsonify({'success': False, 'message': 'Acesso negado'}), 403
 
@@ -489,7 +447,7 @@ def desbloquear(id):
 
     try:
         usuario.situacao = 'ativo'
-        usuario.tentativas_login = 0  # Reset tentativas
+        usuario.reset_tentativas_login()  # Também encerra o bloqueio por tentativas de login
         db.session.commit()
         return jsonify({'success': True, 'message': 'Usuário desbloqueado com sucesso'})
     except Exception as e:
@@ -531,40 +489,15 @@ def editar_perfil():
                 foto = request.files['foto']
 
                 if foto and foto.filename:
-                    from controllers.foto_controller import allowed_file, resize_image
-                    import os
-                    import uuid
-
-                    if allowed_file(foto.filename):
-                        # Remover foto anterior se existir
-                        if usuario.foto:
-                            old_photo_path = os.path.join(current_app.root_path, 'static', 'uploads', 'fotos', usuario.foto)
-                            if os.path.exists(old_photo_path):
-                                try:
-                                    os.remove(old_photo_path)
-                                except:
-                                    pass
-
-                        # Gerar nome único para o arquivo
-                        file_extension = foto.filename.rsplit('.', 1)[1].lower()
-                        filename = f"user_{usuario.id}_{uuid.uuid4().hex[:8]}.{file_extension}"
-
-                        # Definir caminho para salvar
-                        upload_folder = os.path.join(current_app.root_path, 'static', 'uploads', 'fotos')
-                        os.makedirs(upload_folder, exist_ok=True)
-                        file_path = os.path.join(upload_folder, filename)
-
-                        # Salvar arquivo
-                        foto.save(file_path)
-
-                        # Redimensionar imagem
-                        resize_image(file_path)
-
-                        # Atualizar usuário com o nome da foto
+                    from services.imagem_service import processador_imagens, extensao_permitida
+
+                    if extensao_permitida(foto.filename):
+                        # Grava o original; as versões reduzidas são geradas em segundo plano
+                        filename = processador_imagens.salvar(foto, 'usuario', f"user_{usuario.id}", anterior=usuario.foto)
                         usuario.set_foto(filename)
 
                         # Atualizar sessão
-                        session['user_foto_url'] = usuario.get_foto_url()
+                        session['user_foto_url'] = usuario.get_foto_url('thumb', aguardar=True)
                     else:
                         flash('Tipo de arquivo não permitido para foto!', 'error')
 
@@ -588,7 +521,7 @@ def trocar_escola():
     from models import Escola
 
     # Verificar se o usuário pode trocar de escola
-    usuario_atual = Usuario.query.get(session['user_id'])
+    usuario_atual = get_usuario_atual()
 
     if not usuario_atual.can_switch_escola():
         flash('Você não tem permissão para trocar de escola!', 'error')
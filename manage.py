@@ -3,6 +3,7 @@
 
 import os
 import sys
+import click
 from flask.cli import FlaskGroup
 from flask_migrate import init, migrate, upgrade, downgrade, stamp
 from app import create_app
@@ -223,6 +224,226 @@ def backup_db():
         except Exception as e2:
             print(f"❌ Falha no backup de emergência: {e2}")
 
+@cli.command()
+def rebuild_estatisticas():
+    """Reconstruir a tabela de estatísticas por escola"""
+    from models import EstatisticaEscola
+
+    print("📊 Recalculando estatísticas por escola...")
+    linhas = EstatisticaEscola.recalcular()
+    print(f"✅ Estatísticas reconstruídas: {linhas} contadores gravados")
+
+@cli.command()
+def rebuild_emprestimos():
+    """Reconstruir o conjunto de empréstimos em aberto"""
+    from models import EmprestimoAberto
+
+    print("📚 Recalculando empréstimos em aberto...")
+    total = EmprestimoAberto.recalcular()
+    print(f"✅ Empréstimos em aberto: {total}")
+
+@cli.command()
+def varrer_emprestimos():
+    """Marcar empréstimos vencidos e notificar as escolas (para o cron)"""
+    from services.emprestimo_service import controle_emprestimos
+
+    print("⏰ Verificando prazos de devolução...")
+    atrasados = controle_emprestimos.varrer()
+    print(f"✅ Novos empréstimos em atraso notificados: {atrasados}")
+
+@cli.command()
+def rebuild_busca_dossies():
+    """Criar/reconstruir o índice de busca textual de dossiês"""
+    from services.busca_dossie_service import dossie_search
+
+    print("🔎 Reconstruindo índice de busca de dossiês...")
+    if dossie_search.criar_indice(reconstruir=True):
+        print("✅ Índice de busca reconstruído")
+    else:
+        print("⚠️  Banco sem suporte a índice de busca; a busca usará LIKE")
+
+@cli.command()
+@click.option('--forcar-indices', is_flag=True,
+              help='PostgreSQL: desliga enable_seqscan para testar se os índices atendem as consultas')
+def explain_consultas(forcar_indices):
+    """Rodar EXPLAIN nas consultas frequentes e apontar varreduras completas
+
+    Código de saída (para CI/deploy): 0 sem problemas, 1 com varreduras
+    completas, 2 se o banco não é suportado.
+    """
+    from services.diagnostico_service import analisar_consultas, DialetoNaoSuportado
+
+    print("🔍 Analisando planos das consultas frequentes...")
+    try:
+        resultados = analisar_consultas(forcar_indices=forcar_indices)
+    except DialetoNaoSuportado as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+
+    problemas = 0
+    for resultado in resultados:
+        if resultado['varreduras']:
+            problemas += 1
+            print(f"❌ {resultado['nome']}: varredura completa em {', '.join(resultado['varreduras'])}")
+            for linha in resultado['plano']:
+                print(f"     {linha}")
+        else:
+            print(f"✅ {resultado['nome']}")
+
+    if problemas:
+        print(f"\n⚠️  {problemas} consulta(s) com varredura completa")
+        if not forcar_indices:
+            print("💡 Em bases pequenas o PostgreSQL prefere Seq Scan; use --forcar-indices")
+        sys.exit(1)
+
+    print("\n🎉 Todas as consultas usam índices")
+
+@cli.command()
+@click.option('--meses', type=int, default=None,
+              help='Meses mantidos nas tabelas de log (padrão: AUDITORIA_RETENCAO_MESES)')
+@click.option('--sem-arquivo', is_flag=True,
+              help='Não gravar os registros removidos em .jsonl.gz')
+def manter_logs(meses, sem_arquivo):
+    """Criar partições futuras e aplicar a retenção dos logs (rodar mensalmente)"""
+    from services.retencao_logs_service import retencao_logs
+
+    print("🗂️  Criando partições dos próximos meses...")
+    for particao in retencao_logs.criar_particoes():
+        print(f"  ➕ {particao}")
+
+    print("🧹 Aplicando retenção dos logs...")
+    processados = retencao_logs.aplicar_retencao(meses=meses, arquivar=not sem_arquivo)
+    for item in processados:
+        destino = f" → {item['arquivo']}" if item['arquivo'] else ''
+        print(f"  ✅ {item['tabela']} {item['mes']:%m/%Y}: {item['registros']} registros resumidos{destino}")
+
+    if not processados:
+        print("✅ Nenhum mês fora do período de retenção")
+
+@cli.command()
+def gerar_miniaturas():
+    """Gerar as versões reduzidas das fotos já existentes"""
+    from models import Usuario, Dossie, Diretor
+    from services.imagem_service import processador_imagens
+
+    print("🖼️  Gerando miniaturas das fotos...")
+    total = 0
+    for categoria, modelo in (('usuario', Usuario), ('dossie', Dossie), ('diretor', Diretor)):
+        fotos = db.session.query(modelo.foto).filter(modelo.foto != None).yield_per(500)
+        for (foto,) in fotos:
+            processador_imagens.agendar(categoria, foto)
+            total += 1
+
+    processador_imagens.aguardar()
+    print(f"✅ {total} fotos processadas")
+
+@cli.command()
+def migrar_anexos():
+    """Mover os anexos antigos para o armazenamento deduplicado"""
+    from services.armazenamento_service import armazenamento_anexos
+
+    print("📎 Migrando anexos para o armazenamento deduplicado...")
+    resultado = armazenamento_anexos.migrar_legados()
+    print(f"✅ {resultado['migrados']} anexos migrados "
+          f"({resultado['bytes_economizados'] / (1024 * 1024):.1f}MB em duplicatas)")
+    if resultado['ausentes']:
+        print(f"⚠️  {resultado['ausentes']} anexos sem arquivo no disco")
+
+@cli.command()
+@click.option('--carencia-horas', type=float, default=1.0,
+              help='Tempo mínimo sem uso antes de remover um arquivo sem referências')
+def limpar_anexos(carencia_horas):
+    """Remover arquivos de anexos não referenciados e uploads abandonados"""
+    from datetime import timedelta
+    from services.armazenamento_service import armazenamento_anexos
+    from services.upload_fracionado_service import uploads_fracionados
+
+    print("🧹 Removendo uploads fracionados abandonados...")
+    sessoes = uploads_fracionados.limpar_expiradas()
+    print(f"✅ {sessoes} sessões de upload removidas")
+
+    print("🧹 Removendo arquivos de anexos sem referências...")
+    resultado = armazenamento_anexos.coletar_lixo(timedelta(hours=carencia_horas))
+    print(f"✅ {resultado['blobs']} arquivos removidos "
+          f"({resultado['bytes'] / (1024 * 1024):.1f}MB liberados), {resultado['orfaos']} órfãos")
+
+    estatisticas = armazenamento_anexos.estatisticas()
+    print(f"📊 {estatisticas['anexos']} anexos em {estatisticas['blobs']} arquivos; "
+          f"deduplicação economiza {estatisticas['bytes_economizados'] / (1024 * 1024):.1f}MB")
+
+@cli.command()
+@click.argument('arquivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--escola', type=int, required=True, help='ID da escola de destino')
+@click.option('--usuario', type=int, default=None, help='ID do usuário registrado no cadastro')
+@click.option('--simular', is_flag=True, help='Apenas validar, sem gravar')
+def importar_dossies(arquivo, escola, usuario, simular):
+    """Importar dossiês em lote de uma planilha CSV ou XLSX"""
+    from utils.importacao import ler_planilha, formato_do_arquivo, PlanilhaInvalida
+    from services.importacao_dossie_service import importador_dossies
+
+    formato = formato_do_arquivo(arquivo)
+    if not formato:
+        print("❌ Use uma planilha .csv ou .xlsx")
+        return
+
+    print(f"📥 {'Validando' if simular else 'Importando'} {arquivo}...")
+    with open(arquivo, 'rb') as entrada:
+        try:
+            resultado = importador_dossies.importar(ler_planilha(entrada, formato), escola, usuario, simular=simular)
+        except PlanilhaInvalida as e:
+            print(f"❌ {e}")
+            return
+
+    print(f"✅ {resultado['importados']} de {resultado['total']} linhas "
+          f"{'válidas' if simular else 'importadas'} em {resultado['segundos']}s")
+    for erro in resultado['erros'][:20]:
+        print(f"  linha {erro['linha']}: {'; '.join(erro['erros'])}")
+    if len(resultado['erros']) > 20:
+        print(f"  ... e mais {len(resultado['erros']) - 20} linhas com erro")
+
+@cli.command()
+@click.option('--ips', default='1000,10000,100000,1000000', help='Quantidades de IPs simulados (separadas por vírgula)')
+@click.option('--operacoes', type=int, default=50000, help='Operações medidas em cada rodada')
+@click.option('--capacidade', type=int, default=None, help='Máximo de chaves em memória (padrão: LIMITES_MEMORIA_MAXIMO)')
+def benchmark_limites(ips, operacoes, capacidade):
+    """Medir o custo por operação do armazenamento em memória dos limites de login"""
+    import random
+    import time
+    from utils.armazenamento_limites import ArmazenamentoMemoria
+
+    capacidade = capacidade or app.config['LIMITES_MEMORIA_MAXIMO']
+    print(f"⏱️  Armazenamento em memória (capacidade {capacidade} chaves, {operacoes} operações por rodada)")
+    print(f"{'IPs':>10} {'µs/falha':>10} {'µs/contar':>10} {'µs/captcha':>11} {'chaves':>8} {'descartadas':>12}")
+    for total_ips in (int(n) for n in ips.split(',')):
+        armazenamento = ArmazenamentoMemoria(capacidade)
+        inicio = time.time()
+        # Rajada: cada IP falha uma vez, com o relógio avançando (expiração em andamento)
+        for i in range(total_ips):
+            armazenamento.incrementar(f'falhas:10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}', inicio + i * 0.001)
+        agora = inicio + total_ips * 0.001
+        amostra = [f'falhas:10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}'
+                   for i in random.sample(range(total_ips), min(operacoes, total_ips))]
+
+        t0 = time.perf_counter()
+        for i in range(operacoes):
+            armazenamento.incrementar(f'falhas:novo{i}', agora)
+        falha = (time.perf_counter() - t0) / operacoes * 1e6
+
+        t0 = time.perf_counter()
+        for i in range(operacoes):
+            armazenamento.contar(amostra[i % len(amostra)], 300, agora)
+        contar = (time.perf_counter() - t0) / operacoes * 1e6
+
+        t0 = time.perf_counter()
+        for i in range(operacoes):
+            armazenamento.definir(f'captcha:{i}', 'x', 300)
+            armazenamento.consumir(f'captcha:{i}')
+        captcha = (time.perf_counter() - t0) / operacoes * 1e6
+
+        estatisticas = armazenamento.estatisticas()
+        print(f"{total_ips:>10} {falha:>10.2f} {contar:>10.2f} {captcha:>11.2f} "
+              f"{estatisticas['chaves']:>8} {estatisticas['descartadas']:>12}")
+
 @cli.command()
 def help_commands():
     """Mostrar todos os comandos disponíveis"""
@@ -236,6 +457,17 @@ def help_commands():
     print("  show-migrations  - Mostrar status das migrações")
     print("  reset-db         - Resetar banco (CUIDADO!)")
     print("  backup-db        - Fazer backup do banco")
+    print("  rebuild-estatisticas - Reconstruir estatísticas por escola")
+    print("  rebuild-busca-dossies - Reconstruir índice de busca de dossiês")
+    print("  rebuild-emprestimos - Reconstruir o conjunto de empréstimos em aberto")
+    print("  varrer-emprestimos - Notificar empréstimos em atraso (cron)")
+    print("  explain-consultas - Verificar índices das consultas frequentes")
+    print("  manter-logs      - Partições e retenção dos logs (mensal)")
+    print("  gerar-miniaturas - Gerar versões reduzidas das fotos existentes")
+    print("  migrar-anexos    - Mover anexos antigos para o armazenamento deduplicado")
+    print("  limpar-anexos    - Remover anexos sem referências e uploads abandonados")
+    print("  importar-dossies - Importar dossiês em lote de planilha CSV/XLSX")
+    print("  benchmark-limites - Medir o armazenamento em memória dos limites de login")
     print("")
     print("👤 USUÁRIOS:")
     print("  create-superuser - Criar usuário administrador")
@@ -0,0 +1,71 @@
+"""Criar tabela estatisticas_escola
+
+Revision ID: a1f3c9d2e845
+Revises: 68c067ac2063
+Create Date: 2026-10-17 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1f3c9d2e845'
+down_revision = '68c067ac2063'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('estatisticas_escola',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('escola_id', sa.Integer(), nullable=False),
+    sa.Column('dimensao', sa.String(length=30), nullable=False),
+    sa.Column('chave', sa.String(length=50), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('atualizado_em', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['escola_id'], ['escolas.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('escola_id', 'dimensao', 'chave', name='unique_estatistica_escola')
+    )
+    with op.batch_alter_table('estatisticas_escola', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_estatisticas_escola_escola_id'), ['escola_id'], unique=False)
+
+    # Carga inicial: os mesmos agrupamentos de EstatisticaEscola.recalcular()
+    # (rebuild-estatisticas continua disponível para reconstruir depois)
+    if op.get_bind().dialect.name == 'postgresql':
+        mes = "to_char({}, 'YYYY-MM')"
+    else:
+        mes = "strftime('%Y-%m', {})"
+
+    def chave(expressao):
+        # Nulo ou vazio vira 'indefinido', como _normalizar_chave
+        return f"COALESCE(NULLIF(CAST({expressao} AS VARCHAR(50)), ''), 'indefinido')"
+
+    origens = [
+        ('dossie_status', 'd.id_escola', 'd.status', 'dossies d'),
+        ('dossie_mes', 'd.id_escola', mes.format('d.dt_cadastro'), 'dossies d'),
+        ('movimentacao_tipo', 'd.id_escola', 'm.tipo_movimentacao',
+         'movimentacoes m JOIN dossies d ON d.id_dossie = m.dossie_id'),
+        ('movimentacao_status', 'd.id_escola', 'm.status',
+         'movimentacoes m JOIN dossies d ON d.id_dossie = m.dossie_id'),
+        ('movimentacao_mes', 'd.id_escola', mes.format('m.data_movimentacao'),
+         'movimentacoes m JOIN dossies d ON d.id_dossie = m.dossie_id'),
+        ('usuario_situacao', 'u.escola_id', 'u.situacao', 'usuarios u'),
+        ('usuario_perfil', 'u.escola_id', 'u.perfil_id', 'usuarios u'),
+        ('usuario_mes', 'u.escola_id', mes.format('u.data_cadastro'), 'usuarios u'),
+    ]
+    for dimensao, escola, expressao, origem in origens:
+        op.execute(f"""
+            INSERT INTO estatisticas_escola (escola_id, dimensao, chave, total, atualizado_em)
+            SELECT {escola}, '{dimensao}', {chave(expressao)}, COUNT(*), CURRENT_TIMESTAMP
+            FROM {origem}
+            GROUP BY {escola}, {chave(expressao)}
+        """)
+
+
+def downgrade():
+    with op.batch_alter_table('estatisticas_escola', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_estatisticas_escola_escola_id'))
+
+    op.drop_table('estatisticas_escola')
@@ -0,0 +1,25 @@
+"""Índice de escola em diretores (escopo automático por escola)
+
+Revision ID: a8c0d2e4f681
+Revises: f7a9b1c3d570
+Create Date: 2026-10-22 09:41:17.305118
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8c0d2e4f681'
+down_revision = 'f7a9b1c3d570'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('diretores', schema=None) as batch_op:
+        batch_op.create_index('idx_diretores_escola', ['escola_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('diretores', schema=None) as batch_op:
+        batch_op.drop_index('idx_diretores_escola')
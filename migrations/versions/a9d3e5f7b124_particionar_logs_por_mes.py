@@ -0,0 +1,154 @@
+"""Particionar logs por mês e criar resumo mensal
+
+Revision ID: a9d3e5f7b124
+Revises: f4a6b8c0d217
+Create Date: 2026-10-17 16:40:12.337905
+
+"""
+from datetime import date, datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d3e5f7b124'
+down_revision = 'f4a6b8c0d217'
+branch_labels = None
+depends_on = None
+
+
+# Partições criadas além do mês atual
+MESES_A_FRENTE = 3
+
+COLUNAS = {
+    'logs_auditoria': """
+        id integer NOT NULL DEFAULT nextval('{sequencia}'),
+        usuario_id integer NOT NULL REFERENCES usuarios (id),
+        acao varchar(100) NOT NULL,
+        data_hora timestamp without time zone NOT NULL DEFAULT now(),
+        item_alterado varchar(100),
+        ip_address varchar(45),
+        navegador varchar(200),
+        detalhes text,
+        PRIMARY KEY (id, data_hora)""",
+    'logs_sistema': """
+        id integer NOT NULL DEFAULT nextval('{sequencia}'),
+        mensagem_erro text NOT NULL,
+        usuario_id integer REFERENCES usuarios (id),
+        nivel_erro varchar(20) DEFAULT 'INFO',
+        data_hora timestamp without time zone NOT NULL DEFAULT now(),
+        modulo varchar(50),
+        funcao varchar(100),
+        linha integer,
+        PRIMARY KEY (id, data_hora)""",
+}
+
+INDICES = {
+    'logs_auditoria': [
+        ('idx_logs_auditoria_usuario_data', ['usuario_id', 'data_hora']),
+        ('idx_logs_auditoria_data', ['data_hora']),
+    ],
+    'logs_sistema': [
+        ('idx_logs_sistema_data', ['data_hora']),
+    ],
+}
+
+
+def _mes(data, deslocamento=0):
+    indice = data.year * 12 + (data.month - 1) + deslocamento
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def _particionar(bind, tabela):
+    """Recria a tabela como particionada por mês e copia os registros"""
+    sequencia = bind.execute(sa.text(f"SELECT pg_get_serial_sequence('{tabela}', 'id')")).scalar()
+    mais_antigo = bind.execute(sa.text(f"SELECT min(data_hora) FROM {tabela}")).scalar()
+
+    colunas = [linha[0] for linha in bind.execute(sa.text(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_name = :tabela ORDER BY ordinal_position"
+    ), {'tabela': tabela})]
+    selecao = ', '.join(
+        'coalesce(data_hora, now())' if coluna == 'data_hora' else coluna for coluna in colunas
+    )
+
+    op.execute(f"ALTER TABLE {tabela} RENAME TO {tabela}_antigo")
+    op.execute(f"ALTER SEQUENCE {sequencia} OWNED BY NONE")
+    for nome, _ in INDICES[tabela]:
+        op.execute(f"DROP INDEX IF EXISTS {nome}")
+
+    op.execute(f"CREATE TABLE {tabela} ({COLUNAS[tabela].format(sequencia=sequencia)}) "
+               f"PARTITION BY RANGE (data_hora)")
+    op.execute(f"CREATE TABLE {tabela}_padrao PARTITION OF {tabela} DEFAULT")
+
+    hoje = date.today()
+    mes = _mes(mais_antigo or hoje)
+    ultimo = _mes(hoje, MESES_A_FRENTE)
+    while mes <= ultimo:
+        proximo = _mes(mes, 1)
+        op.execute(
+            f"CREATE TABLE {tabela}_{mes.year:04d}_{mes.month:02d} PARTITION OF {tabela} "
+            f"FOR VALUES FROM ('{datetime(mes.year, mes.month, 1).isoformat()}') "
+            f"TO ('{datetime(proximo.year, proximo.month, 1).isoformat()}')"
+        )
+        mes = proximo
+
+    op.execute(f"INSERT INTO {tabela} ({', '.join(colunas)}) SELECT {selecao} FROM {tabela}_antigo")
+    op.execute(f"DROP TABLE {tabela}_antigo")
+    op.execute(f"ALTER SEQUENCE {sequencia} OWNED BY {tabela}.id")
+
+    for nome, colunas_indice in INDICES[tabela]:
+        op.execute(f"CREATE INDEX {nome} ON {tabela} ({', '.join(colunas_indice)})")
+
+
+def _desparticionar(bind, tabela):
+    """Volta a tabela a uma tabela comum com os mesmos registros"""
+    sequencia = bind.execute(sa.text(f"SELECT pg_get_serial_sequence('{tabela}', 'id')")).scalar()
+    op.execute(f"ALTER TABLE {tabela} RENAME TO {tabela}_particionada")
+    op.execute(f"ALTER SEQUENCE {sequencia} OWNED BY NONE")
+    for nome, _ in INDICES[tabela]:
+        op.execute(f"DROP INDEX IF EXISTS {nome}")
+
+    colunas = COLUNAS[tabela].format(sequencia=sequencia).replace('PRIMARY KEY (id, data_hora)', 'PRIMARY KEY (id)')
+    op.execute(f"CREATE TABLE {tabela} ({colunas})")
+    op.execute(f"INSERT INTO {tabela} SELECT * FROM {tabela}_particionada")
+    op.execute(f"DROP TABLE {tabela}_particionada CASCADE")
+    op.execute(f"ALTER SEQUENCE {sequencia} OWNED BY {tabela}.id")
+
+    for nome, colunas_indice in INDICES[tabela]:
+        op.execute(f"CREATE INDEX {nome} ON {tabela} ({', '.join(colunas_indice)})")
+
+
+def upgrade():
+    op.create_table('logs_resumo_mensal',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('origem', sa.String(length=20), nullable=False),
+    sa.Column('mes', sa.Date(), nullable=False),
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('categoria', sa.String(length=100), nullable=False),
+    sa.Column('item', sa.String(length=100), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('origem', 'mes', 'usuario_id', 'categoria', 'item', name='unique_log_resumo_mensal')
+    )
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        _particionar(bind, 'logs_auditoria')
+        _particionar(bind, 'logs_sistema')
+    else:
+        op.create_index('idx_logs_auditoria_data', 'logs_auditoria', ['data_hora'], unique=False)
+        op.create_index('idx_logs_sistema_data', 'logs_sistema', ['data_hora'], unique=False)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        _desparticionar(bind, 'logs_sistema')
+        _desparticionar(bind, 'logs_auditoria')
+    else:
+        op.drop_index('idx_logs_sistema_data', table_name='logs_sistema')
+        op.drop_index('idx_logs_auditoria_data', table_name='logs_auditoria')
+
+    op.drop_table('logs_resumo_mensal')
@@ -0,0 +1,53 @@
+"""Nome normalizado de solicitantes para o autocompletar
+
+Revision ID: b2e4f6a8c913
+Revises: a8c0d2e4f681
+Create Date: 2026-10-23 10:12:48.517204
+
+"""
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2e4f6a8c913'
+down_revision = 'a8c0d2e4f681'
+branch_labels = None
+depends_on = None
+
+
+solicitantes = sa.table(
+    'solicitantes',
+    sa.column('id', sa.Integer),
+    sa.column('nome', sa.String),
+    sa.column('nome_busca', sa.String),
+)
+
+
+def _normalizar(texto):
+    # Mesma regra de models.solicitante.normalizar_busca (sem importar o modelo)
+    texto = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode()
+    return ' '.join(texto.lower().split())
+
+
+def upgrade():
+    with op.batch_alter_table('solicitantes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('nome_busca', sa.String(length=100), nullable=True))
+        batch_op.create_index('idx_solicitantes_escola_busca', ['escola_id', 'nome_busca'], unique=False,
+                              postgresql_ops={'nome_busca': 'varchar_pattern_ops'})
+
+    # Preencher os registros existentes
+    bind = op.get_bind()
+    linhas = bind.execute(sa.select(solicitantes.c.id, solicitantes.c.nome)).all()
+    for id_, nome in linhas:
+        bind.execute(
+            solicitantes.update().where(solicitantes.c.id == id_).values(nome_busca=_normalizar(nome))
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('solicitantes', schema=None) as batch_op:
+        batch_op.drop_index('idx_solicitantes_escola_busca')
+        batch_op.drop_column('nome_busca')
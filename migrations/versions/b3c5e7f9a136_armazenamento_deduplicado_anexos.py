@@ -0,0 +1,45 @@
+"""Armazenamento deduplicado de anexos (arquivos_blob)
+
+Revision ID: b3c5e7f9a136
+Revises: a9d3e5f7b124
+Create Date: 2026-10-17 22:05:41.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3c5e7f9a136'
+down_revision = 'a9d3e5f7b124'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('arquivos_blob',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('tamanho', sa.BigInteger(), nullable=False),
+    sa.Column('referencias', sa.Integer(), nullable=False),
+    sa.Column('ultimo_uso', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    op.create_index('idx_arquivos_blob_referencias', 'arquivos_blob', ['referencias', 'ultimo_uso'], unique=False)
+
+    # Anexos existentes ficam com sha256 nulo até `python manage.py migrar-anexos`
+    with op.batch_alter_table('anexo', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('sha256', sa.String(length=64), nullable=True))
+        batch_op.create_foreign_key('fk_anexo_sha256', 'arquivos_blob', ['sha256'], ['sha256'])
+        batch_op.create_index(batch_op.f('ix_anexo_sha256'), ['sha256'], unique=False)
+        batch_op.create_index('idx_anexo_dossie_sha256', ['dossie_id', 'sha256'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('anexo', schema=None) as batch_op:
+        batch_op.drop_index('idx_anexo_dossie_sha256')
+        batch_op.drop_index(batch_op.f('ix_anexo_sha256'))
+        batch_op.drop_constraint('fk_anexo_sha256', type_='foreignkey')
+        batch_op.drop_column('sha256')
+
+    op.drop_index('idx_arquivos_blob_referencias', table_name='arquivos_blob')
+    op.drop_table('arquivos_blob')
@@ -0,0 +1,31 @@
+"""Criar tabela versoes_cache
+
+Revision ID: b7e2d4f6a913
+Revises: a1f3c9d2e845
+Create Date: 2026-10-17 10:03:11.540372
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d4f6a913'
+down_revision = 'a1f3c9d2e845'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('versoes_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('chave', sa.String(length=50), nullable=False),
+    sa.Column('versao', sa.Integer(), nullable=False),
+    sa.Column('atualizado_em', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('chave')
+    )
+
+
+def downgrade():
+    op.drop_table('versoes_cache')
@@ -0,0 +1,43 @@
+"""Sessões de upload fracionado de anexos
+
+Revision ID: c4d6f8a0b247
+Revises: b3c5e7f9a136
+Create Date: 2026-10-17 23:12:08.334710
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d6f8a0b247'
+down_revision = 'b3c5e7f9a136'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sessoes_upload',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('dossie_id', sa.Integer(), nullable=False),
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('nome', sa.String(length=255), nullable=False),
+    sa.Column('nome_personalizado', sa.String(length=255), nullable=True),
+    sa.Column('tamanho', sa.BigInteger(), nullable=False),
+    sa.Column('tamanho_parte', sa.Integer(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=True),
+    sa.Column('criado_em', sa.DateTime(), nullable=True),
+    sa.Column('atualizado_em', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['dossie_id'], ['dossies.id_dossie'], ),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('sessoes_upload', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_sessoes_upload_atualizado_em'), ['atualizado_em'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('sessoes_upload', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_sessoes_upload_atualizado_em'))
+
+    op.drop_table('sessoes_upload')
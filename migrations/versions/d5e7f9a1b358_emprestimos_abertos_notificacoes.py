@@ -0,0 +1,73 @@
+"""Empréstimos em aberto e notificações
+
+Revision ID: d5e7f9a1b358
+Revises: c4d6f8a0b247
+Create Date: 2026-10-18 10:41:27.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5e7f9a1b358'
+down_revision = 'c4d6f8a0b247'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('notificacoes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('escola_id', sa.Integer(), nullable=False),
+    sa.Column('tipo', sa.String(length=30), nullable=False),
+    sa.Column('titulo', sa.String(length=200), nullable=False),
+    sa.Column('mensagem', sa.Text(), nullable=True),
+    sa.Column('url', sa.String(length=255), nullable=True),
+    sa.Column('movimentacao_id', sa.Integer(), nullable=True),
+    sa.Column('criada_em', sa.DateTime(), nullable=True),
+    sa.Column('lida_em', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['escola_id'], ['escolas.id'], ),
+    sa.ForeignKeyConstraint(['movimentacao_id'], ['movimentacoes.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('notificacoes', schema=None) as batch_op:
+        batch_op.create_index('idx_notificacoes_escola_lida', ['escola_id', 'lida_em', 'id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_notificacoes_movimentacao_id'), ['movimentacao_id'], unique=False)
+
+    op.create_table('emprestimos_abertos',
+    sa.Column('movimentacao_id', sa.Integer(), nullable=False),
+    sa.Column('escola_id', sa.Integer(), nullable=True),
+    sa.Column('dossie_id', sa.Integer(), nullable=True),
+    sa.Column('data_prevista_devolucao', sa.DateTime(), nullable=True),
+    sa.Column('atrasado_desde', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['dossie_id'], ['dossies.id_dossie'], ),
+    sa.ForeignKeyConstraint(['escola_id'], ['escolas.id'], ),
+    sa.ForeignKeyConstraint(['movimentacao_id'], ['movimentacoes.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('movimentacao_id')
+    )
+    with op.batch_alter_table('emprestimos_abertos', schema=None) as batch_op:
+        batch_op.create_index('idx_emprestimos_abertos_escola_prazo', ['escola_id', 'data_prevista_devolucao'], unique=False)
+        batch_op.create_index('idx_emprestimos_abertos_prazo', ['data_prevista_devolucao'], unique=False)
+
+    # Carga inicial: movimentações em aberto (a primeira varredura notifica as já vencidas)
+    op.execute("""
+        INSERT INTO emprestimos_abertos (movimentacao_id, escola_id, dossie_id, data_prevista_devolucao)
+        SELECT m.id, d.id_escola, m.dossie_id, m.data_prevista_devolucao
+        FROM movimentacoes m JOIN dossies d ON d.id_dossie = m.dossie_id
+        WHERE m.status = 'pendente' AND m.data_devolucao IS NULL
+          AND (m.tipo_movimentacao = 'emprestimo' OR m.data_prevista_devolucao IS NOT NULL)
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('emprestimos_abertos', schema=None) as batch_op:
+        batch_op.drop_index('idx_emprestimos_abertos_prazo')
+        batch_op.drop_index('idx_emprestimos_abertos_escola_prazo')
+
+    op.drop_table('emprestimos_abertos')
+    with op.batch_alter_table('notificacoes', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_notificacoes_movimentacao_id'))
+        batch_op.drop_index('idx_notificacoes_escola_lida')
+
+    op.drop_table('notificacoes')
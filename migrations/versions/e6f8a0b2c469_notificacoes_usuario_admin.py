@@ -0,0 +1,34 @@
+"""Notificações de bloqueio de usuário (usuario_id, apenas_admin)
+
+Revision ID: e6f8a0b2c469
+Revises: d5e7f9a1b358
+Create Date: 2026-10-19 09:12:44.306118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6f8a0b2c469'
+down_revision = 'd5e7f9a1b358'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('notificacoes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('usuario_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('apenas_admin', sa.Boolean(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_notificacoes_usuario_id'), ['usuario_id'], unique=False)
+        batch_op.create_foreign_key('fk_notificacoes_usuario_id', 'usuarios', ['usuario_id'], ['id'], ondelete='CASCADE')
+
+    op.execute("UPDATE notificacoes SET apenas_admin = false")
+
+
+def downgrade():
+    with op.batch_alter_table('notificacoes', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_notificacoes_usuario_id', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_notificacoes_usuario_id'))
+        batch_op.drop_column('apenas_admin')
+        batch_op.drop_column('usuario_id')
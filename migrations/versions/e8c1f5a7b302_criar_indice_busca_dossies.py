@@ -0,0 +1,78 @@
+"""Criar índice de busca textual de dossiês
+
+Revision ID: e8c1f5a7b302
+Revises: b7e2d4f6a913
+Create Date: 2026-10-17 11:20:45.918204
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8c1f5a7b302'
+down_revision = 'b7e2d4f6a913'
+branch_labels = None
+depends_on = None
+
+
+TEXTO_TRGM = (
+    "f_unaccent(lower(coalesce(n_dossie, '') || ' ' || coalesce(nome, '') || ' ' || "
+    "coalesce(cpf, '') || ' ' || coalesce(n_mae, '') || ' ' || coalesce(n_pai, '')))"
+)
+
+
+def upgrade():
+    dialeto = op.get_bind().dialect.name
+
+    if dialeto == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("""CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+            LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+            AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$""")
+        op.execute("""ALTER TABLE dossies ADD COLUMN busca tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', f_unaccent(coalesce(n_dossie, '') || ' ' || coalesce(cpf, ''))), 'A') ||
+            setweight(to_tsvector('simple', f_unaccent(coalesce(nome, ''))), 'A') ||
+            setweight(to_tsvector('simple', f_unaccent(coalesce(n_mae, '') || ' ' || coalesce(n_pai, ''))), 'B')
+        ) STORED""")
+        op.execute("CREATE INDEX ix_dossies_busca ON dossies USING gin (busca)")
+        op.execute(f"CREATE INDEX ix_dossies_busca_trgm ON dossies USING gin (({TEXTO_TRGM}) gin_trgm_ops)")
+
+    elif dialeto == 'sqlite':
+        op.execute("""CREATE VIRTUAL TABLE dossies_fts USING fts5(
+            n_dossie, nome, cpf, n_mae, n_pai,
+            content='dossies', content_rowid='id_dossie',
+            tokenize='unicode61 remove_diacritics 2'
+        )""")
+        op.execute("""CREATE TRIGGER dossies_fts_ai AFTER INSERT ON dossies BEGIN
+            INSERT INTO dossies_fts(rowid, n_dossie, nome, cpf, n_mae, n_pai)
+            VALUES (new.id_dossie, new.n_dossie, new.nome, new.cpf, new.n_mae, new.n_pai);
+        END""")
+        op.execute("""CREATE TRIGGER dossies_fts_ad AFTER DELETE ON dossies BEGIN
+            INSERT INTO dossies_fts(dossies_fts, rowid, n_dossie, nome, cpf, n_mae, n_pai)
+            VALUES ('delete', old.id_dossie, old.n_dossie, old.nome, old.cpf, old.n_mae, old.n_pai);
+        END""")
+        op.execute("""CREATE TRIGGER dossies_fts_au AFTER UPDATE ON dossies BEGIN
+            INSERT INTO dossies_fts(dossies_fts, rowid, n_dossie, nome, cpf, n_mae, n_pai)
+            VALUES ('delete', old.id_dossie, old.n_dossie, old.nome, old.cpf, old.n_mae, old.n_pai);
+            INSERT INTO dossies_fts(rowid, n_dossie, nome, cpf, n_mae, n_pai)
+            VALUES (new.id_dossie, new.n_dossie, new.nome, new.cpf, new.n_mae, new.n_pai);
+        END""")
+        # Indexar os dossiês já existentes
+        op.execute("INSERT INTO dossies_fts(dossies_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialeto = op.get_bind().dialect.name
+
+    if dialeto == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_dossies_busca_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_dossies_busca")
+        op.execute("ALTER TABLE dossies DROP COLUMN IF EXISTS busca")
+        op.execute("DROP FUNCTION IF EXISTS f_unaccent(text)")
+
+    elif dialeto == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS dossies_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS dossies_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS dossies_fts_ai")
+        op.execute("DROP TABLE IF EXISTS dossies_fts")
@@ -0,0 +1,48 @@
+"""Criar índices compostos das consultas frequentes
+
+Revision ID: f4a6b8c0d217
+Revises: e8c1f5a7b302
+Create Date: 2026-10-17 14:02:37.104583
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a6b8c0d217'
+down_revision = 'e8c1f5a7b302'
+branch_labels = None
+depends_on = None
+
+
+PENDENTES_COM_PRAZO = sa.text("status = 'pendente' AND data_prevista_devolucao IS NOT NULL")
+
+# (nome, tabela, colunas, opções)
+INDICES = [
+    ('idx_dossies_escola_status', 'dossies', ['id_escola', 'status'], {}),
+    ('idx_dossies_escola_cadastro', 'dossies', ['id_escola', 'dt_cadastro', 'id_dossie'], {}),
+    ('idx_dossies_cadastro', 'dossies', ['dt_cadastro', 'id_dossie'], {}),
+    ('idx_movimentacoes_dossie_status_prazo', 'movimentacoes',
+     ['dossie_id', 'status', 'data_prevista_devolucao'], {}),
+    ('idx_movimentacoes_data', 'movimentacoes', ['data_movimentacao', 'id'], {}),
+    ('idx_movimentacoes_pendentes_prazo', 'movimentacoes', ['data_prevista_devolucao'],
+     {'postgresql_where': PENDENTES_COM_PRAZO, 'sqlite_where': PENDENTES_COM_PRAZO}),
+    ('idx_logs_auditoria_usuario_data', 'logs_auditoria', ['usuario_id', 'data_hora'], {}),
+    ('idx_solicitantes_escola_nome', 'solicitantes', ['escola_id', 'nome', 'id'], {}),
+    ('idx_usuarios_escola_situacao', 'usuarios', ['escola_id', 'situacao'], {}),
+]
+
+
+def upgrade():
+    # CONCURRENTLY no PostgreSQL: não bloqueia escrita nas tabelas durante a criação
+    with op.get_context().autocommit_block():
+        for nome, tabela, colunas, opcoes in INDICES:
+            op.create_index(nome, tabela, colunas, unique=False,
+                            postgresql_concurrently=True, if_not_exists=True, **opcoes)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for nome, tabela, _, _ in reversed(INDICES):
+            op.drop_index(nome, table_name=tabela, postgresql_concurrently=True, if_exists=True)
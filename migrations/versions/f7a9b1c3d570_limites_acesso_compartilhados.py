@@ -0,0 +1,48 @@
+"""Contadores de login e CAPTCHAs compartilhados (armazenamento SQL)
+
+Revision ID: f7a9b1c3d570
+Revises: e6f8a0b2c469
+Create Date: 2026-10-20 14:03:51.772410
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7a9b1c3d570'
+down_revision = 'e6f8a0b2c469'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('contadores_acesso',
+    sa.Column('chave', sa.String(length=150), nullable=False),
+    sa.Column('slot', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('balde', sa.BigInteger(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('chave', 'slot')
+    )
+    with op.batch_alter_table('contadores_acesso', schema=None) as batch_op:
+        batch_op.create_index('idx_contadores_acesso_balde', ['balde'], unique=False)
+
+    op.create_table('valores_acesso',
+    sa.Column('chave', sa.String(length=150), nullable=False),
+    sa.Column('valor', sa.Text(), nullable=False),
+    sa.Column('expira_em', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('chave')
+    )
+    with op.batch_alter_table('valores_acesso', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_valores_acesso_expira_em'), ['expira_em'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('valores_acesso', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_valores_acesso_expira_em'))
+
+    op.drop_table('valores_acesso')
+    with op.batch_alter_table('contadores_acesso', schema=None) as batch_op:
+        batch_op.drop_index('idx_contadores_acesso_balde')
+
+    op.drop_table('contadores_acesso')
@@ -13,10 +13,18 @@ from .diretor import Diretor
 from .dossie import Dossie
 from .movimentacao import Movimentacao
 from .anexo import Anexo
+from .arquivo_blob import ArquivoBlob
+from .sessao_upload import SessaoUpload
 from .solicitante import Solicitante
-from .log_auditoria import LogAuditoria, LogSistema
+from .log_auditoria import LogAuditoria, LogSistema, LogResumoMensal
 from .configuracao_avancada import ConfiguracaoSistema, HistoricoConfiguracao
+from .estatistica_escola import EstatisticaEscola
+from .notificacao import Notificacao
+from .emprestimo_aberto import EmprestimoAberto
+from .versao_cache import VersaoCache
+from .limite_acesso import ContadorAcesso, ValorAcesso
 
 __all__ = ['db', 'Perfil', 'Permissao', 'PerfilPermissao', 'Cidade', 'Escola', 'ConfiguracaoEscola', 'CONFIGURACOES_PADRAO',
-           'Usuario', 'Diretor', 'Dossie', 'Movimentacao', 'Anexo', 'Solicitante', 'LogAuditoria', 'LogSistema',
-           'ConfiguracaoSistema', 'HistoricoConfiguracao']
+           'Usuario', 'Diretor', 'Dossie', 'Movimentacao', 'Anexo', 'ArquivoBlob', 'SessaoUpload', 'Solicitante', 'LogAuditoria', 'LogSistema', 'LogResumoMensal',
+           'ConfiguracaoSistema', 'HistoricoConfiguracao', 'EstatisticaEscola', 'Notificacao', 'EmprestimoAberto',
+           'VersaoCache', 'ContadorAcesso', 'ValorAcesso']
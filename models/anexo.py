@@ -8,12 +8,16 @@ class Anexo(db.Model):
     Armazena múltiplos arquivos por dossiê
     """
     __tablename__ = 'anexo'
+    __table_args__ = (
+        db.Index('idx_anexo_dossie_sha256', 'dossie_id', 'sha256'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     dossie_id = db.Column(db.Integer, db.ForeignKey('dossies.id_dossie'), nullable=False)
     nome = db.Column(db.String(255), nullable=False)  # Nome original do arquivo
     nome_personalizado = db.Column(db.String(255))  # Nome/descrição dado pelo usuário
     caminho = db.Column(db.String(500), nullable=False)  # Caminho onde foi salvo
+    sha256 = db.Column(db.String(64), db.ForeignKey('arquivos_blob.sha256'), index=True)  # Conteúdo (ArquivoBlob)
     tamanho = db.Column(db.Integer)  # Tamanho em bytes
     tipo_arquivo = db.Column(db.String(50))  # Extensão do arquivo
     data_upload = db.Column(db.DateTime, default=datetime.now)
@@ -33,6 +37,7 @@ class Anexo(db.Model):
             'nome': self.nome,
             'nome_personalizado': self.nome_personalizado,
             'caminho': self.caminho,
+            'sha256': self.sha256,
             'tamanho': self.tamanho,
             'tipo_arquivo': self.tipo_arquivo,
             'data_upload': self.data_upload.isoformat() if self.data_upload else None,
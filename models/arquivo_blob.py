@@ -0,0 +1,80 @@
+# models/arquivo_blob.py
+from datetime import datetime
+from sqlalchemy import event, inspect
+from . import db
+from .anexo import Anexo
+
+
+class ArquivoBlob(db.Model):
+    """
+    Conteúdo armazenado dos anexos, endereçado pelo SHA-256
+
+    Cada arquivo distinto é gravado uma única vez (ab/cd/<sha256>) e
+    compartilhado por todos os anexos com o mesmo conteúdo. `referencias`
+    é mantido pelos listeners de Anexo abaixo; blobs sem referências são
+    removidos por `python manage.py limpar-anexos`.
+    """
+    __tablename__ = 'arquivos_blob'
+    __table_args__ = (
+        db.Index('idx_arquivos_blob_referencias', 'referencias', 'ultimo_uso'),
+    )
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    tamanho = db.Column(db.BigInteger, nullable=False)
+    referencias = db.Column(db.Integer, nullable=False, default=0)
+    # Última gravação/reaproveitamento: protege blobs recém-enviados da limpeza
+    ultimo_uso = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    def __repr__(self):
+        return f'<ArquivoBlob {self.sha256[:12]} refs={self.referencias}>'
+
+    def to_dict(self):
+        return {
+            'sha256': self.sha256,
+            'tamanho': self.tamanho,
+            'referencias': self.referencias,
+            'ultimo_uso': self.ultimo_uso.isoformat() if self.ultimo_uso else None
+        }
+
+
+def _somar_referencias(connection, sha256, delta):
+    """Ajusta o contador de referências de um blob na conexão do flush"""
+    if not sha256 or not delta:
+        return
+    tabela = ArquivoBlob.__table__
+    connection.execute(
+        tabela.update().where(tabela.c.sha256 == sha256)
+        .values(referencias=tabela.c.referencias + delta)
+    )
+
+
+# active_history: carrega o hash anterior mesmo com o atributo expirado (após um
+# commit); sem isso a troca de hash não retira a referência do blob antigo
+@event.listens_for(Anexo.sha256, 'set', active_history=True)
+def _manter_historico(target, valor, anterior, iniciador):
+    """Listener vazio de 'set', registrado só para ativar active_history"""
+
+
+def _sha_anterior(target):
+    historico = inspect(target).attrs.sha256.history
+    if historico.deleted:
+        return historico.deleted[0]
+    return target.sha256
+
+
+@event.listens_for(Anexo, 'after_insert')
+def _anexo_inserido(mapper, connection, target):
+    _somar_referencias(connection, target.sha256, 1)
+
+
+@event.listens_for(Anexo, 'after_update')
+def _anexo_atualizado(mapper, connection, target):
+    anterior = _sha_anterior(target)
+    if anterior != target.sha256:
+        _somar_referencias(connection, anterior, -1)
+        _somar_referencias(connection, target.sha256, 1)
+
+
+@event.listens_for(Anexo, 'after_delete')
+def _anexo_excluido(mapper, connection, target):
+    _somar_referencias(connection, _sha_anterior(target), -1)
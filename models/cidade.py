@@ -1,4 +1,5 @@
 # models/cidade.py
+from sqlalchemy import event
 from . import db
 
 class Cidade(db.Model):
@@ -30,3 +31,13 @@ class Cidade(db.Model):
     def id(self):
         """Compatibilidade com código existente"""
         return self.id_cidade
+
+
+def _invalidar_cidades(mapper, connection, target):
+    """Alterações em cidades invalidam a lista em cache de utils/dados_referencia.py"""
+    from .versao_cache import VersaoCache
+    VersaoCache.incrementar(VersaoCache.CIDADES, connection)
+
+
+for _evento in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Cidade, _evento, _invalidar_cidades)
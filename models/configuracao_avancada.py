@@ -8,7 +8,9 @@ from . import db
 from datetime import datetime
 import json
 from enum import Enum
+from sqlalchemy import event
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import object_session
 
 class ConfigScope(Enum):
     """Escopo das configurações"""
@@ -107,16 +109,7 @@ class ConfiguracaoSistema(db.Model):
     @hybrid_property
     def valor_tipado(self):
         """Retorna o valor convertido para o tipo correto"""
-        if self.tipo == ConfigType.BOOLEAN:
-            return self.valor.lower() in ('true', '1', 'yes', 'on')
-        elif self.tipo == ConfigType.INTEGER:
-            return int(self.valor)
-        elif self.tipo == ConfigType.FLOAT:
-            return float(self.valor)
-        elif self.tipo == ConfigType.JSON:
-            return json.loads(self.valor)
-        else:
-            return self.valor
+        return self.converter_valor(self.tipo, self.valor)
     
     @valor_tipado.setter
     def valor_tipado(self, value):
@@ -126,6 +119,20 @@ class ConfiguracaoSistema(db.Model):
         else:
             self.valor = str(value)
     
+    @staticmethod
+    def converter_valor(tipo, valor):
+        """Converte o texto gravado em `valor` para o tipo da configuração"""
+        if tipo == ConfigType.BOOLEAN:
+            return valor.lower() in ('true', '1', 'yes', 'on')
+        elif tipo == ConfigType.INTEGER:
+            return int(valor)
+        elif tipo == ConfigType.FLOAT:
+            return float(valor)
+        elif tipo == ConfigType.JSON:
+            return json.loads(valor)
+        else:
+            return valor
+    
     def validar_valor(self, valor):
         """Valida o valor conforme as regras definidas"""
         # Validação por regex
@@ -198,3 +205,18 @@ class HistoricoConfiguracao(db.Model):
     
     def __repr__(self):
         return f'<HistoricoConfiguracao {self.configuracao_id}: {self.valor_anterior} -> {self.valor_novo}>'
+
+
+def _invalidar_configuracoes(mapper, connection, target):
+    """Qualquer alteração de configuração invalida as configurações resolvidas em todos os workers"""
+    from .versao_cache import VersaoCache
+    VersaoCache.incrementar(VersaoCache.CONFIGURACOES, connection)
+
+    # Após o commit, utils/cache_configuracoes.py troca a geração no Redis
+    session = object_session(target)
+    if session is not None:
+        session.info['configuracoes_alteradas'] = True
+
+
+for _evento in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(ConfiguracaoSistema, _evento, _invalidar_configuracoes)
@@ -8,6 +8,10 @@ class Diretor(db.Model):
     Gerencia informações dos diretores escolares
     """
     __tablename__ = 'diretores'
+    __table_args__ = (
+        db.Index('idx_diretores_escola', 'escola_id'),
+    )
+    __coluna_escola__ = 'escola_id'  # Escopo automático de escola (utils/escopo_escola.py)
 
     id_diretor = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), nullable=False)
@@ -61,10 +65,17 @@ class Diretor(db.Model):
         """Verifica se o diretor está ativo"""
         return self.status == 'ativo'
 
-    def get_foto_url(self):
-        """Retorna a URL da foto do diretor ou uma foto padrão"""
+    def get_foto_url(self, tamanho=None, extensao='jpg'):
+        """
+        Retorna a URL da foto do diretor ou uma foto padrão
+
+        Args:
+            tamanho (str): Derivada desejada ('thumb' ou 'media'); None = original
+            extensao (str): 'jpg' ou 'webp'
+        """
         if self.foto:
-            return f"/static/uploads/diretores/{self.foto}"
+            from services.imagem_service import processador_imagens
+            return processador_imagens.url('diretor', self.foto, tamanho, extensao)
         return "/static/img/default-director.svg"
 
     def has_foto(self):
@@ -76,15 +87,10 @@ class Diretor(db.Model):
         self.foto = filename
 
     def remove_foto(self):
-        """Remove a foto do diretor"""
-        import os
+        """Remove a foto do diretor e suas versões reduzidas"""
         if self.foto:
-            foto_path = f"static/uploads/diretores/{self.foto}"
-            if os.path.exists(foto_path):
-                try:
-                    os.remove(foto_path)
-                except:
-                    pass
+            from services.imagem_service import processador_imagens
+            processador_imagens.remover('diretor', self.foto)
         self.foto = None
 
     def format_cpf(self):
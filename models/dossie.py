@@ -1,5 +1,6 @@
 # models/dossie.py
 from datetime import datetime
+from sqlalchemy.ext.hybrid import hybrid_property
 from . import db
 
 class Dossie(db.Model):
@@ -9,7 +10,12 @@ class Dossie(db.Model):
     __tablename__ = 'dossies'
     __table_args__ = (
         db.UniqueConstraint('n_dossie', 'id_escola', name='unique_dossie_per_escola'),
+        # Índices compostos das consultas por escola
+        db.Index('idx_dossies_escola_status', 'id_escola', 'status'),
+        db.Index('idx_dossies_escola_cadastro', 'id_escola', 'dt_cadastro', 'id_dossie'),
+        db.Index('idx_dossies_cadastro', 'dt_cadastro', 'id_dossie'),
     )
+    __coluna_escola__ = 'id_escola'  # Escopo automático de escola (utils/escopo_escola.py)
 
     # Campos conforme especificação da tabela
     id_dossie = db.Column(db.Integer, primary_key=True)
@@ -81,9 +87,9 @@ class Dossie(db.Model):
         """Compatibilidade com código existente"""
         return self.status
 
-    @property
+    @hybrid_property
     def escola_id(self):
-        """Compatibilidade com código existente"""
+        """Compatibilidade com código existente (também em consultas: Dossie.escola_id == x)"""
         return self.id_escola
 
     @property
@@ -101,10 +107,17 @@ class Dossie(db.Model):
         """Verifica se o dossiê está ativo"""
         return self.status == 'ativo'
 
-    def get_foto_url(self):
-        """Retorna a URL da foto do aluno ou uma foto padrão"""
+    def get_foto_url(self, tamanho=None, extensao='jpg'):
+        """
+        Retorna a URL da foto do aluno ou uma foto padrão
+
+        Args:
+            tamanho (str): Derivada desejada ('thumb' ou 'media'); None = original
+            extensao (str): 'jpg' ou 'webp'
+        """
         if self.foto:
-            return f"/static/uploads/dossies/{self.foto}"
+            from services.imagem_service import processador_imagens
+            return processador_imagens.url('dossie', self.foto, tamanho, extensao)
         return "/static/img/default-student.svg"
 
     def has_foto(self):
@@ -116,13 +129,8 @@ class Dossie(db.Model):
         self.foto = filename
 
     def remove_foto(self):
-        """Remove a foto do dossiê"""
-        import os
+        """Remove a foto do dossiê e suas versões reduzidas"""
         if self.foto:
-            foto_path = f"static/uploads/dossies/{self.foto}"
-            if os.path.exists(foto_path):
-                try:
-                    os.remove(foto_path)
-                except:
-                    pass
+            from services.imagem_service import processador_imagens
+            processador_imagens.remover('dossie', self.foto)
         self.foto = None
@@ -0,0 +1,148 @@
+# models/emprestimo_aberto.py
+from sqlalchemy import event, select
+from sqlalchemy.orm import object_session
+from . import db
+from .dossie import Dossie
+from .movimentacao import Movimentacao
+from .notificacao import Notificacao, marcar_lidas
+
+
+class EmprestimoAberto(db.Model):
+    """
+    Empréstimos em aberto (movimentações pendentes ainda não devolvidas)
+
+    Conjunto pequeno, indexado pela data prevista de devolução, mantido
+    pelos listeners de Movimentacao abaixo: a linha existe enquanto a
+    movimentação está em aberto. atrasado_desde é preenchido pela
+    varredura agendada quando o prazo vence (services/emprestimo_service.py).
+    Reconstruído por completo com `python manage.py rebuild-emprestimos`.
+    """
+    __tablename__ = 'emprestimos_abertos'
+    __table_args__ = (
+        db.Index('idx_emprestimos_abertos_escola_prazo', 'escola_id', 'data_prevista_devolucao'),
+        db.Index('idx_emprestimos_abertos_prazo', 'data_prevista_devolucao'),
+    )
+    __coluna_escola__ = 'escola_id'  # Escopo automático de escola (utils/escopo_escola.py)
+
+    movimentacao_id = db.Column(db.Integer, db.ForeignKey('movimentacoes.id', ondelete='CASCADE'), primary_key=True)
+    escola_id = db.Column(db.Integer, db.ForeignKey('escolas.id'))
+    dossie_id = db.Column(db.Integer, db.ForeignKey('dossies.id_dossie'))
+    data_prevista_devolucao = db.Column(db.DateTime)
+    atrasado_desde = db.Column(db.DateTime)  # Preenchido pela varredura ao vencer o prazo
+
+    def __repr__(self):
+        return f'<EmprestimoAberto movimentação {self.movimentacao_id}>'
+
+    @classmethod
+    def recalcular(cls):
+        """
+        Reconstrói o conjunto a partir das movimentações
+
+        Empréstimos já vencidos entram com atrasado_desde vazio, para que a
+        próxima varredura gere as notificações.
+
+        Returns:
+            int: Quantidade de empréstimos em aberto
+        """
+        db.session.query(cls).delete(synchronize_session=False)
+        linhas = [
+            {
+                'movimentacao_id': id_movimentacao,
+                'escola_id': id_escola,
+                'dossie_id': dossie_id,
+                'data_prevista_devolucao': prazo,
+                'atrasado_desde': None
+            }
+            for id_movimentacao, id_escola, dossie_id, prazo in db.session.query(
+                Movimentacao.id, Dossie.id_escola, Movimentacao.dossie_id, Movimentacao.data_prevista_devolucao
+            ).join(Dossie).filter(filtro_em_aberto())
+        ]
+        if linhas:
+            db.session.execute(cls.__table__.insert(), linhas)
+        db.session.commit()
+        return len(linhas)
+
+
+def filtro_em_aberto():
+    """Condição SQL equivalente a _em_aberto (usada na reconstrução)"""
+    return db.and_(
+        Movimentacao.status == 'pendente',
+        Movimentacao.data_devolucao.is_(None),
+        db.or_(Movimentacao.tipo_movimentacao == 'emprestimo',
+               Movimentacao.data_prevista_devolucao.isnot(None))
+    )
+
+
+def _em_aberto(valores):
+    """Pendente, sem devolução e com devolução esperada (empréstimo ou prazo definido)"""
+    return (
+        valores['status'] == 'pendente'
+        and valores['data_devolucao'] is None
+        and (valores['tipo_movimentacao'] == 'emprestimo' or valores['data_prevista_devolucao'] is not None)
+    )
+
+
+_ATRIBUTOS = ('status', 'data_devolucao', 'tipo_movimentacao', 'data_prevista_devolucao', 'dossie_id')
+
+
+def _valores(target):
+    return {atributo: getattr(target, atributo) for atributo in _ATRIBUTOS}
+
+
+def _inserir(connection, movimentacao_id, valores):
+    connection.execute(EmprestimoAberto.__table__.insert().values(
+        movimentacao_id=movimentacao_id,
+        escola_id=connection.execute(
+            select(Dossie.id_escola).where(Dossie.id_dossie == valores['dossie_id'])
+        ).scalar(),
+        dossie_id=valores['dossie_id'],
+        data_prevista_devolucao=valores['data_prevista_devolucao'],
+        atrasado_desde=None
+    ))
+
+
+def _remover(connection, target):
+    """Tira o empréstimo do conjunto e dá como lidas as notificações de atraso dele"""
+    tabela = EmprestimoAberto.__table__
+    connection.execute(tabela.delete().where(tabela.c.movimentacao_id == target.id))
+    notificacoes = Notificacao.__table__
+    marcar_lidas(
+        object_session(target), connection,
+        notificacoes.c.movimentacao_id == target.id,
+        notificacoes.c.tipo == Notificacao.EMPRESTIMO_ATRASADO
+    )
+
+
+@event.listens_for(Movimentacao, 'after_insert')
+def _apos_inserir(mapper, connection, target):
+    valores = _valores(target)
+    if _em_aberto(valores):
+        _inserir(connection, target.id, valores)
+
+
+@event.listens_for(Movimentacao, 'after_update')
+def _apos_atualizar(mapper, connection, target):
+    # Compara com a linha gravada (o histórico do atributo não tem o valor
+    # anterior quando a instância estava expirada, ex: após um commit)
+    tabela = EmprestimoAberto.__table__
+    depois = _valores(target)
+    gravado = connection.execute(
+        select(tabela.c.data_prevista_devolucao).where(tabela.c.movimentacao_id == target.id)
+    ).first()
+
+    if not _em_aberto(depois):
+        if gravado is not None:
+            _remover(connection, target)
+    elif gravado is None:
+        _inserir(connection, target.id, depois)
+    elif gravado.data_prevista_devolucao != depois['data_prevista_devolucao']:
+        # Prazo prorrogado/alterado: volta a ser verificado pela varredura
+        connection.execute(tabela.update().where(tabela.c.movimentacao_id == target.id).values(
+            data_prevista_devolucao=depois['data_prevista_devolucao'],
+            atrasado_desde=None
+        ))
+
+
+@event.listens_for(Movimentacao, 'after_delete')
+def _apos_excluir(mapper, connection, target):
+    _remover(connection, target)
@@ -1,5 +1,6 @@
 # models/escola.py
 from datetime import datetime
+from sqlalchemy import event
 from . import db
 
 class Escola(db.Model):
@@ -124,3 +125,13 @@ CONFIGURACOES_PADRAO = {
         'descricao': 'Máximo de tentativas de login'
     }
 }
+
+
+def _invalidar_escolas(mapper, connection, target):
+    """Alterações em escolas invalidam as listas em cache de utils/dados_referencia.py"""
+    from .versao_cache import VersaoCache
+    VersaoCache.incrementar(VersaoCache.ESCOLAS, connection)
+
+
+for _evento in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Escola, _evento, _invalidar_escolas)
@@ -0,0 +1,358 @@
+# models/estatistica_escola.py
+from datetime import datetime
+from sqlalchemy import event, inspect, select, func
+from . import db
+from .dossie import Dossie
+from .movimentacao import Movimentacao
+from .usuario import Usuario
+
+
+class EstatisticaEscola(db.Model):
+    """
+    Tabela de resumo com contadores materializados por escola
+    Cada linha guarda o total de uma chave dentro de uma dimensão
+    (ex: dimensao='dossie_status', chave='ativo')
+    Mantida incrementalmente pelos listeners abaixo e reconstruída
+    por completo com `python manage.py rebuild-estatisticas`
+    """
+    __tablename__ = 'estatisticas_escola'
+    __table_args__ = (
+        db.UniqueConstraint('escola_id', 'dimensao', 'chave', name='unique_estatistica_escola'),
+    )
+
+    # Dimensões disponíveis
+    DOSSIE_STATUS = 'dossie_status'
+    DOSSIE_MES = 'dossie_mes'
+    MOVIMENTACAO_TIPO = 'movimentacao_tipo'
+    MOVIMENTACAO_STATUS = 'movimentacao_status'
+    MOVIMENTACAO_MES = 'movimentacao_mes'
+    USUARIO_SITUACAO = 'usuario_situacao'
+    USUARIO_PERFIL = 'usuario_perfil'
+    USUARIO_MES = 'usuario_mes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    escola_id = db.Column(db.Integer, db.ForeignKey('escolas.id'), nullable=False, index=True)
+    dimensao = db.Column(db.String(30), nullable=False)
+    chave = db.Column(db.String(50), nullable=False)  # status, tipo, perfil_id ou mês 'AAAA-MM'
+    total = db.Column(db.Integer, nullable=False, default=0)
+    atualizado_em = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return f'<EstatisticaEscola {self.escola_id} {self.dimensao}:{self.chave}={self.total}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'escola_id': self.escola_id,
+            'dimensao': self.dimensao,
+            'chave': self.chave,
+            'total': self.total,
+            'atualizado_em': self.atualizado_em.isoformat() if self.atualizado_em else None
+        }
+
+    @classmethod
+    def obter_resumo(cls, escola_id=None):
+        """
+        Retorna os contadores de uma escola (ou de todas) em uma única consulta
+
+        Args:
+            escola_id (int): ID da escola; None soma todas as escolas
+
+        Returns:
+            dict: {dimensao: {chave: total}}
+        """
+        query = db.session.query(cls.dimensao, cls.chave, func.sum(cls.total))
+        if escola_id is not None:
+            query = query.filter(cls.escola_id == escola_id)
+        query = query.group_by(cls.dimensao, cls.chave)
+
+        resumo = {}
+        for dimensao, chave, total in query.all():
+            if total:
+                resumo.setdefault(dimensao, {})[chave] = int(total)
+        return resumo
+
+    @classmethod
+    def recalcular(cls, escola_id=None):
+        """
+        Reconstrói os contadores a partir das tabelas de origem
+
+        Args:
+            escola_id (int): ID da escola; None reconstrói todas
+
+        Returns:
+            int: Quantidade de linhas gravadas
+        """
+        remover = db.session.query(cls)
+        if escola_id is not None:
+            remover = remover.filter(cls.escola_id == escola_id)
+        remover.delete(synchronize_session=False)
+
+        def filtrar(query, coluna_escola):
+            if escola_id is not None:
+                query = query.filter(coluna_escola == escola_id)
+            return query
+
+        consultas = [
+            (cls.DOSSIE_STATUS, filtrar(db.session.query(
+                Dossie.id_escola, Dossie.status, func.count(Dossie.id_dossie)
+            ), Dossie.id_escola).group_by(Dossie.id_escola, Dossie.status)),
+            (cls.DOSSIE_MES, filtrar(db.session.query(
+                Dossie.id_escola, _expr_mes(Dossie.dt_cadastro), func.count(Dossie.id_dossie)
+            ), Dossie.id_escola).group_by(Dossie.id_escola, _expr_mes(Dossie.dt_cadastro))),
+            (cls.MOVIMENTACAO_TIPO, filtrar(db.session.query(
+                Dossie.id_escola, Movimentacao.tipo_movimentacao, func.count(Movimentacao.id)
+            ).join(Dossie), Dossie.id_escola).group_by(Dossie.id_escola, Movimentacao.tipo_movimentacao)),
+            (cls.MOVIMENTACAO_STATUS, filtrar(db.session.query(
+                Dossie.id_escola, Movimentacao.status, func.count(Movimentacao.id)
+            ).join(Dossie), Dossie.id_escola).group_by(Dossie.id_escola, Movimentacao.status)),
+            (cls.MOVIMENTACAO_MES, filtrar(db.session.query(
+                Dossie.id_escola, _expr_mes(Movimentacao.data_movimentacao), func.count(Movimentacao.id)
+            ).join(Dossie), Dossie.id_escola).group_by(Dossie.id_escola, _expr_mes(Movimentacao.data_movimentacao))),
+            (cls.USUARIO_SITUACAO, filtrar(db.session.query(
+                Usuario.escola_id, Usuario.situacao, func.count(Usuario.id)
+            ), Usuario.escola_id).group_by(Usuario.escola_id, Usuario.situacao)),
+            (cls.USUARIO_PERFIL, filtrar(db.session.query(
+                Usuario.escola_id, Usuario.perfil_id, func.count(Usuario.id)
+            ), Usuario.escola_id).group_by(Usuario.escola_id, Usuario.perfil_id)),
+            (cls.USUARIO_MES, filtrar(db.session.query(
+                Usuario.escola_id, _expr_mes(Usuario.data_cadastro), func.count(Usuario.id)
+            ), Usuario.escola_id).group_by(Usuario.escola_id, _expr_mes(Usuario.data_cadastro))),
+        ]
+
+        linhas = []
+        for dimensao, query in consultas:
+            for id_escola, chave, total in query.all():
+                linhas.append({
+                    'escola_id': id_escola,
+                    'dimensao': dimensao,
+                    'chave': _normalizar_chave(chave),
+                    'total': total,
+                    'atualizado_em': datetime.now()
+                })
+
+        if linhas:
+            db.session.execute(cls.__table__.insert(), linhas)
+        db.session.commit()
+        return len(linhas)
+
+    @classmethod
+    def somar_insercoes(cls, modelo, registros):
+        """
+        Soma nos contadores registros inseridos sem passar pelos listeners
+        (ex: bulk_insert_mappings da importação em lote)
+
+        Args:
+            modelo: Classe acompanhada (Dossie, Movimentacao ou Usuario)
+            registros (list): Dicionários com os valores inseridos
+        """
+        atributos, chaves, escola = _MODELOS_ACOMPANHADOS[modelo]
+        connection = db.session.connection()
+        deltas = {}
+        for registro in registros:
+            valores = {atributo: registro.get(atributo) for atributo in atributos}
+            _acumular(deltas, escola(connection, valores), chaves(valores), 1)
+        _aplicar_deltas(connection, deltas)
+
+
+def _expr_mes(coluna):
+    """Expressão SQL que converte uma data na chave de mês 'AAAA-MM'"""
+    if db.engine.dialect.name == 'postgresql':
+        return func.to_char(coluna, 'YYYY-MM')
+    return func.strftime('%Y-%m', coluna)
+
+
+def _normalizar_chave(valor):
+    """Converte o valor de uma coluna na chave gravada no resumo"""
+    if valor is None or valor == '':
+        return 'indefinido'
+    if hasattr(valor, 'strftime'):
+        return valor.strftime('%Y-%m')
+    return str(valor)
+
+
+def _valor_anterior(target, atributo):
+    """Valor do atributo antes das alterações pendentes no flush atual"""
+    historico = inspect(target).attrs[atributo].history
+    if historico.deleted:
+        return historico.deleted[0]
+    return getattr(target, atributo)
+
+
+def _aplicar_deltas(connection, deltas):
+    """
+    Soma os deltas nos contadores usando a conexão do flush corrente
+
+    Args:
+        connection: Conexão recebida pelo listener
+        deltas (dict): {(escola_id, dimensao, chave): delta}
+    """
+    tabela = EstatisticaEscola.__table__
+    agora = datetime.now()
+
+    for (escola_id, dimensao, chave), delta in deltas.items():
+        # Sem escola não há contador a ajustar (rebuild-estatisticas também os ignora)
+        if not delta or escola_id is None:
+            continue
+
+        dialeto = connection.dialect.name
+        if dialeto in ('postgresql', 'sqlite'):
+            if dialeto == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(tabela).values(
+                escola_id=escola_id, dimensao=dimensao, chave=chave,
+                total=delta, atualizado_em=agora
+            ).on_conflict_do_update(
+                index_elements=['escola_id', 'dimensao', 'chave'],
+                set_={'total': tabela.c.total + delta, 'atualizado_em': agora}
+            )
+            connection.execute(stmt)
+            continue
+
+        # Outros bancos: UPDATE e, se não houver linha, INSERT
+        resultado = connection.execute(
+            tabela.update().where(
+                tabela.c.escola_id == escola_id,
+                tabela.c.dimensao == dimensao,
+                tabela.c.chave == chave
+            ).values(total=tabela.c.total + delta, atualizado_em=agora)
+        )
+        if resultado.rowcount == 0:
+            connection.execute(tabela.insert().values(
+                escola_id=escola_id, dimensao=dimensao, chave=chave,
+                total=delta, atualizado_em=agora
+            ))
+
+
+def _acumular(deltas, escola_id, chaves, sinal):
+    """Acumula +1/-1 para cada (dimensao, chave) de uma escola"""
+    for dimensao, valor in chaves:
+        chave = (escola_id, dimensao, _normalizar_chave(valor))
+        deltas[chave] = deltas.get(chave, 0) + sinal
+
+
+def _chaves_dossie(valores):
+    return [
+        (EstatisticaEscola.DOSSIE_STATUS, valores['status']),
+        (EstatisticaEscola.DOSSIE_MES, valores['dt_cadastro']),
+    ]
+
+
+def _chaves_movimentacao(valores):
+    return [
+        (EstatisticaEscola.MOVIMENTACAO_TIPO, valores['tipo_movimentacao']),
+        (EstatisticaEscola.MOVIMENTACAO_STATUS, valores['status']),
+        (EstatisticaEscola.MOVIMENTACAO_MES, valores['data_movimentacao']),
+    ]
+
+
+def _chaves_usuario(valores):
+    return [
+        (EstatisticaEscola.USUARIO_SITUACAO, valores['situacao']),
+        (EstatisticaEscola.USUARIO_PERFIL, valores['perfil_id']),
+        (EstatisticaEscola.USUARIO_MES, valores['data_cadastro']),
+    ]
+
+
+def _escola_do_dossie(connection, dossie_id):
+    """Escola de uma movimentação é a escola do dossiê movimentado"""
+    if dossie_id is None:
+        return None
+    return connection.execute(
+        select(Dossie.id_escola).where(Dossie.id_dossie == dossie_id)
+    ).scalar()
+
+
+# Configuração dos modelos acompanhados: (atributos, função de chaves, função de escola)
+_MODELOS_ACOMPANHADOS = {
+    Dossie: (
+        ('status', 'dt_cadastro', 'id_escola'),
+        _chaves_dossie,
+        lambda connection, valores: valores['id_escola'],
+    ),
+    Movimentacao: (
+        ('tipo_movimentacao', 'status', 'data_movimentacao', 'dossie_id'),
+        _chaves_movimentacao,
+        lambda connection, valores: _escola_do_dossie(connection, valores['dossie_id']),
+    ),
+    Usuario: (
+        ('situacao', 'perfil_id', 'data_cadastro', 'escola_id'),
+        _chaves_usuario,
+        lambda connection, valores: valores['escola_id'],
+    ),
+}
+
+
+def _manter_historico(target, valor, anterior, iniciador):
+    """Listener vazio de 'set', registrado só para ativar active_history"""
+
+
+def _registrar_listeners(modelo, atributos, chaves, escola):
+    """Registra after_insert/after_update/after_delete para um modelo"""
+
+    # active_history: carrega o valor anterior mesmo com o atributo expirado
+    # (após um commit); sem isso o histórico fica vazio e a atualização não
+    # retira o registro da chave antiga
+    for atributo in atributos:
+        event.listen(getattr(modelo, atributo), 'set', _manter_historico, active_history=True)
+
+    def valores_atuais(target):
+        return {atributo: getattr(target, atributo) for atributo in atributos}
+
+    def valores_anteriores(target):
+        return {atributo: _valor_anterior(target, atributo) for atributo in atributos}
+
+    @event.listens_for(modelo, 'after_insert')
+    def apos_inserir(mapper, connection, target):
+        valores = valores_atuais(target)
+        deltas = {}
+        _acumular(deltas, escola(connection, valores), chaves(valores), 1)
+        _aplicar_deltas(connection, deltas)
+
+    @event.listens_for(modelo, 'after_update')
+    def apos_atualizar(mapper, connection, target):
+        antes = valores_anteriores(target)
+        depois = valores_atuais(target)
+        if antes == depois:
+            return
+        deltas = {}
+        _acumular(deltas, escola(connection, antes), chaves(antes), -1)
+        _acumular(deltas, escola(connection, depois), chaves(depois), 1)
+        _aplicar_deltas(connection, deltas)
+
+    @event.listens_for(modelo, 'after_delete')
+    def apos_excluir(mapper, connection, target):
+        valores = valores_anteriores(target)
+        deltas = {}
+        _acumular(deltas, escola(connection, valores), chaves(valores), -1)
+        _aplicar_deltas(connection, deltas)
+
+
+for _modelo, (_atributos, _chaves, _escola) in _MODELOS_ACOMPANHADOS.items():
+    _registrar_listeners(_modelo, _atributos, _chaves, _escola)
+
+
+@event.listens_for(Dossie, 'after_update')
+def _transferir_movimentacoes(mapper, connection, target):
+    """
+    Dossiê mudou de escola: as movimentações dele passam a contar na escola nova
+
+    Os contadores de movimentação usam a escola do dossiê, então saem da
+    escola anterior e entram na atual sem que a movimentação seja alterada.
+    """
+    anterior = _valor_anterior(target, 'id_escola')
+    if anterior == target.id_escola:
+        return
+
+    linhas = connection.execute(
+        select(Movimentacao.tipo_movimentacao, Movimentacao.status, Movimentacao.data_movimentacao)
+        .where(Movimentacao.dossie_id == target.id_dossie)
+    ).all()
+    deltas = {}
+    for tipo, status, data in linhas:
+        chaves = _chaves_movimentacao({'tipo_movimentacao': tipo, 'status': status, 'data_movimentacao': data})
+        _acumular(deltas, anterior, chaves, -1)
+        _acumular(deltas, target.id_escola, chaves, 1)
+    _aplicar_deltas(connection, deltas)
@@ -0,0 +1,39 @@
+# models/limite_acesso.py
+from . import db
+
+
+class ContadorAcesso(db.Model):
+    """
+    Janela deslizante de tentativas (login por IP) no armazenamento SQL
+
+    Cada chave tem no máximo um número fixo de linhas (uma por balde de
+    tempo, reaproveitadas em círculo pelo slot): `balde` é o índice
+    absoluto do intervalo e `total` as tentativas registradas nele.
+    Usado por utils/armazenamento_limites.py com LIMITES_ARMAZENAMENTO=sql.
+    """
+    __tablename__ = 'contadores_acesso'
+    __table_args__ = (
+        db.Index('idx_contadores_acesso_balde', 'balde'),
+    )
+
+    chave = db.Column(db.String(150), primary_key=True)
+    slot = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    balde = db.Column(db.BigInteger, nullable=False)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ContadorAcesso {self.chave}[{self.slot}]={self.total}>'
+
+
+class ValorAcesso(db.Model):
+    """
+    Valor com expiração (bloqueio de IP, CAPTCHA pendente) no armazenamento SQL
+    """
+    __tablename__ = 'valores_acesso'
+
+    chave = db.Column(db.String(150), primary_key=True)
+    valor = db.Column(db.Text, nullable=False)
+    expira_em = db.Column(db.Float, nullable=False, index=True)  # timestamp Unix
+
+    def __repr__(self):
+        return f'<ValorAcesso {self.chave}>'
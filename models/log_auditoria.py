@@ -8,11 +8,16 @@ class LogAuditoria(db.Model):
     Registra todas as ações importantes dos usuários
     """
     __tablename__ = 'logs_auditoria'
+    # No PostgreSQL a tabela é particionada por mês em data_hora (ver services/retencao_logs_service.py)
+    __table_args__ = (
+        db.Index('idx_logs_auditoria_usuario_data', 'usuario_id', 'data_hora'),
+        db.Index('idx_logs_auditoria_data', 'data_hora'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
     acao = db.Column(db.String(100), nullable=False)
-    data_hora = db.Column(db.DateTime, default=datetime.now)
+    data_hora = db.Column(db.DateTime, nullable=False, default=datetime.now)  # Chave de partição
     item_alterado = db.Column(db.String(100))
     ip_address = db.Column(db.String(45))
     navegador = db.Column(db.String(200))
@@ -43,12 +48,15 @@ class LogSistema(db.Model):
     Registra erros e eventos importantes do sistema
     """
     __tablename__ = 'logs_sistema'
+    __table_args__ = (
+        db.Index('idx_logs_sistema_data', 'data_hora'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     mensagem_erro = db.Column(db.Text, nullable=False)
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
     nivel_erro = db.Column(db.String(20), default='INFO')  # DEBUG, INFO, WARNING, ERROR, CRITICAL
-    data_hora = db.Column(db.DateTime, default=datetime.now)
+    data_hora = db.Column(db.DateTime, nullable=False, default=datetime.now)  # Chave de partição
     modulo = db.Column(db.String(50))
     funcao = db.Column(db.String(100))
     linha = db.Column(db.Integer)
@@ -71,3 +79,29 @@ class LogSistema(db.Model):
             'funcao': self.funcao,
             'linha': self.linha
         }
+
+class LogResumoMensal(db.Model):
+    """
+    Resumo mensal dos logs removidos pela política de retenção
+    Uma linha por (origem, mês, usuário, categoria, item) com a quantidade
+    de registros; os registros completos vão para arquivos .jsonl.gz
+    """
+    __tablename__ = 'logs_resumo_mensal'
+    __table_args__ = (
+        db.UniqueConstraint('origem', 'mes', 'usuario_id', 'categoria', 'item', name='unique_log_resumo_mensal'),
+    )
+
+    # Origens
+    AUDITORIA = 'auditoria'
+    SISTEMA = 'sistema'
+
+    id = db.Column(db.Integer, primary_key=True)
+    origem = db.Column(db.String(20), nullable=False)
+    mes = db.Column(db.Date, nullable=False)  # Primeiro dia do mês
+    usuario_id = db.Column(db.Integer, nullable=False, default=0)  # 0 = sem usuário
+    categoria = db.Column(db.String(100), nullable=False, default='')  # acao / nivel_erro
+    item = db.Column(db.String(100), nullable=False, default='')  # item_alterado / modulo
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<LogResumoMensal {self.origem} {self.mes} {self.categoria}={self.total}>'
@@ -8,6 +8,16 @@ class Movimentacao(db.Model):
     Registra todas as movimentações e alterações nos dossiês
     """
     __tablename__ = 'movimentacoes'
+
+    # Índices compostos
+    __table_args__ = (
+        db.Index('idx_movimentacoes_dossie_status_prazo', 'dossie_id', 'status', 'data_prevista_devolucao'),
+        db.Index('idx_movimentacoes_data', 'data_movimentacao', 'id'),
+        # Parcial: apenas empréstimos em aberto com prazo (alertas de atraso)
+        db.Index('idx_movimentacoes_pendentes_prazo', 'data_prevista_devolucao',
+                 postgresql_where=db.text("status = 'pendente' AND data_prevista_devolucao IS NOT NULL"),
+                 sqlite_where=db.text("status = 'pendente' AND data_prevista_devolucao IS NOT NULL")),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     dossie_id = db.Column(db.Integer, db.ForeignKey('dossies.id_dossie'), nullable=False)
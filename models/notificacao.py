@@ -0,0 +1,143 @@
+# models/notificacao.py
+from datetime import datetime
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import object_session
+from . import db
+from .usuario import Usuario
+
+
+class Notificacao(db.Model):
+    """
+    Notificação para a equipe de uma escola
+
+    Gerada por processos agendados (ex: empréstimo que passou do prazo de
+    devolução, ver services/emprestimo_service.py) e por listeners (ex:
+    usuário bloqueado por tentativas de login). A consulta de notificações
+    lê apenas esta tabela, sem varrer o histórico.
+
+    Criações e leituras são registradas como eventos na sessão
+    (registrar_evento) e publicadas após o commit pelo canal de
+    notificações (services/notificacao_service.py).
+    """
+    __tablename__ = 'notificacoes'
+    __table_args__ = (
+        # Notificações não lidas da escola, mais recentes primeiro
+        db.Index('idx_notificacoes_escola_lida', 'escola_id', 'lida_em', 'id'),
+    )
+    __coluna_escola__ = 'escola_id'  # Escopo automático de escola (utils/escopo_escola.py)
+
+    # Tipos de notificação
+    EMPRESTIMO_ATRASADO = 'emprestimo_atrasado'
+    USUARIO_BLOQUEADO = 'usuario_bloqueado'
+
+    id = db.Column(db.Integer, primary_key=True)
+    escola_id = db.Column(db.Integer, db.ForeignKey('escolas.id'), nullable=False)
+    tipo = db.Column(db.String(30), nullable=False)
+    titulo = db.Column(db.String(200), nullable=False)
+    mensagem = db.Column(db.Text)
+    url = db.Column(db.String(255))
+    movimentacao_id = db.Column(db.Integer, db.ForeignKey('movimentacoes.id', ondelete='CASCADE'), index=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id', ondelete='CASCADE'), index=True)  # Usuário a que se refere
+    apenas_admin = db.Column(db.Boolean, default=False)  # Visível só para administradores
+    criada_em = db.Column(db.DateTime, default=datetime.now)
+    lida_em = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<Notificacao {self.tipo} - Escola {self.escola_id}>'
+
+    def to_dict(self):
+        return self.como_dict({coluna.name: getattr(self, coluna.name) for coluna in self.__table__.columns})
+
+    @staticmethod
+    def como_dict(valores):
+        """Representação JSON a partir dos valores das colunas (instância ou linha inserida)"""
+        criada_em = valores.get('criada_em')
+        return {
+            'id': valores.get('id'),
+            'escola_id': valores.get('escola_id'),
+            'tipo': valores.get('tipo'),
+            'titulo': valores.get('titulo'),
+            'mensagem': valores.get('mensagem'),
+            'url': valores.get('url'),
+            'movimentacao_id': valores.get('movimentacao_id'),
+            'usuario_id': valores.get('usuario_id'),
+            'apenas_admin': bool(valores.get('apenas_admin')),
+            'criada_em': criada_em.isoformat() if criada_em else None,
+            'lida': valores.get('lida_em') is not None
+        }
+
+
+def registrar_evento(session, escola_id, evento):
+    """
+    Guarda um evento de notificação para publicação após o commit da sessão
+
+    Args:
+        session: Sessão em que a alteração foi feita
+        escola_id (int): Escola afetada
+        evento (dict): {'evento': 'nova', 'notificacao': {...}} ou {'evento': 'lidas', 'ids': [...]}
+    """
+    if session is not None and escola_id is not None:
+        session.info.setdefault('eventos_notificacao', []).append((escola_id, evento))
+
+
+def inserir_notificacoes(session, connection, registros):
+    """INSERT das notificações (dicts de colunas) com registro do evento 'nova' de cada uma"""
+    tabela = Notificacao.__table__
+    for registro in registros:
+        valores = dict(registro, criada_em=registro.get('criada_em') or datetime.now())
+        valores.setdefault('apenas_admin', False)
+        resultado = connection.execute(tabela.insert().values(**valores))
+        valores['id'] = resultado.inserted_primary_key[0]
+        registrar_evento(session, valores['escola_id'], {'evento': 'nova', 'notificacao': Notificacao.como_dict(valores)})
+
+
+def marcar_lidas(session, connection, *condicoes):
+    """
+    Marca como lidas as notificações não lidas que atendem às condições
+
+    Returns:
+        int: Quantidade de notificações marcadas
+    """
+    tabela = Notificacao.__table__
+    marcadas = connection.execute(
+        tabela.update().where(tabela.c.lida_em.is_(None), *condicoes)
+        .values(lida_em=datetime.now()).returning(tabela.c.id, tabela.c.escola_id)
+    ).all()
+    por_escola = {}
+    for id_notificacao, escola_id in marcadas:
+        por_escola.setdefault(escola_id, []).append(id_notificacao)
+    for escola_id, ids in por_escola.items():
+        registrar_evento(session, escola_id, {'evento': 'lidas', 'ids': ids})
+    return len(marcadas)
+
+
+@event.listens_for(Usuario, 'after_update')
+def _bloqueio_alterado(mapper, connection, target):
+    """Bloqueio por tentativas de login notifica os administradores da escola"""
+    if not inspect(target).attrs.bloqueado_ate.history.has_changes():
+        return
+
+    session = object_session(target)
+    tabela = Notificacao.__table__
+    condicoes = (tabela.c.usuario_id == target.id, tabela.c.tipo == Notificacao.USUARIO_BLOQUEADO)
+
+    if target.bloqueado_ate is None or target.bloqueado_ate <= datetime.now():
+        marcar_lidas(session, connection, *condicoes)
+        return
+
+    ja_notificado = connection.execute(
+        select(tabela.c.id).where(tabela.c.lida_em.is_(None), *condicoes).limit(1)
+    ).first()
+    if ja_notificado or target.escola_id is None:
+        return
+
+    inserir_notificacoes(session, connection, [{
+        'escola_id': target.escola_id,
+        'tipo': Notificacao.USUARIO_BLOQUEADO,
+        'titulo': 'Usuário bloqueado',
+        'mensagem': f'{target.nome} foi bloqueado até {target.bloqueado_ate:%d/%m/%Y %H:%M} '
+                    f'por excesso de tentativas de login',
+        'url': f'/usuarios/ver/{target.id}',
+        'usuario_id': target.id,
+        'apenas_admin': True,
+    }])
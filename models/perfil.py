@@ -1,4 +1,5 @@
 # models/perfil.py
+from sqlalchemy import event
 from . import db
 
 class Perfil(db.Model):
@@ -86,3 +87,23 @@ class Perfil(db.Model):
     def can_view(self, modulo):
         """Verifica se pode visualizar registros no módulo"""
         return self.has_permission(modulo, 'visualizar')
+
+
+def _invalidar_snapshot_permissoes(mapper, connection, target):
+    """Renomear ou excluir um perfil muda quem é Administrador Geral"""
+    from .versao_cache import VersaoCache
+    VersaoCache.incrementar(VersaoCache.PERMISSOES, connection)
+
+
+event.listen(Perfil, 'after_update', _invalidar_snapshot_permissoes)
+event.listen(Perfil, 'after_delete', _invalidar_snapshot_permissoes)
+
+
+def _invalidar_perfis(mapper, connection, target):
+    """Alterações em perfis invalidam a lista em cache de utils/dados_referencia.py"""
+    from .versao_cache import VersaoCache
+    VersaoCache.incrementar(VersaoCache.PERFIS, connection)
+
+
+for _evento in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Perfil, _evento, _invalidar_perfis)
@@ -1,4 +1,5 @@
 # models/permissao.py
+from sqlalchemy import event
 from . import db
 
 class Permissao(db.Model):
@@ -42,3 +43,14 @@ class PerfilPermissao(db.Model):
     
     def __repr__(self):
         return f'<PerfilPermissao {self.perfil_id}-{self.permissao_id}>'
+
+
+def _invalidar_snapshot_permissoes(mapper, connection, target):
+    """Qualquer alteração de permissões invalida o snapshot em todos os workers"""
+    from .versao_cache import VersaoCache
+    VersaoCache.incrementar(VersaoCache.PERMISSOES, connection)
+
+
+for _evento in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Permissao, _evento, _invalidar_snapshot_permissoes)
+    event.listen(PerfilPermissao, _evento, _invalidar_snapshot_permissoes)
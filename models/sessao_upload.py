@@ -0,0 +1,54 @@
+# models/sessao_upload.py
+import uuid
+from datetime import datetime
+from . import db
+
+
+class SessaoUpload(db.Model):
+    """
+    Upload fracionado em andamento (arquivos grandes enviados em partes)
+
+    As partes recebidas ficam em {ANEXOS_DIR}/sessoes/<id>/ até a
+    conclusão, quando são montadas direto no armazenamento de anexos.
+    Sessões abandonadas são removidas por `python manage.py limpar-anexos`.
+    """
+    __tablename__ = 'sessoes_upload'
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    dossie_id = db.Column(db.Integer, db.ForeignKey('dossies.id_dossie'), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
+    nome = db.Column(db.String(255), nullable=False)  # Nome original do arquivo
+    nome_personalizado = db.Column(db.String(255))
+    tamanho = db.Column(db.BigInteger, nullable=False)  # Tamanho total em bytes
+    tamanho_parte = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64))  # Hash do arquivo inteiro informado pelo cliente (opcional)
+    criado_em = db.Column(db.DateTime, default=datetime.now)
+    atualizado_em = db.Column(db.DateTime, default=datetime.now, index=True)
+
+    dossie = db.relationship('Dossie')
+
+    def __repr__(self):
+        return f'<SessaoUpload {self.id} {self.nome}>'
+
+    @property
+    def total_partes(self):
+        """Quantidade de partes do arquivo"""
+        return max(-(-self.tamanho // self.tamanho_parte), 1)
+
+    def tamanho_da_parte(self, indice):
+        """Tamanho esperado da parte `indice` (a última pode ser menor)"""
+        if indice < 0 or indice >= self.total_partes:
+            return None
+        return min(self.tamanho_parte, self.tamanho - indice * self.tamanho_parte)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'dossie_id': self.dossie_id,
+            'nome': self.nome,
+            'tamanho': self.tamanho,
+            'tamanho_parte': self.tamanho_parte,
+            'total_partes': self.total_partes,
+            'criado_em': self.criado_em.isoformat() if self.criado_em else None,
+            'atualizado_em': self.atualizado_em.isoformat() if self.atualizado_em else None
+        }
@@ -1,6 +1,16 @@
 # models/solicitante.py
 from . import db
 from datetime import datetime
+import unicodedata
+
+from sqlalchemy import event
+
+
+def normalizar_busca(texto):
+    """Texto em minúsculas e sem acentos, como gravado em nome_busca"""
+    texto = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode()
+    return ' '.join(texto.lower().split())
+
 
 class Solicitante(db.Model):
     """
@@ -8,9 +18,17 @@ class Solicitante(db.Model):
     Campos: Nome, endereço, celular, cidade, CPF, email, parentesco, data de nascimento, tipo de solicitação, status
     """
     __tablename__ = 'solicitantes'
+    __table_args__ = (
+        db.Index('idx_solicitantes_escola_nome', 'escola_id', 'nome', 'id'),
+        # varchar_pattern_ops: LIKE 'prefixo%' usa o índice no PostgreSQL em qualquer collation
+        db.Index('idx_solicitantes_escola_busca', 'escola_id', 'nome_busca',
+                 postgresql_ops={'nome_busca': 'varchar_pattern_ops'}),
+    )
+    __coluna_escola__ = 'escola_id'  # Escopo automático de escola (utils/escopo_escola.py)
     
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), nullable=False)
+    nome_busca = db.Column(db.String(100))  # Nome normalizado para o autocompletar (prefixo indexado)
     endereco = db.Column(db.Text)
     celular = db.Column(db.String(20))
     cidade_id = db.Column(db.Integer, db.ForeignKey('cidades.id_cidade'))
@@ -85,3 +103,9 @@ class Solicitante(db.Model):
             'observacoes': self.observacoes,
             'total_movimentacoes': len(self.movimentacoes)
         }
+
+
+@event.listens_for(Solicitante, 'before_insert')
+@event.listens_for(Solicitante, 'before_update')
+def _normalizar_nome_busca(mapper, connection, target):
+    target.nome_busca = normalizar_busca(target.nome)
@@ -9,6 +9,9 @@ class Usuario(db.Model):
     Representa os usuários que acessam o sistema
     """
     __tablename__ = 'usuarios'
+    __table_args__ = (
+        db.Index('idx_usuarios_escola_situacao', 'escola_id', 'situacao'),
+    )
     
     # Campos conforme especificação
     id = db.Column(db.Integer, primary_key=True)  # id_usuario
@@ -161,10 +164,18 @@ class Usuario(db.Model):
         """Verifica se o usuário está ativo"""
         return self.situacao == 'ativo' and not self.is_bloqueado
 
-    def get_foto_url(self):
-        """Retorna a URL da foto do usuário ou uma foto padrão"""
+    def get_foto_url(self, tamanho=None, extensao='jpg', aguardar=False):
+        """
+        Retorna a URL da foto do usuário ou uma foto padrão
+
+        Args:
+            tamanho (str): Derivada desejada ('thumb' ou 'media'); None = original
+            extensao (str): 'jpg' ou 'webp'
+            aguardar (bool): Foto recém-enviada; a URL passa a entregar a derivada quando ela for gerada
+        """
         if self.foto:
-            return f"/static/uploads/fotos/{self.foto}"
+            from services.imagem_service import processador_imagens
+            return processador_imagens.url('usuario', self.foto, tamanho, extensao, aguardar)
         return "/static/img/default-avatar.svg"
 
     def has_foto(self):
@@ -176,15 +187,10 @@ class Usuario(db.Model):
         self.foto = filename
 
     def remove_foto(self):
-        """Remove a foto do usuário"""
-        import os
+        """Remove a foto do usuário e suas versões reduzidas"""
         if self.foto:
-            foto_path = f"static/uploads/fotos/{self.foto}"
-            if os.path.exists(foto_path):
-                try:
-                    os.remove(foto_path)
-                except:
-                    pass  # Não falhar se não conseguir remover
+            from services.imagem_service import processador_imagens
+            processador_imagens.remover('usuario', self.foto)
         self.foto = None
     
     def __repr__(self):
@@ -0,0 +1,58 @@
+# models/versao_cache.py
+from datetime import datetime
+from sqlalchemy import select
+from . import db
+
+
+class VersaoCache(db.Model):
+    """
+    Contadores de versão usados para invalidar caches em todos os workers
+    Cada cache em memória guarda a versão com que foi montado e é
+    descartado quando a versão gravada no banco muda
+    """
+    __tablename__ = 'versoes_cache'
+
+    # Chaves conhecidas
+    PERMISSOES = 'permissoes'
+    CONFIGURACOES = 'configuracoes'
+    ESCOLAS = 'escolas'
+    CIDADES = 'cidades'
+    PERFIS = 'perfis'
+
+    id = db.Column(db.Integer, primary_key=True)
+    chave = db.Column(db.String(50), nullable=False, unique=True)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+    atualizado_em = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return f'<VersaoCache {self.chave}={self.versao}>'
+
+    @classmethod
+    def obter(cls, chave):
+        """Retorna a versão atual de uma chave (0 se nunca incrementada)"""
+        versao = db.session.execute(
+            select(cls.versao).where(cls.chave == chave)
+        ).scalar()
+        return versao or 0
+
+    @classmethod
+    def incrementar(cls, chave, connection=None):
+        """
+        Incrementa a versão de uma chave
+
+        Args:
+            chave (str): Chave do cache
+            connection: Conexão de um listener de flush; se omitida usa a sessão
+                        (o incremento é gravado no próximo commit)
+        """
+        executar = connection.execute if connection is not None else db.session.execute
+        tabela = cls.__table__
+
+        resultado = executar(
+            tabela.update().where(tabela.c.chave == chave).values(
+                versao=tabela.c.versao + 1,
+                atualizado_em=datetime.now()
+            )
+        )
+        if resultado.rowcount == 0:
+            executar(tabela.insert().values(chave=chave, versao=1, atualizado_em=datetime.now()))
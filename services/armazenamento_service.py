@@ -0,0 +1,316 @@
+# services/armazenamento_service.py
+"""
+Armazenamento deduplicado dos anexos, endereçado pelo conteúdo
+
+Cada arquivo é gravado em {ANEXOS_DIR}/ab/cd/<sha256>, com o hash
+calculado enquanto o upload é copiado para o disco. Conteúdo repetido
+(a mesma certidão anexada a vários dossiês, ou reenviada) reaproveita o
+blob existente; cada Anexo apenas referencia o hash.
+
+O contador de referências (ArquivoBlob.referencias) é mantido pelos
+listeners de Anexo. Excluir um anexo não apaga o arquivo: blobs sem
+referências são removidos por coletar_lixo() após um período de carência.
+"""
+
+import hashlib
+import os
+import re
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func
+
+from models import db, Anexo, ArquivoBlob
+
+# Pasta padrão dos blobs (relativa à raiz da aplicação)
+DIRETORIO_PADRAO = os.path.join('uploads', 'anexos')
+
+# Blobs sem referências só são removidos depois deste tempo sem uso
+CARENCIA_PADRAO = timedelta(hours=1)
+
+_BLOCO = 256 * 1024
+_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ArquivoMuitoGrande(ValueError):
+    """Upload excedeu o tamanho máximo permitido"""
+
+
+class ArmazenamentoAnexos:
+    """Blob store dos anexos"""
+
+    def raiz(self):
+        """Pasta absoluta dos blobs"""
+        pasta = current_app.config.get('ANEXOS_DIR', DIRETORIO_PADRAO)
+        return os.path.join(current_app.root_path, pasta)
+
+    def caminho_relativo(self, sha256):
+        """Caminho do blob relativo à raiz da aplicação (gravado em Anexo.caminho)"""
+        pasta = current_app.config.get('ANEXOS_DIR', DIRETORIO_PADRAO)
+        return os.path.join(pasta, sha256[:2], sha256[2:4], sha256)
+
+    def caminho_blob(self, sha256):
+        """Caminho absoluto do blob de um hash"""
+        return os.path.join(self.raiz(), sha256[:2], sha256[2:4], sha256)
+
+    def caminho_anexo(self, anexo):
+        """Caminho absoluto do arquivo de um anexo (blob ou arquivo legado)"""
+        if anexo.sha256:
+            return self.caminho_blob(anexo.sha256)
+        return os.path.join(current_app.root_path, anexo.caminho)
+
+    def gravar(self, arquivo, tamanho_maximo=None):
+        """
+        Copia o upload para o blob store calculando o SHA-256 no caminho
+
+        Args:
+            arquivo: FileStorage (ou objeto com .stream / .read)
+            tamanho_maximo (int): Limite em bytes (None = sem limite)
+
+        Returns:
+            tuple: (sha256, tamanho, duplicado)
+
+        Raises:
+            ArquivoMuitoGrande: se o conteúdo passar de tamanho_maximo
+        """
+        stream = getattr(arquivo, 'stream', arquivo)
+        temporarios = os.path.join(self.raiz(), 'tmp')
+        os.makedirs(temporarios, exist_ok=True)
+        temporario = os.path.join(temporarios, uuid.uuid4().hex)
+
+        resumo = hashlib.sha256()
+        tamanho = 0
+        try:
+            with open(temporario, 'wb') as destino:
+                while True:
+                    bloco = stream.read(_BLOCO)
+                    if not bloco:
+                        break
+                    tamanho += len(bloco)
+                    if tamanho_maximo and tamanho > tamanho_maximo:
+                        raise ArquivoMuitoGrande(f'{tamanho_maximo / (1024 * 1024):.0f}MB')
+                    resumo.update(bloco)
+                    destino.write(bloco)
+
+            sha256 = resumo.hexdigest()
+            # A linha é renovada antes de olhar o disco: uma limpeza concorrente
+            # não remove mais o blob, e se já o removeu o arquivo é regravado
+            self._registrar_blob(sha256, tamanho)
+
+            destino_final = self.caminho_blob(sha256)
+            duplicado = os.path.exists(destino_final)
+            if duplicado:
+                os.remove(temporario)
+            else:
+                os.makedirs(os.path.dirname(destino_final), exist_ok=True)
+                os.replace(temporario, destino_final)
+        except BaseException:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+
+        return sha256, tamanho, duplicado
+
+    def _registrar_blob(self, sha256, tamanho):
+        """Cria a linha do blob (ou renova ultimo_uso) na transação corrente"""
+        tabela = ArquivoBlob.__table__
+        agora = datetime.now()
+        valores = dict(sha256=sha256, tamanho=tamanho, referencias=0, ultimo_uso=agora)
+
+        dialeto = db.session.get_bind().dialect.name
+        if dialeto in ('postgresql', 'sqlite'):
+            if dialeto == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            db.session.execute(insert(tabela).values(**valores).on_conflict_do_update(
+                index_elements=['sha256'], set_={'ultimo_uso': agora}
+            ))
+            return
+
+        resultado = db.session.execute(
+            tabela.update().where(tabela.c.sha256 == sha256).values(ultimo_uso=agora)
+        )
+        if resultado.rowcount == 0:
+            db.session.execute(tabela.insert().values(**valores))
+
+    def anexo_duplicado(self, dossie_id, sha256):
+        """Anexo do dossiê com o mesmo conteúdo (consulta pelo hash), se houver"""
+        return Anexo.query.filter_by(dossie_id=dossie_id, sha256=sha256).first()
+
+    def coletar_lixo(self, carencia=CARENCIA_PADRAO, agora=None):
+        """
+        Remove blobs sem referências e arquivos órfãos na pasta de blobs
+
+        Args:
+            carencia (timedelta): Tempo mínimo sem uso antes da remoção
+            agora (datetime): Referência de tempo
+
+        Returns:
+            dict: {'blobs': removidos, 'bytes': liberados, 'orfaos': arquivos sem linha}
+        """
+        limite = (agora or datetime.now()) - carencia
+        tabela = ArquivoBlob.__table__
+        resultado = {'blobs': 0, 'bytes': 0, 'orfaos': 0}
+
+        candidatos = db.session.execute(
+            db.select(tabela.c.sha256, tabela.c.tamanho)
+            .where(tabela.c.referencias <= 0, tabela.c.ultimo_uso < limite)
+        ).all()
+
+        for sha256, tamanho in candidatos:
+            # Remove a linha só se continuar sem referências (reuso concorrente)
+            removido = db.session.execute(
+                tabela.delete().where(
+                    tabela.c.sha256 == sha256,
+                    tabela.c.referencias <= 0,
+                    tabela.c.ultimo_uso < limite
+                )
+            ).rowcount
+            if not removido:
+                db.session.commit()
+                continue
+
+            # O arquivo sai do lugar antes do commit: com a linha presa pelo DELETE,
+            # um upload do mesmo conteúdo espera o commit e encontra o blob ausente
+            # (regrava o arquivo em vez de tratá-lo como duplicado)
+            try:
+                retirado = self._retirar_blob(sha256)
+            except OSError:
+                db.session.rollback()
+                continue
+            try:
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                if retirado:
+                    os.replace(retirado, self.caminho_blob(sha256))
+                raise
+            if retirado:
+                try:
+                    os.remove(retirado)
+                except OSError:
+                    pass
+            resultado['blobs'] += 1
+            resultado['bytes'] += tamanho or 0
+
+        resultado['orfaos'] = self._remover_orfaos(limite)
+        return resultado
+
+    def _retirar_blob(self, sha256):
+        """Move o arquivo do blob para tmp/ (apagado após o commit); None se ele já não existe"""
+        temporarios = os.path.join(self.raiz(), 'tmp')
+        os.makedirs(temporarios, exist_ok=True)
+        retirado = os.path.join(temporarios, uuid.uuid4().hex)
+        try:
+            os.replace(self.caminho_blob(sha256), retirado)
+        except FileNotFoundError:
+            return None
+        return retirado
+
+    def _remover_orfaos(self, limite):
+        """Arquivos de blob sem linha em arquivos_blob (ex: upload com rollback)"""
+        raiz = self.raiz()
+        if not os.path.isdir(raiz):
+            return 0
+
+        removidos = 0
+        limite_ts = limite.timestamp()
+        for pasta, subpastas, arquivos in os.walk(raiz):
+            # Apenas as pastas ab/cd do blob store e os temporários
+            relativo = os.path.relpath(pasta, raiz)
+            if relativo == '.':
+                subpastas[:] = [nome for nome in subpastas if len(nome) == 2 or nome == 'tmp']
+                continue
+
+            nomes = [nome for nome in arquivos
+                     if relativo == 'tmp' or _SHA256.match(nome)]
+            antigos = [nome for nome in nomes
+                       if os.path.getmtime(os.path.join(pasta, nome)) < limite_ts]
+            if not antigos:
+                continue
+
+            conhecidos = set()
+            if relativo != 'tmp':
+                conhecidos = set(db.session.execute(
+                    db.select(ArquivoBlob.sha256).where(ArquivoBlob.sha256.in_(antigos))
+                ).scalars())
+            for nome in antigos:
+                if nome not in conhecidos:
+                    try:
+                        os.remove(os.path.join(pasta, nome))
+                        removidos += 1
+                    except OSError:
+                        pass
+        return removidos
+
+    def migrar_legados(self, lote=200):
+        """
+        Move os anexos antigos (timestamp + nome) para o blob store
+
+        Returns:
+            dict: {'migrados': n, 'ausentes': n, 'bytes_economizados': n}
+        """
+        resultado = {'migrados': 0, 'ausentes': 0, 'bytes_economizados': 0}
+        ultimo_id = 0
+        while True:
+            anexos = Anexo.query.filter(Anexo.sha256 == None, Anexo.id > ultimo_id) \
+                .order_by(Anexo.id).limit(lote).all()
+            if not anexos:
+                break
+
+            antigos = []
+            for anexo in anexos:
+                ultimo_id = anexo.id
+                antigo = self._localizar_legado(anexo.caminho)
+                if not antigo:
+                    resultado['ausentes'] += 1
+                    continue
+                antigos.append(antigo)
+
+                with open(antigo, 'rb') as origem:
+                    sha256, tamanho, duplicado = self.gravar(origem)
+                anexo.sha256 = sha256
+                anexo.caminho = self.caminho_relativo(sha256)
+                anexo.tamanho = tamanho
+                resultado['migrados'] += 1
+                if duplicado:
+                    resultado['bytes_economizados'] += tamanho
+
+            db.session.commit()
+            # Só remove os arquivos antigos depois do commit
+            for antigo in antigos:
+                try:
+                    os.remove(antigo)
+                except OSError:
+                    pass
+
+        return resultado
+
+    def _localizar_legado(self, caminho):
+        """Caminho gravado pelos uploads antigos (relativo ao cwd ou à raiz da app)"""
+        for candidato in (caminho, os.path.join(current_app.root_path, caminho)):
+            if candidato and os.path.isfile(candidato):
+                return candidato
+        return None
+
+    def estatisticas(self):
+        """Espaço ocupado pelos blobs e economia obtida com a deduplicação"""
+        blobs, armazenado = db.session.query(
+            func.count(ArquivoBlob.sha256), func.coalesce(func.sum(ArquivoBlob.tamanho), 0)
+        ).one()
+        anexos, logico = db.session.query(
+            func.count(Anexo.id), func.coalesce(func.sum(Anexo.tamanho), 0)
+        ).filter(Anexo.sha256 != None).one()
+        return {
+            'blobs': blobs,
+            'anexos': anexos,
+            'bytes_armazenados': int(armazenado),
+            'bytes_referenciados': int(logico),
+            'bytes_economizados': max(int(logico) - int(armazenado), 0),
+        }
+
+
+# Instância global do serviço
+armazenamento_anexos = ArmazenamentoAnexos()
@@ -0,0 +1,142 @@
+# services/autocompletar_service.py
+"""
+Autocompletar de dossiês e solicitantes (formulário de movimentação)
+
+O formulário não carrega mais as listas completas: o navegador envia o
+termo digitado e recebe apenas os primeiros resultados.
+
+Dossiês: busca indexada do dossie_search (FTS5 / tsvector + pg_trgm),
+restrita aos dossiês ativos da escola.
+Solicitantes: prefixo em nome_busca (nome sem acentos, minúsculo) pelo
+índice (escola_id, nome_busca). Só quando nenhum nome começa pelo termo
+(sobrenome ou CPF digitado) a consulta percorre os solicitantes da escola
+procurando início de palavra no meio do nome e prefixo do CPF, comparado
+só pelos dígitos (gravado com ou sem máscara).
+"""
+
+from models import db, Dossie, Solicitante
+from models.solicitante import normalizar_busca
+from services.busca_dossie_service import dossie_search
+from utils.dados_referencia import escolas
+from utils.escola_utils import aplicar_filtro_escola
+
+
+class Autocompletar:
+    """Primeiros resultados para o termo digitado, no escopo de escola do usuário"""
+
+    MINIMO_CARACTERES = 2
+    LIMITE_PADRAO = 10
+    LIMITE_MAXIMO = 20
+
+    def limite(self, valor):
+        """Limite pedido pelo cliente, dentro de [1, LIMITE_MAXIMO]"""
+        try:
+            return max(1, min(int(valor), self.LIMITE_MAXIMO))
+        except (TypeError, ValueError):
+            return self.LIMITE_PADRAO
+
+    def termo_valido(self, termo):
+        return len((termo or '').strip()) >= self.MINIMO_CARACTERES
+
+    def dossies(self, termo, usuario, limite=LIMITE_PADRAO):
+        """
+        Dossiês ativos mais relevantes para o termo
+
+        Returns:
+            list: dicts com id, numero, aluno e escola
+        """
+        if not self.termo_valido(termo):
+            return []
+
+        query = dossie_search.aplicar(self._dossies(usuario).filter(Dossie.status == 'ativo'), termo.strip())
+        nomes_escolas = self._nomes_escolas()
+        return [
+            self.serializar_dossie(id_dossie, numero, aluno, nomes_escolas.get(id_escola))
+            for id_dossie, numero, aluno, id_escola in query.limit(limite).all()
+        ]
+
+    def dossie(self, id_dossie, usuario):
+        """Dossiê já selecionado (formulário reexibido), no mesmo formato do autocompletar"""
+        linha = self._dossies(usuario).filter(Dossie.id_dossie == id_dossie).first()
+        if not linha:
+            return None
+        return self.serializar_dossie(*linha[:3], self._nomes_escolas().get(linha.id_escola))
+
+    def solicitantes(self, termo, usuario, limite=LIMITE_PADRAO):
+        """
+        Solicitantes ativos cujo nome começa pelo termo; sem nenhum, os que têm
+        uma palavra do nome ou o CPF começando pelo termo
+
+        Returns:
+            list: dicts com id, nome, cpf, telefone, email e parentesco
+        """
+        if not self.termo_valido(termo):
+            return []
+
+        normalizado = normalizar_busca(termo)
+        base = self._solicitantes(usuario).filter(Solicitante.status == 'ativo')
+
+        # Prefixo do nome: faixa no índice (escola_id, nome_busca)
+        linhas = base.filter(
+            Solicitante.nome_busca.startswith(normalizado, autoescape=True)
+        ).order_by(Solicitante.nome_busca, Solicitante.id).limit(limite).all()
+
+        # Nenhum prefixo: início de palavra no meio do nome ou prefixo do CPF.
+        # Sem índice (varre os ativos da escola); por isso não roda quando o prefixo já achou algo.
+        if not linhas:
+            criterios = [Solicitante.nome_busca.contains(' ' + normalizado, autoescape=True)]
+            digitos = ''.join(filter(str.isdigit, termo))
+            if len(digitos) >= self.MINIMO_CARACTERES:
+                criterios.append(self._digitos_cpf().startswith(digitos))
+            linhas = base.filter(db.or_(*criterios)).order_by(
+                Solicitante.nome_busca, Solicitante.id
+            ).limit(limite).all()
+
+        return [self.serializar_solicitante(*linha) for linha in linhas]
+
+    def solicitante(self, id_, usuario):
+        """Solicitante já selecionado (reexibição ou ?solicitante= na URL)"""
+        linha = self._solicitantes(usuario).filter(Solicitante.id == id_).first()
+        return self.serializar_solicitante(*linha) if linha else None
+
+    @staticmethod
+    def _dossies(usuario):
+        return aplicar_filtro_escola(Dossie.query, Dossie, usuario).with_entities(
+            Dossie.id_dossie, Dossie.n_dossie, Dossie.nome, Dossie.id_escola
+        )
+
+    @staticmethod
+    def _solicitantes(usuario):
+        return aplicar_filtro_escola(Solicitante.query, Solicitante, usuario).with_entities(
+            Solicitante.id, Solicitante.nome, Solicitante.cpf, Solicitante.celular,
+            Solicitante.email, Solicitante.parentesco
+        )
+
+    @staticmethod
+    def _digitos_cpf():
+        # CPF sem a máscara (000.000.000-00), para comparar com os dígitos digitados
+        return db.func.replace(db.func.replace(Solicitante.cpf, '.', ''), '-', '')
+
+    @staticmethod
+    def _nomes_escolas():
+        # Dados de referência em memória: sem join com escolas
+        return {escola.id: escola.nome for escola in escolas()}
+
+    @staticmethod
+    def serializar_dossie(id_dossie, numero, aluno, escola=None):
+        return {'id': id_dossie, 'numero': numero, 'aluno': aluno, 'escola': escola or ''}
+
+    @staticmethod
+    def serializar_solicitante(id_, nome, cpf, celular, email, parentesco):
+        return {
+            'id': id_,
+            'nome': nome,
+            'cpf': cpf or '',
+            'telefone': celular or '',
+            'email': email or '',
+            'parentesco': parentesco or '',
+        }
+
+
+# Instância global do serviço
+autocompletar = Autocompletar()
@@ -0,0 +1,237 @@
+# services/busca_dossie_service.py
+"""
+Busca textual de dossiês
+PostgreSQL: coluna tsvector gerada + índices GIN pg_trgm, sem acentos (unaccent)
+            (configuração 'simple': nomes próprios não devem sofrer stemming)
+SQLite: tabela FTS5 dossies_fts sincronizada por triggers
+Outros bancos (ou índice ausente): LIKE nos cinco campos, como antes
+"""
+
+import re
+import time
+
+from flask import current_app
+from sqlalchemy import bindparam, column, func, literal_column, or_, select, table, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, Dossie
+
+# Texto pesquisável por trigramas: precisa ser idêntico à expressão do índice ix_dossies_busca_trgm
+TEXTO_TRGM_POSTGRESQL = (
+    "f_unaccent(lower(coalesce(dossies.n_dossie, '') || ' ' || coalesce(dossies.nome, '') || ' ' || "
+    "coalesce(dossies.cpf, '') || ' ' || coalesce(dossies.n_mae, '') || ' ' || coalesce(dossies.n_pai, '')))"
+)
+
+# Estruturas do índice (idempotentes); a migração e8c1f5a7b302 cria as mesmas
+DDL_POSTGRESQL = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # unaccent() não é IMMUTABLE; o wrapper permite usá-la em coluna gerada e índice
+    """CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+       LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+       AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$""",
+    """ALTER TABLE dossies ADD COLUMN IF NOT EXISTS busca tsvector GENERATED ALWAYS AS (
+           setweight(to_tsvector('simple', f_unaccent(coalesce(n_dossie, '') || ' ' || coalesce(cpf, ''))), 'A') ||
+           setweight(to_tsvector('simple', f_unaccent(coalesce(nome, ''))), 'A') ||
+           setweight(to_tsvector('simple', f_unaccent(coalesce(n_mae, '') || ' ' || coalesce(n_pai, ''))), 'B')
+       ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_dossies_busca ON dossies USING gin (busca)",
+    "CREATE INDEX IF NOT EXISTS ix_dossies_busca_trgm ON dossies USING gin ((" +
+    TEXTO_TRGM_POSTGRESQL.replace('dossies.', '') + ") gin_trgm_ops)",
+]
+
+DDL_SQLITE = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS dossies_fts USING fts5(
+           n_dossie, nome, cpf, n_mae, n_pai,
+           content='dossies', content_rowid='id_dossie',
+           tokenize='unicode61 remove_diacritics 2'
+       )""",
+    """CREATE TRIGGER IF NOT EXISTS dossies_fts_ai AFTER INSERT ON dossies BEGIN
+           INSERT INTO dossies_fts(rowid, n_dossie, nome, cpf, n_mae, n_pai)
+           VALUES (new.id_dossie, new.n_dossie, new.nome, new.cpf, new.n_mae, new.n_pai);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS dossies_fts_ad AFTER DELETE ON dossies BEGIN
+           INSERT INTO dossies_fts(dossies_fts, rowid, n_dossie, nome, cpf, n_mae, n_pai)
+           VALUES ('delete', old.id_dossie, old.n_dossie, old.nome, old.cpf, old.n_mae, old.n_pai);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS dossies_fts_au AFTER UPDATE ON dossies BEGIN
+           INSERT INTO dossies_fts(dossies_fts, rowid, n_dossie, nome, cpf, n_mae, n_pai)
+           VALUES ('delete', old.id_dossie, old.n_dossie, old.nome, old.cpf, old.n_mae, old.n_pai);
+           INSERT INTO dossies_fts(rowid, n_dossie, nome, cpf, n_mae, n_pai)
+           VALUES (new.id_dossie, new.n_dossie, new.nome, new.cpf, new.n_mae, new.n_pai);
+       END""",
+]
+
+# Peso da similaridade por trigramas somada ao ts_rank no PostgreSQL
+PESO_TRIGRAMA = 0.5
+
+# Tabela FTS5 (rowid = id_dossie)
+_dossies_fts = table('dossies_fts', column('rowid'))
+
+
+def _termos(busca):
+    """Quebra a busca em termos alfanuméricos (descarta operadores e aspas)"""
+    return re.findall(r'\w+', busca or '')
+
+
+class DossieSearch:
+    """Busca ranqueada de dossiês, independente do banco"""
+
+    def __init__(self):
+        # Disponibilidade do índice por URL do banco (verificada uma vez por processo)
+        self._disponivel = {}
+
+    def _dialeto(self):
+        return db.engine.dialect.name
+
+    def indice_disponivel(self):
+        """Verifica se as estruturas de busca existem no banco atual"""
+        url = str(db.engine.url)
+        if url not in self._disponivel:
+            dialeto = self._dialeto()
+            try:
+                if dialeto == 'postgresql':
+                    existe = db.session.execute(text(
+                        "SELECT 1 FROM information_schema.columns "
+                        "WHERE table_name = 'dossies' AND column_name = 'busca'"
+                    )).scalar()
+                elif dialeto == 'sqlite':
+                    existe = db.session.execute(text(
+                        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'dossies_fts'"
+                    )).scalar()
+                else:
+                    existe = False
+            except SQLAlchemyError as e:
+                current_app.logger.warning(f"Erro ao verificar índice de busca de dossiês: {e}")
+                db.session.rollback()
+                existe = False
+
+            if not existe:
+                current_app.logger.warning(
+                    "Índice de busca de dossiês ausente; usando LIKE. "
+                    "Execute 'python manage.py rebuild-busca-dossies'."
+                )
+            self._disponivel[url] = bool(existe)
+        return self._disponivel[url]
+
+    def criar_indice(self, reconstruir=False):
+        """
+        Cria (se necessário) as estruturas de busca do banco atual
+
+        Args:
+            reconstruir (bool): No SQLite, repopula dossies_fts a partir de dossies
+
+        Returns:
+            bool: True se o banco suporta o índice
+        """
+        dialeto = self._dialeto()
+        if dialeto == 'postgresql':
+            comandos = DDL_POSTGRESQL
+        elif dialeto == 'sqlite':
+            comandos = list(DDL_SQLITE)
+            if reconstruir:
+                comandos.append("INSERT INTO dossies_fts(dossies_fts) VALUES ('rebuild')")
+        else:
+            return False
+
+        for comando in comandos:
+            db.session.execute(text(comando))
+        db.session.commit()
+
+        self._disponivel.pop(str(db.engine.url), None)
+        return True
+
+    def aplicar(self, query, busca):
+        """
+        Filtra e ordena uma query de Dossie pela relevância da busca
+
+        Args:
+            query: Query de Dossie (já com os demais filtros)
+            busca (str): Texto digitado pelo usuário
+
+        Returns:
+            Query filtrada e ordenada do mais relevante para o menos relevante
+        """
+        termos = _termos(busca)
+        if not termos:
+            return query
+
+        if not self.indice_disponivel():
+            return self._aplicar_like(query, busca)
+
+        dialeto = self._dialeto()
+        if dialeto == 'postgresql':
+            return self._aplicar_postgresql(query, busca, termos)
+        return self._aplicar_sqlite(query, termos)
+
+    def buscar(self, busca, escola_id=None, limite=20):
+        """
+        Retorna os dossiês mais relevantes para a busca
+
+        Args:
+            busca (str): Texto digitado pelo usuário
+            escola_id (int): Restringe a uma escola (opcional)
+            limite (int): Quantidade máxima de resultados
+
+        Returns:
+            tuple: (lista de Dossie, tempo em ms)
+        """
+        inicio = time.perf_counter()
+        if not _termos(busca):
+            return [], 0.0
+
+        query = Dossie.query
+        if escola_id:
+            query = query.filter(Dossie.id_escola == escola_id)
+
+        dossies = self.aplicar(query, busca).limit(limite).all()
+        return dossies, round((time.perf_counter() - inicio) * 1000, 2)
+
+    def _aplicar_postgresql(self, query, busca, termos):
+        """tsvector com prefixo em cada termo OU substring por trigramas, ranqueados juntos"""
+        consulta = func.to_tsquery(
+            literal_column("'simple'::regconfig"),
+            func.f_unaccent(bindparam('busca_tsquery', ' & '.join(f'{termo}:*' for termo in termos)))
+        )
+        busca_normalizada = func.f_unaccent(func.lower(bindparam('busca_texto', busca.strip())))
+        texto = literal_column(TEXTO_TRGM_POSTGRESQL)
+        vetor = literal_column('dossies.busca')
+
+        relevancia = func.ts_rank(vetor, consulta) + PESO_TRIGRAMA * func.similarity(texto, busca_normalizada)
+
+        return query.filter(
+            or_(
+                vetor.op('@@')(consulta),
+                texto.like(func.concat('%', busca_normalizada, '%'))
+            )
+        ).order_by(relevancia.desc(), Dossie.id_dossie.desc())
+
+    def _aplicar_sqlite(self, query, termos):
+        """FTS5 com prefixo em cada termo, ordenado por bm25 (menor = mais relevante)"""
+        consulta = ' '.join(f'"{termo}"*' for termo in termos)
+        resultados = select(
+            _dossies_fts.c.rowid.label('id_dossie'),
+            func.bm25(literal_column('dossies_fts')).label('relevancia')
+        ).where(
+            literal_column('dossies_fts').op('MATCH')(consulta)
+        ).subquery('busca_fts')
+
+        return query.join(
+            resultados, Dossie.id_dossie == resultados.c.id_dossie
+        ).order_by(resultados.c.relevancia, Dossie.id_dossie.desc())
+
+    def _aplicar_like(self, query, busca):
+        """Busca por substring sem índice (comportamento anterior)"""
+        return query.filter(
+            or_(
+                Dossie.n_dossie.contains(busca),
+                Dossie.nome.contains(busca),
+                Dossie.cpf.contains(busca),
+                Dossie.n_mae.contains(busca),
+                Dossie.n_pai.contains(busca)
+            )
+        )
+
+
+# Instância global do serviço
+dossie_search = DossieSearch()
@@ -2,33 +2,166 @@
 """
 Serviço para gerenciamento de configurações
 Implementa cache, validação e hierarquia
+
+Leitura: todas as configurações que valem para um par (escola, usuário)
+são carregadas em uma única consulta e compiladas em um mapeamento
+imutável já resolvido pela precedência usuário → escola → módulo → global
+(ConfiguracoesResolvidas). O mapeamento fica no cache em dois níveis de
+utils/cache_configuracoes.py (local por worker e, se configurado, Redis),
+marcado com a geração das configurações: qualquer escrita em
+ConfiguracaoSistema troca a geração e todos os workers recompilam na
+próxima requisição. Dentro da requisição a geração é lida uma vez e o
+mapeamento fica em `g`, então ler 50 configurações em uma página custa no
+máximo uma leitura da geração e uma consulta.
 """
 
-from flask import session, request
+from collections.abc import Mapping
+from types import MappingProxyType
+
+from flask import g, has_request_context, session, request
 from models import db
 from models.configuracao_avancada import (
     ConfiguracaoSistema, HistoricoConfiguracao, 
     ConfigScope, ConfigType, ConfigCategory
 )
+from utils.cache_configuracoes import cache_configuracoes
 from utils.logs import log_acao, AcoesAuditoria
 import json
-from datetime import datetime, timedelta
-from functools import lru_cache
-import redis
+from datetime import datetime
+
+_SEM_VALOR = object()
+
+
+class ConfiguracoesResolvidas(Mapping):
+    """
+    Configurações de um par (escola, usuário) já resolvidas pela hierarquia
+
+    Como Mapping, expõe chave → valor tipado sem considerar módulo
+    (usuário → escola → global); obter(chave, modulo=...) inclui a camada
+    de módulo entre escola e global. Valores JSON são devolvidos como
+    cópias, então o mapeamento compartilhado não pode ser alterado.
+    """
+
+    __slots__ = ('_geral', '_especificas', '_modulos', 'versao')
+
+    def __init__(self, linhas, escola_id=None, usuario_id=None, versao=None):
+        """
+        Args:
+            linhas: (chave, escopo, escola_id, usuario_id, modulo, tipo, valor) do banco
+        """
+        camadas = {ConfigScope.GLOBAL: {}, ConfigScope.ESCOLA: {}, ConfigScope.USUARIO: {}}
+        modulos = {}
+        for chave, escopo, escola, usuario, modulo, tipo, valor in linhas:
+            if escopo == ConfigScope.MODULO:
+                modulos[(chave, modulo)] = self._compilar(tipo, valor)
+            elif escopo == ConfigScope.ESCOLA and escola == escola_id:
+                camadas[escopo][chave] = self._compilar(tipo, valor)
+            elif escopo == ConfigScope.USUARIO and usuario == usuario_id:
+                camadas[escopo][chave] = self._compilar(tipo, valor)
+            elif escopo == ConfigScope.GLOBAL:
+                camadas[escopo][chave] = self._compilar(tipo, valor)
+
+        especificas = {**camadas[ConfigScope.ESCOLA], **camadas[ConfigScope.USUARIO]}
+        self._especificas = MappingProxyType(especificas)
+        self._geral = MappingProxyType({**camadas[ConfigScope.GLOBAL], **especificas})
+        self._modulos = MappingProxyType(modulos)
+        self.versao = versao
+
+    @staticmethod
+    def _compilar(tipo, valor):
+        """JSON fica como texto (decodificado a cada leitura); os demais já convertidos"""
+        try:
+            if tipo == ConfigType.JSON:
+                json.loads(valor)
+                return (True, valor)
+            return (False, ConfiguracaoSistema.converter_valor(tipo, valor))
+        except (ValueError, TypeError, AttributeError):
+            return (False, valor)
+
+    @staticmethod
+    def _valor(compilado):
+        eh_json, valor = compilado
+        return json.loads(valor) if eh_json else valor
+
+    def obter(self, chave, modulo=None, default=None):
+        """Valor da configuração pela precedência usuário → escola → módulo → global"""
+        if modulo and chave not in self._especificas:
+            compilado = self._modulos.get((chave, modulo), _SEM_VALOR)
+            if compilado is not _SEM_VALOR:
+                return self._valor(compilado)
+        compilado = self._geral.get(chave, _SEM_VALOR)
+        return default if compilado is _SEM_VALOR else self._valor(compilado)
+
+    def __getitem__(self, chave):
+        return self._valor(self._geral[chave])
+
+    def __iter__(self):
+        return iter(self._geral)
+
+    def __len__(self):
+        return len(self._geral)
+
 
 class ConfiguracaoService:
     """Serviço centralizado para gerenciamento de configurações"""
     
-    def __init__(self):
-        self.cache = {}
-        self.cache_timeout = timedelta(minutes=30)
-        self.last_cache_update = {}
-        
-        # Redis para cache distribuído (opcional)
-        try:
-            self.redis_client = redis.Redis(host='localhost', port=6379, db=1)
-        except:
-            self.redis_client = None
+    def _carregar(self, escola_id, usuario_id):
+        """Uma consulta com todas as linhas que valem para o par (escola, usuário)"""
+        escopos = [
+            ConfiguracaoSistema.escopo.in_([ConfigScope.GLOBAL, ConfigScope.MODULO])
+        ]
+        if escola_id:
+            escopos.append(db.and_(ConfiguracaoSistema.escopo == ConfigScope.ESCOLA,
+                                   ConfiguracaoSistema.escola_id == escola_id))
+        if usuario_id:
+            escopos.append(db.and_(ConfiguracaoSistema.escopo == ConfigScope.USUARIO,
+                                   ConfiguracaoSistema.usuario_id == usuario_id))
+        return db.session.query(
+            ConfiguracaoSistema.chave, ConfiguracaoSistema.escopo, ConfiguracaoSistema.escola_id,
+            ConfiguracaoSistema.usuario_id, ConfiguracaoSistema.modulo,
+            ConfiguracaoSistema.tipo, ConfiguracaoSistema.valor
+        ).filter(db.or_(*escopos)).all()
+
+    @staticmethod
+    def _serializar(linhas):
+        """Linhas do banco em forma JSON para o nível Redis do cache"""
+        return [[chave, escopo.value, escola, usuario, modulo, tipo.value, valor]
+                for chave, escopo, escola, usuario, modulo, tipo, valor in linhas]
+
+    @staticmethod
+    def _desserializar(linhas):
+        return [(chave, ConfigScope(escopo), escola, usuario, modulo, ConfigType(tipo), valor)
+                for chave, escopo, escola, usuario, modulo, tipo, valor in linhas]
+
+    def resolvidas(self, escola_id=None, usuario_id=None):
+        """
+        Configurações resolvidas de um par (escola, usuário)
+
+        Returns:
+            ConfiguracoesResolvidas: Mapeamento imutável (compartilhado entre requisições)
+        """
+        escopo = (escola_id or None, usuario_id or None)
+
+        por_requisicao = None
+        if has_request_context():
+            por_requisicao = g.setdefault('_configuracoes_resolvidas', {})
+            if escopo in por_requisicao:
+                return por_requisicao[escopo]
+
+        geracao = cache_configuracoes.geracao()
+        resolvidas = cache_configuracoes.obter(escopo, geracao)
+        if isinstance(resolvidas, list):
+            # Linhas compartilhadas por outro worker via Redis: compila sem ir ao banco
+            resolvidas = ConfiguracoesResolvidas(self._desserializar(resolvidas), *escopo, geracao)
+            cache_configuracoes.guardar(escopo, geracao, resolvidas)
+        elif resolvidas is None:
+            linhas = self._carregar(*escopo)
+            resolvidas = ConfiguracoesResolvidas(linhas, *escopo, geracao)
+            cache_configuracoes.guardar(escopo, geracao, resolvidas, self._serializar(linhas))
+
+        if por_requisicao is not None:
+            por_requisicao[escopo] = resolvidas
+        return resolvidas
     
     def obter_configuracao(self, chave, escola_id=None, usuario_id=None, modulo=None, default=None):
         """
@@ -38,53 +171,7 @@ class ConfiguracaoService:
         3. Módulo específico
         4. Global
         """
-        cache_key = f"{chave}_{escola_id}_{usuario_id}_{modulo}"
-        
-        # Verificar cache
-        if self._is_cache_valid(cache_key):
-            return self.cache[cache_key]
-        
-        # Buscar na hierarquia
-        config = None
-        
-        # 1. Configuração do usuário
-        if usuario_id:
-            config = ConfiguracaoSistema.query.filter_by(
-                chave=chave,
-                escopo=ConfigScope.USUARIO,
-                usuario_id=usuario_id
-            ).first()
-        
-        # 2. Configuração da escola
-        if not config and escola_id:
-            config = ConfiguracaoSistema.query.filter_by(
-                chave=chave,
-                escopo=ConfigScope.ESCOLA,
-                escola_id=escola_id
-            ).first()
-        
-        # 3. Configuração do módulo
-        if not config and modulo:
-            config = ConfiguracaoSistema.query.filter_by(
-                chave=chave,
-                escopo=ConfigScope.MODULO,
-                modulo=modulo
-            ).first()
-        
-        # 4. Configuração global
-        if not config:
-            config = ConfiguracaoSistema.query.filter_by(
-                chave=chave,
-                escopo=ConfigScope.GLOBAL
-            ).first()
-        
-        # Retornar valor ou padrão
-        valor = config.valor_tipado if config else default
-        
-        # Atualizar cache
-        self._update_cache(cache_key, valor)
-        
-        return valor
+        return self.resolvidas(escola_id, usuario_id).obter(chave, modulo=modulo, default=default)
     
     def definir_configuracao(self, chave, valor, escopo=ConfigScope.GLOBAL, 
                            escola_id=None, usuario_id=None, modulo=None, 
@@ -142,8 +229,8 @@ class ConfiguracaoService:
         
         db.session.commit()
         
-        # Limpar cache
-        self._invalidate_cache(chave)
+        # O commit trocou a geração (cache_configuracoes): descarta a cópia da requisição
+        self._descartar_requisicao()
         
         # Log da ação
         log_acao(
@@ -161,15 +248,11 @@ class ConfiguracaoService:
             visivel_interface=True
         ).all()
         
+        resolvidas = self.resolvidas(escola_id, usuario_id)
         resultado = {}
         for config in configs:
-            valor = self.obter_configuracao(
-                config.chave, 
-                escola_id=escola_id, 
-                usuario_id=usuario_id
-            )
             resultado[config.chave] = {
-                'valor': valor,
+                'valor': resolvidas.obter(config.chave),
                 'config': config.to_dict()
             }
         
@@ -230,48 +313,16 @@ class ConfiguracaoService:
             'erros': erros
         }
     
-    def _is_cache_valid(self, cache_key):
-        """Verifica se o cache ainda é válido"""
-        if cache_key not in self.cache:
-            return False
-        
-        if cache_key not in self.last_cache_update:
-            return False
-        
-        return datetime.now() - self.last_cache_update[cache_key] < self.cache_timeout
+    def _descartar_requisicao(self):
+        """Esquece a geração e os mapeamentos guardados na requisição atual"""
+        cache_configuracoes.esquecer_geracao()
+        if has_request_context():
+            g.pop('_configuracoes_resolvidas', None)
     
-    def _update_cache(self, cache_key, valor):
-        """Atualiza o cache local"""
-        self.cache[cache_key] = valor
-        self.last_cache_update[cache_key] = datetime.now()
-        
-        # Atualizar Redis se disponível
-        if self.redis_client:
-            try:
-                self.redis_client.setex(
-                    f"config:{cache_key}", 
-                    int(self.cache_timeout.total_seconds()), 
-                    json.dumps(valor)
-                )
-            except:
-                pass
-    
-    def _invalidate_cache(self, chave):
-        """Invalida cache relacionado a uma chave"""
-        keys_to_remove = [k for k in self.cache.keys() if k.startswith(chave)]
-        for key in keys_to_remove:
-            del self.cache[key]
-            if key in self.last_cache_update:
-                del self.last_cache_update[key]
-        
-        # Invalidar Redis
-        if self.redis_client:
-            try:
-                pattern = f"config:{chave}*"
-                for key in self.redis_client.scan_iter(match=pattern):
-                    self.redis_client.delete(key)
-            except:
-                pass
+    def limpar_cache(self):
+        """Descarta os mapeamentos compilados neste worker"""
+        cache_configuracoes.limpar_local()
+        self._descartar_requisicao()
     
     def _salvar_historico(self, config, valor_anterior, valor_novo, motivo):
         """Salva histórico de mudanças"""
@@ -0,0 +1,99 @@
+# services/dashboard_service.py
+"""
+Serviço de estatísticas do dashboard
+Lê os indicadores de uma escola da tabela materializada estatisticas_escola
+"""
+
+import time
+from datetime import datetime
+
+from models import EstatisticaEscola
+from services.emprestimo_service import controle_emprestimos
+
+# Quantidade de meses exibidos no gráfico de evolução
+MESES_EVOLUCAO = 6
+
+
+def _inicio_mes(data, meses_atras=0):
+    """Retorna o primeiro dia do mês, `meses_atras` meses antes de `data`"""
+    indice = data.year * 12 + (data.month - 1) - meses_atras
+    return datetime(indice // 12, indice % 12 + 1, 1)
+
+
+class DashboardService:
+    """Motor de estatísticas do dashboard por escola"""
+
+    def obter_estatisticas(self, escola_id, hoje=None):
+        """
+        Monta stats, alertas e gráficos de uma escola em duas consultas:
+        1. Contadores materializados em estatisticas_escola
+        2. Empréstimos atrasados (dependem da data atual: lidos de emprestimos_abertos)
+
+        Args:
+            escola_id (int): ID da escola
+            hoje (datetime): Data de referência (padrão: agora)
+
+        Returns:
+            dict: {'stats', 'alertas', 'graficos', 'tempos'}
+        """
+        hoje = hoje or datetime.now()
+        meses = [_inicio_mes(hoje, i) for i in range(MESES_EVOLUCAO - 1, -1, -1)]
+
+        tempos = {}
+        inicio_total = time.perf_counter()
+
+        # Consulta 1: contadores materializados
+        inicio = time.perf_counter()
+        resumo = EstatisticaEscola.obter_resumo(escola_id)
+        tempos['resumo_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+
+        # Consulta 2: empréstimos em aberto com devolução vencida (índice escola/prazo)
+        inicio = time.perf_counter()
+        atrasadas = controle_emprestimos.contar_atrasados(escola_id, hoje)
+        tempos['atrasadas_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+
+        por_status = resumo.get(EstatisticaEscola.DOSSIE_STATUS, {})
+        dossies_mes = resumo.get(EstatisticaEscola.DOSSIE_MES, {})
+        movimentacoes_mes = resumo.get(EstatisticaEscola.MOVIMENTACAO_MES, {})
+        por_tipo = resumo.get(EstatisticaEscola.MOVIMENTACAO_TIPO, {})
+
+        stats = {
+            'total_dossies': sum(por_status.values()),
+            'dossies_ativos': por_status.get('ativo', 0),
+            'dossies_pendentes': por_status.get('pendente', 0),
+            'movimentacoes_mes': movimentacoes_mes.get(hoje.strftime('%Y-%m'), 0)
+        }
+
+        alertas = {
+            'dossies_pendentes': stats['dossies_pendentes'],
+            'movimentacoes_atrasadas': atrasadas
+        }
+
+        graficos = {
+            'evolucao_mensal': [
+                {'mes': mes.strftime('%b/%Y'), 'count': dossies_mes.get(mes.strftime('%Y-%m'), 0)}
+                for mes in meses
+            ],
+            'tipos_movimentacao': [
+                {'tipo': tipo if tipo != 'indefinido' else 'Outro', 'count': total}
+                for tipo, total in por_tipo.items() if total
+            ],
+            'status_dossies': [
+                {'status': status.title(), 'count': total}
+                for status, total in por_status.items() if total
+            ]
+        }
+
+        tempos['consultas'] = 2
+        tempos['total_ms'] = round((time.perf_counter() - inicio_total) * 1000, 2)
+
+        return {
+            'stats': stats,
+            'alertas': alertas,
+            'graficos': graficos,
+            'tempos': tempos
+        }
+
+
+# Instância global do serviço
+dashboard_service = DashboardService()
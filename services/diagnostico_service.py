@@ -0,0 +1,149 @@
+# services/diagnostico_service.py
+"""
+Diagnóstico de índices
+Executa EXPLAIN no catálogo de consultas frequentes do sistema e aponta
+as que ainda percorrem uma tabela inteira (sequential scan)
+"""
+
+import json
+
+from sqlalchemy import func, select
+
+from models import db, Dossie, Movimentacao, LogAuditoria, Solicitante, Usuario
+
+# Tamanho de página usado nas listagens por cursor (+1 para detectar a próxima)
+LIMITE_PAGINA = 16
+
+# Bancos cujo plano de execução sabemos ler
+DIALETOS_SUPORTADOS = ('postgresql', 'sqlite')
+
+
+class DialetoNaoSuportado(Exception):
+    """Banco sem leitura de plano de execução implementada"""
+
+
+def _catalogo(escola_id, dossie_id, usuario_id):
+    """
+    Consultas frequentes, no mesmo formato usado pelos controllers
+
+    Returns:
+        list: [(nome, statement), ...]
+    """
+    return [
+        ('Dossiês da escola por status',
+         select(func.count(Dossie.id_dossie)).where(
+             Dossie.id_escola == escola_id, Dossie.status == 'ativo')),
+        ('Listagem de dossiês da escola (cursor)',
+         select(Dossie.id_dossie).where(Dossie.id_escola == escola_id)
+         .order_by(Dossie.dt_cadastro.desc(), Dossie.id_dossie.desc()).limit(LIMITE_PAGINA)),
+        ('Movimentações pendentes de um dossiê',
+         select(Movimentacao.id).where(
+             Movimentacao.dossie_id == dossie_id, Movimentacao.status == 'pendente')
+         .order_by(Movimentacao.data_prevista_devolucao)),
+        ('Movimentações atrasadas (alertas)',
+         select(func.count(Movimentacao.id)).where(
+             Movimentacao.status == 'pendente',
+             Movimentacao.data_prevista_devolucao != None,
+             Movimentacao.data_prevista_devolucao < func.current_timestamp())),
+        ('Listagem de movimentações (cursor)',
+         select(Movimentacao.id)
+         .order_by(Movimentacao.data_movimentacao.desc(), Movimentacao.id.desc()).limit(LIMITE_PAGINA)),
+        ('Logs de auditoria do usuário',
+         select(LogAuditoria.id).where(LogAuditoria.usuario_id == usuario_id)
+         .order_by(LogAuditoria.data_hora.desc()).limit(50)),
+        ('Solicitantes da escola por nome (cursor)',
+         select(Solicitante.id).where(Solicitante.escola_id == escola_id)
+         .order_by(Solicitante.nome, Solicitante.id).limit(LIMITE_PAGINA)),
+        ('Usuários ativos da escola',
+         select(func.count(Usuario.id)).where(
+             Usuario.escola_id == escola_id, Usuario.situacao == 'ativo')),
+    ]
+
+
+def _parametros(compilado):
+    """Parâmetros no formato esperado pelo driver (posicional ou nomeado)"""
+    if compilado.positional:
+        return tuple(compilado.params[nome] for nome in compilado.positiontup)
+    return compilado.params
+
+
+def _varreduras_postgresql(plano):
+    """Tabelas lidas por Seq Scan em um plano JSON do PostgreSQL"""
+    tabelas = []
+    if plano.get('Node Type') == 'Seq Scan':
+        tabelas.append(plano.get('Relation Name'))
+    for filho in plano.get('Plans', []):
+        tabelas.extend(_varreduras_postgresql(filho))
+    return tabelas
+
+
+def _explicar(conexao, statement):
+    """
+    Executa EXPLAIN e extrai o plano
+
+    Returns:
+        tuple: (linhas do plano em texto, tabelas lidas por varredura completa)
+    """
+    dialeto = conexao.dialect.name
+    compilado = statement.compile(dialect=conexao.dialect)
+    parametros = _parametros(compilado)
+
+    if dialeto == 'postgresql':
+        plano = conexao.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compilado}", parametros).scalar()
+        if isinstance(plano, str):
+            plano = json.loads(plano)
+        raiz = plano[0]['Plan']
+        texto = conexao.exec_driver_sql(f"EXPLAIN {compilado}", parametros).scalars().all()
+        return texto, _varreduras_postgresql(raiz)
+
+    if dialeto == 'sqlite':
+        linhas = conexao.exec_driver_sql(f"EXPLAIN QUERY PLAN {compilado}", parametros).all()
+        texto = [linha[-1] for linha in linhas]
+        # "SCAN tabela" sem índice = varredura completa; "SEARCH" ou "USING ... INDEX" usam índice
+        varreduras = [
+            detalhe.split()[1] for detalhe in texto
+            if detalhe.startswith('SCAN ') and 'INDEX' not in detalhe
+        ]
+        return texto, varreduras
+
+    raise DialetoNaoSuportado(f"EXPLAIN não suportado para o banco '{dialeto}'")
+
+
+def analisar_consultas(forcar_indices=False):
+    """
+    Roda EXPLAIN em cada consulta do catálogo
+
+    Args:
+        forcar_indices (bool): No PostgreSQL, desliga enable_seqscan na transação.
+            Em bases pequenas o planejador prefere Seq Scan mesmo com índice;
+            com a opção, um Seq Scan restante indica que nenhum índice serve.
+
+    Returns:
+        list: [{'nome', 'plano', 'varreduras'}, ...]
+
+    Raises:
+        DialetoNaoSuportado: banco fora de DIALETOS_SUPORTADOS
+    """
+    dialeto = db.session.get_bind().dialect.name
+    if dialeto not in DIALETOS_SUPORTADOS:
+        raise DialetoNaoSuportado(
+            f"dialeto não suportado: '{dialeto}' (suportados: {', '.join(DIALETOS_SUPORTADOS)})"
+        )
+
+    escola_id = db.session.query(func.min(Dossie.id_escola)).scalar() or 1
+    dossie_id = db.session.query(func.min(Dossie.id_dossie)).scalar() or 1
+    usuario_id = db.session.query(func.min(Usuario.id)).scalar() or 1
+
+    conexao = db.session.connection()
+    if forcar_indices and conexao.dialect.name == 'postgresql':
+        conexao.exec_driver_sql("SET LOCAL enable_seqscan = off")
+
+    resultados = []
+    try:
+        for nome, statement in _catalogo(escola_id, dossie_id, usuario_id):
+            plano, varreduras = _explicar(conexao, statement)
+            resultados.append({'nome': nome, 'plano': plano, 'varreduras': varreduras})
+    finally:
+        db.session.rollback()
+
+    return resultados
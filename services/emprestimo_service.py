@@ -0,0 +1,161 @@
+# services/emprestimo_service.py
+"""
+Acompanhamento de empréstimos em atraso
+
+Os empréstimos em aberto ficam em emprestimos_abertos (models/emprestimo_aberto.py),
+indexados pela data prevista de devolução. Uma varredura periódica marca os
+que passaram do prazo (atrasado_desde) e gera uma Notificacao para a escola;
+a marcação é um UPDATE condicional, então vários workers (ou o cron) podem
+varrer ao mesmo tempo sem notificar o mesmo atraso duas vezes.
+
+Dashboard, relatórios e notificações leem esse conjunto pequeno em vez de
+varrer o histórico de movimentações.
+
+A varredura roda em uma thread de fundo a cada EMPRESTIMOS_VARREDURA_SEGUNDOS
+(0 desliga; use então `python manage.py varrer-emprestimos` no cron).
+"""
+
+import atexit
+import os
+import threading
+from datetime import datetime
+
+from models import db, Dossie, EmprestimoAberto, Movimentacao, Notificacao, Solicitante
+from models.notificacao import inserir_notificacoes
+
+# Intervalo padrão entre varreduras (segundos)
+INTERVALO_PADRAO = 300
+
+
+class ControleEmprestimos:
+    """Varredura de prazos e consultas sobre os empréstimos em aberto"""
+
+    def __init__(self):
+        self.app = None
+        self.intervalo = INTERVALO_PADRAO
+        self._thread = None
+        self._pid = None
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Lê a configuração e inicia a varredura periódica na primeira requisição"""
+        self.app = app
+        self.intervalo = app.config.setdefault('EMPRESTIMOS_VARREDURA_SEGUNDOS', INTERVALO_PADRAO)
+        app.extensions['controle_emprestimos'] = self
+        if self.intervalo:
+            app.before_request(self._garantir_thread)
+        atexit.register(self.parar)
+
+    def _garantir_thread(self):
+        """Inicia a thread de varredura deste processo (recriada após um fork do gunicorn)"""
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._executar, name='varredura-emprestimos', daemon=True)
+            self._thread.start()
+
+    def _executar(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    self.varrer()
+                except Exception as e:
+                    self.app.logger.error(f'Erro na varredura de empréstimos em atraso: {e}')
+                finally:
+                    db.session.remove()
+            if self._parar.wait(self.intervalo):
+                return
+
+    def parar(self, timeout=5.0):
+        """Encerra a thread de varredura"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._parar.set()
+        self._thread.join(timeout)
+
+    def varrer(self, agora=None):
+        """
+        Marca os empréstimos que venceram desde a última varredura e notifica as escolas
+
+        Args:
+            agora (datetime): Data de referência (padrão: agora)
+
+        Returns:
+            int: Quantidade de empréstimos que passaram a constar como atrasados
+        """
+        agora = agora or datetime.now()
+        tabela = EmprestimoAberto.__table__
+
+        try:
+            # UPDATE condicional: só uma varredura concorrente marca cada empréstimo
+            vencidos = db.session.execute(
+                tabela.update().where(
+                    tabela.c.atrasado_desde.is_(None),
+                    tabela.c.data_prevista_devolucao < agora
+                ).values(atrasado_desde=agora).returning(tabela.c.movimentacao_id)
+            ).scalars().all()
+
+            if vencidos:
+                detalhes = db.session.query(
+                    EmprestimoAberto.movimentacao_id, EmprestimoAberto.escola_id,
+                    EmprestimoAberto.data_prevista_devolucao, Dossie.n_dossie, Dossie.nome,
+                    db.func.coalesce(Movimentacao.solicitante_nome, Solicitante.nome)
+                ).join(Movimentacao, Movimentacao.id == EmprestimoAberto.movimentacao_id).join(
+                    Dossie, Dossie.id_dossie == Movimentacao.dossie_id
+                ).outerjoin(Solicitante, Solicitante.id == Movimentacao.solicitante_id).filter(
+                    EmprestimoAberto.movimentacao_id.in_(vencidos)
+                )
+
+                notificacoes = []
+                for movimentacao_id, escola_id, prazo, n_dossie, nome, solicitante in detalhes:
+                    mensagem = f'Dossiê {n_dossie} ({nome}) deveria ter sido devolvido em {prazo:%d/%m/%Y}'
+                    if solicitante:
+                        mensagem += f' por {solicitante}'
+                    notificacoes.append({
+                        'escola_id': escola_id,
+                        'tipo': Notificacao.EMPRESTIMO_ATRASADO,
+                        'titulo': 'Empréstimo em atraso',
+                        'mensagem': mensagem,
+                        'url': f'/movimentacoes/ver/{movimentacao_id}',
+                        'movimentacao_id': movimentacao_id,
+                        'criada_em': agora
+                    })
+                # Publicadas aos navegadores conectados após o commit
+                inserir_notificacoes(db.session, db.session.connection(), notificacoes)
+
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        return len(vencidos)
+
+    def contar_atrasados(self, escola_id=None, agora=None):
+        """Empréstimos em aberto com o prazo vencido (pelo índice escola/prazo)"""
+        query = db.session.query(db.func.count(EmprestimoAberto.movimentacao_id)).filter(
+            EmprestimoAberto.data_prevista_devolucao < (agora or datetime.now())
+        )
+        if escola_id is not None:
+            query = query.filter(EmprestimoAberto.escola_id == escola_id)
+        return query.scalar() or 0
+
+    def em_aberto(self, escola_id=None):
+        """Query de movimentações em aberto (mais atrasadas primeiro), com o JOIN em dossies"""
+        query = Movimentacao.query.join(
+            EmprestimoAberto, EmprestimoAberto.movimentacao_id == Movimentacao.id
+        ).join(Dossie, Dossie.id_dossie == Movimentacao.dossie_id)
+        if escola_id is not None:
+            query = query.filter(EmprestimoAberto.escola_id == escola_id)
+        return query.order_by(
+            EmprestimoAberto.data_prevista_devolucao.asc().nullslast(), Movimentacao.id
+        )
+
+
+# Instância global do serviço
+controle_emprestimos = ControleEmprestimos()
@@ -0,0 +1,133 @@
+# services/entrega_arquivos_service.py
+"""
+Entrega dos arquivos enviados (anexos e fotos) ao navegador
+
+Todas as respostas levam ETag forte e respondem a If-None-Match com 304
+sem ler o arquivo. Sem offload, a própria aplicação atende Range (206) e
+o corpo é enviado pelo wsgi.file_wrapper (sendfile no gunicorn).
+
+Com offload, a aplicação só valida a requisição e monta os cabeçalhos;
+os bytes (e o Range) ficam com o proxy:
+
+    ARQUIVOS_OFFLOAD=x-accel-redirect   nginx (location interna, ver abaixo)
+    ARQUIVOS_OFFLOAD=x-sendfile         Apache mod_xsendfile / lighttpd
+
+No nginx, ARQUIVOS_ACCEL_PREFIXO é uma location interna apontando para a
+raiz da aplicação:
+
+    location /_arquivos/ {
+        internal;
+        alias /app/;
+    }
+
+Assim um PDF grande não prende um worker do gunicorn durante o download.
+"""
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from flask import current_app, request
+from werkzeug.utils import send_file
+
+MODOS_OFFLOAD = ('x-accel-redirect', 'x-sendfile')
+
+PREFIXO_ACCEL_PADRAO = '/_arquivos/'
+
+# Nomes gerados a partir do conteúdo (ver imagem_service): o arquivo de
+# um nome nunca muda, então pode ficar no cache do navegador indefinidamente
+_NOME_IMUTAVEL = re.compile(r'_[0-9a-f]{16}(_[a-z]+)?\.[a-z0-9]+$')
+
+# Um ano: o máximo recomendado para Cache-Control
+MAX_AGE_IMUTAVEL = 365 * 24 * 3600
+
+
+def nome_imutavel(filename):
+    """Verifica se o nome do arquivo contém o hash do conteúdo"""
+    return bool(_NOME_IMUTAVEL.search(filename or ''))
+
+
+class EntregaArquivos:
+    """Respostas de download com validação de cache, Range e offload"""
+
+    def modo_offload(self):
+        """Modo de offload configurado ('' = a aplicação envia os bytes)"""
+        modo = (current_app.config.get('ARQUIVOS_OFFLOAD') or '').lower()
+        return modo if modo in MODOS_OFFLOAD else ''
+
+    def uri_interna(self, caminho):
+        """
+        URI da location interna do nginx para um arquivo da aplicação
+
+        Arquivos fora da raiz da aplicação (ex: ANEXOS_DIR absoluto em outro
+        volume) retornam None e são enviados pela própria aplicação.
+        """
+        prefixo = current_app.config.get('ARQUIVOS_ACCEL_PREFIXO') or PREFIXO_ACCEL_PADRAO
+        relativo = os.path.relpath(os.path.realpath(caminho), os.path.realpath(current_app.root_path))
+        if relativo.startswith(os.pardir):
+            return None
+        return prefixo.rstrip('/') + '/' + quote(relativo.replace(os.sep, '/'))
+
+    def enviar(self, caminho, etag=None, download_name=None, as_attachment=False,
+               mimetype=None, imutavel=False, privado=False):
+        """
+        Resposta HTTP com o conteúdo de um arquivo
+
+        Args:
+            caminho (str): Caminho absoluto do arquivo
+            etag (str): ETag forte (ex: SHA-256); None = mtime/tamanho
+            download_name (str): Nome apresentado ao usuário
+            as_attachment (bool): Forçar download (Content-Disposition: attachment)
+            mimetype (str): Tipo do conteúdo; None = deduzido do nome
+            imutavel (bool): Conteúdo nunca muda para esta URL (cache de 1 ano)
+            privado (bool): Não permitir cache em proxies compartilhados
+
+        Raises:
+            FileNotFoundError: se o arquivo não existir
+        """
+        if not os.path.isfile(caminho):
+            raise FileNotFoundError(caminho)
+
+        if mimetype is None:
+            mimetype = mimetypes.guess_type(download_name or caminho)[0] or 'application/octet-stream'
+
+        modo = self.modo_offload()
+        interno = self.uri_interna(caminho) if modo == 'x-accel-redirect' else None
+        offload = modo == 'x-sendfile' or interno is not None
+
+        resposta = send_file(
+            caminho,
+            request.environ,
+            mimetype=mimetype,
+            as_attachment=as_attachment,
+            download_name=download_name,
+            conditional=not offload,
+            etag=etag if etag else True,
+            max_age=MAX_AGE_IMUTAVEL if imutavel else None,
+            use_x_sendfile=offload,
+            response_class=current_app.response_class,
+        )
+
+        if imutavel:
+            resposta.cache_control.immutable = True
+        if privado:
+            resposta.cache_control.public = False
+            resposta.cache_control.private = True
+
+        if offload:
+            # 304 é respondido aqui; Range (206) fica com o proxy
+            resposta = resposta.make_conditional(request.environ)
+            if resposta.status_code == 304:
+                resposta.headers.pop('X-Sendfile', None)
+            elif interno:
+                resposta.headers.pop('X-Sendfile', None)
+                resposta.headers['X-Accel-Redirect'] = interno
+
+        if resposta.status_code == 200:
+            resposta.headers['Accept-Ranges'] = 'bytes'
+        return resposta
+
+
+# Instância global do serviço
+entrega_arquivos = EntregaArquivos()
@@ -0,0 +1,232 @@
+# services/imagem_service.py
+"""
+Pipeline de processamento das fotos enviadas (usuários, dossiês e diretores)
+
+O upload apenas grava o original com nome derivado do conteúdo
+({prefixo}_{sha256[:16]}.{ext}) e entrega a geração das versões menores a
+um pool de threads (o Pillow libera o GIL ao decodificar, redimensionar e
+codificar). Para cada foto são geradas as derivadas:
+
+    {nome}_thumb.jpg / {nome}_thumb.webp   - listagens (avatar)
+    {nome}_media.jpg / {nome}_media.webp   - páginas de detalhe
+
+Como o nome muda junto com o conteúdo, as URLs podem ser cacheadas pelo
+navegador indefinidamente (Cache-Control immutable, ver
+entrega_arquivos_service). Enquanto as derivadas não existem, as URLs
+apontam para o original.
+"""
+
+import atexit
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+# Extensões aceitas para fotos
+EXTENSOES_FOTO = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+# Subpastas de static/uploads por tipo de foto
+CATEGORIAS = {
+    'usuario': 'fotos',
+    'dossie': 'dossies',
+    'diretor': 'diretores',
+}
+
+# Derivadas geradas: nome -> tamanho máximo (largura, altura)
+TAMANHOS = {
+    'thumb': (96, 96),
+    'media': (480, 480),
+}
+
+# Formatos de cada derivada: extensão -> (formato Pillow, opções de gravação)
+FORMATOS = {
+    'jpg': ('JPEG', {'quality': 82, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+}
+
+WORKERS_PADRAO = 2
+
+# Rota que entrega as fotos (controllers/foto_controller.arquivo)
+URL_FOTOS = '/api/foto/arquivo'
+
+_BLOCO_LEITURA = 64 * 1024
+
+
+def extensao_permitida(filename):
+    """Verifica se a extensão do arquivo é de uma foto aceita"""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in EXTENSOES_FOTO
+
+
+def nome_derivada(filename, tamanho, extensao='jpg'):
+    """Nome do arquivo derivado de uma foto (ex: user_1_ab12_thumb.webp)"""
+    base = filename.rsplit('.', 1)[0]
+    return f'{base}_{tamanho}.{extensao}'
+
+
+class ProcessadorImagens:
+    """Gravação das fotos e geração das derivadas em segundo plano"""
+
+    def __init__(self):
+        self.app = None
+        self.workers = WORKERS_PADRAO
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._pendentes = set()
+
+    def init_app(self, app):
+        """Lê a configuração e registra o encerramento do pool"""
+        self.app = app
+        self.workers = app.config.setdefault('IMAGENS_WORKERS', WORKERS_PADRAO)
+        app.extensions['processador_imagens'] = self
+        atexit.register(self.parar)
+
+    def _obter_executor(self):
+        """Cria o pool sob demanda (e novamente após um fork do gunicorn)"""
+        pid = os.getpid()
+        if self._executor is None or self._pid != pid:
+            with self._lock:
+                if self._executor is None or self._pid != pid:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix='imagens'
+                    )
+                    self._pid = pid
+                    self._pendentes = set()
+        return self._executor
+
+    def pasta(self, categoria):
+        """Caminho absoluto da pasta de uploads de uma categoria"""
+        pasta = os.path.join(current_app.static_folder, 'uploads', CATEGORIAS[categoria])
+        os.makedirs(pasta, exist_ok=True)
+        return pasta
+
+    def salvar(self, arquivo, categoria, prefixo, anterior=None):
+        """
+        Grava o original enviado e agenda a geração das derivadas
+
+        Args:
+            arquivo: FileStorage recebido no upload
+            categoria (str): 'usuario', 'dossie' ou 'diretor'
+            prefixo (str): Início do nome do arquivo (ex: 'user_12')
+            anterior (str): Foto atual do registro, removida após a gravação
+
+        Returns:
+            str: Nome do arquivo gravado (a ser salvo no modelo)
+        """
+        pasta = self.pasta(categoria)
+        extensao = arquivo.filename.rsplit('.', 1)[1].lower()
+        temporario = os.path.join(pasta, f'.{prefixo}_{os.getpid()}_{threading.get_ident()}.tmp')
+
+        # Grava e calcula o hash em uma única passada pelo upload
+        resumo = hashlib.sha256()
+        with open(temporario, 'wb') as destino:
+            while True:
+                bloco = arquivo.stream.read(_BLOCO_LEITURA)
+                if not bloco:
+                    break
+                resumo.update(bloco)
+                destino.write(bloco)
+
+        filename = f'{prefixo}_{resumo.hexdigest()[:16]}.{extensao}'
+        os.replace(temporario, os.path.join(pasta, filename))
+
+        if anterior and anterior != filename:
+            self.remover(categoria, anterior)
+
+        self.agendar(categoria, filename)
+        return filename
+
+    def agendar(self, categoria, filename):
+        """Entrega a geração das derivadas ao pool"""
+        caminho = os.path.join(self.pasta(categoria), filename)
+        executor = self._obter_executor()
+        if caminho in self._pendentes:
+            return None
+        self._pendentes.add(caminho)
+        futuro = executor.submit(self.gerar_derivadas, caminho)
+        futuro.add_done_callback(lambda _: self._pendentes.discard(caminho))
+        return futuro
+
+    def gerar_derivadas(self, caminho):
+        """
+        Gera as versões reduzidas (JPEG e WebP) de uma foto
+
+        Executado pelas threads do pool; também pode ser chamado diretamente.
+
+        Returns:
+            list: Caminhos das derivadas geradas
+        """
+        from PIL import Image, ImageOps
+
+        gerados = []
+        try:
+            with Image.open(caminho) as original:
+                # JPEG: decodifica já reduzido (bem mais rápido para fotos grandes)
+                maior = max(TAMANHOS.values())
+                original.draft('RGB', maior)
+                imagem = ImageOps.exif_transpose(original)
+                if imagem.mode not in ('RGB', 'L'):
+                    imagem = imagem.convert('RGB')
+
+                # Do maior para o menor, reaproveitando a redução anterior
+                for tamanho, limites in sorted(TAMANHOS.items(), key=lambda item: -item[1][0]):
+                    imagem = imagem.copy()
+                    imagem.thumbnail(limites, Image.Resampling.LANCZOS, reducing_gap=2.0)
+                    for extensao, (formato, opcoes) in FORMATOS.items():
+                        destino = nome_derivada(caminho, tamanho, extensao)
+                        temporario = f'{destino}.tmp'
+                        imagem.save(temporario, formato, **opcoes)
+                        os.replace(temporario, destino)
+                        gerados.append(destino)
+        except Exception as e:
+            print(f"Erro ao gerar derivadas de {os.path.basename(caminho)}: {e}")
+        return gerados
+
+    def remover(self, categoria, filename):
+        """Remove a foto original e todas as suas derivadas"""
+        pasta = self.pasta(categoria)
+        caminhos = [os.path.join(pasta, filename)]
+        for tamanho in TAMANHOS:
+            for extensao in FORMATOS:
+                caminhos.append(os.path.join(pasta, nome_derivada(filename, tamanho, extensao)))
+
+        for caminho in caminhos:
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass  # Não falhar se não conseguir remover
+
+    def url(self, categoria, filename, tamanho=None, extensao='jpg', aguardar=False):
+        """
+        URL da foto ou de uma derivada
+
+        Se a derivada ainda não foi gerada, retorna a URL do original. Com
+        aguardar=True (URL guardada logo após o upload, ex: na sessão) retorna
+        o original com ?tamanho=: foto.arquivo entrega a derivada assim que
+        ela existir. As fotos são entregues por foto.arquivo (ETag e cache imutável).
+        """
+        subpasta = CATEGORIAS[categoria]
+        if tamanho:
+            derivada = nome_derivada(filename, tamanho, extensao)
+            if os.path.exists(os.path.join(current_app.static_folder, 'uploads', subpasta, derivada)):
+                return f'{URL_FOTOS}/{categoria}/{derivada}'
+            if aguardar:
+                return f'{URL_FOTOS}/{categoria}/{filename}?tamanho={tamanho}&extensao={extensao}'
+        return f'{URL_FOTOS}/{categoria}/{filename}'
+
+    def aguardar(self):
+        """Aguarda o processamento das fotos já agendadas (usado por comandos)"""
+        if self._executor is None or self._pid != os.getpid():
+            return
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+    def parar(self):
+        """Encerra o pool concluindo as derivadas em andamento"""
+        self.aguardar()
+
+
+# Instância global do processador
+processador_imagens = ProcessadorImagens()
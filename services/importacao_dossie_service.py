@@ -0,0 +1,276 @@
+# services/importacao_dossie_service.py
+"""
+Importação em lote de dossiês a partir de planilhas (CSV/XLSX)
+
+Usada na migração dos arquivos em papel: a planilha é lida por streaming,
+cada linha é validada (utils.validators) e a verificação de duplicidade é
+feita contra o conjunto de números de dossiê da escola, carregado em uma
+única consulta. As linhas válidas são gravadas em lotes com
+bulk_insert_mappings, um commit por lote.
+
+O resultado traz o relatório por linha (número da linha na planilha e
+mensagens de erro); linhas com erro não são importadas.
+"""
+
+import os
+import re
+import time
+import unicodedata
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from models import db, Dossie, EstatisticaEscola
+from utils.exportacao import gerar_csv
+from utils.importacao import PlanilhaInvalida
+from utils.validators import ValidationError, validar_cpf, validar_nome
+
+# Linhas gravadas por lote (um INSERT multi-valores e um commit)
+TAMANHO_LOTE = 2000
+
+# Status aceitos (os mesmos do formulário de cadastro)
+STATUS_VALIDOS = ('ativo', 'arquivado', 'transferido', 'inativo')
+
+# Campo do dossiê -> títulos de coluna aceitos (normalizados, ver _normalizar).
+# Inclui os títulos da exportação, para reimportar o arquivo exportado.
+COLUNAS = {
+    'n_dossie': ('n dossie', 'no dossie', 'n do dossie', 'numero dossie', 'numero do dossie', 'n_dossie', 'dossie'),
+    'nome': ('aluno', 'nome', 'nome do aluno'),
+    'ano': ('ano',),
+    'cpf': ('cpf',),
+    'n_pai': ('pai', 'nome do pai', 'n_pai'),
+    'n_mae': ('mae', 'nome da mae', 'n_mae'),
+    'local': ('local',),
+    'pasta': ('pasta',),
+    'tipo_documento': ('tipo de documento', 'tipo documento', 'tipo_documento'),
+    'status': ('status', 'situacao'),
+    'observacao': ('observacao', 'observacoes'),
+}
+
+OBRIGATORIAS = ('n_dossie', 'nome')
+
+# Títulos usados nas mensagens do relatório
+ROTULOS = {
+    'n_dossie': 'Nº Dossiê', 'nome': 'Aluno', 'ano': 'Ano', 'cpf': 'CPF', 'n_pai': 'Pai',
+    'n_mae': 'Mãe', 'local': 'Local', 'pasta': 'Pasta', 'tipo_documento': 'Tipo de Documento',
+    'status': 'Status', 'observacao': 'Observação',
+}
+
+# Relatórios de erros ficam disponíveis para download por este tempo
+VALIDADE_RELATORIO = timedelta(hours=24)
+
+# Tamanho máximo dos campos de texto livre (colunas do modelo)
+_TAMANHOS = {'n_dossie': 50, 'local': 100, 'pasta': 50, 'tipo_documento': 100}
+
+
+def _normalizar(titulo):
+    """Título de coluna sem acentos, minúsculo e com espaços simples"""
+    texto = unicodedata.normalize('NFKD', str(titulo or '')).encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9_]+', ' ', texto.lower()).strip()
+
+
+class ImportadorDossies:
+    """Validação e gravação em lote de dossiês de uma escola"""
+
+    def mapear_colunas(self, cabecalho):
+        """
+        Posição de cada campo na planilha a partir da linha de títulos
+
+        Raises:
+            PlanilhaInvalida: se faltar uma coluna obrigatória
+        """
+        titulos = {}
+        for campo, aceitos in COLUNAS.items():
+            for aceito in aceitos:
+                titulos.setdefault(aceito, campo)
+
+        mapa = {}
+        for indice, titulo in enumerate(cabecalho):
+            campo = titulos.get(_normalizar(titulo))
+            if campo and campo not in mapa:
+                mapa[campo] = indice
+
+        faltando = [ROTULOS[campo] for campo in OBRIGATORIAS if campo not in mapa]
+        if faltando:
+            raise PlanilhaInvalida(f"Colunas obrigatórias ausentes: {', '.join(faltando)}")
+        return mapa
+
+    def validar_linha(self, valores, mapa):
+        """
+        Converte e valida uma linha da planilha
+
+        Returns:
+            tuple: (registro, erros) - registro com os campos do Dossie e
+            lista de mensagens (vazia se a linha é válida)
+        """
+        def valor(campo):
+            indice = mapa.get(campo)
+            if indice is None or indice >= len(valores):
+                return ''
+            return str(valores[indice] or '').strip()
+
+        registro = {}
+        erros = []
+
+        def validar(campo, funcao):
+            try:
+                registro[campo] = funcao(valor(campo))
+            except ValidationError as e:
+                erros.append(f'{ROTULOS[campo]}: {e}')
+
+        registro['n_dossie'] = valor('n_dossie')
+        if not registro['n_dossie']:
+            erros.append(f"{ROTULOS['n_dossie']}: obrigatório")
+
+        validar('nome', validar_nome)
+        validar('cpf', validar_cpf)
+        for campo in ('n_pai', 'n_mae'):
+            validar(campo, lambda texto: validar_nome(texto) if texto else None)
+
+        ano = valor('ano')
+        registro['ano'] = None
+        if ano:
+            if ano.isdigit() and 1900 <= int(ano) <= datetime.now().year + 1:
+                registro['ano'] = int(ano)
+            else:
+                erros.append(f"{ROTULOS['ano']}: valor inválido ({ano})")
+
+        status = _normalizar(valor('status')) or 'ativo'
+        if status in STATUS_VALIDOS:
+            registro['status'] = status
+        else:
+            erros.append(f"{ROTULOS['status']}: deve ser {', '.join(STATUS_VALIDOS)}")
+
+        for campo in ('local', 'pasta', 'tipo_documento', 'observacao'):
+            registro[campo] = valor(campo) or None
+
+        for campo, maximo in _TAMANHOS.items():
+            if registro.get(campo) and len(registro[campo]) > maximo:
+                erros.append(f'{ROTULOS[campo]}: máximo de {maximo} caracteres')
+
+        return registro, erros
+
+    def importar(self, linhas, id_escola, usuario_id, simular=False, tamanho_lote=TAMANHO_LOTE):
+        """
+        Importa os dossiês de uma planilha para uma escola
+
+        Args:
+            linhas: Iterável de listas (a primeira é a linha de títulos)
+            id_escola (int): Escola de destino
+            usuario_id (int): Usuário registrado como responsável pelo cadastro
+            simular (bool): Apenas validar, sem gravar
+            tamanho_lote (int): Registros por INSERT/commit
+
+        Returns:
+            dict: {'total', 'importados', 'erros': [{'linha', 'n_dossie', 'nome', 'erros'}],
+                   'simulacao', 'segundos'}
+
+        Raises:
+            PlanilhaInvalida: planilha vazia ou sem as colunas obrigatórias
+        """
+        inicio = time.perf_counter()
+        linhas = iter(linhas)
+        cabecalho = next(linhas, None)
+        if not cabecalho:
+            raise PlanilhaInvalida('Planilha vazia')
+        mapa = self.mapear_colunas(cabecalho)
+
+        # Números já cadastrados na escola: uma consulta, verificação em memória
+        existentes = set(db.session.execute(
+            db.select(Dossie.n_dossie).where(Dossie.id_escola == id_escola)
+        ).scalars())
+        da_planilha = {}
+
+        resultado = {'total': 0, 'importados': 0, 'erros': [], 'simulacao': simular}
+        agora = datetime.now()
+        lote = []
+
+        for numero, valores in enumerate(linhas, 2):
+            if not any(str(v or '').strip() for v in valores):
+                continue
+            resultado['total'] += 1
+
+            registro, erros = self.validar_linha(valores, mapa)
+            n_dossie = registro['n_dossie']
+            if n_dossie in existentes:
+                erros.append(f'Nº Dossiê "{n_dossie}" já cadastrado nesta escola')
+            elif n_dossie in da_planilha:
+                erros.append(f'Nº Dossiê "{n_dossie}" repetido na planilha (linha {da_planilha[n_dossie]})')
+
+            if erros:
+                resultado['erros'].append({
+                    'linha': numero, 'n_dossie': n_dossie,
+                    'nome': registro.get('nome') or '', 'erros': erros
+                })
+                continue
+
+            da_planilha[n_dossie] = numero
+            registro.update(id_escola=id_escola, usuario_cadastro_id=usuario_id, dt_cadastro=agora)
+            lote.append(registro)
+            if len(lote) >= tamanho_lote:
+                resultado['importados'] += self._gravar(lote, simular)
+                lote = []
+
+        if lote:
+            resultado['importados'] += self._gravar(lote, simular)
+
+        resultado['segundos'] = round(time.perf_counter() - inicio, 2)
+        return resultado
+
+    def _gravar(self, lote, simular):
+        """Insere um lote (INSERT multi-valores) e atualiza as estatísticas da escola"""
+        if simular:
+            return len(lote)
+        try:
+            db.session.bulk_insert_mappings(Dossie, lote)
+            # bulk_insert_mappings não dispara os listeners de EstatisticaEscola
+            EstatisticaEscola.somar_insercoes(Dossie, lote)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return len(lote)
+
+    def _pasta_relatorios(self):
+        pasta = os.path.join(current_app.instance_path, 'importacoes')
+        os.makedirs(pasta, exist_ok=True)
+        return pasta
+
+    def caminho_relatorio(self, token, usuario_id):
+        """Arquivo do relatório (apenas do usuário que importou)"""
+        if not re.fullmatch(r'[0-9a-f]{32}', token or ''):
+            return None
+        caminho = os.path.join(self._pasta_relatorios(), f'{usuario_id}_{token}.csv')
+        return caminho if os.path.isfile(caminho) else None
+
+    def salvar_relatorio(self, resultado, usuario_id):
+        """
+        Grava o relatório de erros em CSV para download
+
+        Returns:
+            str: Token do relatório
+        """
+        pasta = self._pasta_relatorios()
+        limite = time.time() - VALIDADE_RELATORIO.total_seconds()
+        for nome in os.listdir(pasta):
+            caminho = os.path.join(pasta, nome)
+            try:
+                if os.path.getmtime(caminho) < limite:
+                    os.remove(caminho)
+            except OSError:
+                pass
+
+        token = uuid.uuid4().hex
+        linhas = (
+            (erro['linha'], erro['n_dossie'], erro['nome'], '; '.join(erro['erros']))
+            for erro in resultado['erros']
+        )
+        with open(os.path.join(pasta, f'{usuario_id}_{token}.csv'), 'w', encoding='utf-8', newline='') as arquivo:
+            for bloco in gerar_csv(['Linha', 'Nº Dossiê', 'Aluno', 'Erros'], linhas):
+                arquivo.write(bloco)
+        return token
+
+
+# Instância global do serviço
+importador_dossies = ImportadorDossies()
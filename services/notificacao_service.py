@@ -0,0 +1,264 @@
+# services/notificacao_service.py
+"""
+Notificações da escola (sino da barra de navegação)
+
+Leitura: as notificações são geradas fora da requisição (varredura de
+empréstimos em atraso, bloqueio de usuário) e a consulta lê apenas as não
+lidas da escola, pelo índice (escola_id, lida_em, id).
+
+Entrega: o navegador abre um stream Server-Sent Events (/notificacoes/stream)
+e recebe o estado uma única vez na conexão; depois disso só chegam os
+deltas ('nova' e 'lidas'), publicados após o commit de quem alterou as
+notificações. Cliente parado não executa consulta alguma.
+
+O canal é em memória (um processo). Com vários workers do gunicorn, ou com
+a varredura rodando no cron, defina NOTIFICACOES_REDIS_URL: os eventos são
+publicados no Redis e cada processo repassa aos seus assinantes.
+
+Capacidade: cada stream aberto ocupa uma thread do worker enquanto durar
+(NOTIFICACOES_SSE_DURACAO). Por isso cada processo aceita no máximo
+NOTIFICACOES_SSE_MAXIMO streams simultâneos, abaixo do número de threads
+do worker (--threads); acima disso o stream responde 503 e o navegador
+passa a consultar /notificacoes periodicamente, sem ocupar uma thread.
+"""
+
+import json
+import os
+import queue
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, Notificacao
+from models.notificacao import marcar_lidas
+
+try:
+    import redis
+except ImportError:  # Redis é opcional (apenas para vários processos)
+    redis = None
+
+# Quantidade de notificações devolvidas por consulta
+LIMITE_PADRAO = 20
+
+# Eventos aguardando um assinante lento; acima disso o navegador reconecta
+FILA_ASSINATURA = 100
+
+CANAL_REDIS = 'dossie:notificacoes'
+
+
+class LimiteConexoes(Exception):
+    """Processo já atende NOTIFICACOES_SSE_MAXIMO streams"""
+
+
+class Assinatura:
+    """Fila de eventos de um navegador conectado"""
+
+    def __init__(self, escola_id, admin):
+        self.escola_id = escola_id
+        self.admin = admin
+        self.fila = queue.Queue(maxsize=FILA_ASSINATURA)
+        self.perdeu_eventos = False
+
+    def entregar(self, evento):
+        if evento.get('evento') == 'nova' and evento['notificacao'].get('apenas_admin') and not self.admin:
+            return
+        try:
+            self.fila.put_nowait(evento)
+        except queue.Full:
+            # Navegador não está consumindo: o stream é encerrado e ele reconecta com o estado atual
+            self.perdeu_eventos = True
+
+    def proximo(self, timeout):
+        """Próximo evento ou None após `timeout` segundos sem eventos"""
+        try:
+            return self.fila.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class CanalNotificacoes:
+    """Pub/sub de eventos de notificação por escola"""
+
+    def __init__(self):
+        self.app = None
+        self.redis_url = None
+        self.maximo = None
+        self._redis = None
+        self._assinaturas = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        """Lê a configuração e publica os eventos registrados nas sessões após cada commit"""
+        self.app = app
+        self.redis_url = app.config.setdefault('NOTIFICACOES_REDIS_URL', None)
+        app.config.setdefault('NOTIFICACOES_SSE_DURACAO', 300)
+        app.config.setdefault('NOTIFICACOES_SSE_PING', 25)
+        self.maximo = app.config.setdefault('NOTIFICACOES_SSE_MAXIMO', 8)
+        app.extensions['canal_notificacoes'] = self
+        if self.redis_url and redis is None:
+            app.logger.warning('NOTIFICACOES_REDIS_URL definido, mas o pacote redis não está instalado; '
+                               'usando canal em memória')
+        if not event.contains(Session, 'after_commit', self._apos_commit):
+            event.listen(Session, 'after_commit', self._apos_commit)
+            event.listen(Session, 'after_rollback', self._apos_rollback)
+
+    def _cliente_redis(self):
+        if self.redis_url and redis is not None and self._redis is None:
+            self._redis = redis.Redis.from_url(self.redis_url)
+        return self._redis
+
+    # Publicação
+
+    def _apos_commit(self, session):
+        for escola_id, evento in session.info.pop('eventos_notificacao', []):
+            self.publicar(escola_id, evento)
+
+    def _apos_rollback(self, session):
+        session.info.pop('eventos_notificacao', None)
+
+    def publicar(self, escola_id, evento):
+        """Envia um evento aos navegadores conectados da escola (em todos os processos, com Redis)"""
+        cliente = self._cliente_redis()
+        if cliente is not None:
+            try:
+                cliente.publish(CANAL_REDIS, json.dumps({'escola_id': escola_id, 'evento': evento}))
+                return
+            except Exception as e:
+                if self.app is not None:
+                    self.app.logger.error(f'Falha ao publicar notificação no Redis: {e}')
+        self._entregar(escola_id, evento)
+
+    def _entregar(self, escola_id, evento):
+        with self._lock:
+            assinaturas = list(self._assinaturas.get(int(escola_id), ()))
+        for assinatura in assinaturas:
+            assinatura.entregar(evento)
+
+    # Assinatura
+
+    def assinar(self, escola_id, admin=False):
+        """
+        Registra um navegador conectado à escola
+
+        Raises:
+            LimiteConexoes: o processo já atende o máximo de streams
+        """
+        self._garantir_ouvinte_redis()
+        assinatura = Assinatura(int(escola_id), admin)
+        with self._lock:
+            if self.maximo is not None and self._total() >= self.maximo:
+                raise LimiteConexoes(self.maximo)
+            self._assinaturas.setdefault(assinatura.escola_id, set()).add(assinatura)
+        return assinatura
+
+    def cancelar(self, assinatura):
+        with self._lock:
+            assinaturas = self._assinaturas.get(assinatura.escola_id)
+            if assinaturas is not None:
+                assinaturas.discard(assinatura)
+                if not assinaturas:
+                    del self._assinaturas[assinatura.escola_id]
+
+    def conectados(self):
+        """Quantidade de navegadores conectados neste processo"""
+        with self._lock:
+            return self._total()
+
+    def _total(self):
+        # Chamado com self._lock adquirido
+        return sum(len(assinaturas) for assinaturas in self._assinaturas.values())
+
+    def _garantir_ouvinte_redis(self):
+        """Thread que repassa aos assinantes locais os eventos publicados no Redis (uma por processo)"""
+        if self._cliente_redis() is None:
+            return
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                self._redis = None
+            self._pid = pid
+            self._thread = threading.Thread(target=self._ouvir_redis, name='notificacoes-redis', daemon=True)
+            self._thread.start()
+
+    def _ouvir_redis(self):
+        pubsub = self._cliente_redis().pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(CANAL_REDIS)
+            for mensagem in pubsub.listen():
+                try:
+                    dados = json.loads(mensagem['data'])
+                    self._entregar(dados['escola_id'], dados['evento'])
+                except (ValueError, KeyError, TypeError):
+                    continue
+        except Exception as e:
+            if self.app is not None:
+                # A próxima assinatura (reconexão de um navegador) inicia outra thread
+                self.app.logger.error(f'Conexão com o Redis de notificações perdida: {e}')
+        finally:
+            pubsub.close()
+
+
+class CentralNotificacoes:
+    """Consulta e marcação de leitura das notificações por escola"""
+
+    def _nao_lidas(self, escola_id, admin=False):
+        query = Notificacao.query.filter(
+            Notificacao.escola_id == escola_id,
+            Notificacao.lida_em.is_(None)
+        )
+        if not admin:
+            query = query.filter(db.or_(Notificacao.apenas_admin.is_(None), Notificacao.apenas_admin.is_(False)))
+        return query
+
+    def listar(self, escola_id, admin=False, limite=LIMITE_PADRAO):
+        """
+        Notificações não lidas da escola, mais recentes primeiro
+
+        Returns:
+            dict: {'nao_lidas': total, 'notificacoes': [dict, ...]}
+        """
+        query = self._nao_lidas(escola_id, admin)
+        itens = query.order_by(Notificacao.id.desc()).limit(limite).all()
+        total = len(itens) if len(itens) < limite else query.count()
+        return {
+            'nao_lidas': total,
+            'notificacoes': [notificacao.to_dict() for notificacao in itens]
+        }
+
+    def marcar_lidas(self, escola_id, ids=None, admin=False):
+        """
+        Marca notificações da escola como lidas (os navegadores conectados recebem o evento 'lidas')
+
+        Args:
+            escola_id (int): Escola do usuário
+            ids (list): IDs das notificações; None marca todas
+            admin (bool): Inclui as notificações exclusivas de administradores
+
+        Returns:
+            int: Quantidade de notificações marcadas
+        """
+        tabela = Notificacao.__table__
+        condicoes = [tabela.c.escola_id == escola_id]
+        if ids is not None:
+            condicoes.append(tabela.c.id.in_(ids))
+        if not admin:
+            condicoes.append(db.or_(tabela.c.apenas_admin.is_(None), tabela.c.apenas_admin.is_(False)))
+        try:
+            marcadas = marcar_lidas(db.session, db.session.connection(), *condicoes)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return marcadas
+
+
+# Instâncias globais dos serviços
+canal_notificacoes = CanalNotificacoes()
+central_notificacoes = CentralNotificacoes()
@@ -0,0 +1,314 @@
+# services/retencao_logs_service.py
+"""
+Particionamento mensal e retenção dos logs de auditoria e de sistema
+
+PostgreSQL: logs_auditoria e logs_sistema são particionadas por RANGE
+(data_hora), uma partição por mês ({tabela}_AAAA_MM) e uma partição
+padrão ({tabela}_padrao) para datas sem partição. Consultas com intervalo
+de datas leem apenas as partições do intervalo.
+
+SQLite: tabela única com índice em data_hora; a retenção remove os meses
+antigos por intervalo.
+
+Retenção: meses anteriores a AUDITORIA_RETENCAO_MESES são resumidos em
+logs_resumo_mensal, gravados em {LOGS_ARQUIVO_DIR}/{tabela}_AAAA_MM.jsonl.gz
+e então removidos (DETACH + DROP da partição no PostgreSQL).
+"""
+
+import gzip
+import json
+import os
+import re
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, select, text
+
+from models import db, LogAuditoria, LogSistema, LogResumoMensal
+
+# Meses mantidos nas tabelas de log (o mês atual conta como 1)
+RETENCAO_MESES_PADRAO = 12
+# Partições criadas antecipadamente
+MESES_A_FRENTE = 3
+# Período padrão das telas de consulta de logs
+PERIODO_PADRAO_DIAS = 30
+# Diretório dos arquivos de logs antigos
+DIRETORIO_ARQUIVO_PADRAO = os.path.join('arquivos', 'logs')
+
+# tabela -> (modelo, origem no resumo, coluna da categoria, coluna do item)
+TABELAS_LOG = {
+    'logs_auditoria': (LogAuditoria, LogResumoMensal.AUDITORIA, 'acao', 'item_alterado'),
+    'logs_sistema': (LogSistema, LogResumoMensal.SISTEMA, 'nivel_erro', 'modulo'),
+}
+
+
+def mes_relativo(data, deslocamento=0):
+    """Primeiro dia do mês de `data` deslocado de `deslocamento` meses"""
+    indice = data.year * 12 + (data.month - 1) + deslocamento
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def nome_particao(tabela, mes):
+    """Nome da partição mensal de uma tabela de log"""
+    return f'{tabela}_{mes.year:04d}_{mes.month:02d}'
+
+
+def _limites(mes):
+    """Intervalo [início, fim) do mês como datetime"""
+    proximo = mes_relativo(mes, 1)
+    return datetime(mes.year, mes.month, 1), datetime(proximo.year, proximo.month, 1)
+
+
+class RetencaoLogs:
+    """Manutenção das partições e da retenção dos logs"""
+
+    def _dialeto(self):
+        return db.engine.dialect.name
+
+    def particionada(self, conexao, tabela):
+        """Verifica se a tabela é particionada (apenas PostgreSQL)"""
+        if conexao.dialect.name != 'postgresql':
+            return False
+        return conexao.execute(
+            text("SELECT relkind FROM pg_class WHERE relname = :tabela"), {'tabela': tabela}
+        ).scalar() == 'p'
+
+    def particoes(self, conexao, tabela):
+        """
+        Partições mensais existentes
+
+        Returns:
+            dict: {mes (date): nome da partição}
+        """
+        nomes = conexao.execute(text(
+            "SELECT filha.relname FROM pg_inherits "
+            "JOIN pg_class filha ON filha.oid = pg_inherits.inhrelid "
+            "JOIN pg_class mae ON mae.oid = pg_inherits.inhparent "
+            "WHERE mae.relname = :tabela"
+        ), {'tabela': tabela}).scalars().all()
+
+        padrao = re.compile(rf'^{tabela}_(\d{{4}})_(\d{{2}})$')
+        encontradas = {}
+        for nome in nomes:
+            combinacao = padrao.match(nome)
+            if combinacao:
+                encontradas[date(int(combinacao.group(1)), int(combinacao.group(2)), 1)] = nome
+        return encontradas
+
+    def _criar_particao(self, conexao, tabela, mes):
+        """
+        Cria a partição do mês movendo antes as linhas do intervalo que
+        estejam na partição padrão (o ATTACH falharia com elas lá)
+        """
+        particao = nome_particao(tabela, mes)
+        inicio, fim = _limites(mes)
+        intervalo = {'inicio': inicio, 'fim': fim}
+
+        conexao.execute(text(f"CREATE TABLE {particao} (LIKE {tabela} INCLUDING DEFAULTS)"))
+        conexao.execute(text(
+            f"WITH movidas AS (DELETE FROM {tabela}_padrao "
+            f"WHERE data_hora >= :inicio AND data_hora < :fim RETURNING *) "
+            f"INSERT INTO {particao} SELECT * FROM movidas"
+        ), intervalo)
+        conexao.execute(text(
+            f"ALTER TABLE {tabela} ATTACH PARTITION {particao} "
+            f"FOR VALUES FROM ('{inicio.isoformat()}') TO ('{fim.isoformat()}')"
+        ))
+        return particao
+
+    def criar_particoes(self, meses_a_frente=MESES_A_FRENTE, hoje=None):
+        """
+        Garante as partições do mês atual e dos próximos meses
+
+        Returns:
+            list: Nomes das partições criadas
+        """
+        if self._dialeto() != 'postgresql':
+            return []
+
+        hoje = hoje or date.today()
+        criadas = []
+        with db.engine.begin() as conexao:
+            for tabela in TABELAS_LOG:
+                if not self.particionada(conexao, tabela):
+                    continue
+                existentes = self.particoes(conexao, tabela)
+                for deslocamento in range(meses_a_frente + 1):
+                    mes = mes_relativo(hoje, deslocamento)
+                    if mes not in existentes:
+                        criadas.append(self._criar_particao(conexao, tabela, mes))
+        return criadas
+
+    def aplicar_retencao(self, meses=None, arquivar=True, diretorio=None, hoje=None):
+        """
+        Resume, arquiva e remove os meses anteriores ao período de retenção
+
+        Args:
+            meses (int): Meses mantidos (padrão: AUDITORIA_RETENCAO_MESES)
+            arquivar (bool): Gravar os registros em .jsonl.gz antes de remover
+            diretorio (str): Destino dos arquivos (padrão: LOGS_ARQUIVO_DIR)
+            hoje (date): Data de referência
+
+        Returns:
+            list: [{'tabela', 'mes', 'registros', 'arquivo'}, ...]
+        """
+        meses = meses or current_app.config.get('AUDITORIA_RETENCAO_MESES', RETENCAO_MESES_PADRAO)
+        diretorio = diretorio or current_app.config.get('LOGS_ARQUIVO_DIR', DIRETORIO_ARQUIVO_PADRAO)
+        corte = mes_relativo(hoje or date.today(), -(meses - 1))
+        limite_corte = datetime(corte.year, corte.month, 1)
+
+        processados = []
+        for tabela, (modelo, _, _, _) in TABELAS_LOG.items():
+            mais_antigo = db.session.query(func.min(modelo.data_hora)).filter(
+                modelo.data_hora < limite_corte
+            ).scalar()
+            db.session.rollback()
+            if not mais_antigo:
+                continue
+
+            mes = mes_relativo(mais_antigo)
+            while mes < corte:
+                resultado = self._processar_mes(tabela, mes, arquivar, diretorio)
+                if resultado['registros']:
+                    processados.append(resultado)
+                mes = mes_relativo(mes, 1)
+
+        return processados
+
+    def _processar_mes(self, tabela, mes, arquivar, diretorio):
+        """Arquiva, resume e remove um mês de uma tabela de log"""
+        modelo, origem, coluna_categoria, coluna_item = TABELAS_LOG[tabela]
+        colunas = modelo.__table__.c
+        inicio, fim = _limites(mes)
+        no_mes = (colunas.data_hora >= inicio) & (colunas.data_hora < fim)
+
+        arquivo = None
+        registros = 0
+        if arquivar:
+            arquivo, registros = self._arquivar(modelo.__table__, no_mes, tabela, mes, diretorio)
+
+        with db.engine.begin() as conexao:
+            grupos = conexao.execute(
+                select(
+                    func.coalesce(colunas.usuario_id, 0),
+                    func.coalesce(colunas[coluna_categoria], ''),
+                    func.coalesce(colunas[coluna_item], ''),
+                    func.count()
+                ).where(no_mes).group_by(
+                    func.coalesce(colunas.usuario_id, 0),
+                    func.coalesce(colunas[coluna_categoria], ''),
+                    func.coalesce(colunas[coluna_item], '')
+                )
+            ).all()
+
+            total = sum(grupo[3] for grupo in grupos)
+            if not total:
+                return {'tabela': tabela, 'mes': mes, 'registros': 0, 'arquivo': arquivo}
+
+            for usuario_id, categoria, item, quantidade in grupos:
+                self._somar_resumo(conexao, origem, mes, usuario_id, categoria[:100], item[:100], quantidade)
+
+            particao = None
+            if self.particionada(conexao, tabela):
+                particao = self.particoes(conexao, tabela).get(mes)
+            if particao:
+                conexao.execute(text(f"ALTER TABLE {tabela} DETACH PARTITION {particao}"))
+                conexao.execute(text(f"DROP TABLE {particao}"))
+            # Linhas restantes do mês (partição padrão ou tabela não particionada)
+            conexao.execute(modelo.__table__.delete().where(no_mes))
+
+        return {'tabela': tabela, 'mes': mes, 'registros': registros or total, 'arquivo': arquivo}
+
+    def _arquivar(self, tabela, filtro, nome, mes, diretorio):
+        """
+        Grava os registros do mês em JSON lines comprimido (anexando se já existir)
+
+        Returns:
+            tuple: (caminho do arquivo, quantidade de registros)
+        """
+        os.makedirs(diretorio, exist_ok=True)
+        caminho = os.path.join(diretorio, f'{nome_particao(nome, mes)}.jsonl.gz')
+
+        registros = 0
+        with db.engine.connect() as conexao, gzip.open(caminho, 'at', encoding='utf-8') as arquivo:
+            linhas = conexao.execution_options(yield_per=1000).execute(
+                select(tabela).where(filtro).order_by(tabela.c.data_hora)
+            )
+            for linha in linhas.mappings():
+                arquivo.write(json.dumps(dict(linha), default=str, ensure_ascii=False))
+                arquivo.write('\n')
+                registros += 1
+
+        if not registros:
+            return None, 0
+        return caminho, registros
+
+    def _somar_resumo(self, conexao, origem, mes, usuario_id, categoria, item, quantidade):
+        """Soma `quantidade` na linha de resumo (cria se não existir)"""
+        tabela = LogResumoMensal.__table__
+        valores = dict(origem=origem, mes=mes, usuario_id=usuario_id, categoria=categoria, item=item)
+
+        dialeto = conexao.dialect.name
+        if dialeto in ('postgresql', 'sqlite'):
+            if dialeto == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            conexao.execute(insert(tabela).values(total=quantidade, **valores).on_conflict_do_update(
+                index_elements=list(valores),
+                set_={'total': tabela.c.total + quantidade}
+            ))
+            return
+
+        resultado = conexao.execute(
+            tabela.update().where(*[tabela.c[coluna] == valor for coluna, valor in valores.items()])
+            .values(total=tabela.c.total + quantidade)
+        )
+        if resultado.rowcount == 0:
+            conexao.execute(tabela.insert().values(total=quantidade, **valores))
+
+
+def ler_periodo(args, dias_padrao=PERIODO_PADRAO_DIAS):
+    """
+    Lê 'inicio' e 'fim' (AAAA-MM-DD) dos parâmetros da requisição
+
+    Returns:
+        tuple: (inicio, fim) como date; padrão = últimos `dias_padrao` dias
+    """
+    def _data(valor):
+        try:
+            return datetime.strptime(valor, '%Y-%m-%d').date() if valor else None
+        except ValueError:
+            return None
+
+    fim = _data(args.get('fim')) or date.today()
+    inicio = _data(args.get('inicio')) or fim - timedelta(days=dias_padrao - 1)
+    if inicio > fim:
+        inicio, fim = fim, inicio
+    return inicio, fim
+
+
+def filtrar_periodo(query, modelo, inicio=None, fim=None):
+    """
+    Restringe uma query de log a [inicio, fim]; no PostgreSQL o intervalo
+    faz o planejador ler apenas as partições dos meses envolvidos
+
+    Args:
+        query: Query de LogAuditoria ou LogSistema
+        modelo: Modelo consultado
+        inicio (date|datetime): Primeiro dia (inclusivo)
+        fim (date|datetime): Último dia (inclusivo)
+    """
+    if inicio:
+        query = query.filter(modelo.data_hora >= inicio)
+    if fim:
+        if not isinstance(fim, datetime):
+            fim = datetime(fim.year, fim.month, fim.day) + timedelta(days=1)
+            query = query.filter(modelo.data_hora < fim)
+        else:
+            query = query.filter(modelo.data_hora <= fim)
+    return query
+
+
+# Instância global do serviço
+retencao_logs = RetencaoLogs()
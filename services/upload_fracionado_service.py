@@ -0,0 +1,255 @@
+# services/upload_fracionado_service.py
+"""
+Upload fracionado e retomável de anexos grandes
+
+O cliente abre uma sessão informando nome e tamanho do arquivo e envia as
+partes (TAMANHO_PARTE bytes cada, em qualquer ordem e em paralelo), cada
+uma em uma requisição curta: nenhum worker fica preso durante um upload
+lento e uma queda de conexão só perde a parte em trânsito. A lista das
+partes recebidas permite retomar o envio de onde parou.
+
+Cada parte é gravada em {ANEXOS_DIR}/sessoes/<id>/<indice> com verificação
+do SHA-256 enviado no cabeçalho X-Checksum-SHA256. Na conclusão, as
+partes são lidas em sequência e copiadas direto para o blob store
+(armazenamento_anexos.gravar), com memória constante por upload.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from models import db, SessaoUpload
+from services.armazenamento_service import armazenamento_anexos
+
+# Tamanho de cada parte: abaixo do MAX_CONTENT_LENGTH de uma requisição
+TAMANHO_PARTE_PADRAO = 8 * 1024 * 1024
+
+# Maior arquivo aceito pelo upload fracionado
+TAMANHO_MAXIMO_PADRAO = 512 * 1024 * 1024
+
+# Sessões sem atividade por mais que isso são descartadas
+VALIDADE_PADRAO = timedelta(hours=24)
+
+_BLOCO = 256 * 1024
+_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ParteInvalida(ValueError):
+    """Parte recebida não confere com o tamanho ou o checksum esperados"""
+
+
+class UploadIncompleto(ValueError):
+    """Conclusão pedida antes de todas as partes serem recebidas"""
+
+
+class _LeitorPartes:
+    """Lê as partes gravadas em sequência, como um único arquivo"""
+
+    def __init__(self, caminhos):
+        self._caminhos = list(caminhos)
+        self._atual = None
+
+    def read(self, tamanho=-1):
+        while True:
+            if self._atual is None:
+                if not self._caminhos:
+                    return b''
+                self._atual = open(self._caminhos.pop(0), 'rb')
+            bloco = self._atual.read(tamanho)
+            if bloco:
+                return bloco
+            self._atual.close()
+            self._atual = None
+
+    def close(self):
+        if self._atual is not None:
+            self._atual.close()
+            self._atual = None
+
+
+class UploadsFracionados:
+    """Sessões de upload em partes dos anexos"""
+
+    def tamanho_parte(self):
+        return current_app.config.get('UPLOAD_TAMANHO_PARTE', TAMANHO_PARTE_PADRAO)
+
+    def tamanho_maximo(self):
+        return current_app.config.get('UPLOAD_TAMANHO_MAXIMO', TAMANHO_MAXIMO_PADRAO)
+
+    def pasta(self, sessao_id):
+        """Pasta das partes de uma sessão"""
+        return os.path.join(armazenamento_anexos.raiz(), 'sessoes', sessao_id)
+
+    def _caminho_parte(self, sessao_id, indice):
+        return os.path.join(self.pasta(sessao_id), f'{indice:06d}')
+
+    def iniciar(self, dossie_id, usuario_id, nome, tamanho, sha256=None, nome_personalizado=None):
+        """
+        Abre uma sessão de upload
+
+        Raises:
+            ValueError: tamanho inválido ou acima do máximo, hash mal formado
+        """
+        if tamanho <= 0:
+            raise ValueError('Tamanho do arquivo inválido')
+        if tamanho > self.tamanho_maximo():
+            raise ValueError(f'Arquivo muito grande (máximo {self.tamanho_maximo() // (1024 * 1024)}MB)')
+        if sha256 and not _SHA256.match(sha256):
+            raise ValueError('SHA-256 do arquivo inválido')
+
+        sessao = SessaoUpload(
+            dossie_id=dossie_id,
+            usuario_id=usuario_id,
+            nome=nome,
+            nome_personalizado=nome_personalizado or None,
+            tamanho=tamanho,
+            tamanho_parte=self.tamanho_parte(),
+            sha256=sha256 or None
+        )
+        db.session.add(sessao)
+        db.session.commit()
+        os.makedirs(self.pasta(sessao.id), exist_ok=True)
+        return sessao
+
+    def partes_recebidas(self, sessao):
+        """Índices das partes já gravadas"""
+        try:
+            nomes = os.listdir(self.pasta(sessao.id))
+        except FileNotFoundError:
+            return []
+        return sorted(int(nome) for nome in nomes if nome.isdigit())
+
+    def situacao(self, sessao):
+        """Dados da sessão com as partes recebidas e as que faltam"""
+        recebidas = self.partes_recebidas(sessao)
+        faltando = sorted(set(range(sessao.total_partes)) - set(recebidas))
+        dados = sessao.to_dict()
+        dados.update(recebidas=recebidas, faltando=faltando)
+        return dados
+
+    def receber_parte(self, sessao, indice, stream, checksum=None):
+        """
+        Grava uma parte lida do corpo da requisição
+
+        Args:
+            sessao (SessaoUpload): Sessão aberta
+            indice (int): Posição da parte (a partir de 0)
+            stream: Corpo da requisição (lido em blocos)
+            checksum (str): SHA-256 hexadecimal da parte (recomendado)
+
+        Returns:
+            str: SHA-256 da parte recebida
+
+        Raises:
+            ParteInvalida: índice, tamanho ou checksum não conferem
+        """
+        esperado = sessao.tamanho_da_parte(indice)
+        if esperado is None:
+            raise ParteInvalida(f'Parte {indice} fora do intervalo (0 a {sessao.total_partes - 1})')
+
+        destino = self._caminho_parte(sessao.id, indice)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        temporario = f'{destino}.{uuid.uuid4().hex}.tmp'
+
+        resumo = hashlib.sha256()
+        tamanho = 0
+        try:
+            with open(temporario, 'wb') as arquivo:
+                while True:
+                    bloco = stream.read(_BLOCO)
+                    if not bloco:
+                        break
+                    tamanho += len(bloco)
+                    if tamanho > esperado:
+                        raise ParteInvalida(f'Parte {indice} maior que o esperado ({esperado} bytes)')
+                    resumo.update(bloco)
+                    arquivo.write(bloco)
+
+            if tamanho != esperado:
+                raise ParteInvalida(f'Parte {indice} incompleta: {tamanho} de {esperado} bytes')
+            if checksum and checksum.lower() != resumo.hexdigest():
+                raise ParteInvalida(f'Checksum da parte {indice} não confere')
+
+            os.replace(temporario, destino)
+        except BaseException:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+
+        sessao.atualizado_em = datetime.now()
+        db.session.commit()
+        return resumo.hexdigest()
+
+    def concluir(self, sessao):
+        """
+        Monta o arquivo no blob store a partir das partes
+
+        Returns:
+            tuple: (sha256, tamanho)
+
+        Raises:
+            UploadIncompleto: faltam partes
+            ParteInvalida: tamanho ou hash final não conferem
+        """
+        recebidas = self.partes_recebidas(sessao)
+        if len(recebidas) != sessao.total_partes:
+            faltando = sessao.total_partes - len(recebidas)
+            raise UploadIncompleto(f'Faltam {faltando} parte(s) de {sessao.total_partes}')
+
+        leitor = _LeitorPartes(self._caminho_parte(sessao.id, indice) for indice in recebidas)
+        try:
+            sha256, tamanho, _ = armazenamento_anexos.gravar(leitor, sessao.tamanho)
+        finally:
+            leitor.close()
+
+        # O blob gravado sem anexo fica sem referências e é removido pela limpeza
+        if tamanho != sessao.tamanho:
+            raise ParteInvalida(f'Tamanho final {tamanho} difere do informado ({sessao.tamanho})')
+        if sessao.sha256 and sessao.sha256 != sha256:
+            raise ParteInvalida('SHA-256 do arquivo montado não confere')
+        return sha256, tamanho
+
+    def encerrar(self, sessao):
+        """
+        Remove a sessão e suas partes (após concluir ou cancelar)
+
+        Confirma a transação corrente (ex: junto com o Anexo criado) antes
+        de apagar as partes, que continuam disponíveis se o commit falhar.
+        """
+        pasta = self.pasta(sessao.id)
+        db.session.delete(sessao)
+        db.session.commit()
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    def limpar_expiradas(self, validade=VALIDADE_PADRAO, agora=None):
+        """
+        Remove sessões sem atividade e pastas de partes sem sessão
+
+        Returns:
+            int: Sessões/pastas removidas
+        """
+        limite = (agora or datetime.now()) - validade
+        removidas = 0
+
+        for sessao in SessaoUpload.query.filter(SessaoUpload.atualizado_em < limite).all():
+            self.encerrar(sessao)
+            removidas += 1
+
+        raiz = os.path.join(armazenamento_anexos.raiz(), 'sessoes')
+        if os.path.isdir(raiz):
+            ativas = set(db.session.execute(db.select(SessaoUpload.id)).scalars())
+            for nome in os.listdir(raiz):
+                caminho = os.path.join(raiz, nome)
+                if nome not in ativas and os.path.getmtime(caminho) < limite.timestamp():
+                    shutil.rmtree(caminho, ignore_errors=True)
+                    removidas += 1
+        return removidas
+
+
+# Instância global do serviço
+uploads_fracionados = UploadsFracionados()
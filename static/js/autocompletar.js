@@ -0,0 +1,163 @@
+/**
+ * Campo de busca com sugestões do servidor (autocompletar)
+ *
+ * O termo digitado é enviado ao endpoint após uma pausa na digitação
+ * (ESPERA), e só a última requisição é considerada. As respostas ficam em
+ * memória por termo; o cache é limpo quando a janela volta ao foco (um
+ * cadastro feito em outra aba passa a aparecer).
+ *
+ * Uso:
+ *   Autocompletar.criar({
+ *       campo: input de texto, valor: input hidden com o id,
+ *       url: endpoint (?q=), rotulo: item => texto exibido no campo,
+ *       descrever: item => HTML da sugestão (já escapado),
+ *       selecionar: item => ... (null ao limpar)
+ *   });
+ */
+const Autocompletar = (function () {
+    const ESPERA = 250;
+    const instancias = [];
+
+    function escapar(texto) {
+        const div = document.createElement('div');
+        div.textContent = texto || '';
+        return div.innerHTML;
+    }
+
+    function criar(opcoes) {
+        const campo = opcoes.campo;
+        const valor = opcoes.valor;
+        const minimo = opcoes.minimo || 2;
+        const cache = new Map();
+
+        const lista = document.createElement('div');
+        lista.className = 'list-group position-absolute w-100 shadow-sm d-none';
+        lista.style.zIndex = 1050;
+        lista.style.maxHeight = '18rem';
+        lista.style.overflowY = 'auto';
+        campo.parentNode.classList.add('position-relative');
+        campo.parentNode.appendChild(lista);
+
+        let itens = [];
+        let ativo = -1;
+        let temporizador = null;
+        let controle = null;
+        let selecionado = valor.value ? campo.value : null;
+
+        function fechar() {
+            lista.classList.add('d-none');
+            ativo = -1;
+        }
+
+        function exibir(resultados) {
+            itens = resultados;
+            ativo = -1;
+            if (!resultados.length) {
+                lista.innerHTML = '<div class="list-group-item small text-muted">Nenhum resultado encontrado.</div>';
+            } else {
+                lista.innerHTML = resultados.map((item, indice) => `
+                    <button type="button" class="list-group-item list-group-item-action small" data-indice="${indice}">
+                        ${opcoes.descrever(item)}
+                    </button>`).join('');
+            }
+            lista.classList.remove('d-none');
+        }
+
+        function destacar(indice) {
+            const botoes = lista.querySelectorAll('[data-indice]');
+            if (!botoes.length) {
+                return;
+            }
+            ativo = (indice + botoes.length) % botoes.length;
+            botoes.forEach((botao, i) => botao.classList.toggle('active', i === ativo));
+            botoes[ativo].scrollIntoView({block: 'nearest'});
+        }
+
+        function selecionar(item) {
+            valor.value = item ? item.id : '';
+            campo.value = item ? opcoes.rotulo(item) : '';
+            selecionado = item ? campo.value : null;
+            fechar();
+            if (opcoes.selecionar) {
+                opcoes.selecionar(item);
+            }
+        }
+
+        function buscar(termo) {
+            if (cache.has(termo)) {
+                exibir(cache.get(termo));
+                return;
+            }
+            if (controle) {
+                controle.abort();
+            }
+            controle = window.AbortController ? new AbortController() : null;
+            const url = opcoes.url + (opcoes.url.includes('?') ? '&' : '?') + 'q=' + encodeURIComponent(termo);
+            fetch(url, {headers: {'Accept': 'application/json'}, signal: controle ? controle.signal : undefined})
+                .then(resposta => resposta.ok ? resposta.json() : Promise.reject(resposta.status))
+                .then(resultados => {
+                    cache.set(termo, resultados);
+                    if (campo.value.trim() === termo) {
+                        exibir(resultados);
+                    }
+                })
+                .catch(erro => {
+                    if (!erro || erro.name !== 'AbortError') {
+                        fechar();
+                    }
+                });
+        }
+
+        campo.setAttribute('autocomplete', 'off');
+
+        campo.addEventListener('input', () => {
+            // Texto editado: a seleção anterior deixa de valer
+            if (selecionado !== null && campo.value !== selecionado) {
+                const texto = campo.value;
+                selecionar(null);
+                campo.value = texto;
+            }
+            clearTimeout(temporizador);
+            const termo = campo.value.trim();
+            if (termo.length < minimo) {
+                fechar();
+                return;
+            }
+            temporizador = setTimeout(() => buscar(termo), ESPERA);
+        });
+
+        campo.addEventListener('keydown', evento => {
+            if (lista.classList.contains('d-none')) {
+                return;
+            }
+            if (evento.key === 'ArrowDown' || evento.key === 'ArrowUp') {
+                evento.preventDefault();
+                destacar(ativo + (evento.key === 'ArrowDown' ? 1 : -1));
+            } else if (evento.key === 'Enter' && ativo >= 0) {
+                evento.preventDefault();
+                selecionar(itens[ativo]);
+            } else if (evento.key === 'Escape') {
+                fechar();
+            }
+        });
+
+        // mousedown: seleciona antes do blur do campo fechar a lista
+        lista.addEventListener('mousedown', evento => {
+            const botao = evento.target.closest('[data-indice]');
+            if (botao) {
+                evento.preventDefault();
+                selecionar(itens[Number(botao.dataset.indice)]);
+            }
+        });
+
+        campo.addEventListener('blur', fechar);
+
+        const instancia = {selecionar, limpar: () => cache.clear()};
+        instancias.push(instancia);
+        return instancia;
+    }
+
+    window.addEventListener('focus', () => instancias.forEach(instancia => instancia.limpar()));
+
+    return {criar, escapar};
+})();
@@ -0,0 +1,148 @@
+/**
+ * Sino de notificações da barra de navegação
+ *
+ * Recebe as notificações pelo stream /notificacoes/stream (Server-Sent
+ * Events): 'estado' na conexão e depois apenas os deltas ('nova' e
+ * 'lidas'). Navegadores sem EventSource consultam /notificacoes
+ * periodicamente; o mesmo acontece quando o servidor recusa o stream (503
+ * no limite de conexões), até uma nova tentativa após NOVA_TENTATIVA.
+ */
+const Notificacoes = (function () {
+    const INTERVALO = 60 * 1000;
+    const LIMITE = 20;
+    const NOVA_TENTATIVA = 5 * 60 * 1000;
+
+    let estado = {nao_lidas: 0, notificacoes: []};
+    let fonte = null;
+    let consulta = null;
+
+    function escapar(texto) {
+        const div = document.createElement('div');
+        div.textContent = texto || '';
+        return div.innerHTML;
+    }
+
+    function exibir(dados) {
+        estado = dados;
+        const contador = document.getElementById('notificacoesContador');
+        const lista = document.getElementById('notificacoesLista');
+        if (!contador || !lista) {
+            return;
+        }
+
+        contador.textContent = dados.nao_lidas > 99 ? '99+' : dados.nao_lidas;
+        contador.classList.toggle('d-none', !dados.nao_lidas);
+
+        if (!dados.notificacoes.length) {
+            lista.innerHTML = '<div class="text-muted small px-3 py-2">Nenhuma notificação.</div>';
+            return;
+        }
+        lista.innerHTML = dados.notificacoes.map(n => `
+            <a class="dropdown-item border-bottom py-2 text-wrap" href="${escapar(n.url) || '#'}" data-id="${n.id}">
+                <div class="small fw-bold text-danger">${escapar(n.titulo)}</div>
+                <div class="small">${escapar(n.mensagem)}</div>
+                <div class="small text-muted">${new Date(n.criada_em).toLocaleString('pt-BR')}</div>
+            </a>`).join('');
+    }
+
+    function nova(notificacao) {
+        // A notificação pode já ter vindo no 'estado' da conexão
+        if (estado.notificacoes.some(n => n.id === notificacao.id)) {
+            return;
+        }
+        exibir({
+            nao_lidas: estado.nao_lidas + 1,
+            notificacoes: [notificacao, ...estado.notificacoes].slice(0, LIMITE)
+        });
+    }
+
+    function lidas(ids) {
+        const restantes = estado.notificacoes.filter(n => !ids.includes(n.id));
+        const removidas = estado.notificacoes.length - restantes.length;
+        if (removidas < ids.length && estado.nao_lidas > estado.notificacoes.length) {
+            // Algumas não estavam na lista exibida (mais de LIMITE não lidas): relê o total
+            atualizar();
+            return;
+        }
+        exibir({nao_lidas: estado.nao_lidas - removidas, notificacoes: restantes});
+    }
+
+    async function atualizar() {
+        try {
+            const resposta = await fetch('/notificacoes/', {headers: {'Accept': 'application/json'}});
+            if (resposta.ok && resposta.headers.get('Content-Type').includes('json')) {
+                exibir(await resposta.json());
+            }
+        } catch (erro) {
+            // Falha de rede: tenta de novo no próximo intervalo
+        }
+    }
+
+    async function marcarLidas(ids) {
+        await fetch('/notificacoes/lidas', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify(ids ? {ids} : {}),
+            keepalive: true  // o clique no item também navega para a movimentação
+        });
+        if (!fonte) {
+            // Com o stream, a marcação chega como evento 'lidas'
+            await atualizar();
+        }
+    }
+
+    function conectar() {
+        fonte = new EventSource('/notificacoes/stream');
+        fonte.addEventListener('estado', evento => exibir(JSON.parse(evento.data)));
+        fonte.addEventListener('nova', evento => nova(JSON.parse(evento.data).notificacao));
+        fonte.addEventListener('lidas', evento => lidas(JSON.parse(evento.data).ids));
+        // Queda e fim do stream: o EventSource reconecta sozinho (campo retry).
+        // Resposta diferente de 200 (503 no limite de conexões) fecha a fonte de vez.
+        fonte.addEventListener('error', () => {
+            if (fonte && fonte.readyState === EventSource.CLOSED) {
+                fonte = null;
+                consultarPeriodicamente();
+                setTimeout(() => {
+                    clearInterval(consulta);
+                    consulta = null;
+                    conectar();
+                }, NOVA_TENTATIVA);
+            }
+        });
+    }
+
+    function consultarPeriodicamente() {
+        atualizar();
+        consulta = setInterval(() => {
+            if (!document.hidden) {
+                atualizar();
+            }
+        }, INTERVALO);
+    }
+
+    function iniciar() {
+        const lista = document.getElementById('notificacoesLista');
+        if (!lista) {
+            return;
+        }
+        lista.addEventListener('click', evento => {
+            const item = evento.target.closest('[data-id]');
+            if (item) {
+                marcarLidas([Number(item.dataset.id)]);
+            }
+        });
+        document.getElementById('notificacoesMarcarLidas').addEventListener('click', evento => {
+            evento.stopPropagation();
+            marcarLidas();
+        });
+
+        if (window.EventSource) {
+            conectar();
+        } else {
+            consultarPeriodicamente();
+        }
+    }
+
+    document.addEventListener('DOMContentLoaded', iniciar);
+    return {atualizar, marcarLidas};
+})();
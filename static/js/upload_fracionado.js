@@ -0,0 +1,126 @@
+/**
+ * Upload fracionado e retomável de anexos grandes
+ *
+ * O arquivo é enviado em partes (tamanho definido pelo servidor), algumas
+ * em paralelo, cada uma com o SHA-256 no cabeçalho X-Checksum-SHA256.
+ * O id da sessão fica no localStorage: reenviar o mesmo arquivo depois de
+ * uma queda de conexão continua das partes que faltam.
+ */
+const UploadFracionado = (function () {
+    // Arquivos acima deste tamanho usam o upload em partes
+    const LIMITE_SIMPLES = 8 * 1024 * 1024;
+    const PARALELAS = 3;
+    const TENTATIVAS = 5;
+
+    function chave(dossieId, arquivo) {
+        return `upload:${dossieId}:${arquivo.name}:${arquivo.size}:${arquivo.lastModified}`;
+    }
+
+    async function sha256(blob) {
+        // crypto.subtle só existe em contexto seguro (HTTPS ou localhost)
+        if (!window.crypto || !window.crypto.subtle) {
+            return null;
+        }
+        const resumo = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+        return Array.from(new Uint8Array(resumo)).map(b => b.toString(16).padStart(2, '0')).join('');
+    }
+
+    function aguardar(ms) {
+        return new Promise(resolve => setTimeout(resolve, ms));
+    }
+
+    async function abrirSessao(dossieId, arquivo) {
+        const salva = localStorage.getItem(chave(dossieId, arquivo));
+        if (salva) {
+            const resposta = await fetch(`/anexos/sessoes/${salva}`);
+            if (resposta.ok) {
+                return (await resposta.json()).sessao;
+            }
+            localStorage.removeItem(chave(dossieId, arquivo));
+        }
+
+        const resposta = await fetch(`/anexos/upload/${dossieId}/sessoes`, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({nome: arquivo.name, tamanho: arquivo.size})
+        });
+        const dados = await resposta.json();
+        if (!dados.success) {
+            throw new Error(dados.message);
+        }
+        localStorage.setItem(chave(dossieId, arquivo), dados.sessao.id);
+        return dados.sessao;
+    }
+
+    async function enviarParte(sessao, arquivo, indice) {
+        const inicio = indice * sessao.tamanho_parte;
+        const parte = arquivo.slice(inicio, inicio + sessao.tamanho_parte);
+        const cabecalhos = {'Content-Type': 'application/octet-stream'};
+        const checksum = await sha256(parte);
+        if (checksum) {
+            cabecalhos['X-Checksum-SHA256'] = checksum;
+        }
+
+        for (let tentativa = 1; ; tentativa++) {
+            let mensagem;
+            try {
+                const resposta = await fetch(`/anexos/sessoes/${sessao.id}/partes/${indice}`, {
+                    method: 'PUT',
+                    headers: cabecalhos,
+                    body: parte
+                });
+                if (resposta.ok) {
+                    return;
+                }
+                if (resposta.status === 404) {
+                    throw new Error('Sessão de upload expirada. Envie o arquivo novamente.');
+                }
+                mensagem = `Falha ao enviar a parte ${indice + 1} (HTTP ${resposta.status})`;
+            } catch (erro) {
+                if (erro.message.startsWith('Sessão')) {
+                    throw erro;
+                }
+                mensagem = erro.message;
+            }
+            if (tentativa >= TENTATIVAS) {
+                throw new Error(mensagem);
+            }
+            await aguardar(1000 * tentativa);
+        }
+    }
+
+    /**
+     * Envia um arquivo ao dossiê
+     * @param {number} dossieId
+     * @param {File} arquivo
+     * @param {function(number)} aoProgredir - fração enviada (0 a 1)
+     */
+    async function enviar(dossieId, arquivo, aoProgredir) {
+        const sessao = await abrirSessao(dossieId, arquivo);
+        const faltando = sessao.faltando.slice();
+        let enviadas = sessao.total_partes - faltando.length;
+        const progresso = () => aoProgredir && aoProgredir(enviadas / sessao.total_partes);
+        progresso();
+
+        async function trabalhador() {
+            while (faltando.length) {
+                await enviarParte(sessao, arquivo, faltando.shift());
+                enviadas++;
+                progresso();
+            }
+        }
+        await Promise.all(Array.from({length: PARALELAS}, trabalhador));
+
+        const resposta = await fetch(`/anexos/sessoes/${sessao.id}/concluir`, {method: 'POST'});
+        const dados = await resposta.json();
+        if (dados.success || !dados.sessao) {
+            localStorage.removeItem(chave(dossieId, arquivo));
+        }
+        if (!dados.success) {
+            throw new Error(dados.message);
+        }
+        return dados;
+    }
+
+    return {LIMITE_SIMPLES, enviar};
+})();
@@ -0,0 +1,95 @@
+# tests/conftest.py
+"""
+Fixtures dos testes: aplicação com SQLite temporário e dados mínimos
+
+As variáveis de ambiente precisam estar definidas antes de importar app.py,
+que cria a instância global da aplicação na importação.
+"""
+
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import event
+
+_DIRETORIO = tempfile.mkdtemp(prefix='dossie_testes_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_DIRETORIO, 'testes.db')}"
+os.environ['EMPRESTIMOS_VARREDURA_SEGUNDOS'] = '0'  # Sem thread de varredura
+os.environ.pop('CONFIG_REDIS_URL', None)
+os.environ.pop('NOTIFICACOES_REDIS_URL', None)
+
+from app import app as _app  # noqa: E402
+from models import db, Perfil, Cidade, Escola, Usuario, Dossie, Movimentacao  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    _app.config.update(TESTING=True)
+    with _app.app_context():
+        db.create_all()
+    yield _app
+
+
+@pytest.fixture(scope='session')
+def dados(app):
+    """Duas escolas, um Administrador Geral, um operador e alguns dossiês com movimentações"""
+    with app.app_context():
+        admin_geral = Perfil(perfil='Administrador Geral')
+        operador = Perfil(perfil='Operador')
+        cidade = Cidade(nome='Cidade Teste', uf='SP')
+        db.session.add_all([admin_geral, operador, cidade])
+        db.session.flush()
+
+        escola_a = Escola(nome='Escola A', uf='SP', id_cidade=cidade.id_cidade)
+        escola_b = Escola(nome='Escola B', uf='SP', id_cidade=cidade.id_cidade)
+        db.session.add_all([escola_a, escola_b])
+        db.session.flush()
+
+        admin = Usuario(nome='Admin', email='admin@teste', escola_id=escola_a.id,
+                        perfil_id=admin_geral.id_perfil, senha_hash='x')
+        usuario = Usuario(nome='Operador', email='operador@teste', escola_id=escola_b.id,
+                          perfil_id=operador.id_perfil, senha_hash='x')
+        db.session.add_all([admin, usuario])
+        db.session.flush()
+
+        for escola in (escola_a, escola_b):
+            for i in range(25):
+                dossie = Dossie(n_dossie=f'{escola.id}-{i}', nome=f'Aluno {i}', id_escola=escola.id, status='ativo')
+                db.session.add(dossie)
+                db.session.flush()
+                db.session.add(Movimentacao(dossie_id=dossie.id_dossie, tipo_movimentacao='emprestimo',
+                                            usuario_id=admin.id, escola_origem_id=escola.id, status='pendente'))
+        db.session.commit()
+
+        return {'escola_a': escola_a.id, 'escola_b': escola_b.id, 'admin': admin.id, 'usuario': usuario.id}
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    """Coloca um usuário na sessão do cliente de teste"""
+    def entrar(usuario_id, escola_id=None):
+        with client.session_transaction() as sessao:
+            sessao['user_id'] = usuario_id
+            if escola_id:
+                sessao['escola_atual_id'] = escola_id
+    return entrar
+
+
+@pytest.fixture
+def consultas(app):
+    """Lista das instruções SQL executadas enquanto o teste roda"""
+    registradas = []
+
+    def registrar(conn, cursor, instrucao, parametros, contexto, executemany):
+        registradas.append(instrucao)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', registrar)
+    yield registradas
+    event.remove(engine, 'before_cursor_execute', registrar)
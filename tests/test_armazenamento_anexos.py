@@ -0,0 +1,74 @@
+# tests/test_armazenamento_anexos.py
+"""Blob store dos anexos (services/armazenamento_service.py): referências e limpeza"""
+
+import io
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, Anexo, ArquivoBlob, Dossie
+from services.armazenamento_service import armazenamento_anexos
+
+
+@pytest.fixture
+def contexto(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'ANEXOS_DIR', str(tmp_path))
+    with app.app_context():
+        yield
+
+
+def _gravar(conteudo):
+    sha256, _, _ = armazenamento_anexos.gravar(io.BytesIO(conteudo))
+    return sha256
+
+
+def _referencias(sha256):
+    return db.session.get(ArquivoBlob, sha256, populate_existing=True).referencias
+
+
+def test_troca_de_hash_apos_commit_retira_a_referencia_antiga(contexto, dados):
+    dossie_id = db.session.execute(
+        db.select(Dossie.id_dossie).execution_options(escopo_escola=False)
+    ).scalars().first()
+    antigo, novo = _gravar(b'certidao v1'), _gravar(b'certidao v2')
+    anexo = Anexo(dossie_id=dossie_id, nome='certidao.pdf', sha256=antigo,
+                  caminho=armazenamento_anexos.caminho_relativo(antigo))
+    db.session.add(anexo)
+    db.session.commit()
+    assert _referencias(antigo) == 1
+
+    # Instância expirada pelo commit
+    anexo.sha256 = novo
+    db.session.commit()
+    assert _referencias(antigo) == 0
+    assert _referencias(novo) == 1
+
+    db.session.delete(anexo)
+    db.session.commit()
+    assert _referencias(novo) == 0
+
+
+def test_coleta_retira_o_arquivo_antes_de_confirmar_a_exclusao(contexto, monkeypatch):
+    sha256 = _gravar(b'conteudo sem referencias')
+    tabela = ArquivoBlob.__table__
+    db.session.execute(tabela.update().where(tabela.c.sha256 == sha256).values(ultimo_uso=datetime(2000, 1, 1)))
+    db.session.commit()
+    caminho = armazenamento_anexos.caminho_blob(sha256)
+    assert os.path.exists(caminho)
+
+    # Um upload concorrente do mesmo conteúdo espera este commit: o arquivo já não pode estar lá
+    arquivo_no_commit = []
+    commit = db.session.commit
+    def commit_observado():
+        arquivo_no_commit.append(os.path.exists(caminho))
+        commit()
+    monkeypatch.setattr(db.session, 'commit', commit_observado)
+
+    resultado = armazenamento_anexos.coletar_lixo(carencia=timedelta(0), agora=datetime(2001, 1, 1))
+
+    assert resultado['blobs'] == 1
+    assert arquivo_no_commit == [False]
+    assert not os.path.exists(caminho)
+    assert db.session.get(ArquivoBlob, sha256) is None
+    assert os.listdir(os.path.join(armazenamento_anexos.raiz(), 'tmp')) == []
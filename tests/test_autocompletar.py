@@ -0,0 +1,42 @@
+# tests/test_autocompletar.py
+"""Autocompletar de solicitantes (/movimentacoes/api/solicitantes)"""
+
+import pytest
+
+from models import db, Solicitante
+from models.solicitante import normalizar_busca
+
+
+@pytest.fixture(scope='module')
+def solicitantes(app, dados):
+    with app.app_context():
+        for nome, cpf in (('Maria Silva', '123.456.789-09'), ('João Souza', '98765432100'),
+                          ('Silvana Costa', None)):
+            db.session.add(Solicitante(nome=nome, nome_busca=normalizar_busca(nome), cpf=cpf,
+                                       status='ativo', escola_id=dados['escola_b']))
+        db.session.commit()
+
+
+def _nomes(client, termo):
+    resposta = client.get('/movimentacoes/api/solicitantes', query_string={'q': termo})
+    assert resposta.status_code == 200
+    return [item['nome'] for item in resposta.get_json()]
+
+
+@pytest.mark.parametrize('termo, nome', [
+    ('1234', 'Maria Silva'),            # dígitos contra CPF com máscara
+    ('123.456', 'Maria Silva'),         # máscara parcial
+    ('98765', 'João Souza'),            # CPF gravado sem máscara
+    ('987.654.321-0', 'João Souza'),
+])
+def test_cpf_comparado_pelos_digitos(client, login, dados, solicitantes, termo, nome):
+    login(dados['usuario'])
+    assert _nomes(client, termo) == [nome]
+
+
+def test_palavra_no_meio_do_nome_so_sem_prefixo(client, login, dados, solicitantes):
+    login(dados['usuario'])
+    # Prefixo encontrou 'Silvana': a busca no meio do nome ('Maria Silva') não roda
+    assert _nomes(client, 'silva') == ['Silvana Costa']
+    # Nenhum nome começa com 'souza': procura início de palavra
+    assert _nomes(client, 'Souza') == ['João Souza']
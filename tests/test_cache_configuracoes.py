@@ -0,0 +1,120 @@
+# tests/test_cache_configuracoes.py
+"""Geração do cache de configurações (utils/cache_configuracoes.py) com um Redis falso"""
+
+import pytest
+import redis
+
+from models import db, VersaoCache
+from utils.cache_configuracoes import CacheConfiguracoes
+
+ESCOPO = (1, None)
+
+
+class RedisFalso:
+    """Redis em memória (get e set com ex/nx); fora_do_ar simula a queda do servidor"""
+
+    def __init__(self):
+        self.dados = {}
+        self.fora_do_ar = False
+        self.despejar = False  # set aceito, mas a chave some em seguida (maxmemory)
+
+    def _verificar(self):
+        if self.fora_do_ar:
+            raise redis.ConnectionError('Connection refused')
+
+    def get(self, chave):
+        self._verificar()
+        return self.dados.get(chave)
+
+    def set(self, chave, valor, ex=None, nx=False):
+        self._verificar()
+        if nx and chave in self.dados:
+            return None
+        if not self.despejar:
+            self.dados[chave] = valor.encode() if isinstance(valor, str) else valor
+        return True
+
+
+@pytest.fixture
+def servidor():
+    return RedisFalso()
+
+
+@pytest.fixture
+def workers(app, servidor):
+    """Dois caches (um por worker) apontando para o mesmo Redis"""
+    caches = []
+    for _ in range(2):
+        cache = CacheConfiguracoes()
+        cache.app = app
+        cache.redis = servidor
+        caches.append(cache)
+    with app.app_context():
+        yield caches
+
+
+def _geracao_sql():
+    return f's:{VersaoCache.obter(VersaoCache.CONFIGURACOES)}'
+
+
+def test_invalidacao_troca_a_geracao_dos_dois_workers(workers):
+    a, b = workers
+    geracao = a.geracao()
+    assert geracao.startswith('r:')
+    assert b.geracao() == geracao
+
+    # Linhas montadas por um worker servem ao outro pelo Redis
+    a.guardar(ESCOPO, geracao, 'resolvidas', linhas=[['chave', 'valor']])
+    assert a.obter(ESCOPO, geracao) == 'resolvidas'
+    assert b.obter(ESCOPO, geracao) == [['chave', 'valor']]
+
+    a.invalidar()
+    nova = b.geracao()
+    assert nova.startswith('r:') and nova != geracao
+    assert a.geracao() == nova
+    assert a.obter(ESCOPO, nova) is None
+    assert b.obter(ESCOPO, nova) is None
+
+
+def test_redis_fora_do_ar_usa_a_geracao_de_versoes_cache(workers, servidor):
+    a, _ = workers
+    servidor.fora_do_ar = True
+
+    geracao = a.geracao()
+    assert geracao == _geracao_sql()
+    assert not a.redis_disponivel()
+
+    a.guardar(ESCOPO, geracao, 'resolvidas', linhas=[['chave', 'valor']])
+    assert a.obter(ESCOPO, geracao) == 'resolvidas'
+    assert servidor.dados == {}
+
+    # Alteração de configuração: o listener do modelo incrementa versoes_cache
+    VersaoCache.incrementar(VersaoCache.CONFIGURACOES)
+    db.session.commit()
+    nova = a.geracao()
+    assert nova == _geracao_sql() and nova != geracao
+    assert a.obter(ESCOPO, nova) is None
+
+
+def test_redis_de_volta_gera_nova_geracao(workers, servidor):
+    a, b = workers
+    a.espera = 0
+    anterior = a.geracao()
+
+    servidor.fora_do_ar = True
+    assert a.geracao() == _geracao_sql()
+
+    # Escritas feitas durante a falha não trocaram a geração no Redis
+    servidor.fora_do_ar = False
+    recuperada = a.geracao()
+    assert recuperada.startswith('r:') and recuperada != anterior
+    assert b.geracao() == recuperada
+    assert a.estatisticas()['redis'] == 'ativo'
+
+
+def test_geracao_despejada_logo_apos_o_set_usa_versoes_cache(workers, servidor):
+    a, _ = workers
+    servidor.despejar = True
+
+    assert a.geracao() == _geracao_sql()
+    assert a.redis_disponivel()
@@ -0,0 +1,59 @@
+# tests/test_consultas_por_requisicao.py
+"""
+Regressão da quantidade de consultas SQL nas páginas principais
+
+O usuário logado é carregado uma única vez por requisição
+(utils/usuario_atual.py) e as listagens carregam as relações de forma
+antecipada. Os tetos abaixo valem com 25 dossiês e movimentações por escola:
+um N+1 ou uma segunda carga do usuário os ultrapassa.
+"""
+
+import pytest
+
+# Página -> teto de consultas (caches de referência e de configuração já aquecidos)
+TETOS = {
+    '/dashboard': 3,
+    '/dossies/': 4,
+    '/movimentacoes/': 4,
+}
+
+
+def _carregamentos_usuario(consultas):
+    return [q for q in consultas if q.lstrip().startswith('SELECT usuarios.id') and 'WHERE usuarios.id = ?' in q]
+
+
+@pytest.mark.parametrize('url', TETOS)
+@pytest.mark.parametrize('perfil', ['admin', 'usuario'])
+def test_paginas_respeitam_teto_de_consultas(client, login, dados, consultas, url, perfil):
+    login(dados[perfil], dados['escola_a'] if perfil == 'admin' else None)
+    assert client.get(url).status_code == 200  # Aquece os caches por processo
+
+    consultas.clear()
+    resposta = client.get(url)
+
+    assert resposta.status_code == 200
+    assert len(consultas) <= TETOS[url], '\n'.join(consultas)
+    assert len(_carregamentos_usuario(consultas)) == 1
+
+
+def test_teto_nao_depende_da_quantidade_de_registros(app, client, login, dados, consultas):
+    from models import db, Dossie, Movimentacao
+
+    login(dados['usuario'])
+    client.get('/movimentacoes/')
+    consultas.clear()
+    client.get('/movimentacoes/')
+    antes = len(consultas)
+
+    with app.app_context():
+        for i in range(10):
+            dossie = Dossie(n_dossie=f'extra-{i}', nome=f'Extra {i}', id_escola=dados['escola_b'], status='ativo')
+            db.session.add(dossie)
+            db.session.flush()
+            db.session.add(Movimentacao(dossie_id=dossie.id_dossie, tipo_movimentacao='consulta',
+                                        usuario_id=dados['admin'], escola_origem_id=dados['escola_b'], status='pendente'))
+        db.session.commit()
+
+    consultas.clear()
+    client.get('/movimentacoes/')
+    assert len(consultas) == antes
@@ -0,0 +1,30 @@
+# tests/test_dados_referencia.py
+"""Endpoints JSON dos dados de referência: ETag pela versão e 304 na revalidação"""
+
+import pytest
+
+
+@pytest.mark.parametrize('rota', ['/escolas/api/ativas', '/perfis/api'])
+def test_revalidacao_sem_mudanca_responde_304(client, login, dados, rota):
+    login(dados['admin'])
+    resposta = client.get(rota)
+    assert resposta.status_code == 200
+    assert resposta.get_json()
+    etag = resposta.headers['ETag']
+
+    revalidada = client.get(rota, headers={'If-None-Match': etag})
+    assert revalidada.status_code == 304
+    assert revalidada.data == b''
+    assert revalidada.headers['ETag'] == etag
+
+
+def test_escolas_do_operador_apenas_a_propria(client, login, dados):
+    login(dados['admin'])
+    todas = client.get('/escolas/api/ativas')
+    assert {escola['id'] for escola in todas.get_json()} >= {dados['escola_a'], dados['escola_b']}
+
+    login(dados['usuario'])
+    propria = client.get('/escolas/api/ativas')
+    assert [escola['id'] for escola in propria.get_json()] == [dados['escola_b']]
+    # ETag diferente: o navegador não reaproveita a lista de outro escopo
+    assert propria.headers['ETag'] != todas.headers['ETag']
@@ -0,0 +1,31 @@
+# tests/test_dossie_cadastro.py
+"""Cadastro de dossiê (controllers/dossie_controller.novo) com anexo acima do limite"""
+
+import io
+
+from models import Dossie
+
+
+def test_anexo_grande_mantem_formulario_e_nao_grava(app, client, login, dados, monkeypatch):
+    monkeypatch.setattr('controllers.anexo_controller.MAX_FILE_SIZE', 1024 * 1024)
+    login(dados['admin'], dados['escola_a'])
+
+    resposta = client.post('/dossies/novo', data={
+        'n_dossie': 'grande-1',
+        'nome': 'Aluno Com Anexo Grande',
+        'ano': '2024',
+        'status': 'arquivado',
+        'observacao': 'observação preservada',
+        'anexos_files[]': (io.BytesIO(b'x' * (1536 * 1024)), 'historico.pdf'),
+    }, content_type='multipart/form-data')
+
+    corpo = resposta.get_data(as_text=True)
+    assert resposta.status_code == 200
+    assert 'historico.pdf&#34; excede o tamanho máximo de 1MB' in corpo
+    assert 'value="grande-1"' in corpo
+    assert 'value="Aluno Com Anexo Grande"' in corpo
+    assert 'observação preservada</textarea>' in corpo
+    assert '<option value="arquivado" selected>' in corpo
+
+    with app.app_context():
+        assert Dossie.query.filter_by(n_dossie='grande-1').first() is None
@@ -0,0 +1,38 @@
+# tests/test_fotos.py
+"""URL da miniatura guardada logo após o upload (foto.arquivo com ?tamanho=)"""
+
+import os
+
+import pytest
+
+from services.imagem_service import processador_imagens, nome_derivada
+
+ORIGINAL = 'user_1_0123456789abcdef.jpg'
+
+
+@pytest.fixture
+def fotos(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'static_folder', str(tmp_path))
+    with app.app_context():
+        pasta = processador_imagens.pasta('usuario')
+    with open(os.path.join(pasta, ORIGINAL), 'wb') as arquivo:
+        arquivo.write(b'original')
+    return pasta
+
+
+def test_url_aguardada_entrega_o_original_e_depois_a_miniatura(app, client, login, dados, fotos):
+    with app.app_context():
+        url = processador_imagens.url('usuario', ORIGINAL, 'thumb', aguardar=True)
+        assert processador_imagens.url('usuario', ORIGINAL, 'thumb') == f'/api/foto/arquivo/usuario/{ORIGINAL}'
+    login(dados['admin'])
+
+    # Miniatura ainda em geração: o original, sem cache imutável
+    resposta = client.get(url)
+    assert resposta.data == b'original'
+    assert not resposta.cache_control.immutable
+
+    with open(os.path.join(fotos, nome_derivada(ORIGINAL, 'thumb')), 'wb') as arquivo:
+        arquivo.write(b'miniatura')
+    revalidada = client.get(url, headers={'If-None-Match': resposta.headers['ETag']})
+    assert revalidada.status_code == 200
+    assert revalidada.data == b'miniatura'
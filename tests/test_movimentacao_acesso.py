@@ -0,0 +1,36 @@
+# tests/test_movimentacao_acesso.py
+"""Movimentação de outra escola: acesso negado (não erro 500) com o escopo automático de escola"""
+
+import pytest
+
+from models import db, Dossie, Movimentacao
+
+
+@pytest.fixture
+def movimentacao_escola_a(app, dados):
+    with app.app_context():
+        return db.session.execute(
+            db.select(Movimentacao.id).join(Dossie, Movimentacao.dossie_id == Dossie.id_dossie)
+            .where(Dossie.id_escola == dados['escola_a'])
+            .execution_options(escopo_escola=False)
+        ).scalars().first()
+
+
+@pytest.mark.parametrize('metodo, rota', [
+    ('get', '/movimentacoes/ver/{}'),
+    ('post', '/movimentacoes/concluir/{}'),
+    ('post', '/movimentacoes/cancelar/{}'),
+])
+def test_operador_de_outra_escola_recebe_acesso_negado(client, login, dados, movimentacao_escola_a, metodo, rota):
+    login(dados['usuario'])
+    resposta = getattr(client, metodo)(rota.format(movimentacao_escola_a))
+    assert resposta.status_code == 302
+    assert resposta.headers['Location'].endswith('/movimentacoes/')
+    with client.session_transaction() as sessao:
+        mensagens = [mensagem for _, mensagem in sessao.get('_flashes', [])]
+    assert any('Acesso negado' in mensagem for mensagem in mensagens)
+
+
+def test_admin_geral_ve_movimentacao_de_qualquer_escola(client, login, dados, movimentacao_escola_a):
+    login(dados['admin'])
+    assert client.get(f'/movimentacoes/ver/{movimentacao_escola_a}').status_code == 200
@@ -0,0 +1,41 @@
+# tests/test_notificacoes_stream.py
+"""Limite de streams SSE por processo (/notificacoes/stream)"""
+
+import pytest
+
+from services.notificacao_service import canal_notificacoes, LimiteConexoes
+
+
+@pytest.fixture
+def limite_um(app):
+    anterior = canal_notificacoes.maximo
+    canal_notificacoes.maximo = 1
+    yield
+    canal_notificacoes.maximo = anterior
+
+
+def test_stream_acima_do_limite_responde_503(client, login, dados, limite_um):
+    login(dados['admin'])
+    ocupada = canal_notificacoes.assinar(dados['escola_a'])
+    try:
+        resposta = client.get('/notificacoes/stream')
+        assert resposta.status_code == 503
+        assert resposta.headers['Retry-After']
+        assert canal_notificacoes.conectados() == 1
+    finally:
+        canal_notificacoes.cancelar(ocupada)
+
+
+def test_stream_abaixo_do_limite_libera_a_vaga_ao_fechar(client, login, dados, limite_um):
+    login(dados['admin'])
+    resposta = client.get('/notificacoes/stream', buffered=False)
+    assert resposta.status_code == 200
+    assert resposta.mimetype == 'text/event-stream'
+    assert canal_notificacoes.conectados() == 1
+    with pytest.raises(LimiteConexoes):
+        canal_notificacoes.assinar(dados['escola_a'])
+
+    # Primeiros eventos (retry e estado) e encerramento pelo cliente
+    next(resposta.response)
+    resposta.close()
+    assert canal_notificacoes.conectados() == 0
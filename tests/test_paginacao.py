@@ -0,0 +1,58 @@
+# tests/test_paginacao.py
+"""Paginação por chave (utils/paginacao.py) com chaves de ordenação nulas"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, Escola, Dossie
+from utils.paginacao import paginar_keyset
+
+
+@pytest.fixture(scope='module')
+def escola_paginacao(app, dados):
+    """Escola com 7 dossiês datados (2 com a mesma data) e 5 sem data de cadastro (legados)"""
+    with app.app_context():
+        escola = Escola(nome='Escola Paginação', uf='SP', id_cidade=db.session.get(Escola, dados['escola_a']).id_cidade)
+        db.session.add(escola)
+        db.session.flush()
+        base = datetime(2024, 1, 1)
+        datas = [base + timedelta(days=i) for i in range(6)] + [base + timedelta(days=5)]
+        for i, data in enumerate(datas):
+            db.session.add(Dossie(n_dossie=f'p{i}', nome=f'Datado {i}', id_escola=escola.id, dt_cadastro=data))
+        for i in range(5):
+            db.session.add(Dossie(n_dossie=f'n{i}', nome=f'Legado {i}', id_escola=escola.id))
+        db.session.flush()
+        db.session.execute(
+            db.update(Dossie).where(Dossie.id_escola == escola.id, Dossie.nome.like('Legado%')).values(dt_cadastro=None)
+        )
+        db.session.commit()
+        return escola.id
+
+
+def _ordem_esperada(escola_id, descendente):
+    dossies = Dossie.query.filter(Dossie.id_escola == escola_id).all()
+    datados = sorted((d for d in dossies if d.dt_cadastro), key=lambda d: (d.dt_cadastro, d.id_dossie), reverse=descendente)
+    nulos = sorted((d for d in dossies if not d.dt_cadastro), key=lambda d: d.id_dossie, reverse=descendente)
+    return [d.id_dossie for d in (datados + nulos if descendente else nulos + datados)]
+
+
+@pytest.mark.parametrize('descendente', [True, False])
+@pytest.mark.parametrize('por_pagina', [2, 3, 5, 7])
+def test_percorre_todos_os_registros_com_chave_nula(app, escola_paginacao, descendente, por_pagina):
+    chaves = [Dossie.dt_cadastro, Dossie.id_dossie]
+    with app.test_request_context():
+        query = Dossie.query.filter(Dossie.id_escola == escola_paginacao)
+        esperado = _ordem_esperada(escola_paginacao, descendente)
+
+        # Avançando
+        paginas = [paginar_keyset(query, chaves, per_page=por_pagina, descendente=descendente)]
+        while paginas[-1].has_next:
+            paginas.append(paginar_keyset(query, chaves, paginas[-1].next_cursor, por_pagina, descendente))
+        assert [d.id_dossie for pagina in paginas for d in pagina] == esperado
+
+        # Voltando a partir da última página
+        voltando = [paginas[-1]]
+        while voltando[-1].has_prev:
+            voltando.append(paginar_keyset(query, chaves, voltando[-1].prev_cursor, por_pagina, descendente))
+        assert [[d.id_dossie for d in p] for p in reversed(voltando)] == [[d.id_dossie for d in p] for p in paginas]
@@ -0,0 +1,46 @@
+# tests/test_permissoes.py
+"""Decorator require_permission (utils/permissions.py): resposta 403 e log de auditoria"""
+
+import json
+
+import pytest
+from flask import session
+from werkzeug.exceptions import Forbidden
+
+from models import LogAuditoria
+from utils.gravador_logs import gravador_logs
+from utils.logs import AcoesAuditoria
+from utils.permissions import require_permission
+
+
+@require_permission('dossie', 'excluir')
+def _view_protegida():
+    return 'ok'
+
+
+def test_acesso_negado_retorna_403_e_registra_auditoria(app, dados):
+    with app.test_request_context('/dossies/excluir/1', method='POST'):
+        session['user_id'] = dados['usuario']
+        with pytest.raises(Forbidden):
+            _view_protegida()
+
+    assert gravador_logs.flush()
+    with app.app_context():
+        log = LogAuditoria.query.filter_by(
+            acao=AcoesAuditoria.ACESSO_NEGADO, usuario_id=dados['usuario']
+        ).order_by(LogAuditoria.id.desc()).first()
+        assert log is not None
+        assert log.item_alterado == 'Permissao'
+        detalhes = json.loads(log.detalhes)
+        assert detalhes['modulo'] == 'dossie' and detalhes['acao'] == 'excluir'
+        assert detalhes['mensagem'].startswith('Acesso negado: Operador')
+
+
+def test_acesso_permitido_em_debug(app, dados):
+    app.debug = True
+    try:
+        with app.test_request_context('/dossies/excluir/1', method='POST'):
+            session['user_id'] = dados['admin']
+            assert _view_protegida() == 'ok'
+    finally:
+        app.debug = False
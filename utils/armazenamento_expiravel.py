@@ -0,0 +1,126 @@
+# utils/armazenamento_expiravel.py
+"""
+Dicionário com expiração por chave e tamanho máximo
+
+Usado pelo armazenamento em memória dos limites de acesso
+(utils/armazenamento_limites.py): tentativas de login por IP, bloqueios
+e CAPTCHAs pendentes. Em uma rajada de tentativas vindas de muitos IPs o
+custo de cada operação não depende da quantidade de chaves:
+
+- a expiração é indexada por um heap (expira_em, chave); cada escrita
+  remove do topo apenas as entradas já vencidas, e cada entrada sai do
+  heap uma única vez (custo amortizado O(log n));
+- acima de `capacidade` chaves, as menos usadas recentemente são
+  descartadas (LRU pela ordem do OrderedDict);
+- reescrever a mesma chave deixa a posição antiga no heap; o heap é
+  recompactado quando passa do dobro das chaves vivas.
+
+Não é thread-safe: quem usa protege as chamadas com o próprio lock.
+"""
+
+import heapq
+import time
+from collections import OrderedDict
+
+# Máximo de chaves mantidas por padrão
+CAPACIDADE_PADRAO = 100_000
+
+
+class _Entrada:
+    __slots__ = ('valor', 'expira_em')
+
+    def __init__(self, valor, expira_em):
+        self.valor = valor
+        self.expira_em = expira_em
+
+
+class ArmazenamentoExpiravel:
+    """Chave → valor com TTL, expiração por heap e descarte LRU acima da capacidade"""
+
+    __slots__ = ('capacidade', '_entradas', '_heap', 'descartadas', 'expiradas')
+
+    def __init__(self, capacidade=CAPACIDADE_PADRAO):
+        self.capacidade = capacidade
+        self._entradas = OrderedDict()
+        self._heap = []
+        self.descartadas = 0  # removidas pelo limite de capacidade
+        self.expiradas = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def _vencer(self, agora):
+        """Remove as entradas vencidas do topo do heap"""
+        heap = self._heap
+        entradas = self._entradas
+        while heap and heap[0][0] <= agora:
+            expira_em, chave = heapq.heappop(heap)
+            entrada = entradas.get(chave)
+            # A chave pode ter sido renovada (posição antiga no heap) ou removida
+            if entrada is not None and entrada.expira_em == expira_em:
+                del entradas[chave]
+                self.expiradas += 1
+
+    def _compactar(self):
+        self._heap = [(entrada.expira_em, chave) for chave, entrada in self._entradas.items()]
+        heapq.heapify(self._heap)
+
+    def definir(self, chave, valor, ttl, agora=None):
+        """Grava o valor com validade de `ttl` segundos"""
+        agora = agora if agora is not None else time.time()
+        self._vencer(agora)
+
+        expira_em = agora + ttl
+        entrada = self._entradas.get(chave)
+        if entrada is not None:
+            entrada.valor = valor
+            entrada.expira_em = expira_em
+            self._entradas.move_to_end(chave)
+        else:
+            self._entradas[chave] = _Entrada(valor, expira_em)
+            while len(self._entradas) > self.capacidade:
+                self._entradas.popitem(last=False)
+                self.descartadas += 1
+        heapq.heappush(self._heap, (expira_em, chave))
+
+        if len(self._heap) > 2 * len(self._entradas) + 64:
+            self._compactar()
+
+    def obter(self, chave, agora=None):
+        """Valor da chave (None se ausente ou vencida); conta como uso recente"""
+        entrada = self._entradas.get(chave)
+        if entrada is None:
+            return None
+        if entrada.expira_em <= (agora if agora is not None else time.time()):
+            del self._entradas[chave]
+            self.expiradas += 1
+            return None
+        self._entradas.move_to_end(chave)
+        return entrada.valor
+
+    def renovar(self, chave, ttl, agora=None):
+        """Estende a validade de uma chave existente"""
+        agora = agora if agora is not None else time.time()
+        entrada = self._entradas.get(chave)
+        if entrada is None or entrada.expira_em <= agora:
+            return False
+        entrada.expira_em = agora + ttl
+        self._entradas.move_to_end(chave)
+        heapq.heappush(self._heap, (entrada.expira_em, chave))
+        if len(self._heap) > 2 * len(self._entradas) + 64:
+            self._compactar()
+        return True
+
+    def remover(self, chave, agora=None):
+        """Remove e retorna o valor (None se ausente ou vencido)"""
+        entrada = self._entradas.pop(chave, None)
+        if entrada is None or entrada.expira_em <= (agora if agora is not None else time.time()):
+            return None
+        return entrada.valor
+
+    def chaves(self):
+        return list(self._entradas)
+
+    def limpar(self):
+        self._entradas.clear()
+        self._heap.clear()
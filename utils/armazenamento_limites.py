@@ -0,0 +1,401 @@
+# utils/armazenamento_limites.py
+"""
+Armazenamento compartilhado do rate limiting de login e dos CAPTCHAs
+
+Com vários workers do gunicorn, contadores em memória ficam separados por
+processo (o bloqueio só ocorre depois de MAX_TENTATIVAS × workers e o
+CAPTCHA gerado em um worker não é reconhecido pelo outro). O armazenamento
+é escolhido por LIMITES_ARMAZENAMENTO:
+
+    memory://            em memória (um processo; padrão)
+    redis://host:6379/2  Redis (também usado pelo Flask-Limiter)
+    sql                  tabelas contadores_acesso / valores_acesso do banco
+
+Todos oferecem a mesma interface:
+
+    incrementar / contar / zerar      janela deslizante de tentativas
+    definir / obter / consumir / remover   valores com expiração
+
+A janela deslizante usa baldes de tamanho fixo: BALDES intervalos de
+BALDE_SEGUNDOS por chave, reaproveitados em círculo. Registrar e contar
+custam o mesmo independentemente de quantas tentativas houve.
+"""
+
+import math
+import threading
+import time
+
+from sqlalchemy import case, func, select
+
+from utils.armazenamento_expiravel import ArmazenamentoExpiravel, CAPACIDADE_PADRAO
+
+try:
+    import redis
+except ImportError:  # Redis é opcional
+    redis = None
+
+# Baldes da janela deslizante (cobrem BALDES × BALDE_SEGUNDOS = 20 minutos)
+BALDE_SEGUNDOS = 30
+BALDES = 40
+
+# Intervalo mínimo entre limpezas de linhas expiradas (SQL)
+LIMPEZA_SEGUNDOS = 60
+
+PREFIXO_REDIS = 'dossie:limites:'
+
+
+def _indice(agora):
+    return int(agora // BALDE_SEGUNDOS)
+
+
+def _baldes_na_janela(janela):
+    """Quantidade de baldes que cobrem `janela` segundos (limitada a BALDES)"""
+    return max(1, min(BALDES, math.ceil(janela / BALDE_SEGUNDOS)))
+
+
+class _Janela:
+    __slots__ = ('baldes', 'totais')
+
+    def __init__(self):
+        self.baldes = [-1] * BALDES
+        self.totais = [0] * BALDES
+
+
+class ArmazenamentoMemoria:
+    """
+    Armazenamento em memória do processo
+
+    Contadores e valores ficam em ArmazenamentoExpiravel
+    (utils/armazenamento_expiravel.py): expiração indexada e no máximo
+    `capacidade` chaves de cada tipo, descartando as menos usadas.
+    """
+
+    def __init__(self, capacidade=CAPACIDADE_PADRAO):
+        self._contadores = ArmazenamentoExpiravel(capacidade)  # chave -> _Janela
+        self._valores = ArmazenamentoExpiravel(capacidade)
+        self._lock = threading.Lock()
+
+    def incrementar(self, chave, agora=None):
+        agora = agora or time.time()
+        indice = _indice(agora)
+        slot = indice % BALDES
+        validade = BALDES * BALDE_SEGUNDOS
+        with self._lock:
+            janela = self._contadores.obter(chave, agora)
+            if janela is None:
+                janela = _Janela()
+                self._contadores.definir(chave, janela, validade, agora)
+            else:
+                self._contadores.renovar(chave, validade, agora)
+            if janela.baldes[slot] != indice:
+                janela.baldes[slot] = indice
+                janela.totais[slot] = 0
+            janela.totais[slot] += 1
+
+    def contar(self, chave, janela, agora=None):
+        agora = agora or time.time()
+        minimo = _indice(agora) - _baldes_na_janela(janela) + 1
+        with self._lock:
+            registro = self._contadores.obter(chave, agora)
+            if registro is None:
+                return 0
+            return sum(total for balde, total in zip(registro.baldes, registro.totais) if balde >= minimo)
+
+    def zerar(self, chave):
+        with self._lock:
+            self._contadores.remover(chave)
+
+    def definir(self, chave, valor, ttl):
+        with self._lock:
+            self._valores.definir(chave, valor, ttl)
+
+    def obter(self, chave):
+        with self._lock:
+            return self._valores.obter(chave)
+
+    def consumir(self, chave):
+        """Lê e remove o valor (uso único)"""
+        with self._lock:
+            return self._valores.remover(chave)
+
+    def remover(self, chave):
+        with self._lock:
+            self._valores.remover(chave)
+
+    def contar_chaves(self, prefixo):
+        """Chaves (contadores e valores) com o prefixo, para estatísticas"""
+        with self._lock:
+            return sum(1 for dados in (self._contadores, self._valores)
+                       for chave in dados.chaves() if chave.startswith(prefixo))
+
+    def limpar(self, prefixo=''):
+        with self._lock:
+            for dados in (self._contadores, self._valores):
+                if not prefixo:
+                    dados.limpar()
+                    continue
+                for chave in [c for c in dados.chaves() if c.startswith(prefixo)]:
+                    dados.remover(chave)
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'chaves': len(self._contadores) + len(self._valores),
+                'descartadas': self._contadores.descartadas + self._valores.descartadas,
+                'expiradas': self._contadores.expiradas + self._valores.expiradas
+            }
+
+
+# Registro no balde atual do slot; o slot é zerado quando passa a outro balde
+_INCREMENTAR_LUA = """
+local slot = ARGV[1]
+if redis.call('HGET', KEYS[1], 'b' .. slot) ~= ARGV[2] then
+    redis.call('HSET', KEYS[1], 'b' .. slot, ARGV[2], 't' .. slot, 0)
+end
+redis.call('HINCRBY', KEYS[1], 't' .. slot, 1)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+"""
+
+
+class ArmazenamentoRedis:
+    """
+    Armazenamento no Redis, compartilhado por todos os workers
+
+    Cada janela é um hash com 2 × BALDES campos (bN = balde do slot N,
+    tN = tentativas). Se o Redis falhar, a operação usa o armazenamento em
+    memória do processo, para que o login não pare junto com o Redis.
+    """
+
+    def __init__(self, url, logger=None, capacidade=CAPACIDADE_PADRAO):
+        if redis is None:
+            raise RuntimeError('O pacote redis não está instalado')
+        self.cliente = redis.Redis.from_url(url)
+        self.logger = logger
+        self.reserva = ArmazenamentoMemoria(capacidade)
+        self._incrementar = self.cliente.register_script(_INCREMENTAR_LUA)
+
+    def _executar(self, nome, funcao, *args):
+        try:
+            return funcao()
+        except redis.RedisError as e:
+            if self.logger is not None:
+                self.logger.error(f'Falha no Redis dos limites de acesso ({nome}): {e}')
+            return getattr(self.reserva, nome)(*args)
+
+    def incrementar(self, chave, agora=None):
+        agora = agora or time.time()
+        indice = _indice(agora)
+        self._executar('incrementar', lambda: self._incrementar(
+            keys=[PREFIXO_REDIS + chave], args=[indice % BALDES, indice, BALDES * BALDE_SEGUNDOS]
+        ), chave, agora)
+
+    def contar(self, chave, janela, agora=None):
+        agora = agora or time.time()
+        minimo = _indice(agora) - _baldes_na_janela(janela) + 1
+
+        def contar():
+            campos = self.cliente.hgetall(PREFIXO_REDIS + chave)
+            return sum(
+                int(campos.get(b't%d' % slot, 0))
+                for slot in range(BALDES)
+                if int(campos.get(b'b%d' % slot, -1)) >= minimo
+            )
+        return self._executar('contar', contar, chave, janela, agora)
+
+    def zerar(self, chave):
+        self._executar('zerar', lambda: self.cliente.delete(PREFIXO_REDIS + chave), chave)
+
+    def definir(self, chave, valor, ttl):
+        self._executar('definir', lambda: self.cliente.set(PREFIXO_REDIS + chave, valor, ex=max(1, int(ttl))),
+                       chave, valor, ttl)
+
+    def obter(self, chave):
+        def obter():
+            valor = self.cliente.get(PREFIXO_REDIS + chave)
+            return valor.decode() if valor is not None else None
+        return self._executar('obter', obter, chave)
+
+    def consumir(self, chave):
+        def consumir():
+            with self.cliente.pipeline() as pipe:  # MULTI: só um worker obtém o valor
+                valor, _ = pipe.get(PREFIXO_REDIS + chave).delete(PREFIXO_REDIS + chave).execute()
+            return valor.decode() if valor is not None else None
+        return self._executar('consumir', consumir, chave)
+
+    def remover(self, chave):
+        self._executar('remover', lambda: self.cliente.delete(PREFIXO_REDIS + chave), chave)
+
+    def contar_chaves(self, prefixo):
+        return self._executar('contar_chaves', lambda: sum(
+            1 for _ in self.cliente.scan_iter(match=PREFIXO_REDIS + prefixo + '*', count=500)
+        ), prefixo)
+
+    def limpar(self, prefixo=''):
+        def limpar():
+            chaves = list(self.cliente.scan_iter(match=PREFIXO_REDIS + prefixo + '*', count=500))
+            if chaves:
+                self.cliente.delete(*chaves)
+        self._executar('limpar', limpar, prefixo)
+
+
+class ArmazenamentoSQL:
+    """
+    Armazenamento nas tabelas contadores_acesso e valores_acesso
+
+    Cada operação roda em uma transação própria (db.engine.begin()), sem
+    interferir na sessão da requisição de login.
+    """
+
+    def __init__(self):
+        self._ultima_limpeza = 0
+
+    def _tabelas(self):
+        from models import ContadorAcesso, ValorAcesso
+        return ContadorAcesso.__table__, ValorAcesso.__table__
+
+    def _engine(self):
+        from models import db
+        return db.engine
+
+    def _limpar_expirados(self, connection, agora):
+        if agora - self._ultima_limpeza < LIMPEZA_SEGUNDOS:
+            return
+        self._ultima_limpeza = agora
+        contadores, valores = self._tabelas()
+        connection.execute(contadores.delete().where(contadores.c.balde <= _indice(agora) - BALDES))
+        connection.execute(valores.delete().where(valores.c.expira_em <= agora))
+
+    def _upsert(self, connection, tabela, chaves, valores, atualizar):
+        dialeto = connection.dialect.name
+        if dialeto in ('postgresql', 'sqlite'):
+            if dialeto == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            connection.execute(insert(tabela).values(**chaves, **valores).on_conflict_do_update(
+                index_elements=list(chaves), set_=atualizar
+            ))
+            return
+
+        # Outros bancos: UPDATE e, se não houver linha, INSERT
+        condicoes = [tabela.c[coluna] == valor for coluna, valor in chaves.items()]
+        if connection.execute(tabela.update().where(*condicoes).values(**atualizar)).rowcount == 0:
+            connection.execute(tabela.insert().values(**chaves, **valores))
+
+    def incrementar(self, chave, agora=None):
+        agora = agora or time.time()
+        indice = _indice(agora)
+        contadores, _ = self._tabelas()
+        with self._engine().begin() as connection:
+            self._limpar_expirados(connection, agora)
+            # Slot de outro balde recomeça em 1; do mesmo balde soma 1
+            self._upsert(connection, contadores, {'chave': chave, 'slot': indice % BALDES}, {
+                'balde': indice, 'total': 1
+            }, {
+                'total': case((contadores.c.balde == indice, contadores.c.total + 1), else_=1),
+                'balde': indice
+            })
+
+    def contar(self, chave, janela, agora=None):
+        agora = agora or time.time()
+        minimo = _indice(agora) - _baldes_na_janela(janela) + 1
+        contadores, _ = self._tabelas()
+        with self._engine().connect() as connection:
+            total = connection.execute(
+                select(func.sum(contadores.c.total)).where(
+                    contadores.c.chave == chave, contadores.c.balde >= minimo
+                )
+            ).scalar()
+        return int(total or 0)
+
+    def zerar(self, chave):
+        contadores, _ = self._tabelas()
+        with self._engine().begin() as connection:
+            connection.execute(contadores.delete().where(contadores.c.chave == chave))
+
+    def definir(self, chave, valor, ttl):
+        agora = time.time()
+        _, valores = self._tabelas()
+        with self._engine().begin() as connection:
+            self._limpar_expirados(connection, agora)
+            self._upsert(connection, valores, {'chave': chave}, {
+                'valor': valor, 'expira_em': agora + ttl
+            }, {'valor': valor, 'expira_em': agora + ttl})
+
+    def obter(self, chave):
+        _, valores = self._tabelas()
+        with self._engine().connect() as connection:
+            return connection.execute(
+                select(valores.c.valor).where(valores.c.chave == chave, valores.c.expira_em > time.time())
+            ).scalar()
+
+    def consumir(self, chave):
+        _, valores = self._tabelas()
+        with self._engine().begin() as connection:
+            # DELETE ... RETURNING: só um worker obtém o valor
+            return connection.execute(
+                valores.delete().where(valores.c.chave == chave, valores.c.expira_em > time.time())
+                .returning(valores.c.valor)
+            ).scalar()
+
+    def remover(self, chave):
+        _, valores = self._tabelas()
+        with self._engine().begin() as connection:
+            connection.execute(valores.delete().where(valores.c.chave == chave))
+
+    def contar_chaves(self, prefixo):
+        contadores, valores = self._tabelas()
+        agora = time.time()
+        with self._engine().connect() as connection:
+            return connection.execute(select(func.count(func.distinct(contadores.c.chave))).where(
+                contadores.c.chave.startswith(prefixo, autoescape=True),
+                contadores.c.balde > _indice(agora) - BALDES
+            )).scalar() + connection.execute(select(func.count()).select_from(valores).where(
+                valores.c.chave.startswith(prefixo, autoescape=True), valores.c.expira_em > agora
+            )).scalar()
+
+    def limpar(self, prefixo=''):
+        contadores, valores = self._tabelas()
+        with self._engine().begin() as connection:
+            for tabela in (contadores, valores):
+                connection.execute(tabela.delete().where(tabela.c.chave.startswith(prefixo, autoescape=True)))
+
+
+def criar_armazenamento(url, logger=None, capacidade=CAPACIDADE_PADRAO):
+    """Armazenamento correspondente a LIMITES_ARMAZENAMENTO"""
+    url = (url or 'memory://').strip()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return ArmazenamentoRedis(url, logger, capacidade)
+    if url == 'sql':
+        return ArmazenamentoSQL()
+    if url == 'memory://':
+        return ArmazenamentoMemoria(capacidade)
+    raise ValueError(f'LIMITES_ARMAZENAMENTO inválido: {url}')
+
+
+class ArmazenamentoLimites:
+    """Armazenamento configurado para a aplicação (memória até o init_app)"""
+
+    def __init__(self):
+        self.backend = ArmazenamentoMemoria()
+
+    def init_app(self, app):
+        url = app.config.setdefault('LIMITES_ARMAZENAMENTO', 'memory://')
+        capacidade = app.config.setdefault('LIMITES_MEMORIA_MAXIMO', CAPACIDADE_PADRAO)
+        try:
+            self.backend = criar_armazenamento(url, app.logger, capacidade)
+        except RuntimeError as e:
+            app.logger.warning(f'{e}; limites de acesso ficam em memória')
+            self.backend = ArmazenamentoMemoria(capacidade)
+        app.extensions['armazenamento_limites'] = self
+
+    def storage_uri_flask_limiter(self, app):
+        """storage_uri do Flask-Limiter: o mesmo Redis, quando configurado"""
+        url = app.config.get('LIMITES_ARMAZENAMENTO') or 'memory://'
+        if isinstance(self.backend, ArmazenamentoRedis):
+            return url
+        return 'memory://'
+
+
+# Instância global do armazenamento
+armazenamento_limites = ArmazenamentoLimites()
@@ -0,0 +1,214 @@
+# utils/cache_configuracoes.py
+"""
+Cache em dois níveis das configurações resolvidas (services/configuracao_service.py)
+
+1. Local: LRU com TTL por processo (ArmazenamentoExpiravel), consultado
+   sem ir à rede.
+2. Redis (opcional, CONFIG_REDIS_URL): as linhas carregadas para um par
+   (escola, usuário) ficam em dossie:config:<geração>:<escola>:<usuário>,
+   compartilhadas entre os workers; um worker novo não precisa consultar
+   o banco.
+
+Invalidação por geração: cada entrada guarda a geração com que foi
+montada. Com o Redis saudável a geração é um token em dossie:config:geracao,
+trocado após o commit de qualquer alteração em ConfiguracaoSistema (e com
+validade CONFIG_CACHE_TIMEOUT, para limitar o atraso caso uma troca se
+perca). Sem Redis, ou com ele fora do ar, a geração é a versão de
+'configuracoes' em versoes_cache, incrementada pelo listener do modelo.
+Nos dois casos a geração é lida uma vez por requisição e as chaves
+antigas do Redis simplesmente expiram, sem varredura.
+
+O Redis é verificado (health check): uma falha o desativa por
+CONFIG_REDIS_ESPERA segundos, período em que tudo vem da tabela SQL. Ao
+voltar a usá-lo o worker troca a geração, já que escritas feitas durante a
+falha não chegaram ao Redis.
+"""
+
+import json
+import threading
+import time
+import uuid
+
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from utils.armazenamento_expiravel import ArmazenamentoExpiravel
+
+try:
+    import redis
+except ImportError:  # Redis é opcional
+    redis = None
+
+CACHE_TIMEOUT = 1800  # Validade de uma entrada (segundos)
+MAX_ESCOPOS = 2000  # Pares (escola, usuário) mantidos em memória
+REDIS_ESPERA = 30  # Segundos sem tentar o Redis após uma falha
+
+CHAVE_GERACAO = 'dossie:config:geracao'
+PREFIXO_REDIS = 'dossie:config:'
+
+
+class CacheConfiguracoes:
+    """Cache local + Redis das configurações resolvidas, invalidado por geração"""
+
+    def __init__(self):
+        self.app = None
+        self.timeout = CACHE_TIMEOUT
+        self.espera = REDIS_ESPERA
+        self.local = ArmazenamentoExpiravel(MAX_ESCOPOS)
+        self.lock = threading.Lock()
+        self.redis = None
+        self._indisponivel_ate = 0
+
+    def init_app(self, app):
+        """Lê a configuração e troca a geração após os commits que alteram configurações"""
+        self.app = app
+        self.timeout = app.config.setdefault('CONFIG_CACHE_TIMEOUT', CACHE_TIMEOUT)
+        self.espera = app.config.setdefault('CONFIG_REDIS_ESPERA', REDIS_ESPERA)
+        self.local = ArmazenamentoExpiravel(app.config.setdefault('CONFIG_CACHE_MAXIMO', MAX_ESCOPOS))
+        url = app.config.setdefault('CONFIG_REDIS_URL', None)
+        if url and redis is None:
+            app.logger.warning('CONFIG_REDIS_URL definido, mas o pacote redis não está instalado; '
+                               'cache de configurações apenas local')
+        elif url:
+            self.redis = redis.Redis.from_url(
+                url, socket_timeout=0.5, socket_connect_timeout=0.5, health_check_interval=30
+            )
+        app.extensions['cache_configuracoes'] = self
+        if not event.contains(Session, 'after_commit', self._apos_commit):
+            event.listen(Session, 'after_commit', self._apos_commit)
+            event.listen(Session, 'after_rollback', self._apos_rollback)
+
+    # Redis
+
+    def redis_disponivel(self):
+        return self.redis is not None and time.time() >= self._indisponivel_ate
+
+    def _falha_redis(self, e):
+        self._indisponivel_ate = time.time() + self.espera
+        if self.app is not None:
+            self.app.logger.warning(f'Redis do cache de configurações indisponível ({e}); '
+                                    f'usando versoes_cache por {self.espera}s')
+
+    # Geração
+
+    def _geracao_redis(self):
+        """Token de geração no Redis ou None (chave sumiu entre o set e o get)"""
+        atual = self.redis.get(CHAVE_GERACAO)
+        if atual is None:
+            # Chave expirada ou Redis reiniciado: nova geração (nada antigo é reaproveitado)
+            self.redis.set(CHAVE_GERACAO, uuid.uuid4().hex, ex=self.timeout, nx=True)
+            atual = self.redis.get(CHAVE_GERACAO)
+            if atual is None:
+                # Despejada (maxmemory) ou expirada logo após o set: a requisição usa versoes_cache
+                return None
+        return 'r:' + atual.decode()
+
+    def _geracao_sql(self):
+        from models import VersaoCache
+        return f's:{VersaoCache.obter(VersaoCache.CONFIGURACOES)}'
+
+    def geracao(self):
+        """Geração atual das configurações, lida uma vez por requisição"""
+        if has_request_context() and '_geracao_configuracoes' in g:
+            return g._geracao_configuracoes
+
+        geracao = None
+        if self.redis_disponivel():
+            try:
+                if self._indisponivel_ate:
+                    # Recuperado após falha: escritas do período podem não ter trocado a geração
+                    self.redis.set(CHAVE_GERACAO, uuid.uuid4().hex, ex=self.timeout)
+                    self._indisponivel_ate = 0
+                geracao = self._geracao_redis()
+            except redis.RedisError as e:
+                self._falha_redis(e)
+        if geracao is None:
+            geracao = self._geracao_sql()
+
+        if has_request_context():
+            g._geracao_configuracoes = geracao
+        return geracao
+
+    def esquecer_geracao(self):
+        """Descarta a geração guardada na requisição atual"""
+        if has_request_context():
+            g.pop('_geracao_configuracoes', None)
+
+    # Entradas
+
+    def _chave_redis(self, geracao, escopo):
+        escola_id, usuario_id = escopo
+        return f'{PREFIXO_REDIS}{geracao}:{escola_id or 0}:{usuario_id or 0}'
+
+    def obter(self, escopo, geracao):
+        """
+        Entrada de um par (escola, usuário) montada na geração atual
+
+        Returns:
+            object | list | None: Valor local; linhas vindas do Redis (lista); ou None
+        """
+        with self.lock:
+            entrada = self.local.obter(escopo)
+        if entrada is not None and entrada[0] == geracao:
+            return entrada[1]
+
+        if geracao.startswith('r:') and self.redis_disponivel():
+            try:
+                dados = self.redis.get(self._chave_redis(geracao, escopo))
+            except redis.RedisError as e:
+                self._falha_redis(e)
+                return None
+            if dados is not None:
+                return json.loads(dados)
+        return None
+
+    def guardar(self, escopo, geracao, valor, linhas=None):
+        """Guarda o valor localmente e, com as linhas serializáveis, no Redis"""
+        with self.lock:
+            self.local.definir(escopo, (geracao, valor), self.timeout)
+        if linhas is not None and geracao.startswith('r:') and self.redis_disponivel():
+            try:
+                self.redis.set(self._chave_redis(geracao, escopo), json.dumps(linhas), ex=self.timeout)
+            except redis.RedisError as e:
+                self._falha_redis(e)
+
+    # Invalidação
+
+    def invalidar(self):
+        """Nova geração para todos os workers (o listener do modelo já incrementou versoes_cache)"""
+        with self.lock:
+            self.local.limpar()
+        self.esquecer_geracao()
+        if self.redis_disponivel():
+            try:
+                self.redis.set(CHAVE_GERACAO, uuid.uuid4().hex, ex=self.timeout)
+            except redis.RedisError as e:
+                self._falha_redis(e)
+
+    def limpar_local(self):
+        with self.lock:
+            self.local.limpar()
+        self.esquecer_geracao()
+
+    def _apos_commit(self, session):
+        if session.info.pop('configuracoes_alteradas', False):
+            self.invalidar()
+
+    def _apos_rollback(self, session):
+        session.info.pop('configuracoes_alteradas', None)
+
+    def estatisticas(self):
+        with self.lock:
+            return {
+                'escopos_locais': len(self.local),
+                'descartados': self.local.descartadas,
+                'expirados': self.local.expiradas,
+                'redis': 'desativado' if self.redis is None else (
+                    'ativo' if self.redis_disponivel() else 'indisponível'
+                )
+            }
+
+
+# Instância global do cache
+cache_configuracoes = CacheConfiguracoes()
@@ -1,14 +1,39 @@
 # utils/captcha.py
 """
 Sistema de CAPTCHA matemático simples para proteção contra bots
+
+Os CAPTCHAs pendentes ficam no armazenamento configurado por
+LIMITES_ARMAZENAMENTO (utils/armazenamento_limites.py), com expiração de
+CAPTCHA_VALIDADE segundos; assim a resposta pode chegar a outro worker do
+gunicorn. Cada token vale para uma única verificação.
 """
 
+import json
 import random
 import hashlib
-from datetime import datetime, timedelta
+import secrets
+
+from utils.armazenamento_limites import armazenamento_limites
+
+# Validade de um CAPTCHA gerado (segundos)
+CAPTCHA_VALIDADE = 300
+
+# Janela de falhas de login considerada para exigir o CAPTCHA (segundos)
+JANELA_CAPTCHA = 600
+
 
-# Cache de captchas por sessão
-captcha_cache = {}
+def _guardar(token, resposta_hash, tipo='matematico'):
+    armazenamento_limites.backend.definir(
+        f'captcha:{token}', json.dumps({'resposta_hash': resposta_hash, 'tipo': tipo}), CAPTCHA_VALIDADE
+    )
+
+
+def _consumir(token):
+    """Dados do CAPTCHA pendente, removendo-o (None se inexistente ou expirado)"""
+    if not token:
+        return None
+    dados = armazenamento_limites.backend.consumir(f'captcha:{token}')
+    return json.loads(dados) if dados is not None else None
 
 def gerar_captcha():
     """
@@ -39,26 +64,19 @@ def gerar_captcha():
         pergunta = f"Quanto é {num1} × {num2}?"
     
     # Gerar token único
-    token = hashlib.md5(f"{datetime.now().isoformat()}{random.random()}".encode()).hexdigest()
+    token = secrets.token_hex(16)
     
     # Hash da resposta para segurança
     resposta_hash = hashlib.sha256(f"{resposta}{token}".encode()).hexdigest()
     
-    # Armazenar no cache com expiração
-    captcha_cache[token] = {
-        'resposta_hash': resposta_hash,
-        'criado_em': datetime.now(),
-        'usado': False
-    }
-    
-    # Limpar captchas expirados
-    limpar_captchas_expirados()
+    # Armazenar com expiração
+    _guardar(token, resposta_hash)
     
     return pergunta, resposta_hash, token
 
 def verificar_captcha(token, resposta_usuario):
     """
-    Verifica se a resposta do CAPTCHA está correta
+    Verifica se a resposta do CAPTCHA está correta (o token é consumido)
     
     Args:
         token (str): Token do CAPTCHA
@@ -67,49 +85,21 @@ def verificar_captcha(token, resposta_usuario):
     Returns:
         bool: True se a resposta está correta
     """
-    if not token or token not in captcha_cache:
-        return False
-    
-    captcha_data = captcha_cache[token]
-    
-    # Verificar se já foi usado
-    if captcha_data['usado']:
-        return False
-    
-    # Verificar se expirou (5 minutos)
-    if datetime.now() - captcha_data['criado_em'] > timedelta(minutes=5):
-        del captcha_cache[token]
+    captcha_data = _consumir(token)
+    if captcha_data is None:
         return False
     
     try:
         resposta_int = int(resposta_usuario.strip())
         resposta_hash = hashlib.sha256(f"{resposta_int}{token}".encode()).hexdigest()
-        
-        if resposta_hash == captcha_data['resposta_hash']:
-            # Marcar como usado
-            captcha_cache[token]['usado'] = True
-            return True
-    except (ValueError, TypeError):
-        pass
-    
-    return False
+        return resposta_hash == captcha_data['resposta_hash']
+    except (ValueError, TypeError, AttributeError):
+        return False
 
 def invalidar_captcha(token):
-    """Remove um CAPTCHA do cache"""
-    if token in captcha_cache:
-        del captcha_cache[token]
-
-def limpar_captchas_expirados():
-    """Remove CAPTCHAs expirados do cache"""
-    agora = datetime.now()
-    tokens_expirados = []
-    
-    for token, data in captcha_cache.items():
-        if agora - data['criado_em'] > timedelta(minutes=10):
-            tokens_expirados.append(token)
-    
-    for token in tokens_expirados:
-        del captcha_cache[token]
+    """Remove um CAPTCHA pendente"""
+    if token:
+        armazenamento_limites.backend.remover(f'captcha:{token}')
 
 def deve_mostrar_captcha(ip_address):
     """
@@ -121,22 +111,10 @@ def deve_mostrar_captcha(ip_address):
     Returns:
         bool: True se deve mostrar CAPTCHA
     """
-    from utils.rate_limiter import tentativas_por_ip
-    
-    if ip_address not in tentativas_por_ip:
-        return False
-    
-    tentativas = tentativas_por_ip[ip_address]
-    agora = datetime.now()
-    
-    # Contar tentativas falhadas nas últimas 2 tentativas
-    tentativas_recentes = [
-        t for t in tentativas 
-        if not t['sucesso'] and (agora - t['timestamp']).total_seconds() <= 600  # 10 minutos
-    ]
+    from utils.rate_limiter import contar_falhas
     
-    # Mostrar CAPTCHA após 2 tentativas falhadas
-    return len(tentativas_recentes) >= 2
+    # Mostrar CAPTCHA após 2 tentativas falhadas nos últimos 10 minutos
+    return contar_falhas(ip_address, JANELA_CAPTCHA) >= 2
 
 def gerar_captcha_visual():
     """
@@ -150,24 +128,19 @@ def gerar_captcha_visual():
     codigo = ''.join(random.choice(caracteres) for _ in range(4))
     
     # Gerar token
-    token = hashlib.md5(f"{datetime.now().isoformat()}{random.random()}".encode()).hexdigest()
+    token = secrets.token_hex(16)
     
     # Hash do código
     codigo_hash = hashlib.sha256(f"{codigo.upper()}{token}".encode()).hexdigest()
     
-    # Armazenar no cache
-    captcha_cache[token] = {
-        'resposta_hash': codigo_hash,
-        'criado_em': datetime.now(),
-        'usado': False,
-        'tipo': 'visual'
-    }
+    # Armazenar com expiração
+    _guardar(token, codigo_hash, 'visual')
     
     return codigo, token
 
 def verificar_captcha_visual(token, codigo_usuario):
     """
-    Verifica CAPTCHA visual
+    Verifica CAPTCHA visual (o token é consumido)
     
     Args:
         token (str): Token do CAPTCHA
@@ -176,56 +149,28 @@ def verificar_captcha_visual(token, codigo_usuario):
     Returns:
         bool: True se correto
     """
-    if not token or token not in captcha_cache:
-        return False
-    
-    captcha_data = captcha_cache[token]
-    
-    if captcha_data.get('tipo') != 'visual':
-        return False
-    
-    if captcha_data['usado']:
-        return False
-    
-    if datetime.now() - captcha_data['criado_em'] > timedelta(minutes=5):
-        del captcha_cache[token]
+    captcha_data = _consumir(token)
+    if captcha_data is None or captcha_data.get('tipo') != 'visual':
         return False
     
     try:
         codigo_hash = hashlib.sha256(f"{codigo_usuario.upper().strip()}{token}".encode()).hexdigest()
-        
-        if codigo_hash == captcha_data['resposta_hash']:
-            captcha_cache[token]['usado'] = True
-            return True
-    except (ValueError, TypeError):
-        pass
-    
-    return False
+        return codigo_hash == captcha_data['resposta_hash']
+    except (ValueError, TypeError, AttributeError):
+        return False
 
 def obter_estatisticas_captcha():
     """
     Retorna estatísticas do sistema de CAPTCHA
     
     Returns:
-        dict: Estatísticas
+        dict: Estatísticas (CAPTCHAs usados ou expirados já saem do armazenamento)
     """
-    agora = datetime.now()
-    
-    total_captchas = len(captcha_cache)
-    captchas_usados = sum(1 for data in captcha_cache.values() if data['usado'])
-    captchas_expirados = sum(
-        1 for data in captcha_cache.values() 
-        if agora - data['criado_em'] > timedelta(minutes=5)
-    )
-    
     return {
-        'total_captchas_ativos': total_captchas,
-        'captchas_usados': captchas_usados,
-        'captchas_expirados': captchas_expirados,
-        'captchas_pendentes': total_captchas - captchas_usados - captchas_expirados
+        'total_captchas_ativos': armazenamento_limites.backend.contar_chaves('captcha:'),
+        'captchas_validade_segundos': CAPTCHA_VALIDADE
     }
 
 def limpar_cache_captcha():
-    """Limpa todo o cache de CAPTCHAs (para testes)"""
-    global captcha_cache
-    captcha_cache = {}
+    """Limpa todos os CAPTCHAs pendentes (para testes)"""
+    armazenamento_limites.backend.limpar('captcha:')
@@ -0,0 +1,130 @@
+"""
+Carregamento antecipado (eager loading) das listagens e detector de N+1
+
+Cada listagem tem um conjunto nomeado de opções de carregamento
+(joinedload/selectinload/contains_eager) com os relacionamentos que o seu
+template percorre; o controller aplica o conjunto com com_carregamento().
+Assim uma página custa um número constante de consultas, independente da
+quantidade de linhas.
+
+Em desenvolvimento (app.debug ou DETECTAR_N_MAIS_1=1) o detector registra
+no log toda carga preguiçosa (lazy load) disparada durante a renderização
+de um template, com o template e a linha que a provocou.
+"""
+
+import sys
+from collections import Counter
+
+from flask import before_render_template, g, has_app_context, template_rendered
+from sqlalchemy import event
+from sqlalchemy.orm import Session, contains_eager, joinedload, selectinload
+
+from models import Dossie, Movimentacao, Usuario
+
+
+# Conjuntos de opções por listagem (opções de carregamento são reutilizáveis entre queries)
+CARREGAMENTOS = {
+    # dossies/listar.html: dossie.escola.nome
+    'dossies.listar': (
+        joinedload(Dossie.escola),
+    ),
+    # movimentacoes/listar.html (listagem, pendentes, emprestados): mov.dossie
+    # (as queries já fazem JOIN com dossies) e mov.solicitante
+    'movimentacoes.listar': (
+        contains_eager(Movimentacao.dossie),
+        selectinload(Movimentacao.solicitante),
+    ),
+    # movimentacoes/ver.html: todos os relacionamentos da movimentação
+    'movimentacoes.detalhe': (
+        joinedload(Movimentacao.dossie).joinedload(Dossie.escola),
+        joinedload(Movimentacao.usuario),
+        joinedload(Movimentacao.solicitante),
+        joinedload(Movimentacao.escola_origem),
+        joinedload(Movimentacao.escola_destino),
+    ),
+    # relatorios/nao_devolvidos.html: a query já faz JOIN com dossies
+    'relatorios.nao_devolvidos': (
+        contains_eager(Movimentacao.dossie).joinedload(Dossie.escola),
+        selectinload(Movimentacao.solicitante),
+    ),
+    # admin/model_list.html
+    'admin.usuario': (
+        selectinload(Usuario.perfil_obj),
+    ),
+}
+
+
+def com_carregamento(query, nome):
+    """
+    Aplica à query o conjunto de opções de carregamento de uma listagem
+
+    Args:
+        query: Query do modelo listado
+        nome (str): Chave de CARREGAMENTOS (nomes sem conjunto não alteram a query)
+    """
+    opcoes = CARREGAMENTOS.get(nome)
+    return query.options(*opcoes) if opcoes else query
+
+
+def _linha_do_template():
+    """(template, linha) do frame de template Jinja mais próximo na pilha"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        template = frame.f_globals.get('__jinja_template__')
+        if template is not None:
+            return template.name or template.filename, template.get_corresponding_lineno(frame.f_lineno)
+        frame = frame.f_back
+    return None, None
+
+
+class DetectorNMais1:
+    """Registra cargas preguiçosas feitas durante a renderização de templates"""
+
+    def __init__(self):
+        self.app = None
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('DETECTAR_N_MAIS_1', False)
+        before_render_template.connect(self._inicio_render, app)
+        template_rendered.connect(self._fim_render, app)
+        if not event.contains(Session, 'do_orm_execute', self._consulta):
+            event.listen(Session, 'do_orm_execute', self._consulta)
+
+    def ativo(self, app):
+        return app.debug or app.config.get('DETECTAR_N_MAIS_1')
+
+    def _inicio_render(self, app, template, context, **extra):
+        if not self.ativo(app):
+            return
+        pilha = g.setdefault('_n_mais_1', [])
+        pilha.append((template.name, Counter()))
+
+    def _fim_render(self, app, template, context, **extra):
+        pilha = g.get('_n_mais_1')
+        if not pilha:
+            return
+        nome, cargas = pilha.pop()
+        for (local, entidade, origem), quantidade in cargas.most_common():
+            app.logger.warning(
+                f'N+1 ao renderizar {nome}: {quantidade} carga(s) preguiçosa(s) de '
+                f'{entidade} a partir de {origem} em {local}'
+            )
+
+    def _consulta(self, estado):
+        if not estado.is_select or estado.lazy_loaded_from is None or not has_app_context():
+            return
+        pilha = g.get('_n_mais_1')
+        if not pilha:
+            return
+
+        template, linha = _linha_do_template()
+        local = f'{template}:{linha}' if template else '(fora do template)'
+        mapper = estado.bind_mapper
+        entidade = mapper.class_.__name__ if mapper is not None else '?'
+        origem = estado.lazy_loaded_from.class_.__name__
+        pilha[-1][1][(local, entidade, origem)] += 1
+
+
+# Instância global do detector
+detector_n_mais_1 = DetectorNMais1()
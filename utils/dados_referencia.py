@@ -0,0 +1,188 @@
+# utils/dados_referencia.py
+"""
+Dados de referência em cache por processo (listas de filtros e formulários)
+
+Cada conjunto (escolas, cidades, perfis) é carregado como uma tupla de
+namedtuples imutáveis e marcado com a versão da sua chave em
+versoes_cache; os listeners dos modelos incrementam a versão a cada
+escrita, e o conjunto é recarregado na próxima requisição de qualquer
+worker. As versões de todas as chaves são lidas em uma única consulta por
+requisição, então uma página com selects de escolas, cidades e perfis não
+consulta essas tabelas.
+
+Os endpoints JSON usam resposta_json: o ETag é derivado da versão do
+conjunto e o navegador revalida com If-None-Match, recebendo 304 sem corpo
+enquanto nada mudou.
+"""
+
+from collections import namedtuple
+from types import MappingProxyType
+import hashlib
+import threading
+
+from flask import current_app, g, has_request_context, jsonify, request
+
+from models.versao_cache import VersaoCache
+
+
+# Registros reduzidos aos campos usados nos selects
+EscolaRef = namedtuple('EscolaRef', 'id nome uf situacao')
+
+
+class CidadeRef(namedtuple('CidadeRef', 'id_cidade nome uf')):
+    __slots__ = ()
+
+    @property
+    def id(self):
+        """Compatibilidade com Cidade.id"""
+        return self.id_cidade
+
+
+class PerfilRef(namedtuple('PerfilRef', 'id_perfil perfil descricao')):
+    __slots__ = ()
+
+    @property
+    def id(self):
+        """Compatibilidade com Perfil.id"""
+        return self.id_perfil
+
+
+def _carregar_escolas():
+    from models import db, Escola
+    linhas = db.session.execute(
+        db.select(Escola.id, Escola.nome, Escola.uf, Escola.situacao).order_by(Escola.nome)
+    ).all()
+    return tuple(EscolaRef(*linha) for linha in linhas)
+
+
+def _carregar_escolas_ativas():
+    return tuple(escola for escola in dados_referencia.obter('escolas') if escola.situacao == 'ativa')
+
+
+def _carregar_cidades():
+    from models import db, Cidade
+    linhas = db.session.execute(
+        db.select(Cidade.id_cidade, Cidade.nome, Cidade.uf).order_by(Cidade.nome)
+    ).all()
+    return tuple(CidadeRef(*linha) for linha in linhas)
+
+
+def _carregar_cidades_por_uf():
+    por_uf = {}
+    for cidade in dados_referencia.obter('cidades'):
+        por_uf.setdefault(cidade.uf.upper(), []).append(cidade)
+    return MappingProxyType({uf: tuple(cidades) for uf, cidades in por_uf.items()})
+
+
+def _carregar_perfis():
+    from models import db, Perfil
+    linhas = db.session.execute(
+        db.select(Perfil.id_perfil, Perfil.perfil, Perfil.descricao).order_by(Perfil.id_perfil)
+    ).all()
+    return tuple(PerfilRef(*linha) for linha in linhas)
+
+
+class DadosReferencia:
+    """Conjuntos nome -> (chave de versão, carregador), servidos de memória enquanto a versão não muda"""
+
+    def __init__(self):
+        self.cache = {}  # nome -> (versao, dados)
+        self.lock = threading.Lock()
+        self.conjuntos = {}
+
+    def registrar(self, nome, chave_versao, carregar):
+        self.conjuntos[nome] = (chave_versao, carregar)
+
+    def versao(self, nome):
+        """Versão do conjunto em versoes_cache; todas as chaves são lidas uma vez por requisição"""
+        chave_versao = self.conjuntos[nome][0]
+        if has_request_context() and '_versoes_referencia' in g:
+            return g._versoes_referencia.get(chave_versao, 0)
+
+        from models import db
+        chaves = {chave for chave, _ in self.conjuntos.values()}
+        versoes = dict(db.session.execute(
+            db.select(VersaoCache.chave, VersaoCache.versao).where(VersaoCache.chave.in_(chaves))
+        ).all())
+        if has_request_context():
+            g._versoes_referencia = versoes
+        return versoes.get(chave_versao, 0)
+
+    def obter(self, nome):
+        """
+        Conjunto de referência atual
+
+        Returns:
+            tuple | Mapping: namedtuples imutáveis (compartilhadas entre requisições)
+        """
+        carregar = self.conjuntos[nome][1]
+        versao = self.versao(nome)
+        entrada = self.cache.get(nome)
+        if entrada is not None and entrada[0] == versao:
+            return entrada[1]
+
+        # Carga fora do lock: o lock protege apenas a troca da entrada
+        dados = carregar()
+        with self.lock:
+            self.cache[nome] = (versao, dados)
+        return dados
+
+    def resposta_json(self, nome, serializar, *variacao):
+        """
+        Resposta JSON de um conjunto com ETag pela versão (304 se o cliente já tem)
+
+        Args:
+            nome (str): Conjunto registrado
+            serializar (callable): Recebe o conjunto e retorna o conteúdo JSON
+            *variacao: Parâmetros que mudam o conteúdo (ex: a UF filtrada)
+        """
+        chave = ':'.join(str(parte) for parte in (nome, self.versao(nome), *variacao))
+        etag = hashlib.sha1(chave.encode()).hexdigest()
+        if etag in request.if_none_match:
+            resposta = current_app.response_class(status=304)
+        else:
+            resposta = jsonify(serializar(self.obter(nome)))
+        resposta.set_etag(etag)
+        resposta.cache_control.private = True
+        resposta.cache_control.no_cache = True  # Sempre revalidar: a versão pode mudar
+        return resposta
+
+    def limpar_cache(self):
+        with self.lock:
+            self.cache.clear()
+        if has_request_context():
+            g.pop('_versoes_referencia', None)
+
+
+# Instância global do cache
+dados_referencia = DadosReferencia()
+dados_referencia.registrar('escolas', VersaoCache.ESCOLAS, _carregar_escolas)
+dados_referencia.registrar('escolas_ativas', VersaoCache.ESCOLAS, _carregar_escolas_ativas)
+dados_referencia.registrar('cidades', VersaoCache.CIDADES, _carregar_cidades)
+dados_referencia.registrar('cidades_por_uf', VersaoCache.CIDADES, _carregar_cidades_por_uf)
+dados_referencia.registrar('perfis', VersaoCache.PERFIS, _carregar_perfis)
+
+
+def escolas():
+    """Todas as escolas ordenadas por nome, como EscolaRef"""
+    return dados_referencia.obter('escolas')
+
+
+def escolas_ativas():
+    """Escolas ativas ordenadas por nome, como EscolaRef"""
+    return dados_referencia.obter('escolas_ativas')
+
+
+def cidades():
+    """Cidades ordenadas por nome, como CidadeRef"""
+    return dados_referencia.obter('cidades')
+
+
+def cidades_da_uf(uf):
+    """Cidades de uma UF ordenadas por nome"""
+    return dados_referencia.obter('cidades_por_uf').get(uf.upper(), ())
+
+
+def perfis():
+    """Perfis na ordem de cadastro, como PerfilRef"""
+    return dados_referencia.obter('perfis')
@@ -4,6 +4,9 @@ Utilitários para gerenciamento de escola atual
 
 from flask import session
 
+from utils.dados_referencia import escolas_ativas
+from utils.escopo_escola import coluna_escola
+
 def get_escola_atual_id(usuario):
     """
     Retorna o ID da escola atual de trabalho para o usuário
@@ -24,28 +27,33 @@ def get_escola_atual_id(usuario):
         # Para outros perfis, sempre usar a escola do usuário
         return usuario.escola_id
 
-def aplicar_filtro_escola(query, model, usuario, campo_escola='escola_id'):
+def aplicar_filtro_escola(query, model, usuario, escola_id=None):
     """
     Aplica filtro de escola na query baseado no usuário
     
+    Demais perfis já recebem o escopo automático da própria escola
+    (utils/escopo_escola.py); para o Admin Geral filtra pela escola
+    escolhida no filtro da listagem ou, sem ela, pela escola atual da sessão.
+    
     Args:
         query: Query SQLAlchemy
-        model: Modelo que contém o campo escola
+        model: Modelo com `__coluna_escola__`
         usuario: Objeto Usuario
-        campo_escola: Nome do campo que contém o ID da escola
+        escola_id: Escola escolhida no filtro da listagem (opcional)
         
     Returns:
         Query filtrada
     """
-    if not usuario:
+    if not usuario or not usuario.is_admin_geral():
         return query
-        
-    escola_atual_id = get_escola_atual_id(usuario)
     
-    if escola_atual_id:
-        # Usar getattr para acessar o campo dinamicamente
-        campo = getattr(model, campo_escola)
-        query = query.filter(campo == escola_atual_id)
+    try:
+        escola_id = int(escola_id) if escola_id else get_escola_atual_id(usuario)
+    except (TypeError, ValueError):
+        escola_id = get_escola_atual_id(usuario)  # Ignora filtro inválido
+    
+    if escola_id:
+        query = query.filter(coluna_escola(model) == escola_id)
     
     return query
 
@@ -59,13 +67,11 @@ def get_escolas_para_filtro(usuario):
     Returns:
         list: Lista de escolas
     """
-    from models import Escola
-    
     if not usuario:
         return []
         
     if usuario.is_admin_geral():
-        return Escola.query.filter_by(situacao='ativa').all()
+        return escolas_ativas()
     else:
         return [usuario.escola] if usuario.escola else []
 
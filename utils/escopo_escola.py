@@ -0,0 +1,101 @@
+# utils/escopo_escola.py
+"""
+Escopo de escola aplicado automaticamente às consultas ORM
+
+Modelos com `__coluna_escola__` (Dossie, Solicitante, Diretor, Notificacao,
+EmprestimoAberto) recebem, em todo SELECT feito durante uma requisição de
+usuário que não é Administrador Geral, o critério `coluna == escola do
+usuário` via with_loader_criteria. O critério vale também para joins,
+aliases e carregamentos de relacionamentos, então `db.session.get(Dossie, id)`
+de outra escola retorna None e nenhuma listagem depende de cada controller
+lembrar do filtro.
+
+O Administrador Geral não recebe escopo automático: alterna entre escolas
+e filtra explicitamente (utils/escola_utils.aplicar_filtro_escola).
+Tarefas fora de requisição (varreduras, comandos do manage.py) também não.
+Para consultar sem escopo dentro de uma requisição use
+`.execution_options(escopo_escola=False)`.
+"""
+
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from utils.usuario_atual import get_usuario_atual
+
+
+def coluna_escola(model):
+    """Coluna de escola declarada pelo modelo em `__coluna_escola__` (ou None)"""
+    nome = getattr(model, '__coluna_escola__', None)
+    return getattr(model, nome) if nome else None
+
+
+class EscopoEscola:
+    """Listener do_orm_execute que restringe os modelos por escola à escola do usuário"""
+
+    def __init__(self):
+        self._modelos = None
+
+    def init_app(self, app):
+        app.extensions['escopo_escola'] = self
+        if not event.contains(Session, 'do_orm_execute', self._aplicar):
+            event.listen(Session, 'do_orm_execute', self._aplicar)
+
+    def modelos(self):
+        """Modelos com `__coluna_escola__`, descobertos no primeiro uso"""
+        if self._modelos is None:
+            from models import db
+            self._modelos = tuple(
+                mapper.class_ for mapper in db.Model.registry.mappers
+                if getattr(mapper.class_, '__coluna_escola__', None)
+            )
+        return self._modelos
+
+    def escola_atual(self):
+        """
+        Escola imposta às consultas da requisição atual
+
+        Returns:
+            int | None: escola_id do usuário; None sem requisição, sem login ou para Admin Geral
+        """
+        if not has_request_context():
+            return None
+        if '_escopo_escola' in g:
+            return g._escopo_escola
+        if g.get('_resolvendo_escopo_escola'):
+            # Consulta do próprio usuário logado (Usuario não tem escopo)
+            return None
+
+        g._resolvendo_escopo_escola = True
+        try:
+            usuario = get_usuario_atual()
+        finally:
+            g.pop('_resolvendo_escopo_escola', None)
+
+        escola_id = None
+        if usuario is not None and not usuario.is_admin_geral():
+            escola_id = usuario.escola_id
+        g._escopo_escola = escola_id
+        return escola_id
+
+    def _aplicar(self, estado):
+        if (
+            not estado.is_select
+            or estado.is_column_load
+            or estado.is_relationship_load
+            or not estado.execution_options.get('escopo_escola', True)
+        ):
+            return
+
+        escola_id = self.escola_atual()
+        if escola_id is None:
+            return
+
+        estado.statement = estado.statement.options(*(
+            with_loader_criteria(model, coluna_escola(model) == escola_id, include_aliases=True)
+            for model in self.modelos()
+        ))
+
+
+# Instância global do escopo
+escopo_escola = EscopoEscola()
@@ -0,0 +1,226 @@
+"""
+Exportação de listagens em CSV e XLSX por streaming
+
+As linhas vêm de um cursor do servidor (Query.yield_per) e são escritas e
+enviadas ao navegador em blocos, sem montar o arquivo inteiro em memória:
+o consumo é o mesmo para 100 ou 1 milhão de registros.
+
+O XLSX é gerado diretamente (zip + XML da planilha com strings inline),
+sem dependências externas; o zipfile escreve em modo não-seekable, com
+descritores de dados após cada entrada.
+"""
+
+import csv
+import io
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from flask import Response, stream_with_context
+
+# Formatos aceitos pelas rotas de exportação
+FORMATOS = ('csv', 'xlsx')
+
+# Registros lidos do banco por vez
+TAMANHO_LOTE = 1000
+
+# Linhas acumuladas antes de enviar um bloco ao cliente
+LINHAS_POR_BLOCO = 500
+
+TIPOS_CONTEUDO = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Caracteres de controle não permitidos em XML 1.0
+_CONTROLE_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _formatar(valor):
+    """Valor exibido na célula (datas no formato brasileiro)"""
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return valor.strftime('%d/%m/%Y %H:%M')
+    if isinstance(valor, date):
+        return valor.strftime('%d/%m/%Y')
+    return valor
+
+
+def gerar_csv(colunas, linhas):
+    """
+    Gera o CSV em blocos de texto
+
+    Usa ';' como separador e BOM UTF-8 para o Excel em português abrir
+    o arquivo com acentos e colunas corretos.
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=';')
+
+    buffer.write('\ufeff')
+    escritor.writerow(colunas)
+
+    for indice, linha in enumerate(linhas, 1):
+        escritor.writerow([_formatar(valor) for valor in linha])
+        if indice % LINHAS_POR_BLOCO == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+class _SaidaEmBlocos:
+    """Arquivo somente-escrita que acumula bytes até serem retirados"""
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def retirar(self):
+        dados = b''.join(self._partes)
+        self._partes = []
+        return dados
+
+
+def _referencia_coluna(indice):
+    """Letra(s) da coluna na planilha: 0 -> A, 26 -> AA"""
+    letras = ''
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _celula(referencia, valor):
+    """XML de uma célula (número ou string inline)"""
+    valor = _formatar(valor)
+    if isinstance(valor, bool):
+        valor = 'Sim' if valor else 'Não'
+    if isinstance(valor, (int, float, Decimal)):
+        return f'<c r="{referencia}"><v>{valor}</v></c>'
+    texto = escape(_CONTROLE_XML.sub('', str(valor)))
+    return f'<c r="{referencia}" t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _linha_xml(numero, valores):
+    celulas = ''.join(
+        _celula(f'{_referencia_coluna(indice)}{numero}', valor)
+        for indice, valor in enumerate(valores)
+    )
+    return f'<row r="{numero}">{celulas}</row>'
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{nome}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def gerar_xlsx(colunas, linhas, nome_planilha='Dados'):
+    """Gera o XLSX em blocos de bytes"""
+    saida = _SaidaEmBlocos()
+    # Nome da aba: até 31 caracteres, sem []:*?/\
+    nome_planilha = escape(re.sub(r'[\[\]:*?/\\]', '', nome_planilha)[:31] or 'Dados')
+
+    with zipfile.ZipFile(saida, 'w', compression=zipfile.ZIP_DEFLATED) as arquivo:
+        arquivo.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        arquivo.writestr('_rels/.rels', _RELS)
+        arquivo.writestr('xl/workbook.xml', _WORKBOOK.format(nome=nome_planilha))
+        arquivo.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        yield saida.retirar()
+
+        with arquivo.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as planilha:
+            planilha.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetData>'
+            )
+            planilha.write(_linha_xml(1, colunas).encode('utf-8'))
+
+            bloco = []
+            for numero, linha in enumerate(linhas, 2):
+                bloco.append(_linha_xml(numero, linha))
+                if len(bloco) == LINHAS_POR_BLOCO:
+                    planilha.write(''.join(bloco).encode('utf-8'))
+                    bloco = []
+                    yield saida.retirar()
+
+            planilha.write(''.join(bloco).encode('utf-8'))
+            planilha.write(b'</sheetData></worksheet>')
+
+    yield saida.retirar()
+
+
+def resposta_exportacao(query, colunas, nome_arquivo, formato='csv', nome_planilha='Dados'):
+    """
+    Resposta HTTP que exporta uma query por streaming
+
+    Args:
+        query: Query com with_entities(...) na ordem de `colunas`
+        colunas (list): Títulos das colunas
+        nome_arquivo (str): Nome do arquivo sem extensão
+        formato (str): 'csv' ou 'xlsx'
+        nome_planilha (str): Nome da aba no XLSX
+
+    Returns:
+        Response em streaming (sem Content-Length)
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportação inválido: {formato}")
+
+    # Cursor do servidor: o banco entrega TAMANHO_LOTE linhas por vez
+    linhas = query.yield_per(TAMANHO_LOTE)
+
+    if formato == 'xlsx':
+        conteudo = gerar_xlsx(colunas, linhas, nome_planilha)
+    else:
+        conteudo = (bloco.encode('utf-8') for bloco in gerar_csv(colunas, linhas))
+
+    resposta = Response(stream_with_context(conteudo), mimetype=TIPOS_CONTEUDO[formato])
+    resposta.headers['Content-Disposition'] = f'attachment; filename="{nome_arquivo}.{formato}"'
+    resposta.headers['X-Accel-Buffering'] = 'no'
+    resposta.headers['Cache-Control'] = 'no-store'
+    return resposta
@@ -0,0 +1,255 @@
+# utils/gravador_logs.py
+"""
+Gravação assíncrona em lote dos logs de auditoria e de sistema
+
+log_acao/log_sistema apenas enfileiram o registro; uma thread de fundo
+grava os lotes (INSERT executemany) em conexão própria a cada
+AUDITORIA_LOTE registros ou AUDITORIA_INTERVALO_MS milissegundos.
+Assim a requisição não espera a escrita do log e a sessão da requisição
+nunca é commitada pelo log.
+
+Backpressure: com a fila cheia o registro é gravado de forma síncrona
+pelo próprio chamador (nada é descartado) e contabilizado nas métricas.
+As métricas são atualizadas pelas threads das requisições e pela gravadora,
+sempre sob _lock_metricas.
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+
+# Valores padrão (sobrescritos por app.config)
+LOTE_PADRAO = 100
+INTERVALO_MS_PADRAO = 200
+FILA_MAX_PADRAO = 10000
+
+
+class GravadorLogs:
+    """Fila limitada + thread gravadora de logs"""
+
+    def __init__(self):
+        self.app = None
+        self.engine = None
+        self.assincrono = True
+        self.lote = LOTE_PADRAO
+        self.intervalo = INTERVALO_MS_PADRAO / 1000
+        self.fila_max = FILA_MAX_PADRAO
+
+        self._fila = None
+        self._thread = None
+        self._pid = None
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+        self._lock_metricas = threading.Lock()
+        self._metricas = self._metricas_zeradas()
+
+    @staticmethod
+    def _metricas_zeradas():
+        return {
+            'enfileirados': 0,
+            'gravados': 0,
+            'lotes': 0,
+            'falhas': 0,
+            'gravacoes_sincronas': 0,
+            'maior_fila': 0,
+            'ultimo_lote_registros': 0,
+            'ultimo_lote_ms': 0.0,
+        }
+
+    def init_app(self, app):
+        """Lê a configuração e registra o flush no encerramento do processo"""
+        self.app = app
+        self.assincrono = app.config.setdefault('AUDITORIA_ASSINCRONA', True)
+        self.lote = app.config.setdefault('AUDITORIA_LOTE', LOTE_PADRAO)
+        self.intervalo = app.config.setdefault('AUDITORIA_INTERVALO_MS', INTERVALO_MS_PADRAO) / 1000
+        self.fila_max = app.config.setdefault('AUDITORIA_FILA_MAX', FILA_MAX_PADRAO)
+        app.extensions['gravador_logs'] = self
+        atexit.register(self.parar)
+
+    def _obter_engine(self):
+        """Engine da aplicação (capturada na primeira chamada, dentro do contexto)"""
+        if self.engine is None:
+            from models import db
+            if self.app is not None:
+                with self.app.app_context():
+                    self.engine = db.engine
+            else:
+                self.engine = db.engine
+        return self.engine
+
+    def _garantir_thread(self):
+        """
+        Inicia a thread gravadora sob demanda
+
+        Também recria fila e thread após um fork (ex: gunicorn com
+        preload_app), já que a thread do processo pai não existe no filho.
+        """
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                self._fila = queue.Queue(maxsize=self.fila_max)
+                # O lock herdado do pai pode ter sido copiado adquirido
+                self._lock_metricas = threading.Lock()
+                self._metricas = self._metricas_zeradas()
+            self._pid = pid
+            self._parar.clear()
+            self._obter_engine()
+            self._thread = threading.Thread(target=self._executar, name='gravador-logs', daemon=True)
+            self._thread.start()
+
+    def registrar(self, tabela, registro):
+        """
+        Enfileira um registro para gravação
+
+        Args:
+            tabela: Tabela SQLAlchemy de destino (ex: LogAuditoria.__table__)
+            registro (dict): Valores das colunas
+        """
+        if not self.assincrono:
+            self._gravar_sincrono(tabela, registro)
+            return
+
+        self._garantir_thread()
+        try:
+            self._fila.put_nowait((tabela, registro))
+        except queue.Full:
+            self._gravar_sincrono(tabela, registro)
+            return
+
+        tamanho = self._fila.qsize()
+        with self._lock_metricas:
+            self._metricas['enfileirados'] += 1
+            if tamanho > self._metricas['maior_fila']:
+                self._metricas['maior_fila'] = tamanho
+
+    def _gravar_sincrono(self, tabela, registro):
+        """Grava um único registro na thread do chamador"""
+        with self._lock_metricas:
+            self._metricas['gravacoes_sincronas'] += 1
+        self._gravar_lote([(tabela, registro)])
+
+    def _executar(self):
+        """Laço da thread: junta registros até o tamanho do lote ou o intervalo"""
+        while not self._parar.is_set():
+            lote = self._coletar_lote()
+            if lote:
+                self._gravar_lote(lote)
+                self._concluir(lote)
+        self._drenar()
+
+    def _concluir(self, lote):
+        """Marca os itens do lote como processados (libera flush())"""
+        for _ in lote:
+            self._fila.task_done()
+
+    def _coletar_lote(self):
+        """Retira da fila até `lote` registros, esperando no máximo `intervalo`"""
+        lote = []
+        limite = time.monotonic() + self.intervalo
+        while len(lote) < self.lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self._fila.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _drenar(self):
+        """Grava tudo o que restou na fila"""
+        while True:
+            lote = []
+            try:
+                while len(lote) < self.lote:
+                    lote.append(self._fila.get_nowait())
+            except queue.Empty:
+                pass
+            if not lote:
+                return
+            self._gravar_lote(lote)
+            self._concluir(lote)
+
+    def _gravar_lote(self, lote):
+        """INSERT em lote por tabela; se o lote falhar, tenta registro a registro"""
+        inicio = time.perf_counter()
+        por_tabela = {}
+        for tabela, registro in lote:
+            por_tabela.setdefault(tabela, []).append(registro)
+
+        engine = self._obter_engine()
+        gravados = falhas = 0
+        for tabela, registros in por_tabela.items():
+            try:
+                with engine.begin() as conexao:
+                    conexao.execute(tabela.insert(), registros)
+                gravados += len(registros)
+            except Exception as e:
+                print(f"Erro ao gravar lote de {len(registros)} logs em {tabela.name}: {e}")
+                for registro in registros:
+                    try:
+                        with engine.begin() as conexao:
+                            conexao.execute(tabela.insert(), registro)
+                        gravados += 1
+                    except Exception as erro:
+                        falhas += 1
+                        print(f"Log descartado ({tabela.name}): {erro}")
+
+        # Gravação síncrona (requisição) e thread gravadora podem chegar aqui ao mesmo tempo
+        with self._lock_metricas:
+            self._metricas['gravados'] += gravados
+            self._metricas['falhas'] += falhas
+            self._metricas['lotes'] += 1
+            self._metricas['ultimo_lote_registros'] = len(lote)
+            self._metricas['ultimo_lote_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+
+    def flush(self, timeout=5.0):
+        """
+        Aguarda a gravação de tudo o que já foi enfileirado
+
+        Returns:
+            bool: True se a fila foi gravada dentro do timeout
+        """
+        if self._fila is None or self._pid != os.getpid():
+            return True
+        limite = time.monotonic() + timeout
+        with self._fila.all_tasks_done:
+            while self._fila.unfinished_tasks:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                self._fila.all_tasks_done.wait(restante)
+        return True
+
+    def parar(self, timeout=10.0):
+        """Encerra a thread gravando os registros pendentes"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._parar.set()
+        self._thread.join(timeout)
+
+    def metricas(self):
+        """
+        Métricas da fila de logs
+
+        Returns:
+            dict: Contadores, tamanho e capacidade da fila
+        """
+        with self._lock_metricas:
+            dados = dict(self._metricas)
+        dados['tamanho_fila'] = self._fila.qsize() if self._fila is not None and self._pid == os.getpid() else 0
+        dados['capacidade_fila'] = self.fila_max
+        dados['assincrono'] = self.assincrono
+        dados['thread_ativa'] = bool(self._thread and self._thread.is_alive() and self._pid == os.getpid())
+        return dados
+
+
+# Instância global do gravador
+gravador_logs = GravadorLogs()
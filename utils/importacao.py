@@ -0,0 +1,193 @@
+"""
+Leitura de planilhas CSV e XLSX por streaming
+
+Par de utils/exportacao: as linhas são lidas uma a uma, sem carregar o
+arquivo inteiro em memória. O XLSX é lido diretamente do zip (XML da
+primeira planilha com iterparse), sem dependências externas; apenas a
+tabela de strings compartilhadas é mantida em memória.
+"""
+
+import codecs
+import csv
+import io
+import re
+import zipfile
+from xml.etree.ElementTree import ParseError, iterparse
+
+# Formatos aceitos pelas rotas de importação
+FORMATOS = ('csv', 'xlsx')
+
+_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_COLUNA = re.compile(r'^([A-Z]+)')
+
+
+class PlanilhaInvalida(ValueError):
+    """Arquivo não pôde ser lido como CSV/XLSX"""
+
+
+def formato_do_arquivo(filename):
+    """'csv' ou 'xlsx' pela extensão do nome (None se não suportado)"""
+    extensao = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return extensao if extensao in FORMATOS else None
+
+
+def ler_csv(arquivo):
+    """
+    Gera as linhas de um CSV (listas de strings)
+
+    Aceita UTF-8 (com ou sem BOM) ou Windows-1252 (CSV salvo pelo Excel),
+    separado por ';' ou ','.
+    """
+    stream = getattr(arquivo, 'stream', arquivo)
+    inicio = stream.read(64 * 1024)
+    if isinstance(inicio, str):
+        inicio = inicio.encode('utf-8')
+
+    try:
+        inicio.decode('utf-8')
+        codificacao = 'utf-8-sig'
+    except UnicodeDecodeError as e:
+        # Corte no meio de um caractere multibyte no fim do bloco lido
+        codificacao = 'utf-8-sig' if e.start >= len(inicio) - 3 else 'cp1252'
+
+    primeira_linha = inicio.split(b'\n', 1)[0]
+    delimitador = ';' if primeira_linha.count(b';') >= primeira_linha.count(b',') else ','
+
+    decodificador = codecs.getincrementaldecoder(codificacao)(errors='replace')
+
+    def texto():
+        yield decodificador.decode(inicio)
+        while True:
+            bloco = stream.read(64 * 1024)
+            if not bloco:
+                break
+            yield decodificador.decode(bloco)
+        yield decodificador.decode(b'', final=True)
+
+    def linhas():
+        pendente = ''
+        for parte in texto():
+            pendente += parte
+            *completas, pendente = pendente.split('\n')
+            for linha in completas:
+                yield linha + '\n'
+        if pendente:
+            yield pendente
+
+    yield from csv.reader(linhas(), delimiter=delimitador)
+
+
+def _indice_coluna(referencia):
+    """Índice da coluna a partir da referência da célula: A1 -> 0, AA7 -> 26"""
+    letras = _COLUNA.match(referencia).group(1)
+    indice = 0
+    for letra in letras:
+        indice = indice * 26 + ord(letra) - 64
+    return indice - 1
+
+
+def _strings_compartilhadas(zip_arquivo):
+    nome = 'xl/sharedStrings.xml'
+    if nome not in zip_arquivo.namelist():
+        return []
+    strings = []
+    with zip_arquivo.open(nome) as xml:
+        for _, elemento in iterparse(xml):
+            if elemento.tag == f'{_NS}si':
+                strings.append(''.join(t.text or '' for t in elemento.iter(f'{_NS}t')))
+                elemento.clear()
+    return strings
+
+
+def _primeira_planilha(zip_arquivo):
+    """Caminho no zip da primeira aba do workbook"""
+    try:
+        with zip_arquivo.open('xl/workbook.xml') as xml:
+            for _, elemento in iterparse(xml):
+                if elemento.tag == f'{_NS}sheet':
+                    rel_id = elemento.get(f'{_NS_REL}id')
+                    break
+            else:
+                rel_id = None
+        if rel_id:
+            with zip_arquivo.open('xl/_rels/workbook.xml.rels') as xml:
+                for _, elemento in iterparse(xml):
+                    if elemento.get('Id') == rel_id:
+                        alvo = elemento.get('Target').lstrip('/')
+                        return alvo if alvo.startswith('xl/') else f'xl/{alvo}'
+    except KeyError:
+        pass
+    return 'xl/worksheets/sheet1.xml'
+
+
+def _valor_celula(celula, strings):
+    tipo = celula.get('t')
+    if tipo == 'inlineStr':
+        return ''.join(t.text or '' for t in celula.iter(f'{_NS}t'))
+    valor = celula.find(f'{_NS}v')
+    if valor is None or valor.text is None:
+        return ''
+    texto = valor.text
+    if tipo == 's':
+        return strings[int(texto)]
+    if tipo in ('str', 'b', 'e'):
+        return texto
+    # Números inteiros sem ".0" nem notação científica (nº do dossiê, CPF, ano)
+    try:
+        numero = float(texto)
+    except ValueError:
+        return texto
+    if numero.is_integer() and ('.' in texto or 'E' in texto.upper()):
+        return str(int(numero))
+    return texto
+
+
+def ler_xlsx(arquivo):
+    """Gera as linhas da primeira aba de um XLSX (listas de strings)"""
+    stream = getattr(arquivo, 'stream', arquivo)
+    if not stream.seekable():
+        stream = io.BytesIO(stream.read())
+
+    try:
+        zip_arquivo = zipfile.ZipFile(stream)
+    except zipfile.BadZipFile:
+        raise PlanilhaInvalida('Arquivo XLSX inválido')
+
+    with zip_arquivo:
+        strings = _strings_compartilhadas(zip_arquivo)
+        planilha = _primeira_planilha(zip_arquivo)
+        if planilha not in zip_arquivo.namelist():
+            raise PlanilhaInvalida('Planilha não encontrada no arquivo XLSX')
+
+        with zip_arquivo.open(planilha) as xml:
+            for _, elemento in iterparse(xml):
+                if elemento.tag != f'{_NS}row':
+                    continue
+                linha = []
+                for celula in elemento.iter(f'{_NS}c'):
+                    referencia = celula.get('r')
+                    if referencia:
+                        indice = _indice_coluna(referencia)
+                        linha.extend([''] * (indice - len(linha)))
+                    linha.append(_valor_celula(celula, strings))
+                elemento.clear()
+                yield linha
+
+
+def ler_planilha(arquivo, formato):
+    """
+    Linhas de um arquivo CSV ou XLSX
+
+    Raises:
+        PlanilhaInvalida: formato não suportado ou arquivo corrompido
+    """
+    leitores = {'csv': ler_csv, 'xlsx': ler_xlsx}
+    if formato not in leitores:
+        raise PlanilhaInvalida(f'Formato de importação inválido: {formato}')
+
+    try:
+        yield from leitores[formato](arquivo)
+    except (csv.Error, ParseError, zipfile.BadZipFile, KeyError, IndexError) as e:
+        raise PlanilhaInvalida(f'Erro ao ler a planilha: {e}')
+
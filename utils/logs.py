@@ -3,23 +3,31 @@
 Utilitários para sistema de logs e auditoria
 """
 
-from flask import session, request
+from flask import session, request, has_request_context
 from datetime import datetime
 import traceback
 import sys
 
+from utils.gravador_logs import gravador_logs
+
 def log_acao(acao, item_alterado=None, detalhes=None, usuario_id=None):
     """
     Registrar log de auditoria
     
+    O registro é enfileirado e gravado em lote pelo gravador_logs, fora da
+    sessão da requisição (não faz commit de alterações pendentes).
+    
     Args:
         acao (str): Ação realizada (ex: 'LOGIN', 'CRIAR_USUARIO', 'EDITAR_DOSSIE')
         item_alterado (str): Item que foi alterado (ex: 'Usuario', 'Dossie')
         detalhes (str): Detalhes adicionais da ação
         usuario_id (int): ID do usuário (opcional, pega da sessão se não informado)
+    
+    Returns:
+        dict: Registro enfileirado, ou None se não houve registro
     """
     try:
-        from models import db, LogAuditoria
+        from models import LogAuditoria
         
         # Obter ID do usuário da sessão se não informado
         if usuario_id is None:
@@ -29,21 +37,20 @@ def log_acao(acao, item_alterado=None, detalhes=None, usuario_id=None):
         if not usuario_id:
             return
         
-        # Criar log de auditoria
-        log = LogAuditoria(
-            usuario_id=usuario_id,
-            acao=acao,
-            item_alterado=item_alterado,
-            detalhes=detalhes,
-            ip_address=request.remote_addr if request else None,
-            navegador=request.headers.get('User-Agent') if request else None,
-            data_hora=datetime.now()
-        )
+        em_requisicao = has_request_context()
+        registro = {
+            'usuario_id': usuario_id,
+            'acao': acao,
+            'item_alterado': item_alterado,
+            'detalhes': detalhes,
+            'ip_address': request.remote_addr if em_requisicao else None,
+            'navegador': request.headers.get('User-Agent') if em_requisicao else None,
+            'data_hora': datetime.now()
+        }
         
-        db.session.add(log)
-        db.session.commit()
+        gravador_logs.registrar(LogAuditoria.__table__, registro)
         
-        return log
+        return registro
         
     except Exception as e:
         # Se falhar ao registrar log, não deve quebrar a aplicação
@@ -52,7 +59,7 @@ def log_acao(acao, item_alterado=None, detalhes=None, usuario_id=None):
 
 def log_sistema(mensagem, nivel='INFO', modulo=None, funcao=None, usuario_id=None):
     """
-    Registrar log do sistema
+    Registrar log do sistema (gravado em lote pelo gravador_logs)
     
     Args:
         mensagem (str): Mensagem do log
@@ -60,9 +67,12 @@ def log_sistema(mensagem, nivel='INFO', modulo=None, funcao=None, usuario_id=Non
         modulo (str): Módulo onde ocorreu
         funcao (str): Função onde ocorreu
         usuario_id (int): ID do usuário (opcional)
+    
+    Returns:
+        dict: Registro enfileirado, ou None em caso de erro
     """
     try:
-        from models import db, LogSistema
+        from models import LogSistema
         
         # Obter informações do frame atual se não informado
         if not modulo or not funcao:
@@ -73,24 +83,22 @@ def log_sistema(mensagem, nivel='INFO', modulo=None, funcao=None, usuario_id=Non
                 funcao = frame.f_code.co_name
         
         # Obter ID do usuário da sessão se não informado
-        if usuario_id is None:
+        if usuario_id is None and has_request_context():
             usuario_id = session.get('user_id')
         
-        # Criar log do sistema
-        log = LogSistema(
-            mensagem_erro=mensagem,
-            nivel_erro=nivel,
-            modulo=modulo,
-            funcao=funcao,
-            linha=sys._getframe(1).f_lineno,
-            usuario_id=usuario_id,
-            data_hora=datetime.now()
-        )
+        registro = {
+            'mensagem_erro': mensagem,
+            'nivel_erro': nivel,
+            'modulo': modulo,
+            'funcao': funcao,
+            'linha': sys._getframe(1).f_lineno,
+            'usuario_id': usuario_id,
+            'data_hora': datetime.now()
+        }
         
-        db.session.add(log)
-        db.session.commit()
+        gravador_logs.registrar(LogSistema.__table__, registro)
         
-        return log
+        return registro
         
     except Exception as e:
         # Se falhar ao registrar log, não deve quebrar a aplicação
@@ -124,7 +132,7 @@ def log_erro(erro, modulo=None, funcao=None, usuario_id=None):
         print(f"Erro ao registrar erro: {e}")
         return None
 
-def obter_logs_auditoria(limite=100, usuario_id=None, acao=None):
+def obter_logs_auditoria(limite=100, usuario_id=None, acao=None, inicio=None, fim=None):
     """
     Obter logs de auditoria
     
@@ -132,14 +140,17 @@ def obter_logs_auditoria(limite=100, usuario_id=None, acao=None):
         limite (int): Número máximo de logs
         usuario_id (int): Filtrar por usuário
         acao (str): Filtrar por ação
+        inicio (date): Primeiro dia do período (limita as partições lidas)
+        fim (date): Último dia do período
     
     Returns:
         list: Lista de logs
     """
     try:
         from models import LogAuditoria
+        from services.retencao_logs_service import filtrar_periodo
         
-        query = LogAuditoria.query
+        query = filtrar_periodo(LogAuditoria.query, LogAuditoria, inicio, fim)
         
         if usuario_id:
             query = query.filter_by(usuario_id=usuario_id)
@@ -155,21 +166,24 @@ def obter_logs_auditoria(limite=100, usuario_id=None, acao=None):
         print(f"Erro ao obter logs de auditoria: {e}")
         return []
 
-def obter_logs_sistema(limite=100, nivel=None):
+def obter_logs_sistema(limite=100, nivel=None, inicio=None, fim=None):
     """
     Obter logs do sistema
     
     Args:
         limite (int): Número máximo de logs
         nivel (str): Filtrar por nível
+        inicio (date): Primeiro dia do período (limita as partições lidas)
+        fim (date): Último dia do período
     
     Returns:
         list: Lista de logs
     """
     try:
         from models import LogSistema
+        from services.retencao_logs_service import filtrar_periodo
         
-        query = LogSistema.query
+        query = filtrar_periodo(LogSistema.query, LogSistema, inicio, fim)
         
         if nivel:
             query = query.filter_by(nivel_erro=nivel)
@@ -189,6 +203,8 @@ class AcoesAuditoria:
     ALTERACAO = 'ALTERACAO'
     EXCLUSAO = 'EXCLUSAO'
     VISUALIZACAO = 'VISUALIZACAO'
+    EXPORTACAO = 'EXPORTACAO'
+    IMPORTACAO = 'IMPORTACAO'
 
     # Autenticação
     LOGIN = 'LOGIN'
@@ -232,6 +248,10 @@ class AcoesAuditoria:
     ANEXO_REMOVIDO = 'ANEXO_REMOVIDO'
     ANEXO_BAIXADO = 'ANEXO_BAIXADO'
     
+    # Permissões (utils/permissions.require_permission)
+    ACESSO_NEGADO = 'ACESSO_NEGADO'
+    ACESSO_PERMITIDO = 'ACESSO_PERMITIDO'
+    
     # Sistema
     BACKUP_CRIADO = 'BACKUP_CRIADO'
     CONFIGURACAO_ALTERADA = 'CONFIGURACAO_ALTERADA'
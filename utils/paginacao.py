@@ -0,0 +1,279 @@
+"""
+Paginação por chave (keyset / cursor) para listagens grandes
+
+Em vez de COUNT(*) + OFFSET, cada página filtra pela chave de ordenação do
+último registro exibido, de modo que a página 500 custa o mesmo que a 1.
+Os cursores são opacos (base64 de JSON) e carregam a chave e a direção.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import tuple_
+
+from models import db
+
+# Itens por página padrão das listagens
+POR_PAGINA = 15
+
+
+class CursorInvalido(ValueError):
+    """Cursor malformado ou de outra listagem"""
+
+
+def _serializar_valor(valor):
+    """Converte um valor da chave em algo representável em JSON"""
+    if isinstance(valor, datetime):
+        return {'dt': valor.isoformat()}
+    if isinstance(valor, date):
+        return {'d': valor.isoformat()}
+    if isinstance(valor, Decimal):
+        return {'n': str(valor)}
+    return valor
+
+def _desserializar_valor(valor):
+    """Inverso de _serializar_valor"""
+    if isinstance(valor, dict):
+        if 'dt' in valor:
+            return datetime.fromisoformat(valor['dt'])
+        if 'd' in valor:
+            return date.fromisoformat(valor['d'])
+        if 'n' in valor:
+            return Decimal(valor['n'])
+    return valor
+
+def codificar_cursor(dados):
+    """Gera um cursor opaco a partir de um dict"""
+    bruto = json.dumps(dados, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(bruto).decode('ascii').rstrip('=')
+
+def decodificar_cursor(cursor):
+    """
+    Lê um cursor gerado por codificar_cursor
+
+    Raises:
+        CursorInvalido: se o cursor não puder ser lido
+    """
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        dados = json.loads(bruto)
+    except (ValueError, TypeError) as e:
+        raise CursorInvalido(str(e))
+    if not isinstance(dados, dict):
+        raise CursorInvalido('cursor deve ser um objeto')
+    return dados
+
+
+class PaginaCursor:
+    """
+    Página de resultados navegável por cursores
+
+    Atributos usados pelos templates: items, has_prev, has_next,
+    prev_cursor, next_cursor, total (None se não solicitado) e
+    total_estimado (True quando total vem da estimativa do planejador).
+    """
+
+    def __init__(self, items, per_page, prev_cursor=None, next_cursor=None,
+                 total=None, total_estimado=False):
+        self.items = items
+        self.per_page = per_page
+        self.prev_cursor = prev_cursor
+        self.next_cursor = next_cursor
+        self.total = total
+        self.total_estimado = total_estimado
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def estimar_total(query):
+    """
+    Estima a quantidade de linhas de uma query sem percorrê-la
+
+    No PostgreSQL usa pg_class.reltuples quando a query não tem filtros e a
+    estimativa de linhas do EXPLAIN caso contrário; nos demais bancos faz o
+    COUNT(*) (usado apenas em bases pequenas de desenvolvimento).
+
+    Returns:
+        tuple: (total, estimado)
+    """
+    engine = db.session.get_bind()
+    if engine.dialect.name != 'postgresql':
+        return query.order_by(None).count(), False
+
+    statement = query.order_by(None).statement
+    froms = statement.get_final_froms()
+    if statement.whereclause is None and len(froms) == 1 and hasattr(froms[0], 'name'):
+        total = db.session.execute(
+            db.text("SELECT reltuples::bigint FROM pg_class WHERE relname = :tabela"),
+            {'tabela': froms[0].name}
+        ).scalar()
+    else:
+        compilado = statement.compile(dialect=engine.dialect)
+        plano = db.session.connection().exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {compilado}", compilado.params
+        ).scalar()
+        if isinstance(plano, str):
+            plano = json.loads(plano)
+        total = plano[0]['Plan']['Plan Rows']
+
+    return max(int(total or 0), 0), True
+
+
+def _ler_cursor_keyset(cursor, tamanho):
+    """Extrai (valores da chave, é_página_anterior) de um cursor keyset"""
+    dados = decodificar_cursor(cursor)
+    valores = dados.get('k')
+    if not isinstance(valores, list) or len(valores) != tamanho:
+        raise CursorInvalido('chave incompatível com a listagem')
+    try:
+        valores = [_desserializar_valor(v) for v in valores]
+    except (ValueError, TypeError, ArithmeticError) as e:
+        raise CursorInvalido(str(e))
+    return valores, dados.get('d') == 'p'
+
+
+def _anulavel(coluna):
+    """Se a coluna da chave admite NULL (expressões sem metadados contam como anuláveis)"""
+    return getattr(getattr(coluna, 'expression', coluna), 'nullable', True)
+
+
+def _comparar(colunas, valores, menor):
+    """(c1, c2, ...) < (v1, v2, ...) ou >, em comparação de linha quando há mais de uma coluna"""
+    if len(colunas) == 1:
+        return colunas[0] < valores[0] if menor else colunas[0] > valores[0]
+    esquerda, direita = tuple_(*colunas), tuple_(*valores)
+    return esquerda < direita if menor else esquerda > direita
+
+
+def _segmentos_keyset(chaves, valores, inverter):
+    """
+    Filtros e ordens a percorrer, em sequência, para obter a próxima página
+
+    Registros com a primeira chave nula ficam depois de todos os demais na
+    ordem decrescente (antes, na crescente), ordenados pelas chaves restantes.
+    Cada segmento é uma comparação de linha ou um IS NULL, que o banco
+    resolve pelo índice (chave, id); o segundo só é consultado quando o
+    primeiro não completa a página.
+
+    Returns:
+        list: [(filtro ou None, [colunas de ordenação])]
+    """
+    def ordenar(colunas):
+        return [coluna.desc() if inverter else coluna.asc() for coluna in colunas]
+
+    if not _anulavel(chaves[0]):
+        filtro = _comparar(chaves, valores, inverter) if valores is not None else None
+        return [(filtro, ordenar(chaves))]
+
+    primeira, restantes = chaves[0], chaves[1:]
+    com_valor = (primeira.isnot(None), ordenar(chaves))
+    nulos = (primeira.is_(None), ordenar(restantes))
+
+    if valores is None:
+        return [com_valor, nulos] if inverter else [nulos, com_valor]
+
+    if valores[0] is None:
+        # Cursor dentro do trecho de nulos
+        nulos = (db.and_(primeira.is_(None), _comparar(restantes, valores[1:], inverter)), nulos[1])
+        return [nulos] if inverter else [nulos, com_valor]
+
+    com_valor = (_comparar(chaves, valores, inverter), com_valor[1])
+    return [com_valor, nulos] if inverter else [com_valor]
+
+
+def paginar_keyset(query, chaves, cursor=None, per_page=POR_PAGINA, descendente=True, contar=False):
+    """
+    Pagina uma query pela chave de ordenação
+
+    Args:
+        query: Query SQLAlchemy (sem order_by; a ordem é definida pelas chaves)
+        chaves (list): Colunas da chave, terminando em uma coluna única
+                       (ex: [Dossie.dt_cadastro, Dossie.id_dossie]); só a
+                       primeira pode ser nula (registros sem valor vão para o fim)
+        cursor (str): Cursor recebido na URL (None para a primeira página)
+        per_page (int): Itens por página
+        descendente (bool): Ordem decrescente (True) ou crescente
+        contar (bool): Calcular/estimar o total de registros
+
+    Returns:
+        PaginaCursor
+    """
+    anterior = False
+    valores = None
+    if cursor:
+        try:
+            valores, anterior = _ler_cursor_keyset(cursor, len(chaves))
+        except CursorInvalido:
+            # Cursor adulterado ou de outra listagem: volta à primeira página
+            valores, anterior = None, False
+
+    # Voltar uma página = avançar na ordem inversa e reverter o resultado
+    inverter = descendente != anterior
+
+    linhas = []
+    for filtro, ordem in _segmentos_keyset(chaves, valores, inverter):
+        segmento = query.filter(filtro) if filtro is not None else query
+        linhas += segmento.order_by(*ordem).limit(per_page + 1 - len(linhas)).all()
+        if len(linhas) > per_page:
+            break
+    mais = len(linhas) > per_page
+    items = linhas[:per_page]
+    if anterior:
+        items.reverse()
+
+    def _cursor(item, direcao):
+        chave = [_serializar_valor(getattr(item, coluna.key)) for coluna in chaves]
+        return codificar_cursor({'k': chave, 'd': direcao})
+
+    prev_cursor = next_cursor = None
+    if items:
+        if anterior:
+            prev_cursor = _cursor(items[0], 'p') if mais else None
+            next_cursor = _cursor(items[-1], 'n')
+        else:
+            prev_cursor = _cursor(items[0], 'p') if valores is not None else None
+            next_cursor = _cursor(items[-1], 'n') if mais else None
+
+    total, estimado = estimar_total(query) if contar else (None, False)
+    return PaginaCursor(items, per_page, prev_cursor, next_cursor, total, estimado)
+
+
+def paginar_offset(query, cursor=None, per_page=POR_PAGINA):
+    """
+    Pagina uma query com ordem própria (ex: relevância da busca) sem COUNT(*)
+
+    Usa a mesma interface de cursores de paginar_keyset; indicado apenas para
+    resultados já restritos, como os de uma busca textual.
+
+    Returns:
+        PaginaCursor
+    """
+    inicio = 0
+    if cursor:
+        try:
+            inicio = decodificar_cursor(cursor).get('o', 0)
+        except CursorInvalido:
+            inicio = 0
+        if not isinstance(inicio, int) or inicio < 0:
+            inicio = 0
+
+    linhas = query.offset(inicio).limit(per_page + 1).all()
+    items = linhas[:per_page]
+
+    prev_cursor = codificar_cursor({'o': max(inicio - per_page, 0)}) if inicio > 0 else None
+    next_cursor = codificar_cursor({'o': inicio + per_page}) if len(linhas) > per_page else None
+    return PaginaCursor(items, per_page, prev_cursor, next_cursor)
@@ -1,190 +1,263 @@
 # utils/permission_cache.py
 """
-Sistema de cache para permissões de usuários
+Snapshot de permissões por perfil compartilhado pelo processo
+
+Cada perfil é compilado em um frozenset de (modulo, acao). O snapshot guarda
+a versão de 'permissoes' em versoes_cache com que foi montado; quando outro
+worker altera PerfilPermissao a versão é incrementada no banco e o snapshot
+é recarregado na próxima requisição. A carga do banco acontece fora do lock:
+o lock protege apenas a troca das entradas do dicionário.
 """
 
-import json
-from datetime import datetime, timedelta
-from collections import defaultdict
+from datetime import datetime
 import threading
 
-# Cache em memória das permissões por usuário
+# Snapshot em memória: perfil_id -> (versao, frozenset((modulo, acao)), criado_em)
 permissions_cache = {}
-cache_timestamps = {}
 lock = threading.Lock()
 
 # Configurações do cache
-CACHE_TIMEOUT = 3600  # 1 hora em segundos
-MAX_CACHE_SIZE = 1000  # Máximo de usuários no cache
+CACHE_TIMEOUT = 3600  # Validade máxima de uma entrada (segundos)
+MAX_CACHE_SIZE = 1000  # Máximo de perfis no cache
 
-def get_user_permissions(user_id):
+# Administrador Geral recebe todas as permissões conhecidas
+ADMIN_PERMISSIONS = {
+    'usuario': ['criar', 'editar', 'excluir', 'visualizar'],
+    'escola': ['criar', 'editar', 'excluir', 'visualizar'],
+    'diretor': ['criar', 'editar', 'excluir', 'visualizar'],
+    'solicitante': ['criar', 'editar', 'excluir', 'visualizar'],
+    'dossie': ['criar', 'editar', 'excluir', 'visualizar'],
+    'movimentacao': ['criar', 'editar', 'excluir', 'visualizar'],
+    'anexo': ['criar', 'editar', 'excluir', 'visualizar'],
+    'relatorio': ['visualizar', 'gerar'],
+    'admin': ['total', 'backup', 'logs'],
+    'permissao': ['criar', 'editar', 'excluir', 'visualizar'],
+    'perfil': ['criar', 'editar', 'excluir', 'visualizar'],
+    'cidade': ['criar', 'editar', 'excluir', 'visualizar'],
+    'configuracao': ['criar', 'editar', 'excluir', 'visualizar']
+}
+
+def _versao_atual():
+    """
+    Lê a versão das permissões no banco, uma vez por requisição
+
+    Returns:
+        int: Versão atual, ou None se não foi possível ler
+    """
+    from flask import g, has_request_context
+
+    if has_request_context() and '_versao_permissoes' in g:
+        return g._versao_permissoes
+
+    try:
+        from models import VersaoCache
+        versao = VersaoCache.obter(VersaoCache.PERMISSOES)
+    except Exception as e:
+        print(f"Erro ao ler versão das permissões: {e}")
+        try:
+            from models import db
+            db.session.rollback()
+        except Exception:
+            pass
+        versao = None
+
+    if has_request_context():
+        g._versao_permissoes = versao
+    return versao
+
+def _entrada_valida(entrada, versao):
+    """Entrada vale se foi montada na versão atual e não passou do timeout"""
+    versao_entrada, _, criado_em = entrada
+    if (datetime.now() - criado_em).total_seconds() >= CACHE_TIMEOUT:
+        return False
+    return versao is None or versao_entrada == versao
+
+def get_perfil_permissions(perfil_id):
     """
-    Busca permissões do usuário do cache ou banco de dados
-    
+    Retorna o snapshot de permissões de um perfil
+
     Args:
-        user_id (int): ID do usuário
-        
+        perfil_id (int): ID do perfil
+
     Returns:
-        dict: Permissões do usuário {modulo: [acao1, acao2, ...]}
+        frozenset: Pares (modulo, acao)
     """
-    with lock:
-        # Verificar se está no cache e não expirou
-        if user_id in permissions_cache:
-            timestamp = cache_timestamps.get(user_id)
-            if timestamp and (datetime.now() - timestamp).total_seconds() < CACHE_TIMEOUT:
-                return permissions_cache[user_id]
-        
-        # Buscar do banco de dados
-        permissions = _load_permissions_from_db(user_id)
-        
-        # Armazenar no cache
-        _store_in_cache(user_id, permissions)
-        
-        return permissions
-
-def _load_permissions_from_db(user_id):
+    if perfil_id is None:
+        return frozenset()
+
+    versao = _versao_atual()
+
+    # Leitura sem lock: a troca de entradas no dicionário é atômica
+    entrada = permissions_cache.get(perfil_id)
+    if entrada and _entrada_valida(entrada, versao):
+        return entrada[1]
+
+    # Carregar do banco fora do lock
+    permissoes = _load_permissions_from_db(perfil_id)
+    _store_in_cache(perfil_id, versao, permissoes)
+    return permissoes
+
+def _load_permissions_from_db(perfil_id):
     """
-    Carrega permissões do banco de dados
-    
+    Compila as permissões de um perfil a partir do banco
+
     Args:
-        user_id (int): ID do usuário
-        
+        perfil_id (int): ID do perfil
+
     Returns:
-        dict: Permissões do usuário
+        frozenset: Pares (modulo, acao)
     """
     try:
-        from models import Usuario, Perfil
-        
-        usuario = Usuario.query.get(user_id)
-        if not usuario or not usuario.perfil_obj:
-            return {}
-        
-        permissions = {}
-        
-        # Admin Geral tem todas as permissões
-        if usuario.perfil_obj.perfil == 'Administrador Geral':
-            # Definir todas as permissões possíveis
-            all_permissions = {
-                'usuario': ['criar', 'editar', 'excluir', 'visualizar'],
-                'escola': ['criar', 'editar', 'excluir', 'visualizar'],
-                'diretor': ['criar', 'editar', 'excluir', 'visualizar'],
-                'solicitante': ['criar', 'editar', 'excluir', 'visualizar'],
-                'dossie': ['criar', 'editar', 'excluir', 'visualizar'],
-                'movimentacao': ['criar', 'editar', 'excluir', 'visualizar'],
-                'anexo': ['criar', 'editar', 'excluir', 'visualizar'],
-                'relatorio': ['visualizar', 'gerar'],
-                'admin': ['total', 'backup', 'logs'],
-                'permissao': ['criar', 'editar', 'excluir', 'visualizar'],
-                'perfil': ['criar', 'editar', 'excluir', 'visualizar'],
-                'cidade': ['criar', 'editar', 'excluir', 'visualizar'],
-                'configuracao': ['criar', 'editar', 'excluir', 'visualizar']
-            }
-            return all_permissions
-        
-        # Para outros perfis, buscar permissões específicas
-        from models import db
+        from models import db, Perfil
         from models.permissao import PerfilPermissao, Permissao
 
-        permissoes_query = db.session.query(Permissao).join(PerfilPermissao).filter(
-            PerfilPermissao.perfil_id == usuario.perfil_obj.id_perfil
+        perfil = db.session.get(Perfil, perfil_id)
+        if not perfil:
+            return frozenset()
+
+        # Admin Geral tem todas as permissões
+        if perfil.perfil == 'Administrador Geral':
+            return frozenset(
+                (modulo, acao) for modulo, acoes in ADMIN_PERMISSIONS.items() for acao in acoes
+            )
+
+        pares = db.session.query(Permissao.modulo, Permissao.acao).join(PerfilPermissao).filter(
+            PerfilPermissao.perfil_id == perfil_id
         ).all()
-        
-        for perm in permissoes_query:
-            if perm.modulo not in permissions:
-                permissions[perm.modulo] = []
-            permissions[perm.modulo].append(perm.acao)
-        
-        return permissions
-        
+
+        return frozenset((modulo, acao) for modulo, acao in pares)
+
     except Exception as e:
-        print(f"Erro ao carregar permissões do usuário {user_id}: {e}")
-        return {}
+        print(f"Erro ao carregar permissões do perfil {perfil_id}: {e}")
+        return frozenset()
 
-def _store_in_cache(user_id, permissions):
+def _store_in_cache(perfil_id, versao, permissoes):
     """
-    Armazena permissões no cache
-    
+    Armazena o snapshot de um perfil
+
     Args:
-        user_id (int): ID do usuário
-        permissions (dict): Permissões do usuário
+        perfil_id (int): ID do perfil
+        versao (int): Versão com que o snapshot foi montado
+        permissoes (frozenset): Pares (modulo, acao)
     """
-    # Limpar cache se estiver muito grande
-    if len(permissions_cache) >= MAX_CACHE_SIZE:
-        _cleanup_old_entries()
-    
-    permissions_cache[user_id] = permissions
-    cache_timestamps[user_id] = datetime.now()
+    with lock:
+        # Limpar cache se estiver muito grande
+        if len(permissions_cache) >= MAX_CACHE_SIZE:
+            _cleanup_old_entries()
+
+        permissions_cache[perfil_id] = (versao, permissoes, datetime.now())
 
 def _cleanup_old_entries():
-    """Remove entradas antigas do cache"""
+    """Remove entradas antigas do cache (chamar com o lock adquirido)"""
     now = datetime.now()
-    expired_users = []
-    
-    for user_id, timestamp in cache_timestamps.items():
-        if (now - timestamp).total_seconds() > CACHE_TIMEOUT:
-            expired_users.append(user_id)
-    
-    for user_id in expired_users:
-        if user_id in permissions_cache:
-            del permissions_cache[user_id]
-        if user_id in cache_timestamps:
-            del cache_timestamps[user_id]
+    expired = [
+        perfil_id for perfil_id, (_, _, criado_em) in permissions_cache.items()
+        if (now - criado_em).total_seconds() > CACHE_TIMEOUT
+    ]
 
-def invalidate_user_cache(user_id):
+    for perfil_id in expired:
+        permissions_cache.pop(perfil_id, None)
+
+def _perfil_do_usuario(user_id):
+    """Retorna o perfil_id de um usuário"""
+    try:
+        from models import db, Usuario
+        return db.session.query(Usuario.perfil_id).filter(Usuario.id == user_id).scalar()
+    except Exception as e:
+        print(f"Erro ao buscar perfil do usuário {user_id}: {e}")
+        return None
+
+def _agrupar_por_modulo(permissoes):
+    """Converte o frozenset em {modulo: [acao1, acao2, ...]}"""
+    modulos = {}
+    for modulo, acao in sorted(permissoes, key=lambda par: (par[0] or '', par[1] or '')):
+        modulos.setdefault(modulo, []).append(acao)
+    return modulos
+
+def get_user_permissions(user_id):
     """
-    Invalida cache de um usuário específico
-    
+    Busca permissões do usuário a partir do snapshot do seu perfil
+
     Args:
         user_id (int): ID do usuário
+
+    Returns:
+        dict: Permissões do usuário {modulo: [acao1, acao2, ...]}
+    """
+    return _agrupar_por_modulo(get_perfil_permissions(_perfil_do_usuario(user_id)))
+
+def invalidate_perfil_cache(perfil_id):
+    """
+    Invalida o snapshot de um perfil neste worker
+
+    Args:
+        perfil_id (int): ID do perfil
     """
     with lock:
-        if user_id in permissions_cache:
-            del permissions_cache[user_id]
-        if user_id in cache_timestamps:
-            del cache_timestamps[user_id]
+        permissions_cache.pop(perfil_id, None)
+
+def invalidate_user_cache(user_id):
+    """
+    Invalida o snapshot do perfil de um usuário neste worker
+
+    Args:
+        user_id (int): ID do usuário
+    """
+    invalidate_perfil_cache(_perfil_do_usuario(user_id))
 
 def invalidate_all_cache():
-    """Invalida todo o cache de permissões"""
+    """Invalida todo o cache de permissões neste worker"""
     with lock:
         permissions_cache.clear()
-        cache_timestamps.clear()
+
+def perfil_has_permission(perfil_id, modulo, acao):
+    """
+    Verifica se um perfil tem permissão específica (com cache)
+
+    Args:
+        perfil_id (int): ID do perfil
+        modulo (str): Módulo (ex: 'usuario', 'dossie')
+        acao (str): Ação (ex: 'criar', 'editar')
+
+    Returns:
+        bool: True se tem permissão
+    """
+    return (modulo, acao) in get_perfil_permissions(perfil_id)
 
 def has_permission_cached(user_id, modulo, acao):
     """
     Verifica se usuário tem permissão específica (com cache)
-    
+
     Args:
         user_id (int): ID do usuário
         modulo (str): Módulo (ex: 'usuario', 'dossie')
         acao (str): Ação (ex: 'criar', 'editar')
-        
+
     Returns:
         bool: True se tem permissão
     """
-    permissions = get_user_permissions(user_id)
-    return acao in permissions.get(modulo, [])
+    return perfil_has_permission(_perfil_do_usuario(user_id), modulo, acao)
 
 def get_user_modules_cached(user_id):
     """
     Retorna módulos que o usuário tem acesso
-    
+
     Args:
         user_id (int): ID do usuário
-        
+
     Returns:
         list: Lista de módulos
     """
-    permissions = get_user_permissions(user_id)
-    return list(permissions.keys())
+    return list(get_user_permissions(user_id).keys())
 
 def can_access_menu_cached(user_id, menu_tipo):
     """
     Verifica se usuário pode acessar um menu específico
-    
+
     Args:
         user_id (int): ID do usuário
         menu_tipo (str): Tipo do menu
-        
+
     Returns:
         bool: True se pode acessar
     """
@@ -197,69 +270,71 @@ def can_access_menu_cached(user_id, menu_tipo):
         'admin': ['admin', 'permissao', 'perfil'],
         'manutencao': ['cidade', 'configuracao']
     }
-    
+
     if menu_tipo not in menu_mapping:
         return False
-    
-    permissions = get_user_permissions(user_id)
-    
+
+    permissoes = get_perfil_permissions(_perfil_do_usuario(user_id))
+    modulos = {modulo for modulo, _ in permissoes}
+
     # Verificar se tem acesso a pelo menos um módulo do menu
-    for modulo in menu_mapping[menu_tipo]:
-        if modulo in permissions and permissions[modulo]:
-            return True
-    
-    return False
+    return any(modulo in modulos for modulo in menu_mapping[menu_tipo])
 
 def get_cache_stats():
     """
     Retorna estatísticas do cache
-    
+
     Returns:
         dict: Estatísticas do cache
     """
     with lock:
-        now = datetime.now()
-        
-        total_entries = len(permissions_cache)
-        expired_entries = 0
-        
-        for timestamp in cache_timestamps.values():
-            if (now - timestamp).total_seconds() > CACHE_TIMEOUT:
-                expired_entries += 1
-        
-        return {
-            'total_entries': total_entries,
-            'active_entries': total_entries - expired_entries,
-            'expired_entries': expired_entries,
-            'cache_timeout_seconds': CACHE_TIMEOUT,
-            'max_cache_size': MAX_CACHE_SIZE,
-            'memory_usage_estimate': total_entries * 1024  # Estimativa em bytes
-        }
+        entradas = list(permissions_cache.values())
+
+    now = datetime.now()
+    expired_entries = sum(
+        1 for _, _, criado_em in entradas
+        if (now - criado_em).total_seconds() > CACHE_TIMEOUT
+    )
+
+    return {
+        'total_entries': len(entradas),
+        'active_entries': len(entradas) - expired_entries,
+        'expired_entries': expired_entries,
+        'versoes': sorted({versao for versao, _, _ in entradas if versao is not None}),
+        'cache_timeout_seconds': CACHE_TIMEOUT,
+        'max_cache_size': MAX_CACHE_SIZE,
+        'memory_usage_estimate': sum(len(permissoes) for _, permissoes, _ in entradas) * 64  # Estimativa em bytes
+    }
+
+def preload_perfil_permissions(perfil_ids):
+    """
+    Pré-carrega snapshots de múltiplos perfis
+
+    Args:
+        perfil_ids (list): Lista de IDs de perfis
+    """
+    for perfil_id in perfil_ids:
+        get_perfil_permissions(perfil_id)
 
 def preload_user_permissions(user_ids):
     """
     Pré-carrega permissões de múltiplos usuários
-    
+
     Args:
         user_ids (list): Lista de IDs de usuários
     """
-    for user_id in user_ids:
-        get_user_permissions(user_id)
+    preload_perfil_permissions({_perfil_do_usuario(user_id) for user_id in user_ids})
 
 def warm_cache():
-    """Aquece o cache com usuários ativos"""
+    """Aquece o cache com todos os perfis"""
     try:
-        from models import Usuario
-        
-        # Buscar usuários ativos
-        usuarios_ativos = Usuario.query.filter_by(situacao='ativo').limit(100).all()
-        user_ids = [u.id for u in usuarios_ativos]
-        
-        # Pré-carregar permissões
-        preload_user_permissions(user_ids)
-        
-        print(f"Cache aquecido com {len(user_ids)} usuários")
-        
+        from models import Perfil
+
+        perfil_ids = [p.id_perfil for p in Perfil.query.all()]
+        preload_perfil_permissions(perfil_ids)
+
+        print(f"Cache aquecido com {len(perfil_ids)} perfis")
+
     except Exception as e:
         print(f"Erro ao aquecer cache: {e}")
 
@@ -267,7 +342,7 @@ def warm_cache():
 def configure_cache(timeout=3600, max_size=1000):
     """
     Configura parâmetros do cache
-    
+
     Args:
         timeout (int): Timeout em segundos
         max_size (int): Tamanho máximo do cache
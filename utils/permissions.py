@@ -2,7 +2,7 @@
 
 from functools import wraps
 from flask import session, flash, redirect, url_for, abort
-from models import Usuario
+from utils.usuario_atual import get_usuario_atual
 
 def require_permission(modulo, acao):
     """
@@ -22,7 +22,7 @@ def require_permission(modulo, acao):
                 return redirect(url_for('auth.login'))
             
             # Buscar usuário
-            usuario = Usuario.query.get(session['user_id'])
+            usuario = get_usuario_atual()
             if not usuario:
                 flash('Usuário não encontrado.', 'error')
                 return redirect(url_for('auth.login'))
@@ -35,33 +35,29 @@ def require_permission(modulo, acao):
             from flask import request, current_app
             import json
 
+            # Usuário, IP e navegador já ficam nas colunas do log; aqui só o contexto
             detalhes_log = {
-                'usuario_id': usuario.id,
-                'usuario_nome': usuario.nome,
                 'modulo': modulo,
                 'acao': acao,
-                'resultado': 'PERMITIDO' if tem_permissao else 'NEGADO',
-                'ip_origem': request.remote_addr if request else 'N/A',
-                'url_solicitada': request.url if request else 'N/A',
-                'metodo_http': request.method if request else 'N/A',
-                'user_agent': request.headers.get('User-Agent') if request else 'N/A',
+                'url': request.path,
+                'metodo': request.method,
                 'funcao': f.__name__
             }
 
             if not tem_permissao:
                 # Log específico para acessos negados
+                detalhes_log['mensagem'] = f'Acesso negado: {usuario.nome} tentou {acao} em {modulo}'
                 log_acao(AcoesAuditoria.ACESSO_NEGADO, 'Permissao',
-                        f'Acesso negado: {usuario.nome} tentou {acao} em {modulo}',
-                        detalhes=json.dumps(detalhes_log))
+                        detalhes=json.dumps(detalhes_log, separators=(',', ':')))
 
                 flash(f'Acesso negado. Você não tem permissão para {acao} {modulo}.', 'error')
                 return abort(403)
             else:
                 # Log para acessos permitidos (apenas em debug)
                 if current_app.debug:
+                    detalhes_log['mensagem'] = f'Acesso permitido: {usuario.nome} executou {acao} em {modulo}'
                     log_acao(AcoesAuditoria.ACESSO_PERMITIDO, 'Permissao',
-                            f'Acesso permitido: {usuario.nome} executou {acao} em {modulo}',
-                            detalhes=json.dumps(detalhes_log))
+                            detalhes=json.dumps(detalhes_log, separators=(',', ':')))
             
             return f(*args, **kwargs)
         return decorated_function
@@ -86,9 +82,9 @@ def has_permission(usuario, modulo, acao):
     if usuario.perfil_obj.perfil == 'Administrador Geral':
         return True
 
-    # Usar cache para verificação de permissões
-    from utils.permission_cache import has_permission_cached
-    return has_permission_cached(usuario.id, modulo, acao)
+    # Usar snapshot de permissões do perfil
+    from utils.permission_cache import perfil_has_permission
+    return perfil_has_permission(usuario.perfil_id, modulo, acao)
 
 def can_create(usuario, modulo):
     """Verifica se pode criar registros no módulo"""
@@ -116,14 +112,12 @@ def get_user_permissions(usuario):
     if not usuario or not usuario.perfil_obj:
         return {}
     
-    permissoes = usuario.perfil_obj.get_permissoes()
+    from utils.permission_cache import get_perfil_permissions
     
     # Agrupar por módulo
     modulos = {}
-    for perm in permissoes:
-        if perm.modulo not in modulos:
-            modulos[perm.modulo] = []
-        modulos[perm.modulo].append(perm.acao)
+    for modulo, acao in get_perfil_permissions(usuario.perfil_id):
+        modulos.setdefault(modulo, []).append(acao)
     
     return modulos
 
@@ -0,0 +1,44 @@
+# utils/usuario_atual.py
+"""
+Usuário logado carregado uma única vez por requisição
+"""
+
+from flask import g, session, has_request_context
+from sqlalchemy.orm import joinedload
+
+def get_usuario_atual():
+    """
+    Retorna o usuário da sessão, carregado com perfil e escola em um único SELECT
+
+    O resultado fica em flask.g, de modo que decorators, controllers e
+    funções de template compartilham o mesmo objeto durante a requisição.
+
+    Returns:
+        Usuario: Usuário logado ou None
+    """
+    if not has_request_context():
+        return None
+
+    if '_usuario_atual' in g:
+        return g._usuario_atual
+
+    usuario = None
+    user_id = session.get('user_id')
+    if user_id:
+        from models import db, Usuario
+        # Sem escopo de escola: o escopo depende deste mesmo usuário
+        # (utils/escopo_escola.py) e o resolveria com um segundo SELECT
+        usuario = db.session.get(
+            Usuario, user_id,
+            options=[joinedload(Usuario.perfil_obj), joinedload(Usuario.escola)],
+            execution_options={'escopo_escola': False}
+        )
+
+    g._usuario_atual = usuario
+    return usuario
+
+def limpar_usuario_atual():
+    """Descarta o usuário em cache (ex: após login, logout ou troca de perfil)"""
+    if has_request_context():
+        g.pop('_usuario_atual', None)
+        g.pop('_escopo_escola', None)  # utils/escopo_escola.py